@@ -241,7 +241,16 @@ async def refresh_templates():
         from app.scripts.load_templates import load_templates
         await load_templates()
         
-        return {"status": "success", "message": "Mesaj şablonları yeniden yüklendi"}
+        # Paylaşılan şablon kaydını dosyalar ve veritabanından yenile
+        from app.utils.template_registry import template_registry
+        snapshot = await template_registry.reload_async()
+        
+        return {
+            "status": "success",
+            "message": "Mesaj şablonları yeniden yüklendi",
+            "version": snapshot.version,
+            "templates": len(snapshot)
+        }
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Şablonlar yeniden yüklenirken hata: {str(e)}")
@@ -130,6 +130,9 @@ class Settings(BaseSettings):
     # Servis Ayarları
     MESSAGE_BATCH_SIZE: int = 50  # Validator ile düzelteceğiz
     MESSAGE_BATCH_INTERVAL: int = 30  # Validator ile düzelteceğiz
+    MESSAGE_OUTBOX_CONSUMERS: int = safe_getenv_int("MESSAGE_OUTBOX_CONSUMERS", "4")
+    MESSAGE_OUTBOX_VISIBILITY_TIMEOUT: int = safe_getenv_int("MESSAGE_OUTBOX_VISIBILITY_TIMEOUT", "300")
+    MESSAGE_OUTBOX_MAX_ATTEMPTS: int = safe_getenv_int("MESSAGE_OUTBOX_MAX_ATTEMPTS", "3")
     SCHEDULER_INTERVAL: int = 60  # Validator ile düzelteceğiz
     
     # Otomatik mesajlaşma ayarları
@@ -197,4 +197,134 @@ def update_group_counts(active_count: int):
     Args:
         active_count: Aktif grup sayısı
     """
-    ACTIVE_GROUPS.set(active_count) 
\ No newline at end of file
+    ACTIVE_GROUPS.set(active_count) 
+WRITE_BEHIND_BATCH_SIZE = Histogram(
+    'telegram_bot_write_behind_batch_size',
+    'Write-behind tamponundan tek seferde yazılan satır sayısı',
+    ['buffer'],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+
+WRITE_BEHIND_FLUSH_LAG = Histogram(
+    'telegram_bot_write_behind_flush_lag_seconds',
+    'Kaydın tampona girişi ile veritabanına yazılması arasındaki gecikme',
+    ['buffer'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+WRITE_BEHIND_PENDING = Gauge(
+    'telegram_bot_write_behind_pending_rows',
+    'Write-behind tamponunda bekleyen satır sayısı',
+    ['buffer']
+)
+
+def track_write_behind_flush(buffer: str, batch_size: int, lag: float, pending: int = 0):
+    """
+    Write-behind tamponunun boşaltma metriklerini takip eder.
+    
+    Args:
+        buffer: Tampon adı
+        batch_size: Yazılan satır sayısı
+        lag: En eski kaydın bekleme süresi (saniye)
+        pending: Boşaltma sonrası bekleyen satır sayısı
+    """
+    WRITE_BEHIND_BATCH_SIZE.labels(buffer=buffer).observe(batch_size)
+    WRITE_BEHIND_FLUSH_LAG.labels(buffer=buffer).observe(lag)
+    WRITE_BEHIND_PENDING.labels(buffer=buffer).set(pending)
+
+CACHE_EVENTS = Counter(
+    'telegram_bot_cache_events_total',
+    'Önbellek isabet/ıskalama/tahliye olayları',
+    ['cache', 'event']
+)
+
+CACHE_SIZE = Gauge(
+    'telegram_bot_cache_size',
+    'Önbellekteki kayıt sayısı',
+    ['cache']
+)
+
+def track_cache_event(cache: str, event: str, count: int = 1):
+    """
+    Önbellek olayını takip eder.
+    
+    Args:
+        cache: Önbellek adı
+        event: Olay tipi (hit, miss, eviction, expired, invalidation)
+        count: Olay sayısı
+    """
+    CACHE_EVENTS.labels(cache=cache, event=event).inc(count)
+
+def update_cache_size(cache: str, size: int):
+    """
+    Önbellek boyutunu günceller.
+    
+    Args:
+        cache: Önbellek adı
+        size: Kayıt sayısı
+    """
+    CACHE_SIZE.labels(cache=cache).set(size)
+
+SEND_RATE_LIMIT = Gauge(
+    'telegram_bot_send_rate_limit',
+    'Adaptif hız sınırlayıcının metot başına izin verdiği istek/saniye',
+    ['method']
+)
+
+def track_send_rate(method: str, rate: float, flood_seconds: Optional[int] = None):
+    """
+    Adaptif hız sınırlayıcının metot hızını ve son FloodWait süresini takip eder.
+    
+    FloodWait olayları yalnızca track_telegram_request içinde sayılır;
+    burada sayılırsa aynı olay iki kez artırılır.
+    
+    Args:
+        method: Gönderim metodu
+        rate: Güncel izin verilen hız (istek/saniye)
+        flood_seconds: FloodWait bekleme süresi (varsa)
+    """
+    SEND_RATE_LIMIT.labels(method=method).set(rate)
+    if flood_seconds is not None:
+        FLOOD_WAIT_SECONDS.labels(method=method).set(flood_seconds)
+
+OUTBOX_EVENTS = Counter(
+    'telegram_bot_outbox_events_total',
+    'Mesaj outbox kuyruğu olayları',
+    ['event']
+)
+
+OUTBOX_CLAIM_LAG = Histogram(
+    'telegram_bot_outbox_claim_lag_seconds',
+    'Outbox kaydının vadesi ile işleme alınması arasındaki gecikme',
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300)
+)
+
+def track_outbox_event(event: str, count: int = 1, lag: Optional[float] = None):
+    """
+    Outbox kuyruğu olaylarını takip eder.
+    
+    Args:
+        event: Olay tipi (enqueued, claimed, acked, retried, failed, dead_lettered, reclaimed)
+        count: Olay sayısı
+        lag: Vadeden işleme alınmaya kadar geçen süre (claimed için, saniye)
+    """
+    OUTBOX_EVENTS.labels(event=event).inc(count)
+    if lag is not None:
+        OUTBOX_CLAIM_LAG.observe(max(lag, 0.0))
+
+SINGLE_FLIGHT_CALLS = Counter(
+    'telegram_bot_single_flight_calls_total',
+    'Tekil uçuş (single-flight) çağrıları; saved = yinelenen ve bekleyen işe bağlanan',
+    ['group', 'outcome']
+)
+
+def track_single_flight(group: str, outcome: str, count: int = 1):
+    """
+    Tekil uçuş çağrısını takip eder.
+    
+    Args:
+        group: Tekil uçuş grubu adı
+        outcome: executed (gerçek çağrı) veya saved (bekleyen çağrıya bağlandı)
+        count: Çağrı sayısı
+    """
+    SINGLE_FLIGHT_CALLS.labels(group=group, outcome=outcome).inc(count)
@@ -4,12 +4,20 @@
 # Yol: /Users/siyahkare/code/telegram-bot/app/core/scheduler.py
 # İşlev: Merkezi zamanlayıcı yönetimi.
 #
+# APScheduler tabanlı görev zamanlayıcısının yanında, servis döngülerinin
+# sabit uyumalar yerine kullandığı olay güdümlü bir uyandırma katmanı
+# içerir: tek bir zamanlayıcı yığını (heap) her iş anahtarını tam vadesinde
+# uyandırır, PostgreSQL LISTEN/NOTIFY dinleyicisi ise yeni kayıt eklendiğinde
+# ilgili servisi hemen uyandırır.
+#
 # © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
 # ============================================================================ #
 """
 
+import heapq
+import itertools
 import logging
-from typing import Dict, Any, Optional, Callable, Union, List
+from typing import Dict, Any, Optional, Callable, Union, List, Tuple
 import asyncio
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -287,5 +295,391 @@ class AsyncScheduler:
             logger.error(f"Görev devam ettirilirken hata: {str(e)}")
             return False
 
+
+class WakeupScheduler:
+    """
+    Zamanlayıcı yığını tabanlı uyandırma servisi.
+
+    Servis döngüleri `await wakeups.wait(key, timeout)` ile bekler. Bir anahtar
+    üç şekilde uyanır: schedule() ile verilen vadede, wake() çağrıldığında
+    (ör. NOTIFY) veya durdurma olayı ayarlandığında. Tüm vadeler tek bir
+    min-heap'te tutulur ve tek bir sürücü görevi yalnızca en yakın vadeye
+    kadar uyur; süresi geçmiş veya ertelenmiş kayıtlar heap'ten tembel
+    olarak (lazy deletion) düşürülür.
+    """
+
+    def __init__(self):
+        """Uyandırma servisini oluşturur."""
+        self._heap: List[Tuple[float, int, str]] = []
+        self._due: Dict[str, float] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._driving = False
+
+        self.stats = {
+            "timer_wakeups": 0,
+            "notify_wakeups": 0,
+            "waits": 0
+        }
+
+    def _event(self, key: str) -> asyncio.Event:
+        """Anahtara ait uyandırma olayını döndürür (yoksa oluşturur)"""
+        self._bind_loop()
+        event = self._events.get(key)
+        if event is None:
+            event = asyncio.Event()
+            self._events[key] = event
+        return event
+
+    def _bind_loop(self) -> None:
+        """
+        Çalışan olay döngüsüne bağlanır; döngü değiştiyse (ör. yeniden
+        başlatma) eski döngüye bağlı olaylar ve vadeler sıfırlanır.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            self._loop = loop
+            self._events = {}
+            self._heap = []
+            self._due = {}
+            self._task = None
+
+    def _ensure_driver(self) -> None:
+        """Heap sürücü görevini çalışan döngüde başlatır"""
+        self._bind_loop()
+        if self._task is None or self._task.done():
+            self._changed = asyncio.Event()
+            self._driving = True
+            self._task = asyncio.get_running_loop().create_task(self._drive())
+
+    def schedule(self, key: str, delay: float) -> None:
+        """
+        Anahtarı `delay` saniye sonra uyandırır.
+
+        Anahtarın daha yakın bir vadesi varsa o korunur; böylece birden çok
+        kaynaktan gelen vadelerden en erkeni geçerli olur.
+
+        Args:
+            key: İş anahtarı (ör. servis adı)
+            delay: Bekleme süresi (saniye)
+        """
+        self._ensure_driver()
+        when = asyncio.get_running_loop().time() + max(delay, 0.0)
+        current = self._due.get(key)
+        if current is not None and current <= when:
+            return
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        # Yeni vade en yakın vadeyse sürücü yeniden hesaplasın
+        if self._heap[0][2] == key:
+            self._changed.set()
+
+    def wake(self, key: str) -> None:
+        """
+        Anahtarı vadesini beklemeden hemen uyandırır.
+
+        Args:
+            key: İş anahtarı
+        """
+        self._due.pop(key, None)
+        self.stats["notify_wakeups"] += 1
+        self._event(key).set()
+
+    def wake_all(self) -> None:
+        """Bekleyen tüm anahtarları uyandırır (ör. kaçırılmış bildirimler için)."""
+        for key in list(self._events):
+            self.wake(key)
+
+    async def wait(
+        self,
+        key: str,
+        timeout: Optional[float] = None,
+        stop_event: Optional[asyncio.Event] = None
+    ) -> bool:
+        """
+        Anahtar uyandırılana, vadesi gelene veya durdurulana kadar bekler.
+
+        Args:
+            key: İş anahtarı
+            timeout: En fazla bekleme süresi (saniye, None ise yalnızca olaylar)
+            stop_event: Ayarlandığında beklemeyi sonlandıran olay
+
+        Returns:
+            bool: Uyandırıldıysa True, durdurma olayıyla sonlandıysa False
+        """
+        if timeout is not None:
+            self.schedule(key, timeout)
+        event = self._event(key)
+        self.stats["waits"] += 1
+
+        try:
+            if stop_event is None:
+                await event.wait()
+            else:
+                if stop_event.is_set():
+                    return False
+                waiters = [
+                    asyncio.ensure_future(event.wait()),
+                    asyncio.ensure_future(stop_event.wait())
+                ]
+                try:
+                    await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+                # Olay başka bir bekleyen tarafından temizlenmiş olabilir;
+                # karar olay bekleyicisinin tamamlanıp tamamlanmadığına göre verilir
+                return waiters[0].done() and not waiters[0].cancelled()
+            return True
+        finally:
+            # Sonraki bekleme temiz başlasın; eski vade heap'te tembel silinir
+            event.clear()
+            self._due.pop(key, None)
+
+    def next_due(self, key: str) -> Optional[float]:
+        """
+        Anahtarın vadesine kalan süreyi döndürür.
+
+        Returns:
+            Optional[float]: Kalan süre (saniye) veya vade yoksa None
+        """
+        when = self._due.get(key)
+        if when is None:
+            return None
+        return max(0.0, when - asyncio.get_running_loop().time())
+
+    async def _drive(self) -> None:
+        """En yakın vadeye kadar uyuyup vadesi gelen anahtarları uyandırır"""
+        loop = asyncio.get_running_loop()
+        while self._driving:
+            self._changed.clear()
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                when, _, key = heapq.heappop(self._heap)
+                # Ertelenmiş, öne çekilmiş veya iptal edilmiş kayıtları atla
+                if self._due.get(key) != when:
+                    continue
+                del self._due[key]
+                self.stats["timer_wakeups"] += 1
+                self._event(key).set()
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def shutdown(self) -> None:
+        """Sürücü görevini durdurur ve bekleyenleri uyandırır."""
+        self.wake_all()
+        if self._task is not None:
+            # wait_for iptali yutabildiği için döngü bayrakla da sonlandırılır
+            self._driving = False
+            self._changed.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._heap.clear()
+        self._due.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Uyandırma istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "scheduled": len(self._due),
+            "heap_size": len(self._heap)
+        }
+
+
+# Yeni iş kayıtlarında bildirim gönderen tablolar ve kanalları
+NOTIFY_CHANNELS = {
+    "messages": "messages_new",
+    "gpt_requests": "gpt_requests_new",
+    "campaigns": "campaigns_new",
+}
+
+NOTIFY_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION notify_new_work_item() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(TG_ARGV[0], NEW.id::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+TRIGGER_STATE_QUERY = """
+    SELECT to_regclass($1) IS NOT NULL AS table_exists,
+           EXISTS (
+               SELECT 1 FROM pg_trigger
+               WHERE tgrelid = to_regclass($1) AND tgname = $2 AND NOT tgisinternal
+           ) AS trigger_exists
+"""
+
+
+class PgNotifyListener:
+    """
+    PostgreSQL LISTEN/NOTIFY dinleyicisi.
+
+    Ayrı bir asyncpg bağlantısı üzerinden kanalları dinler ve gelen her
+    bildirimde kanala bağlı iş anahtarını WakeupScheduler üzerinden uyandırır.
+    Bağlantı koparsa artan beklemeyle yeniden bağlanır ve aradaki kaçırılmış
+    bildirimler için tüm anahtarları bir kez uyandırır.
+    """
+
+    def __init__(self, wakeups: WakeupScheduler, pool=None, reconnect_delay: float = 5.0):
+        """
+        Dinleyiciyi yapılandırır.
+
+        Args:
+            wakeups: Bildirimlerin iletileceği uyandırma servisi
+            pool: Bağlantı bilgisinin alınacağı AsyncDbConnectionPool (None ise start() içinde alınır)
+            reconnect_delay: İlk yeniden bağlanma gecikmesi (saniye)
+        """
+        self.wakeups = wakeups
+        self.pool = pool
+        self.reconnect_delay = reconnect_delay
+        self._channels: Dict[str, set] = {}
+        self._connection = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._triggers_ready = False
+        self._stopping = False
+
+        self.stats = {
+            "notifications": 0,
+            "reconnects": 0
+        }
+
+    @property
+    def is_listening(self) -> bool:
+        """Dinleme bağlantısı açıksa True döndürür"""
+        return self._connection is not None and not self._connection.is_closed()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        """asyncpg bildirim geri çağrısı"""
+        self.stats["notifications"] += 1
+        for key in self._channels.get(channel, ()):
+            self.wakeups.wake(key)
+
+    def _on_terminate(self, connection) -> None:
+        """Bağlantı koptuğunda yeniden bağlanmayı başlatır"""
+        self._connection = None
+        if not self._stopping and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = asyncio.get_event_loop().create_task(self._reconnect())
+
+    async def listen(self, table: str, key: str) -> bool:
+        """
+        Tabloya yeni kayıt eklendiğinde anahtarı uyandıracak şekilde abone olur.
+
+        Args:
+            table: NOTIFY_CHANNELS içindeki tablo adı
+            key: Uyandırılacak iş anahtarı
+
+        Returns:
+            bool: Dinleme etkinse True
+        """
+        channel = NOTIFY_CHANNELS[table]
+        keys = self._channels.setdefault(channel, set())
+        is_new_channel = not keys
+        keys.add(key)
+
+        if not self.is_listening:
+            return await self.start()
+        if is_new_channel:
+            await self._connection.add_listener(channel, self._on_notify)
+        return True
+
+    async def start(self) -> bool:
+        """
+        Tetikleyicileri hazırlar ve dinleme bağlantısını açar.
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        if self.is_listening:
+            return True
+        self._stopping = False
+        try:
+            import asyncpg
+
+            if self.pool is None:
+                from app.db.async_connection_pool import get_db_pool
+                self.pool = await get_db_pool()
+            if not self._triggers_ready:
+                await self.ensure_triggers()
+
+            connection = await asyncpg.connect(dsn=self.pool.db_url)
+            for channel in self._channels:
+                await connection.add_listener(channel, self._on_notify)
+            connection.add_termination_listener(self._on_terminate)
+            self._connection = connection
+            logger.info(f"LISTEN/NOTIFY dinleyicisi başlatıldı: {', '.join(self._channels) or '-'}")
+            return True
+        except Exception as e:
+            logger.warning(f"LISTEN/NOTIFY dinleyicisi başlatılamadı: {str(e)}")
+            return False
+
+    async def ensure_triggers(self) -> None:
+        """
+        İş tablolarına INSERT bildirim tetikleyicilerini kurar.
+
+        Tablo yoksa veya tetikleyici zaten kuruluysa dokunulmaz; DROP/CREATE
+        TRIGGER tabloyu yazmalara kilitlediği için her başlangıçta çalışmaz.
+        """
+        await self.pool.execute(NOTIFY_FUNCTION_SQL)
+        for table, channel in NOTIFY_CHANNELS.items():
+            trigger = f"{table}_notify_new"
+            row = await self.pool.fetchrow(TRIGGER_STATE_QUERY, table, trigger)
+            if not row or not row["table_exists"] or row["trigger_exists"]:
+                continue
+            await self.pool.execute(
+                f"CREATE TRIGGER {trigger} AFTER INSERT ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION notify_new_work_item('{channel}')"
+            )
+        self._triggers_ready = True
+
+    async def _reconnect(self) -> None:
+        """Bağlantıyı artan beklemeyle yeniden kurar"""
+        delay = self.reconnect_delay
+        while not self._stopping:
+            await asyncio.sleep(delay)
+            if await self.start():
+                self.stats["reconnects"] += 1
+                # Kopukluk sırasında gelen bildirimler kaçırılmış olabilir
+                self.wakeups.wake_all()
+                return
+            delay = min(delay * 2, 300.0)
+
+    async def stop(self) -> None:
+        """Dinleme bağlantısını kapatır."""
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                await connection.close()
+            except Exception as e:
+                logger.debug(f"LISTEN bağlantısı kapatılamadı: {str(e)}")
+
+
 # Tekil zamanlayıcı örneği oluştur
-scheduler = AsyncScheduler()
\ No newline at end of file
+scheduler = AsyncScheduler()
+
+# Servis döngülerinin paylaştığı uyandırma servisi ve NOTIFY dinleyicisi
+wakeups = WakeupScheduler()
+notify_listener = PgNotifyListener(wakeups)
\ No newline at end of file
@@ -36,6 +36,7 @@ try:
     from app.service_manager import ServiceManager, ServiceStatus
     from app.utils.logger_setup import setup_logger
     from app.utils.postgres_db import setup_postgres_db
+    from app.db.async_pg_db import AsyncPgDatabase
     from telethon import TelegramClient
     from telethon.errors import SessionPasswordNeededError
 except ImportError as e:
@@ -71,6 +72,7 @@ class ServiceStarter:
         self.config = None
         self.client = None
         self.db = None
+        self.async_db = None
         self.service_manager = None
         self.shutdown_event = asyncio.Event()
         self.session_dir = os.path.join(parent_dir, "session")
@@ -122,6 +124,14 @@ class ServiceStarter:
                 from app.test_services import DatabaseMock
                 self.db = DatabaseMock()
             
+            # Servislerin sorguları event loop'u bloklamasın diye asyncpg deposu;
+            # havuz kurulamazsa servisler psycopg2 bağlantısıyla devam eder
+            async_db = AsyncPgDatabase(db_url=self.config.get('database_url'))
+            if await async_db.connect():
+                self.async_db = async_db
+            else:
+                logger.warning("Asenkron PostgreSQL deposu kurulamadı, servisler senkron bağlantıyı kullanacak")
+            
             # Telegram istemcisini oluştur
             logger.info("Telegram istemcisi başlatılıyor...")
             
@@ -177,6 +187,7 @@ class ServiceStarter:
             
             # Servisleri doğrudan oluşturup kaydedelim (sınıf kaydı yerine)
             stop_event = self.shutdown_event
+            service_db = self.async_db or self.db
             
             # EventService'i oluştur ve kaydet
             try:
@@ -184,7 +195,7 @@ class ServiceStarter:
                 event_service = EventService(
                     client=self.client,
                     config=self.config,
-                    db=self.db,
+                    db=service_db,
                     stop_event=stop_event
                 )
                 self.service_manager.register_service(event_service)
@@ -208,11 +219,12 @@ class ServiceStarter:
                     module = __import__(module_path, fromlist=[class_name])
                     service_class = getattr(module, class_name)
                     
-                    # Servisi oluştur
+                    # Servisi oluştur; ReplyService yalnızca senkron bağlantıdaki
+                    # yanıt/anahtar kelime yardımcılarını kullanır
                     service = service_class(
                         client=self.client, 
                         config=self.config, 
-                        db=self.db, 
+                        db=self.db if service_name == "reply" else service_db, 
                         stop_event=stop_event
                     )
                     
@@ -9,6 +9,7 @@ import os
 import json
 import asyncio
 import logging
+import threading
 from typing import Dict, Any, Optional, List, Callable, Awaitable, Union
 from datetime import datetime
 
@@ -39,6 +40,8 @@ class TDLibClient:
         system_version: str = "Bot",
         proxy_settings: Optional[Dict[str, Any]] = None,
         tdlib_verbosity: int = 2,
+        poll_timeout: float = 1.0,
+        max_pending_updates: int = 10000,
     ):
         """
         TDLib istemcisini başlatır.
@@ -58,6 +61,8 @@ class TDLibClient:
             system_version: Sistem sürümü
             proxy_settings: Proxy ayarları
             tdlib_verbosity: TDLib log seviyesi
+            poll_timeout: Alıcı thread'in td_json_client_receive bekleme süresi (saniye)
+            max_pending_updates: İşlenmeyi bekleyen en fazla güncelleme sayısı
         """
         # TDLib kütüphanesini yükle
         try:
@@ -145,8 +150,18 @@ class TDLibClient:
         self._update_handlers = []
         self._pending_requests = {}
         self._next_request_id = 0
+        self._type_waiters: Dict[str, List[asyncio.Future]] = {}
+        self._authorization_state: Optional[Dict[str, Any]] = None
         
-        # TDLib istemci döngüsü
+        # TDLib alıcı thread'i ve güncelleme dağıtım görevi.
+        # td_json_client_receive bloklayan bir C çağrısı olduğundan event loop
+        # dışında çalışır; sonuçlar loop'a call_soon_threadsafe ile aktarılır.
+        self.poll_timeout = poll_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._recv_thread: Optional[threading.Thread] = None
+        self._recv_stop = threading.Event()
+        # Kuyruktaki güncelleme sayısını sınırlar; dolduğunda alıcı thread bekler
+        self._update_slots = threading.BoundedSemaphore(max(max_pending_updates, 1))
         self._recv_task = None
         
     async def connect(self) -> bool:
@@ -184,12 +199,12 @@ class TDLibClient:
                 })
                 logger.info(f"Proxy ayarlandı: {proxy_result}")
             
+            # Alıcı thread'i ve dağıtım görevini başlat
+            self._start_receiver()
+            
             # TDLib parametrelerini gönder
             await self._send(parameters)
             
-            # Alıcı görevi başlat
-            self._recv_task = asyncio.create_task(self._receive_loop())
-            
             # Yanıt bekle
             result = await self._wait_for_type('updateAuthorizationState', timeout=10.0)
             
@@ -219,13 +234,8 @@ class TDLibClient:
             if self._client:
                 await self._send({'@type': 'close'})
                 
-                # Alıcı görevini bekle
-                if self._recv_task and not self._recv_task.done():
-                    try:
-                        self._recv_task.cancel()
-                        await self._recv_task
-                    except asyncio.CancelledError:
-                        pass
+                # Alıcı thread'i ve dağıtım görevini durdur
+                await self._stop_receiver()
                         
                 # İstemciyi yok et
                 self._td_json_client_destroy(self._client)
@@ -285,59 +295,129 @@ class TDLibClient:
         else:
             return {}
             
-    async def _receive(self, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+    def _start_receiver(self) -> None:
+        """
+        TDLib alıcı thread'ini ve güncelleme dağıtım görevini başlatır.
         """
-        TDLib'den veri alır.
+        if self._recv_thread and self._recv_thread.is_alive():
+            return
+            
+        self._loop = asyncio.get_running_loop()
+        self._recv_stop.clear()
+        self._recv_thread = threading.Thread(
+            target=self._receiver_thread,
+            name=f"tdlib-recv-{self.session_name}",
+            daemon=True
+        )
+        self._recv_thread.start()
+        self._recv_task = asyncio.create_task(self._receive_loop())
         
-        Args:
-            timeout: Zaman aşımı
-            
-        Returns:
-            Optional[Dict[str, Any]]: Alınan veri
+    async def _stop_receiver(self) -> None:
         """
-        if not self._client:
-            raise RuntimeError("TDLib istemcisi başlatılmadı")
-            
-        # Al
-        result_json = self._td_json_client_receive(self._client, timeout)
+        Alıcı thread'ini durdurur ve dağıtım görevini iptal eder.
+        """
+        self._recv_stop.set()
         
-        if result_json:
-            return json.loads(result_json.decode('utf-8'))
-        else:
-            return None
-            
-    async def _receive_loop(self) -> None:
+        # Thread en fazla bir poll_timeout kadar td_json_client_receive içinde kalır
+        if self._recv_thread and self._recv_thread.is_alive():
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._recv_thread.join, self.poll_timeout + 1.0
+            )
+        self._recv_thread = None
+        
+        if self._recv_task and not self._recv_task.done():
+            try:
+                self._recv_task.cancel()
+                await self._recv_task
+            except asyncio.CancelledError:
+                pass
+        self._recv_task = None
+        
+    def _receiver_thread(self) -> None:
         """
-        TDLib'den sürekli veri alan döngü.
+        TDLib'den sürekli veri alan thread döngüsü.
+        
+        Bloklayan td_json_client_receive çağrısı ve JSON çözümleme bu thread'de
+        yapılır. İstek yanıtları doğrudan, güncellemeler ise kuyrukta yer
+        açıldıkça event loop'a aktarılır.
         """
-        while self._client:
+        while not self._recv_stop.is_set() and self._client:
             try:
-                result = await self._receive()
+                result_json = self._td_json_client_receive(self._client, self.poll_timeout)
+                if not result_json:
+                    continue
+                    
+                result = json.loads(result_json.decode('utf-8'))
                 
-                if result:
-                    # Request ID varsa bekleyen isteği kontrol et
-                    extra = result.get('@extra', {})
-                    request_id = extra.get('request_id')
+                # İstek yanıtları kuyruğu beklemeden future'lara iletilir
+                if isinstance(result.get('@extra'), dict) and 'request_id' in result['@extra']:
+                    self._loop.call_soon_threadsafe(self._route_result, result, False)
+                    continue
                     
-                    if request_id is not None and request_id in self._pending_requests:
-                        future = self._pending_requests.pop(request_id)
-                        if not future.done():
-                            future.set_result(result)
-                    else:
-                        # Güncelleme kuyruğuna ekle
-                        await self._updates_queue.put(result)
+                # Güncelleme kuyruğu doluysa yer açılana kadar bekle (backpressure)
+                while not self._update_slots.acquire(timeout=self.poll_timeout):
+                    if self._recv_stop.is_set():
+                        return
                         
-                        # Güncelleme işleyicilere bildir
-                        update_type = result.get('@type')
-                        if update_type:
-                            for handler in self._update_handlers:
-                                try:
-                                    await handler(result)
-                                except Exception as e:
-                                    logger.exception(f"Güncelleme işleyici hatası: {str(e)}")
+                self._loop.call_soon_threadsafe(self._route_result, result, True)
+            except RuntimeError:
+                # Event loop kapandı
+                break
             except Exception as e:
-                logger.exception(f"TDLib alıcı döngüsü hatası: {str(e)}")
-                await asyncio.sleep(1.0)  # Hata sonrası bekle
+                logger.exception(f"TDLib alıcı thread hatası: {str(e)}")
+                self._recv_stop.wait(1.0)  # Hata sonrası bekle
+                
+    def _route_result(self, result: Dict[str, Any], holds_slot: bool) -> None:
+        """
+        Alıcı thread'den gelen sonucu event loop üzerinde yönlendirir.
+        
+        Args:
+            result: TDLib'den gelen veri
+            holds_slot: Sonuç kuyruk kapasitesinden bir yer ayırdıysa True
+        """
+        # Request ID varsa bekleyen isteği kontrol et
+        extra = result.get('@extra') or {}
+        request_id = extra.get('request_id') if isinstance(extra, dict) else None
+        
+        if request_id is not None and request_id in self._pending_requests:
+            future = self._pending_requests.pop(request_id)
+            if not future.done():
+                future.set_result(result)
+            if holds_slot:
+                self._update_slots.release()
+            return
+            
+        if result.get('@type') == 'updateAuthorizationState':
+            self._authorization_state = result
+            
+        # Belirli bir türü bekleyenleri uyandır
+        for key in (result.get('@type'), result.get('authorization_state', {}).get('@type')):
+            for waiter in self._type_waiters.pop(key, []) if key else []:
+                if not waiter.done():
+                    waiter.set_result(result)
+                    
+        # Güncelleme kuyruğuna ekle
+        self._updates_queue.put_nowait((result, holds_slot))
+        
+    async def _receive_loop(self) -> None:
+        """
+        Kuyruktaki güncellemeleri işleyicilere dağıtan döngü.
+        """
+        while True:
+            result, holds_slot = await self._updates_queue.get()
+            try:
+                # Güncelleme işleyicilere bildir
+                update_type = result.get('@type')
+                if update_type:
+                    for handler in self._update_handlers:
+                        try:
+                            await handler(result)
+                        except Exception as e:
+                            logger.exception(f"Güncelleme işleyici hatası: {str(e)}")
+            finally:
+                if holds_slot:
+                    self._update_slots.release()
+                self._updates_queue.task_done()
                 
     @track_telegram_request("auth_phone")
     async def phone_login(self, phone: Optional[str] = None) -> bool:
@@ -401,34 +481,25 @@ class TDLibClient:
         Returns:
             Optional[Dict[str, Any]]: Beklenen güncelleme
         """
-        start_time = datetime.now()
-        while (datetime.now() - start_time).total_seconds() < timeout:
-            try:
-                # Güncelleme kuyruğunu kontrol et
-                if not self._updates_queue.empty():
-                    update = await self._updates_queue.get()
-                    
-                    if update.get('@type') == update_type:
-                        return update
-                    elif update.get('authorization_state', {}).get('@type') == update_type:
-                        return update
-                        
-                # Yeni güncelleme bekle
-                result = await self._receive(timeout=0.1)
-                
-                if result:
-                    if result.get('@type') == update_type:
-                        return result
-                    elif result.get('authorization_state', {}).get('@type') == update_type:
-                        return result
-                        
-                # Kısa bekle
-                await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.exception(f"Güncelleme beklenirken hata: {str(e)}")
-                
-        return None
+        # Yetkilendirme durumu zaten bekleneni gösteriyorsa hemen dön
+        state = self._authorization_state
+        if state and update_type in (
+            state.get('@type'), state.get('authorization_state', {}).get('@type')
+        ):
+            return state
+            
+        waiter = asyncio.get_running_loop().create_future()
+        self._type_waiters.setdefault(update_type, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._type_waiters.get(update_type)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._type_waiters[update_type]
         
     @track_telegram_request("api_request")
     async def send_request(self, method: str, **kwargs) -> Dict[str, Any]:
@@ -481,6 +552,7 @@ class TDLibClient:
             return result
             
         except asyncio.TimeoutError:
+            self._pending_requests.pop(request_id, None)
             logger.error(f"TDLib API zaman aşımı: {method}")
             return {'@type': 'error', 'code': 408, 'message': 'Request timeout'}
         except Exception as e:
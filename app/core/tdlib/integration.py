@@ -319,8 +319,8 @@ class TelegramDiscoveryService(BaseService):  # BaseService'den türetildiğini
                 logger.error(f"Herkese açık grupları alma hatası: {str(e)}")
                 public_chats = []
                     
-            # Her grubu işle
-            for chat_id in public_chats:
+            # Her grubu bir kez işle; birden çok aramada çıkan sohbetler yeniden sorgulanmaz
+            for chat_id in dict.fromkeys(public_chats):
                 try:
                     # Grup detaylarını al
                     chat = await self.tdlib_client.get_chat(chat_id)
@@ -0,0 +1,740 @@
+"""
+# ============================================================================ #
+# Dosya: pooled_session.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/core/tdlib/pooled_session.py
+# İşlev: Paylaşılan asyncpg havuzunu kullanan asenkron Telethon oturumu.
+#
+# PostgresSession her oturum için ayrı, bloklayan bir psycopg2 bağlantısı
+# tutar ve her varlık araması/kaydı Telethon döngüsünü bekletir. Bu oturum
+# bağlantı tutmaz: açılışta oturum satırı ve en son kullanılan varlıklar
+# AsyncDbConnectionPool üzerinden belleğe (sıcak harita) yüklenir, aramalar
+# bellekten yanıtlanır, bellekte olmayan varlıklar arka planda veritabanından
+# tembel olarak okunur. Değişiklikler kirli olarak işaretlenir ve zamanlayıcı
+# ile tek bir transaction içinde toplu upsert edilir. Tablo düzeni
+# PostgresSession ile aynıdır (telethon_<oturum>_*), mevcut veriler aynen
+# kullanılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from telethon import TelegramClient, utils
+from telethon.crypto import AuthKey
+from telethon.sessions.memory import MemorySession, _SentFileType
+from telethon.tl import types
+from telethon.tl.types import PeerUser, PeerChat, PeerChannel
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+
+logger = logging.getLogger(__name__)
+
+# Varlık satırı: (işaretli id, access_hash, username, phone, name)
+EntityRow = Tuple[int, int, Optional[str], Optional[str], Optional[str]]
+
+SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS {p}_version (
+        version INTEGER PRIMARY KEY
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {p}_sessions (
+        dc_id INTEGER PRIMARY KEY,
+        server_address TEXT,
+        port INTEGER,
+        auth_key BYTEA,
+        takeout_id INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {p}_entities (
+        id BIGINT PRIMARY KEY,
+        hash BIGINT NOT NULL,
+        username TEXT,
+        phone TEXT,
+        name TEXT,
+        date TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {p}_entities_username_idx ON {p}_entities (username)",
+    "CREATE INDEX IF NOT EXISTS {p}_entities_phone_idx ON {p}_entities (phone)",
+    """
+    CREATE TABLE IF NOT EXISTS {p}_update_state (
+        id INTEGER PRIMARY KEY,
+        pts INTEGER,
+        qts INTEGER,
+        date INTEGER,
+        seq INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {p}_sent_files (
+        md5_digest BYTEA,
+        file_size INTEGER,
+        type INTEGER,
+        id BIGINT,
+        hash BIGINT,
+        PRIMARY KEY (md5_digest, file_size, type)
+    )
+    """,
+    "INSERT INTO {p}_version VALUES (7) ON CONFLICT DO NOTHING",
+)
+
+ENTITY_COLUMNS = "id, hash, username, phone, name"
+
+UPSERT_ENTITIES = """
+    INSERT INTO {p}_entities (id, hash, username, phone, name, date)
+    SELECT *, NOW()
+    FROM unnest($1::bigint[], $2::bigint[], $3::text[], $4::text[], $5::text[])
+    ON CONFLICT (id) DO UPDATE SET
+        hash = EXCLUDED.hash,
+        username = EXCLUDED.username,
+        phone = EXCLUDED.phone,
+        name = EXCLUDED.name,
+        date = EXCLUDED.date
+"""
+
+UPSERT_SENT_FILES = """
+    INSERT INTO {p}_sent_files (md5_digest, file_size, type, id, hash)
+    SELECT * FROM unnest($1::bytea[], $2::integer[], $3::integer[], $4::bigint[], $5::bigint[])
+    ON CONFLICT (md5_digest, file_size, type) DO UPDATE SET
+        id = EXCLUDED.id,
+        hash = EXCLUDED.hash
+"""
+
+UPSERT_UPDATE_STATES = """
+    INSERT INTO {p}_update_state (id, pts, qts, date, seq)
+    SELECT * FROM unnest($1::integer[], $2::integer[], $3::integer[], $4::integer[], $5::integer[])
+    ON CONFLICT (id) DO UPDATE SET
+        pts = EXCLUDED.pts,
+        qts = EXCLUDED.qts,
+        date = EXCLUDED.date,
+        seq = EXCLUDED.seq
+"""
+
+# Veritabanı yedek aramaları (sütun -> koşul)
+FALLBACK_CONDITIONS = {
+    "id": "id = ANY($1::bigint[])",
+    "username": "username = $1",
+    "phone": "phone = $1",
+}
+
+
+def table_prefix(session_name: str) -> str:
+    """Oturum adından tablo önekini üretir (PostgresSession ile aynı düzen)"""
+    return "telethon_" + re.sub(r"[^0-9A-Za-z_]", "_", os.path.basename(str(session_name)))
+
+
+class PooledPostgresSession(MemorySession):
+    """
+    Paylaşılan bağlantı havuzu üzerinde çalışan write-behind Telethon oturumu.
+
+    Telethon'un senkron oturum arayüzü yalnızca bellekteki sıcak haritaya
+    dokunur; hiçbir çağrı döngüyü veritabanı için bekletmez. Bellekte
+    bulunmayan varlıklar için arka planda tek bir sorgu başlatılır; çağıran
+    taraf beklemek isterse ensure() ile bu sorguyu bekleyebilir
+    (PooledSessionClient bunu her varlık çözümlemesinden önce yapar). Kirli
+    kayıtlar her `flush_interval_ms` milisaniyede, oturum anahtarı
+    değiştiğinde veya save() çağrıldığında yazılır.
+    """
+
+    def __init__(
+        self,
+        session_name: str,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        hot_limit: int = 20000,
+        flush_interval_ms: int = 5000,
+        max_dirty_rows: int = 500
+    ):
+        """
+        Oturumu yapılandırır (veritabanına dokunmaz, yükleme load() ile yapılır).
+
+        Args:
+            session_name: Oturum adı (tablo öneki bu addan üretilir)
+            pool: Paylaşılan asyncpg bağlantı havuzu (None ise load() içinde alınır)
+            hot_limit: Bellekte tutulan en fazla varlık sayısı
+            flush_interval_ms: İki yazma arasındaki maksimum süre (milisaniye)
+            max_dirty_rows: Erken yazmayı tetikleyen kirli varlık sayısı
+        """
+        super().__init__()
+        self.name = session_name
+        self.table_prefix = table_prefix(session_name)
+        self.pool = pool
+        self.hot_limit = max(int(hot_limit), 1)
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.max_dirty_rows = max(int(max_dirty_rows), 1)
+
+        # Sıcak harita: en son kullanılan sonda (LRU)
+        self._entities: "OrderedDict[int, EntityRow]" = OrderedDict()
+        self._by_username: Dict[str, int] = {}
+        self._by_phone: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+
+        # Son yazmadan bu yana değişen kayıtlar
+        self._dirty_entities: Dict[int, EntityRow] = {}
+        self._dirty_files: Dict[Tuple[bytes, int, int], Tuple[int, int]] = {}
+        self._dirty_states: Dict[int, Tuple[int, int, int, int]] = {}
+        self._session_dirty = False
+
+        # Veritabanında da bulunamayan anahtarlar ve süren yedek aramalar
+        self._db_misses: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._lookups: Dict[Hashable, asyncio.Task] = {}
+
+        self._flush_needed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Senkron çağrılardan başlatılan görevler (çöp toplayıcı silmesin diye)
+        self._background: Set[asyncio.Task] = set()
+        self.is_running = False
+        self.loaded = False
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "db_lookups": 0,
+            "db_hits": 0,
+            "evictions": 0,
+            "flushes": 0,
+            "flushed_rows": 0,
+            "errors": 0,
+            "last_flush": None
+        }
+
+    def _sql(self, template: str) -> str:
+        return template.format(p=self.table_prefix)
+
+    # ------------------------------------------------------------------ #
+    # Yaşam döngüsü
+    # ------------------------------------------------------------------ #
+
+    async def load(self) -> "PooledPostgresSession":
+        """
+        Tabloları hazırlar; oturum satırını, dosya ve durum kayıtlarını ve en
+        son kullanılan `hot_limit` varlığı belleğe yükler.
+
+        Returns:
+            PooledPostgresSession: Oturumun kendisi
+        """
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        for statement in SCHEMA_STATEMENTS:
+            await self.pool.execute(self._sql(statement))
+
+        row = await self.pool.fetchrow(self._sql(
+            "SELECT dc_id, server_address, port, auth_key, takeout_id FROM {p}_sessions LIMIT 1"
+        ))
+        if row:
+            self._dc_id = row["dc_id"] or 0
+            self._server_address = row["server_address"]
+            self._port = row["port"]
+            self._takeout_id = row["takeout_id"]
+            key = row["auth_key"]
+            self._auth_key = AuthKey(data=bytes(key)) if key else None
+
+        entities = await self.pool.fetch(self._sql(
+            f"SELECT {ENTITY_COLUMNS} FROM {{p}}_entities ORDER BY date DESC NULLS LAST LIMIT $1"
+        ), self.hot_limit)
+        # En yeni sonda kalacak şekilde ters sırayla ekle
+        for entity in reversed(entities):
+            self._remember(tuple(entity))
+
+        for file_row in await self.pool.fetch(self._sql(
+            "SELECT md5_digest, file_size, type, id, hash FROM {p}_sent_files"
+        )):
+            md5_digest, file_size, file_type, file_id, file_hash = tuple(file_row)
+            self._files[(bytes(md5_digest), file_size, _SentFileType(file_type))] = (file_id, file_hash)
+
+        for state_row in await self.pool.fetch(self._sql(
+            "SELECT id, pts, qts, date, seq FROM {p}_update_state"
+        )):
+            state_id, pts, qts, date, seq = tuple(state_row)
+            self._update_states[state_id] = types.updates.State(
+                pts, qts, datetime.datetime.fromtimestamp(date, tz=datetime.timezone.utc), seq, unread_count=0
+            )
+
+        self.loaded = True
+        logger.info(
+            f"Havuzlu oturum yüklendi ({self.table_prefix}): {len(self._entities)} varlık, "
+            f"{len(self._files)} dosya, {len(self._update_states)} durum"
+        )
+        return self
+
+    async def start(self) -> bool:
+        """
+        Arka plan yazma görevini başlatır.
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        if self.is_running:
+            return True
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        self.is_running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        return True
+
+    async def stop(self) -> None:
+        """
+        Arka plan görevini durdurur ve bekleyen değişiklikleri yazar.
+
+        Görev iptal edilmez; döngü uyandırılır ve süren yazmayı bitirip
+        kendiliğinden çıkar.
+        """
+        self.is_running = False
+        self._flush_needed.set()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._lookups.values()):
+            task.cancel()
+        await self.flush()
+
+    def _spawn(self, coro: Awaitable[Any]) -> Optional[asyncio.Task]:
+        """Senkron çağrıdan görev başlatır ve bitene kadar referansını tutar"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            coro.close()
+            return None
+        task = loop.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def _request_flush(self) -> None:
+        """Çalışan döngü varsa yazmayı öne çeker, yoksa tek seferlik yazma planlar"""
+        if self.is_running:
+            self._flush_needed.set()
+            return
+        self._spawn(self.flush())
+
+    async def _flush_loop(self) -> None:
+        """Zaman veya kirli kayıt sınırına göre periyodik yazma döngüsü"""
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Havuzlu oturum yazma döngüsü hatası: {str(e)}")
+
+    # ------------------------------------------------------------------ #
+    # Oturum anahtarı ve veri merkezi
+    # ------------------------------------------------------------------ #
+
+    def _mark_session_dirty(self) -> None:
+        self._session_dirty = True
+        # Yetkilendirme verisi kaybolmamalı; beklemeden yazılır
+        self._request_flush()
+
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self._mark_session_dirty()
+
+    @property
+    def auth_key(self):
+        return self._auth_key
+
+    @auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self._mark_session_dirty()
+
+    @property
+    def takeout_id(self):
+        return self._takeout_id
+
+    @takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._mark_session_dirty()
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty_states[entity_id] = (state.pts, state.qts, int(state.date.timestamp()), state.seq)
+
+    def cache_file(self, md5_digest, file_size, instance):
+        super().cache_file(md5_digest, file_size, instance)
+        if isinstance(md5_digest, memoryview):
+            md5_digest = bytes(md5_digest)
+        file_type = _SentFileType.from_type(type(instance)).value
+        self._dirty_files[(md5_digest, file_size, file_type)] = (instance.id, instance.access_hash)
+
+    def save(self):
+        """Telethon'un senkron kayıt çağrısı; yazma arka planda yapılır."""
+        self._request_flush()
+
+    def close(self):
+        """
+        Telethon bağlantıyı kapatırken çağırır; son değişiklikleri arka planda
+        yazar. Yazmanın bitmesini beklemek için close_async() kullanılır.
+        """
+        self._spawn(self.stop())
+
+    async def close_async(self) -> None:
+        """Oturumu durdurur ve arka planda süren yazma/silme görevlerini bekler."""
+        await self.stop()
+        current = asyncio.current_task()
+        pending = [task for task in self._background if task is not current]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def delete(self):
+        """Oturum tablolarını siler (arka planda)."""
+        self._spawn(self.delete_async())
+
+    async def delete_async(self) -> None:
+        """Oturum tablolarını ve bellekteki verileri siler."""
+        self._dirty_entities.clear()
+        self._dirty_files.clear()
+        self._dirty_states.clear()
+        self._session_dirty = False
+        if self.pool is None:
+            return
+        for table in ("sessions", "entities", "sent_files", "update_state", "version"):
+            await self.pool.execute(f"DROP TABLE IF EXISTS {self.table_prefix}_{table}")
+        logger.info(f"Havuzlu oturum verileri silindi: {self.table_prefix}_*")
+
+    # ------------------------------------------------------------------ #
+    # Sıcak varlık haritası
+    # ------------------------------------------------------------------ #
+
+    def _unindex(self, row: EntityRow) -> None:
+        entity_id, _, username, phone, name = row
+        for index, value in ((self._by_username, username), (self._by_phone, phone), (self._by_name, name)):
+            if value and index.get(value) == entity_id:
+                del index[value]
+
+    def _remember(self, row: EntityRow) -> None:
+        """Varlığı sıcak haritaya ekler/tazeler ve sınırı aşanları tahliye eder"""
+        entity_id = row[0]
+        previous = self._entities.pop(entity_id, None)
+        if previous is not None:
+            self._unindex(previous)
+        self._entities[entity_id] = row
+        _, _, username, phone, name = row
+        if username:
+            self._by_username[username] = entity_id
+        if phone:
+            self._by_phone[phone] = entity_id
+        if name:
+            self._by_name[name] = entity_id
+
+        while len(self._entities) > self.hot_limit:
+            _, evicted = self._entities.popitem(last=False)
+            self._unindex(evicted)
+            self.stats["evictions"] += 1
+
+    def _hit(self, entity_id: Optional[int]) -> Optional[Tuple[int, int]]:
+        row = self._entities.get(entity_id)
+        if row is None:
+            return None
+        self._entities.move_to_end(entity_id)
+        self.stats["hits"] += 1
+        return row[0], row[1]
+
+    def process_entities(self, tlo):
+        """Gelen varlıkları sıcak haritaya ekler; yalnızca değişenleri kirli işaretler."""
+        for row in self._entities_to_rows(tlo):
+            if self._entities.get(row[0]) == row:
+                self._entities.move_to_end(row[0])
+                continue
+            self._remember(row)
+            self._dirty_entities[row[0]] = row
+        if len(self._dirty_entities) >= self.max_dirty_rows:
+            self._flush_needed.set()
+
+    def get_entity_rows_by_phone(self, phone):
+        result = self._hit(self._by_phone.get(phone))
+        if result is None:
+            self._miss("phone", phone)
+        return result
+
+    def get_entity_rows_by_username(self, username):
+        result = self._hit(self._by_username.get(username))
+        if result is None:
+            self._miss("username", username)
+        return result
+
+    def get_entity_rows_by_name(self, name):
+        # Adlar tekil değildir; veritabanı yedeği yalnızca id/username/phone için
+        return self._hit(self._by_name.get(name))
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            candidates = (id,)
+        else:
+            candidates = (
+                utils.get_peer_id(PeerUser(id)),
+                utils.get_peer_id(PeerChat(id)),
+                utils.get_peer_id(PeerChannel(id))
+            )
+        for candidate in candidates:
+            result = self._hit(candidate)
+            if result is not None:
+                return result
+        self._miss("id", candidates)
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Tembel veritabanı yedeği
+    # ------------------------------------------------------------------ #
+
+    def _miss(self, column: str, value: Any) -> None:
+        """Bellekte bulunamayan anahtar için arka plan veritabanı araması başlatır"""
+        self.stats["misses"] += 1
+        key = (column, value)
+        if self.pool is None or key in self._lookups or key in self._db_misses:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.fetch_entity(column, value))
+        self._lookups[key] = task
+        task.add_done_callback(lambda _: self._lookups.pop(key, None))
+
+    async def fetch_entity(self, column: str, value: Any) -> Optional[EntityRow]:
+        """
+        Varlığı veritabanından okuyup sıcak haritaya ekler.
+
+        Args:
+            column: 'id', 'username' veya 'phone'
+            value: Aranan değer (id için aday id listesi)
+
+        Returns:
+            Optional[EntityRow]: Bulunan varlık satırı
+        """
+        args = list(value) if column == "id" else value
+        self.stats["db_lookups"] += 1
+        try:
+            row = await self.pool.fetchrow(self._sql(
+                f"SELECT {ENTITY_COLUMNS} FROM {{p}}_entities WHERE {FALLBACK_CONDITIONS[column]} LIMIT 1"
+            ), args)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Oturum varlığı veritabanından okunamadı ({column}): {str(e)}")
+            return None
+
+        if row is None:
+            self._db_misses[(column, value)] = None
+            while len(self._db_misses) > self.hot_limit:
+                self._db_misses.popitem(last=False)
+            return None
+
+        row = tuple(row)
+        # Bu arada daha yeni bir sürüm geldiyse onu ezme
+        if row[0] not in self._entities:
+            self._remember(row)
+        self.stats["db_hits"] += 1
+        return row
+
+    async def ensure(self, key: Any) -> bool:
+        """
+        Anahtarın varlığını bellekte yoksa veritabanından yükler.
+
+        Telethon'un ağ çözümlemesine düşmeden önce beklenebilir; ör.
+        `await session.ensure(peer)` ardından `client.get_input_entity(peer)`.
+
+        Args:
+            key: Telethon'un get_input_entity() ile kabul ettiği anahtar
+
+        Returns:
+            bool: Varlık oturumda bulunduysa True
+        """
+        try:
+            self.get_input_entity(key)
+            return True
+        except ValueError:
+            pass
+        pending = list(self._lookups.values())
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        try:
+            self.get_input_entity(key)
+            return True
+        except ValueError:
+            return False
+
+    async def prefetch(self, entity_ids: Iterable[int]) -> int:
+        """
+        Bellekte olmayan işaretli ID'leri tek sorguyla sıcak haritaya yükler.
+
+        Args:
+            entity_ids: İşaretli varlık ID'leri
+
+        Returns:
+            int: Yüklenen varlık sayısı
+        """
+        missing = [int(i) for i in set(entity_ids) if int(i) not in self._entities]
+        if not missing or self.pool is None:
+            return 0
+        rows = await self.pool.fetch(self._sql(
+            f"SELECT {ENTITY_COLUMNS} FROM {{p}}_entities WHERE id = ANY($1::bigint[])"
+        ), missing)
+        for row in rows:
+            if row[0] not in self._entities:
+                self._remember(tuple(row))
+        self.stats["db_lookups"] += 1
+        self.stats["db_hits"] += len(rows)
+        return len(rows)
+
+    # ------------------------------------------------------------------ #
+    # Yazma
+    # ------------------------------------------------------------------ #
+
+    async def flush(self) -> int:
+        """
+        Kirli kayıtları tek transaction içinde toplu upsert eder.
+
+        Returns:
+            int: Yazılan satır sayısı
+        """
+        async with self._flush_lock:
+            if self.pool is None:
+                return 0
+            entities, self._dirty_entities = self._dirty_entities, {}
+            files, self._dirty_files = self._dirty_files, {}
+            states, self._dirty_states = self._dirty_states, {}
+            session_dirty, self._session_dirty = self._session_dirty, False
+            if not (entities or files or states or session_dirty):
+                return 0
+
+            started = time.monotonic()
+            try:
+                async with self.pool.acquire() as connection:
+                    async with connection.transaction():
+                        if session_dirty:
+                            await self._write_session(connection)
+                        if entities:
+                            await connection.execute(
+                                self._sql(UPSERT_ENTITIES), *[list(c) for c in zip(*entities.values())]
+                            )
+                        if files:
+                            await connection.execute(
+                                self._sql(UPSERT_SENT_FILES),
+                                *[list(c) for c in zip(*(key + value for key, value in files.items()))]
+                            )
+                        if states:
+                            await connection.execute(
+                                self._sql(UPSERT_UPDATE_STATES),
+                                *[list(c) for c in zip(*((key,) + value for key, value in states.items()))]
+                            )
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Havuzlu oturum yazılamadı ({self.table_prefix}): {str(e)}")
+                # Değişiklikleri kaybetme
+                self._restore_dirty(entities, files, states, session_dirty)
+                return 0
+            except BaseException:
+                # İptal edilirse transaction geri alınır; kayıtlar sonraki yazmaya kalır
+                self._restore_dirty(entities, files, states, session_dirty)
+                raise
+
+            written = len(entities) + len(files) + len(states) + int(session_dirty)
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += written
+            self.stats["last_flush"] = datetime.datetime.now()
+            logger.debug(
+                f"Havuzlu oturum yazıldı ({self.table_prefix}): {len(entities)} varlık, "
+                f"{len(files)} dosya, {len(states)} durum, {time.monotonic() - started:.3f}s"
+            )
+            return written
+
+    def _restore_dirty(self, entities: Dict, files: Dict, states: Dict, session_dirty: bool) -> None:
+        """Yazılamayan kirli kayıtları geri koyar; bu arada gelen daha yeni değerler korunur"""
+        for pending, restored in (
+            (self._dirty_entities, entities), (self._dirty_files, files), (self._dirty_states, states)
+        ):
+            for key, value in restored.items():
+                pending.setdefault(key, value)
+        self._session_dirty = self._session_dirty or session_dirty
+
+    async def _write_session(self, connection: Any) -> None:
+        """Tek satırlık oturum tablosunu yeniler (dc_id değişebilir)"""
+        await connection.execute(self._sql("DELETE FROM {p}_sessions"))
+        auth_key = self._auth_key.key if self._auth_key else b""
+        await connection.execute(
+            self._sql("INSERT INTO {p}_sessions VALUES ($1, $2, $3, $4, $5)"),
+            self._dc_id, self._server_address, self._port, bytes(auth_key), self._takeout_id
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Oturum istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "hot_entities": len(self._entities),
+            "pending": len(self._dirty_entities) + len(self._dirty_files) + len(self._dirty_states),
+            "lookups_in_flight": len(self._lookups)
+        }
+
+
+class PooledSessionClient(TelegramClient):
+    """
+    Havuzlu oturumun soğuk varlıklarını çözmeden önce bekleyen istemci.
+
+    Sıcak haritada olmayan bir varlık için oturum yalnızca arka plan
+    araması başlatır ve None döndürür; Telethon bu durumda ValueError
+    yükseltir. Telethon'un kendi çağrıları (send_message, get_entity vb.)
+    dahil tüm varlık çözümlemeleri get_input_entity() üzerinden geçtiğinden
+    burada önce veritabanı araması beklenir.
+    """
+
+    async def get_input_entity(self, peer):
+        session = self.session
+        if isinstance(session, PooledPostgresSession) and isinstance(peer, (int, str)) and peer not in ("me", "self"):
+            await session.ensure(peer)
+        return await super().get_input_entity(peer)
+
+
+async def create_pooled_session(
+    session_name: str,
+    pool: Optional[AsyncDbConnectionPool] = None,
+    sqlite_path: Optional[str] = None,
+    **kwargs: Any
+) -> PooledPostgresSession:
+    """
+    Havuzlu oturumu oluşturur, yükler ve yazma görevini başlatır.
+
+    Oturumda yetki anahtarı yoksa ve `sqlite_path` mevcutsa veriler önce
+    SQLite oturum dosyasından aktarılır.
+
+    Args:
+        session_name: Oturum adı
+        pool: Paylaşılan bağlantı havuzu (None ise get_db_pool())
+        sqlite_path: Aktarım için SQLite .session dosyası (opsiyonel)
+        **kwargs: PooledPostgresSession parametreleri
+
+    Returns:
+        PooledPostgresSession: Kullanıma hazır oturum
+    """
+    session = await PooledPostgresSession(session_name, pool=pool, **kwargs).load()
+    if session.auth_key is None and sqlite_path and os.path.exists(sqlite_path):
+        # Tek seferlik aktarım; psycopg2 kullandığı için döngü dışında çalışır
+        from app.core.tdlib.session import migrate_sqlite_to_postgres
+        logger.info(f"Havuzlu oturum için SQLite verileri aktarılıyor: {sqlite_path}")
+        if await asyncio.to_thread(migrate_sqlite_to_postgres, sqlite_path, session_name):
+            session = await PooledPostgresSession(session_name, pool=session.pool, **kwargs).load()
+    await session.start()
+    return session
@@ -3,12 +3,14 @@ import logging
 import os
 import time
 import json
+from datetime import datetime
 import sqlite3
 from telethon.sessions import StringSession, MemorySession
 from app.core.config import settings
 from telethon import TelegramClient
 import psycopg2
-from telethon.sessions.sqlite import SQLiteSession
+from psycopg2.extras import execute_values
+from telethon.sessions.sqlite import SQLiteSession, _SentFileType
 from telethon.crypto import AuthKey
 from telethon.tl.types import (
     InputPhoto, InputDocument, PeerUser, PeerChat, PeerChannel
@@ -26,6 +28,9 @@ except ImportError:
     logger = logging.getLogger(__name__)
     logger.warning("TDLib import edilemedi, alternatif Telethon kullanılacak")
 
+# save() sırasında execute_values ile tek sorguda gönderilen satır sayısı
+SAVE_PAGE_SIZE = 1000
+
 class PostgresSession(SQLiteSession):
     """
     PostgreSQL tabanlı Telethon oturum yöneticisi.
@@ -75,6 +80,11 @@ class PostgresSession(SQLiteSession):
         # Update state için sözlük
         self._update_states = {}
         
+        # Son save() çağrısından bu yana değişen kayıtlar
+        self._dirty_entities = set()  # entity id
+        self._dirty_sent_files = set()  # (md5_digest, file_size, type)
+        self._dirty_update_states = set()  # state id
+        
         # Bağlantıyı aç ve tabloları oluştur
         self._connect()
         self._create_tables()
@@ -249,162 +259,203 @@ class PostgresSession(SQLiteSession):
         except Exception as e:
             logger.error(f"PostgreSQL'den veri yüklenirken hata: {e}")
     
+    def process_entities(self, tlo):
+        """
+        Varlıkları işle ve yalnızca değişen kayıtları kirli olarak işaretle.
+        
+        SQLiteSession davranışı korunur; ayrıca bellekteki _entities sözlüğü
+        güncellenir ve save() sadece değişen satırları PostgreSQL'e yazar.
+        """
+        super().process_entities(tlo)
+        
+        if not self.save_entities:
+            return
+        
+        rows = self._entities_to_rows(tlo)
+        if not rows:
+            return
+        
+        for entity_id, entity_hash, username, phone, name in rows:
+            current = self._entities.get(entity_id)
+            entity = {
+                'hash': entity_hash,
+                'username': username,
+                'phone': phone,
+                'name': name
+            }
+            if current == entity:
+                continue
+            
+            self._entities[entity_id] = entity
+            self._dirty_entities.add(entity_id)
+            
+            if username:
+                self._entities_by_username[username.lower()] = entity_id
+            if phone:
+                self._entities_by_phone[phone] = entity_id
+            if name:
+                self._entities_by_name[name.lower()] = entity_id
+    
+    def cache_file(self, md5_digest, file_size, instance):
+        """Gönderilen dosyayı önbelleğe al ve kirli olarak işaretle"""
+        super().cache_file(md5_digest, file_size, instance)
+        
+        if isinstance(md5_digest, memoryview):
+            md5_digest = bytes(md5_digest)
+        
+        file_type = _SentFileType.from_type(type(instance)).value
+        key = (md5_digest, file_size, file_type)
+        value = (instance.id, instance.access_hash)
+        if self._sent_files.get(key) != value:
+            self._sent_files[key] = value
+            self._dirty_sent_files.add(key)
+    
+    def set_update_state(self, entity_id, state):
+        """Update state bilgisini kaydet ve kirli olarak işaretle"""
+        super().set_update_state(entity_id, state)
+        
+        value = (state.pts, state.qts, int(state.date.timestamp()), state.seq)
+        if self._update_states.get(entity_id) != value:
+            self._update_states[entity_id] = value
+            self._dirty_update_states.add(entity_id)
+    
     def _update_session_table(self):
-        """Oturum tablosunu güncelle"""
-        try:
-            # Önce mevcut verileri temizle
-            self.db_cursor.execute(f"DELETE FROM {self.table_prefix}_sessions")
-            
-            # Auth key verisi
-            auth_key_data = b'' if not self._auth_key else self._auth_key.key
-            
-            # memoryview'i bytes'a çevir
-            if isinstance(auth_key_data, memoryview):
-                auth_key_data = bytes(auth_key_data)
-            
-            # Yeni verileri ekle
-            self.db_cursor.execute(
-                f"INSERT INTO {self.table_prefix}_sessions VALUES (%s, %s, %s, %s, %s)",
-                (self._dc_id, self._server_address, self._port,
-                 auth_key_data,
-                 self._takeout_id)
-            )
-            
-            self.db_conn.commit()
-        except Exception as e:
-            logger.error(f"Oturum tablosu güncellenirken hata: {e}")
-            self.db_conn.rollback()
-            raise
+        """Oturum tablosunu güncelle (commit save() içinde yapılır)"""
+        # SQLiteSession.__init__ bağlantı kurulmadan önce de çağırabilir
+        if getattr(self, 'db_cursor', None) is None:
+            return
+        
+        # Tablo tek satır tutar; dc_id değişebileceği için sil + ekle
+        self.db_cursor.execute(f"DELETE FROM {self.table_prefix}_sessions")
+        
+        # Auth key verisi
+        auth_key_data = b'' if not self._auth_key else self._auth_key.key
+        
+        # memoryview'i bytes'a çevir
+        if isinstance(auth_key_data, memoryview):
+            auth_key_data = bytes(auth_key_data)
+        
+        self.db_cursor.execute(
+            f"INSERT INTO {self.table_prefix}_sessions VALUES (%s, %s, %s, %s, %s)",
+            (self._dc_id, self._server_address, self._port,
+             auth_key_data,
+             self._takeout_id)
+        )
     
     def _update_entities(self, rows):
-        """Varlık (entity) kayıtlarını güncelle"""
-        try:
-            # Mevcut kayıtları sil
-            self.db_cursor.execute(f"DELETE FROM {self.table_prefix}_entities")
-            
-            # Yeni kayıtları ekle
-            if rows:
-                now = int(time.time())
-                rows = [(i, h, u, p, n, now) for i, h, u, p, n in rows]
-                
-                # PostgreSQL'de parametre gösterimi ? yerine %s ile yapılır
-                insert_query = f"INSERT INTO {self.table_prefix}_entities VALUES (%s, %s, %s, %s, %s, %s)"
-                self.db_cursor.executemany(insert_query, rows)
-            
-            self.db_conn.commit()
-        except Exception as e:
-            logger.error(f"Varlıklar güncellenirken hata: {e}")
-            self.db_conn.rollback()
-            raise
+        """Değişen varlık (entity) kayıtlarını tek sorguda upsert et"""
+        if not rows:
+            return
+        
+        now = datetime.now()
+        rows = [(i, h, u, p, n, now) for i, h, u, p, n in rows]
+        
+        execute_values(
+            self.db_cursor,
+            f"""
+            INSERT INTO {self.table_prefix}_entities (id, hash, username, phone, name, date)
+            VALUES %s
+            ON CONFLICT (id) DO UPDATE
+            SET hash = EXCLUDED.hash,
+                username = EXCLUDED.username,
+                phone = EXCLUDED.phone,
+                name = EXCLUDED.name,
+                date = EXCLUDED.date
+            """,
+            rows,
+            page_size=SAVE_PAGE_SIZE
+        )
     
     def _update_sent_files(self, rows):
-        """Gönderilen dosya kayıtlarını güncelle"""
-        try:
-            # Mevcut kayıtları sil
-            self.db_cursor.execute(f"DELETE FROM {self.table_prefix}_sent_files")
-            
-            # Yeni kayıtları ekle
-            if rows:
-                # memoryview kontrolü
-                clean_rows = []
-                for row in rows:
-                    md5_digest, file_size, file_type, file_id, file_hash = row
-                    
-                    # Binary verileri bytes'a dönüştür
-                    if isinstance(md5_digest, memoryview):
-                        md5_digest = bytes(md5_digest)
-                    
-                    clean_rows.append((md5_digest, file_size, file_type, file_id, file_hash))
-                
-                # PostgreSQL'de parametre gösterimi ? yerine %s ile yapılır
-                insert_query = f"INSERT INTO {self.table_prefix}_sent_files VALUES (%s, %s, %s, %s, %s)"
-                self.db_cursor.executemany(insert_query, clean_rows)
-            
-            self.db_conn.commit()
-        except Exception as e:
-            logger.error(f"Gönderilen dosyalar güncellenirken hata: {e}")
-            self.db_conn.rollback()
-            raise
+        """Değişen gönderilmiş dosya kayıtlarını tek sorguda upsert et"""
+        if not rows:
+            return
+        
+        # Binary verileri bytes'a dönüştür
+        clean_rows = []
+        for md5_digest, file_size, file_type, file_id, file_hash in rows:
+            if isinstance(md5_digest, memoryview):
+                md5_digest = bytes(md5_digest)
+            clean_rows.append((md5_digest, file_size, file_type, file_id, file_hash))
+        
+        execute_values(
+            self.db_cursor,
+            f"""
+            INSERT INTO {self.table_prefix}_sent_files (md5_digest, file_size, type, id, hash)
+            VALUES %s
+            ON CONFLICT (md5_digest, file_size, type) DO UPDATE
+            SET id = EXCLUDED.id,
+                hash = EXCLUDED.hash
+            """,
+            clean_rows,
+            page_size=SAVE_PAGE_SIZE
+        )
     
     def _update_state(self, rows):
-        """Durum kayıtlarını güncelle"""
-        try:
-            # Mevcut kayıtları sil
-            self.db_cursor.execute(f"DELETE FROM {self.table_prefix}_update_state")
-            
-            # Yeni kayıtları ekle
-            if rows:
-                # PostgreSQL'de parametre gösterimi ? yerine %s ile yapılır
-                insert_query = f"INSERT INTO {self.table_prefix}_update_state VALUES (%s, %s, %s, %s, %s)"
-                self.db_cursor.executemany(insert_query, rows)
-            
-            self.db_conn.commit()
-        except Exception as e:
-            logger.error(f"Durum kayıtları güncellenirken hata: {e}")
-            self.db_conn.rollback()
-            raise
+        """Değişen durum kayıtlarını tek sorguda upsert et"""
+        if not rows:
+            return
+        
+        execute_values(
+            self.db_cursor,
+            f"""
+            INSERT INTO {self.table_prefix}_update_state (id, pts, qts, date, seq)
+            VALUES %s
+            ON CONFLICT (id) DO UPDATE
+            SET pts = EXCLUDED.pts,
+                qts = EXCLUDED.qts,
+                date = EXCLUDED.date,
+                seq = EXCLUDED.seq
+            """,
+            rows,
+            page_size=SAVE_PAGE_SIZE
+        )
     
     def save(self):
-        """Oturum verilerini PostgreSQL'e kaydet"""
+        """
+        Oturum verilerini PostgreSQL'e kaydet.
+        
+        Yalnızca son kayıttan bu yana değişen varlık, dosya ve durum satırları
+        tek bir transaction içinde upsert edilir; kayıt süresi tablo boyutuna
+        değil değişiklik miktarına bağlıdır.
+        """
+        # SQLiteSession.__init__ bağlantı kurulmadan önce save() çağırır
+        if getattr(self, 'db_conn', None) is None:
+            return
+        
+        # Kirli kümeleri devral; hata olursa geri yüklenir
+        dirty_entities, self._dirty_entities = self._dirty_entities, set()
+        dirty_sent_files, self._dirty_sent_files = self._dirty_sent_files, set()
+        dirty_update_states, self._dirty_update_states = self._dirty_update_states, set()
+        
         try:
-            logger.info("PostgreSQL oturum verileri kaydediliyor...")
-            
-            # Oturum tablosunu güncelle
             self._update_session_table()
             
-            # Entities veri tipi kontrolü ve düzeltme
-            if isinstance(self._entities, set):
-                logger.warning("_entities bir set olarak tanımlanmış, dict'e dönüştürülüyor")
-                entity_dict = {}
-                for entity in self._entities:
-                    # Entity ID'sini belirle (normal bir entity objesi veya dict olabilir)
-                    if isinstance(entity, dict) and 'id' in entity:
-                        entity_id = entity['id']
-                    elif hasattr(entity, 'id'):
-                        entity_id = entity.id
-                    else:
-                        # Entity ID belirlenemezse, bu entity'yi atla
-                        continue
-                        
-                    # Entity bilgilerini oluştur
-                    entity_dict[entity_id] = {
-                        'hash': getattr(entity, 'hash', 0),
-                        'username': getattr(entity, 'username', None),
-                        'phone': getattr(entity, 'phone', None),
-                        'name': getattr(entity, 'name', None)
-                    }
-                
-                # Set yerine dict kullan
-                self._entities = entity_dict
-                logger.info(f"_entities başarıyla dict'e dönüştürüldü ({len(self._entities)} adet entity)")
-            
-            # Varlıkları güncelle
-            try:
-                rows = [(i, d['hash'], d['username'], d['phone'], d['name'])
-                    for i, d in self._entities.items()]
-                self._update_entities(rows)
-            except Exception as e:
-                logger.error(f"Varlıklar güncellenirken hata: {e}")
-            
-            # Gönderilen dosyaları güncelle
-            try:
-                rows = [(*key, value[0], value[1])
-                    for key, value in self._sent_files.items()]
-                self._update_sent_files(rows)
-            except Exception as e:
-                logger.error(f"Gönderilen dosyalar güncellenirken hata: {e}")
+            self._update_entities([
+                (i, d['hash'], d['username'], d['phone'], d['name'])
+                for i in dirty_entities
+                if (d := self._entities.get(i)) is not None
+            ])
+            self._update_sent_files([
+                (*key, *self._sent_files[key])
+                for key in dirty_sent_files if key in self._sent_files
+            ])
+            self._update_state([
+                (x, *self._update_states[x])
+                for x in dirty_update_states if x in self._update_states
+            ])
             
-            # Durum bilgilerini güncelle
-            try:
-                rows = [(x, *y) for x, y in self._update_states.items()]
-                self._update_state(rows)
-            except Exception as e:
-                logger.error(f"Durum bilgileri güncellenirken hata: {e}")
-            
-            logger.info("PostgreSQL oturum verileri başarıyla kaydedildi")
+            self.db_conn.commit()
+            logger.debug(
+                f"PostgreSQL oturum verileri kaydedildi: {len(dirty_entities)} varlık, "
+                f"{len(dirty_sent_files)} dosya, {len(dirty_update_states)} durum"
+            )
         except Exception as e:
             logger.error(f"PostgreSQL verileri kaydedilirken hata: {e}")
             self.db_conn.rollback()
+            self._dirty_entities |= dirty_entities
+            self._dirty_sent_files |= dirty_sent_files
+            self._dirty_update_states |= dirty_update_states
             raise
         
     def close(self):
@@ -16,6 +16,7 @@ from telethon.sessions import MemorySession, StringSession
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
 from app.core.config import settings
 from app.core.tdlib.session import create_memory_session, create_string_session, create_postgres_session, create_session
+from app.core.tdlib.pooled_session import create_pooled_session, PooledPostgresSession, PooledSessionClient
 
 logger = logging.getLogger(__name__)
 
@@ -127,9 +128,16 @@ async def get_client() -> Optional[TelegramClient]:
                     logger.warning("SESSION_STRING değeri bulunamadı, bellek tabanlı oturuma geçiliyor")
                     session = create_memory_session()
             elif session_type == "postgres":
-                # PostgreSQL tabanlı oturum
-                logger.info("PostgreSQL tabanlı oturum (PostgresSession) kullanılıyor")
-                session = create_postgres_session(settings.SESSION_NAME)
+                # Paylaşılan asyncpg havuzu üzerinde PostgreSQL tabanlı oturum
+                logger.info("PostgreSQL tabanlı oturum (PooledPostgresSession) kullanılıyor")
+                try:
+                    session = await create_pooled_session(
+                        settings.SESSION_NAME,
+                        sqlite_path=os.path.join(settings.SESSIONS_DIR, f"{settings.SESSION_NAME}.session")
+                    )
+                except Exception as e:
+                    logger.error(f"Havuzlu oturum oluşturulamadı, PostgresSession'a geçiliyor: {e}")
+                    session = create_postgres_session(settings.SESSION_NAME)
             else:
                 # Varsayılan dosya tabanlı oturum (SQLite)
                 logger.info("Dosya tabanlı oturum kullanılıyor")
@@ -138,8 +146,9 @@ async def get_client() -> Optional[TelegramClient]:
             # API_HASH değerini SecretStr türünden string'e dönüştür
             api_hash = settings.API_HASH.get_secret_value() if hasattr(settings.API_HASH, 'get_secret_value') else str(settings.API_HASH)
             
-            # Client oluştur
-            _client = TelegramClient(
+            # Client oluştur; havuzlu oturumda soğuk varlıklar çözülmeden önce veritabanından yüklenir
+            client_class = PooledSessionClient if isinstance(session, PooledPostgresSession) else TelegramClient
+            _client = client_class(
                 session,
                 settings.API_ID,
                 api_hash,
@@ -155,7 +164,7 @@ async def get_client() -> Optional[TelegramClient]:
             await _client.connect()
             
             # Memory session için otomatik oturum açma veya yeni oturum oluşturma gerekebilir
-            if not await _client.is_user_authorized() and isinstance(session, (MemorySession, StringSession)) and session_type != "string":
+            if not await _client.is_user_authorized() and isinstance(session, (MemorySession, StringSession)) and session_type not in ("string", "postgres"):
                 # Mevcut .session dosyasına erişmeyi dene
                 file_session_path = os.path.join(settings.SESSIONS_DIR, f"{settings.SESSION_NAME}.session")
                 if os.path.exists(file_session_path):
@@ -300,6 +309,10 @@ async def disconnect_client():
     if _client:
         try:
             await _client.disconnect()
+            # Havuzlu oturumun son yazmasının bitmesini bekle
+            close_session = getattr(_client.session, "close_async", None)
+            if close_session is not None:
+                await close_session()
             logger.info("Telegram client bağlantısı kapatıldı")
         except Exception as e:
             logger.error(f"Client bağlantısı kapatılırken hata: {e}")
@@ -9,13 +9,15 @@
 """
 
 # Bu modülü aktif et
-__all__ = ['UserDatabase', 'PgDatabase']
+__all__ = ['UserDatabase', 'PgDatabase', 'AsyncPgDatabase']
 
 # Kullanılan sınıfları içe aktar
 try:
     from app.db.user_db import UserDatabase
     from app.db.pg_db import PgDatabase
+    from app.db.async_pg_db import AsyncPgDatabase
 except ImportError:
     # Doğrudan içe aktarma yapalım (göreceli import)
     from .user_db import UserDatabase
     from .pg_db import PgDatabase
+    from .async_pg_db import AsyncPgDatabase
@@ -0,0 +1,363 @@
+"""
+# ============================================================================ #
+# Dosya: activity_rollups.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/activity_rollups.py
+# İşlev: ActivityService için saatlik ve günlük aktivite toplam (rollup) tabloları.
+#
+# `messages`, `users` ve `groups` tablolarındaki yeni satırlar, kaynak başına
+# tutulan bir ID filigranından (watermark) itibaren parça parça okunur ve
+# saatlik/günlük kovalara `INSERT ... ON CONFLICT DO UPDATE` ile eklenir.
+# Analiz döngüsü ham tabloları taramak yerine yalnızca bu küçük, birincil
+# anahtar indeksli tabloları okur; maliyet geçmişin boyutundan bağımsızdır.
+#
+# ID'ler commit sırasıyla değil nextval sırasıyla görünür olur: geç commit
+# edilen bir satırın ID'si, ondan sonra commit edilmiş satırlarınkinden
+# küçük olabilir. Filigran bu yüzden ID dizisindeki ilk taze boşluğun
+# altında tutulur; boşluk `settle_seconds` süresince kapanmazsa geri
+# alınmış bir işlemden kaldığı kabul edilip geçilir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+
+logger = logging.getLogger(__name__)
+
+# Kova tabloları: tablo adı -> date_trunc birimi
+ROLLUP_TABLES = {
+    "activity_rollup_hourly": "hour",
+    "activity_rollup_daily": "day",
+}
+
+CREATE_ROLLUP_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        dimension TEXT NOT NULL,
+        bucket TIMESTAMP NOT NULL,
+        dim_key TEXT NOT NULL,
+        event_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, bucket, dim_key)
+    )
+"""
+
+CREATE_STATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS activity_rollup_state (
+        source TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+"""
+
+CREATE_ACTIVITIES_TABLE = """
+    CREATE TABLE IF NOT EXISTS activities (
+        id SERIAL PRIMARY KEY,
+        activity_type VARCHAR(50) NOT NULL,
+        activity_data JSONB,
+        created_at TIMESTAMP DEFAULT NOW()
+    )
+"""
+
+# Kaynak tablo -> her satırın katkı yaptığı (boyut, anahtar ifadesi) listesi.
+# Anahtar ifadesi NULL dönen boyutlar o satır için atlanır.
+ROLLUP_SOURCES = {
+    "messages": [
+        ("message", "''"),
+        ("group", "src.group_id::text"),
+        ("user", "src.user_id::text"),
+        ("message_type", "src.message_type"),
+    ],
+    "users": [
+        ("new_user", "''"),
+    ],
+    "groups": [
+        ("new_group", "''"),
+    ],
+}
+
+LOCK_STATE_QUERY = """
+    SELECT last_id FROM activity_rollup_state WHERE source = $1 FOR UPDATE
+"""
+
+INIT_STATE_QUERY = """
+    INSERT INTO activity_rollup_state (source) VALUES ($1)
+    ON CONFLICT (source) DO NOTHING
+"""
+
+SAVE_STATE_QUERY = """
+    UPDATE activity_rollup_state SET last_id = $2, updated_at = NOW() WHERE source = $1
+"""
+
+# Aralıktaki ilk "taze" ID boşluğu: boşluktan sonraki satır yakın zamanda
+# oluşturulduysa eksik ID'ler hâlâ commit edilmemiş bir işleme ait olabilir
+FIRST_OPEN_GAP_QUERY = """
+    SELECT MIN(prev_id) + 1 FROM (
+        SELECT id, created_at, COALESCE(LAG(id) OVER (ORDER BY id), $1) AS prev_id
+        FROM {source}
+        WHERE id > $1 AND id <= $2
+    ) ids
+    WHERE id > prev_id + 1
+      AND created_at > LOCALTIMESTAMP - $3::float8 * INTERVAL '1 second'
+"""
+
+ROLLUP_UPSERT_QUERY = """
+    INSERT INTO {table} (dimension, bucket, dim_key, event_count)
+    SELECT d.dimension, date_trunc('{unit}', src.created_at), d.dim_key, COUNT(*)
+    FROM {source} src
+    CROSS JOIN LATERAL (VALUES {dimensions}) AS d(dimension, dim_key)
+    WHERE src.id > $1 AND src.id <= $2
+      AND src.created_at IS NOT NULL
+      AND d.dim_key IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, dim_key)
+    DO UPDATE SET event_count = {table}.event_count + EXCLUDED.event_count
+"""
+
+# Pencere özeti: boyut başına farklı anahtar ve toplam olay sayısı
+WINDOW_SUMMARY_QUERY = """
+    SELECT dimension, COUNT(DISTINCT dim_key) AS keys, SUM(event_count) AS events
+    FROM activity_rollup_hourly
+    WHERE dimension = ANY($2::text[]) AND bucket >= $1
+    GROUP BY dimension
+"""
+
+TOTALS_QUERY = """
+    SELECT dimension, SUM(event_count) AS events
+    FROM activity_rollup_daily
+    WHERE dimension = ANY($1::text[])
+    GROUP BY dimension
+"""
+
+TOP_GROUPS_QUERY = """
+    SELECT top.dim_key, top.message_count, g.name AS title
+    FROM (
+        SELECT dim_key, SUM(event_count) AS message_count
+        FROM activity_rollup_hourly
+        WHERE dimension = 'group' AND bucket >= $1
+        GROUP BY dim_key
+        ORDER BY message_count DESC
+        LIMIT $2
+    ) top
+    LEFT JOIN groups g ON g.group_id::text = top.dim_key
+    ORDER BY top.message_count DESC
+"""
+
+MESSAGE_TYPES_QUERY = """
+    SELECT dim_key, SUM(event_count) AS count
+    FROM activity_rollup_hourly
+    WHERE dimension = 'message_type' AND bucket >= $1
+    GROUP BY dim_key
+    ORDER BY count DESC
+"""
+
+PRUNE_HOURLY_QUERY = """
+    DELETE FROM activity_rollup_hourly WHERE bucket < $1
+"""
+
+
+def _dimension_values(dimensions: List[tuple]) -> str:
+    """LATERAL VALUES listesini oluşturur (sabit ifadelerden, kullanıcı girdisi yok)"""
+    return ", ".join(f"('{name}', {expression})" for name, expression in dimensions)
+
+
+class ActivityRollups:
+    """
+    Aktivite rollup tablolarının bakımı ve okunması.
+
+    refresh() her kaynak için filigrandan sonraki satırları `chunk_size`
+    parçalar halinde kovalara ekler; filigran satırı `FOR UPDATE` ile
+    kilitlendiği için aynı anda çalışan iki süreç aynı satırları iki kez
+    saymaz. Parça, içinde `settle_seconds`'tan yeni bir ID boşluğu varsa
+    boşluğun hemen altında kesilir; böylece geç commit edilen satırlar
+    filigranın altında kalıp atlanmaz. Kaynak tablolar yalnızca eklemeyle
+    büyüdüğü varsayılır; silinen satırlar toplamlardan düşülmez.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        chunk_size: int = 50000,
+        hourly_retention_days: int = 14,
+        settle_seconds: float = 300.0
+    ):
+        """
+        Rollup yöneticisini yapılandırır.
+
+        Args:
+            pool: Asenkron bağlantı havuzu (None ise ilk kullanımda alınır)
+            chunk_size: Tek işlemde toplanacak en fazla kaynak satırı
+            hourly_retention_days: Saatlik kovaların saklanacağı gün sayısı
+            settle_seconds: ID boşluğunun geri alınmış sayılmadan önce beklenen süre (saniye)
+        """
+        self.pool = pool
+        self.chunk_size = max(int(chunk_size), 1)
+        self.hourly_retention_days = max(int(hourly_retention_days), 2)
+        self.settle_seconds = max(float(settle_seconds), 0.0)
+        self._schema_ready = False
+
+        self.stats = {
+            "refreshes": 0,
+            "rows_rolled_up": 0,
+            "pruned_buckets": 0,
+            "held_at_gap": 0
+        }
+
+    async def _get_pool(self) -> AsyncDbConnectionPool:
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        return self.pool
+
+    async def ensure_schema(self) -> None:
+        """Rollup, filigran ve activities tablolarını oluşturur"""
+        if self._schema_ready:
+            return
+        pool = await self._get_pool()
+        for table in ROLLUP_TABLES:
+            await pool.execute(CREATE_ROLLUP_TABLE.format(table=table))
+        await pool.execute(CREATE_STATE_TABLE)
+        await pool.execute(CREATE_ACTIVITIES_TABLE)
+        for source in ROLLUP_SOURCES:
+            await pool.execute(INIT_STATE_QUERY, source)
+        self._schema_ready = True
+
+    # ------------------------------------------------------------------ #
+    # Bakım
+    # ------------------------------------------------------------------ #
+
+    async def refresh(self) -> int:
+        """
+        Tüm kaynaklar için filigrandan sonraki satırları kovalara ekler.
+
+        Returns:
+            int: Toplanan kaynak satırı aralığı genişliği
+        """
+        await self.ensure_schema()
+        pool = await self._get_pool()
+        total = 0
+        for source, dimensions in ROLLUP_SOURCES.items():
+            max_id = await pool.fetchval(f"SELECT MAX(id) FROM {source}") or 0
+            while True:
+                advanced = await self._refresh_chunk(pool, source, dimensions, max_id)
+                total += advanced
+                if advanced < self.chunk_size:
+                    break
+
+        pruned = await pool.execute(
+            PRUNE_HOURLY_QUERY,
+            datetime.utcnow() - timedelta(days=self.hourly_retention_days)
+        )
+        self.stats["pruned_buckets"] += _affected(pruned)
+        self.stats["refreshes"] += 1
+        self.stats["rows_rolled_up"] += total
+        return total
+
+    async def _refresh_chunk(self, pool: AsyncDbConnectionPool, source: str,
+                             dimensions: List[tuple], max_id: int) -> int:
+        """Tek bir ID aralığını tek işlemde kovalara ekler ve filigranı ilerletir"""
+        values = _dimension_values(dimensions)
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                last_id = await connection.fetchval(LOCK_STATE_QUERY, source) or 0
+                upper = min(max_id, last_id + self.chunk_size)
+                if upper <= last_id:
+                    return 0
+                gap = await connection.fetchval(
+                    FIRST_OPEN_GAP_QUERY.format(source=source), last_id, upper, self.settle_seconds
+                )
+                if gap is not None:
+                    # Eksik ID hâlâ commit edilmemiş olabilir; filigran altında kalsın
+                    upper = gap - 1
+                    self.stats["held_at_gap"] += 1
+                    if upper <= last_id:
+                        return 0
+                for table, unit in ROLLUP_TABLES.items():
+                    await connection.execute(
+                        ROLLUP_UPSERT_QUERY.format(
+                            table=table, unit=unit, source=source, dimensions=values
+                        ),
+                        last_id, upper
+                    )
+                await connection.execute(SAVE_STATE_QUERY, source, upper)
+        return upper - last_id
+
+    # ------------------------------------------------------------------ #
+    # Okuma
+    # ------------------------------------------------------------------ #
+
+    async def summary(self, since: datetime, top_limit: int = 5) -> Dict[str, Any]:
+        """
+        Pencere ve tüm zaman toplamlarını rollup tablolarından okur.
+
+        Pencere saatlik kovalarla hesaplanır; `since` saat başına yuvarlanır.
+
+        Args:
+            since: Pencere başlangıcı (UTC)
+            top_limit: En aktif grup sayısı
+
+        Returns:
+            Dict[str, Any]: users/groups/messages istatistikleri
+        """
+        await self.ensure_schema()
+        pool = await self._get_pool()
+        bucket_start = since.replace(minute=0, second=0, microsecond=0)
+
+        window = {
+            row["dimension"]: row
+            for row in await pool.fetch(
+                WINDOW_SUMMARY_QUERY, bucket_start, ["message", "group", "user", "new_user"]
+            )
+        }
+        totals = {
+            row["dimension"]: int(row["events"] or 0)
+            for row in await pool.fetch(TOTALS_QUERY, ["message", "new_user", "new_group"])
+        }
+        top_groups = [
+            {"title": row["title"] or row["dim_key"], "message_count": int(row["message_count"])}
+            for row in await pool.fetch(TOP_GROUPS_QUERY, bucket_start, top_limit)
+        ]
+        message_types = [
+            {"type": row["dim_key"], "count": int(row["count"])}
+            for row in await pool.fetch(MESSAGE_TYPES_QUERY, bucket_start)
+        ]
+
+        def window_value(dimension: str, field: str) -> int:
+            row = window.get(dimension)
+            return int(row[field] or 0) if row else 0
+
+        return {
+            "users": {
+                "total": totals.get("new_user", 0),
+                "active": window_value("user", "keys"),
+                "new": window_value("new_user", "events"),
+            },
+            "groups": {
+                "total": totals.get("new_group", 0),
+                "active": window_value("group", "keys"),
+                "top_active": top_groups,
+            },
+            "messages": {
+                "total": totals.get("message", 0),
+                "recent": window_value("message", "events"),
+                "types": message_types,
+            },
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Rollup istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return dict(self.stats)
+
+
+def _affected(status: str) -> int:
+    """asyncpg durum metninden ("DELETE 3") etkilenen satır sayısını çıkarır"""
+    try:
+        return int(str(status).rsplit(" ", 1)[-1])
+    except (ValueError, IndexError):
+        return 0
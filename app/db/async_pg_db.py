@@ -0,0 +1,439 @@
+"""
+# ============================================================================ #
+# Dosya: async_pg_db.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/async_pg_db.py
+# İşlev: AsyncDbConnectionPool üzerinde bloklamayan veri erişim katmanı.
+#
+# PgDatabase ve UserDatabase (PostgreSQL) sınıfları `async` tanımlı olsalar da
+# psycopg2 imleçlerini doğrudan event loop üzerinde çalıştırır. Bu sınıf aynı
+# metot adlarını korur ancak tüm sorguları asyncpg havuzu üzerinden yürütür;
+# böylece handler ve servisler kod değişikliği olmadan geçiş yapabilir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.utils.ttl_cache import invalidate_user
+from app.utils.single_flight import db_flight
+
+logger = logging.getLogger(__name__)
+
+# psycopg2 tarzı %s parametrelerini yakalar (%% kaçışları hariç)
+_PARAM_PATTERN = re.compile(r"(?<!%)%s")
+
+
+def to_asyncpg_query(query: str) -> str:
+    """
+    psycopg2 tarzı `%s` parametrelerini asyncpg'nin `$1, $2, ...` biçimine çevirir.
+
+    Args:
+        query: psycopg2 parametreli SQL sorgusu
+
+    Returns:
+        str: asyncpg uyumlu SQL sorgusu
+    """
+    counter = 0
+
+    def _replace(_match):
+        nonlocal counter
+        counter += 1
+        return f"${counter}"
+
+    return _PARAM_PATTERN.sub(_replace, query).replace("%%", "%")
+
+
+def _normalize_params(params: Any) -> Sequence[Any]:
+    """Parametreleri asyncpg'nin beklediği konumsal diziye dönüştürür."""
+    if params is None:
+        return ()
+    if isinstance(params, (list, tuple)):
+        return tuple(params)
+    return (params,)
+
+
+class AsyncPgDatabase:
+    """
+    asyncpg havuzu üzerinde çalışan asenkron veritabanı deposu.
+
+    PgDatabase ile aynı metot imzalarını sunar. Satırlar `asyncpg.Record`
+    olarak döner; Record hem indeks (`row[0]`) hem anahtar (`row['name']`,
+    `row.get('name')`) erişimini desteklediği için hem PgDatabase
+    (RealDictCursor) hem UserDatabase (tuple) kullanıcıları ile uyumludur.
+    """
+
+    def __init__(self, pool: Optional[AsyncDbConnectionPool] = None, db_url: Optional[str] = None):
+        """
+        Depoyu yapılandırır.
+
+        Args:
+            pool: Paylaşılan bağlantı havuzu (None ise connect() içinde alınır)
+            db_url: Veritabanı bağlantı URL'si (None ise çevre değişkenlerinden alınır)
+        """
+        self.pool = pool
+        self.db_url = db_url
+        self.connected = pool is not None
+        # Her yazmada artar; okuma birleştirme anahtarının parçasıdır
+        self._write_generation = 0
+
+    async def connect(self) -> bool:
+        """
+        Paylaşılan bağlantı havuzunu hazırlar.
+
+        Returns:
+            bool: Bağlantı başarılıysa True
+        """
+        try:
+            if self.pool is None:
+                self.pool = await get_db_pool(db_url=self.db_url)
+            self.connected = await self.pool.ping()
+            if self.connected:
+                logger.info("Asenkron PostgreSQL deposu hazır")
+            return self.connected
+        except Exception as e:
+            logger.error(f"Asenkron PostgreSQL bağlantı hatası: {str(e)}")
+            self.connected = False
+            return False
+
+    async def _ensure_pool(self) -> AsyncDbConnectionPool:
+        """Havuz henüz alınmadıysa alır."""
+        if self.pool is None:
+            await self.connect()
+        return self.pool
+
+    # ------------------------------------------------------------------ #
+    # Genel sorgu metotları (PgDatabase / UserDatabase uyumlu)
+    # ------------------------------------------------------------------ #
+
+    async def _read(self, method: str, query, params):
+        """
+        Okuma sorgusunu çalıştırır; aynı anda süren özdeş SELECT'ler birleştirilir.
+
+        Anahtara yazma sayacı da girer: bir yazmadan sonra başlayan okuma,
+        yazmadan önce başlamış özdeş okumaya bağlanmaz.
+        """
+        pool = await self._ensure_pool()
+        sql = to_asyncpg_query(query)
+        args = _normalize_params(params)
+        call = getattr(pool, method)
+        if not sql.lstrip().upper().startswith("SELECT"):
+            # INSERT ... RETURNING gibi yazan sorgular
+            self._write_generation += 1
+            return await call(sql, *args)
+        key = (method, sql, args, self._write_generation)
+        try:
+            hash(key)
+        except TypeError:
+            # Hash'lenemeyen parametre (ör. liste) içeren sorgular birleştirilmez
+            return await call(sql, *args)
+        return await db_flight.do(key, call, sql, *args)
+
+    async def fetchone(self, query, params=None):
+        """Tek bir satır sonuç döndürür"""
+        try:
+            return await self._read("fetchrow", query, params)
+        except Exception as e:
+            logger.error(f"Sorgu hatası (fetchone): {str(e)}")
+            return None
+
+    async def fetchall(self, query, params=None):
+        """Tüm sonuçları döndürür"""
+        try:
+            return await self._read("fetch", query, params)
+        except Exception as e:
+            logger.error(f"Sorgu hatası (fetchall): {str(e)}")
+            return []
+
+    async def fetchval(self, query, params=None):
+        """Tek bir değer döndürür"""
+        try:
+            return await self._read("fetchval", query, params)
+        except Exception as e:
+            logger.error(f"Sorgu hatası (fetchval): {str(e)}")
+            return None
+
+    async def execute(self, query, params=None):
+        """Sorgu çalıştırır (asyncpg her ifadeyi kendi transaction'ında commit eder)"""
+        self._write_generation += 1
+        try:
+            pool = await self._ensure_pool()
+            await pool.execute(to_asyncpg_query(query), *_normalize_params(params))
+            return True
+        except Exception as e:
+            logger.error(f"Sorgu çalıştırma hatası: {str(e)}")
+            return False
+
+    async def execute_many(self, query, params_list: List[Sequence[Any]]):
+        """Aynı sorguyu birden çok parametre seti ile tek seferde çalıştırır"""
+        if not params_list:
+            return True
+        self._write_generation += 1
+        try:
+            pool = await self._ensure_pool()
+            await pool.execute_many(
+                to_asyncpg_query(query),
+                [tuple(_normalize_params(p)) for p in params_list]
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Toplu sorgu çalıştırma hatası: {str(e)}")
+            return False
+
+    async def execute_query(self, query, params=None):
+        """
+        SQL sorgusu çalıştırır ve sonuçları döndürür.
+
+        Args:
+            query: SQL sorgusu
+            params: Parametreler
+
+        Returns:
+            list: SELECT sorguları için satırlar, diğerleri için True
+        """
+        pool = await self._ensure_pool()
+        asyncpg_query = to_asyncpg_query(query)
+        args = _normalize_params(params)
+
+        try:
+            if query.strip().upper().startswith(('SELECT', 'SHOW', 'WITH')):
+                return await pool.fetch(asyncpg_query, *args)
+            self._write_generation += 1
+            await pool.execute(asyncpg_query, *args)
+            return True
+        except Exception as e:
+            logger.error(f"Sorgu çalıştırma hatası (execute_query): {str(e)}")
+            raise  # Hatanın üst katmanlara iletilmesi gerekiyor
+
+    # ------------------------------------------------------------------ #
+    # Grup metotları
+    # ------------------------------------------------------------------ #
+
+    async def get_target_groups(self):
+        """Tüm hedef grupları getirir"""
+        return await self.fetchall("SELECT * FROM groups WHERE is_target = TRUE")
+
+    async def get_all_groups(self):
+        """Tüm grupları getirir"""
+        return await self.fetchall("SELECT * FROM groups")
+
+    async def get_group_by_id(self, group_id):
+        """ID'ye göre grup getirir"""
+        return await self.fetchone("SELECT * FROM groups WHERE group_id = %s", (group_id,))
+
+    async def get_active_groups(self):
+        """Aktif grupları getirir"""
+        return await self.fetchall('''
+            SELECT * FROM groups
+            WHERE is_active = TRUE
+               OR (retry_after IS NOT NULL AND retry_after <= %s AND permanent_error = FALSE)
+        ''', (datetime.now(),))
+
+    async def add_group(self, group_id, title, username=None, member_count=0, is_active=True):
+        """
+        Grubu veritabanına ekler veya günceller
+
+        Args:
+            group_id (int): Grup ID
+            title (str): Grup adı
+            username (str, optional): Grup kullanıcı adı
+            member_count (int, optional): Grup üye sayısı
+            is_active (bool, optional): Grup aktif mi
+
+        Returns:
+            bool: İşlem başarılıysa True
+        """
+        now = datetime.now()
+        return await self.execute('''
+            INSERT INTO groups
+            (group_id, name, join_date, member_count, is_active, is_target, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s)
+            ON CONFLICT (group_id) DO UPDATE
+            SET name = EXCLUDED.name,
+                member_count = EXCLUDED.member_count,
+                is_active = EXCLUDED.is_active,
+                updated_at = EXCLUDED.updated_at
+        ''', (group_id, title, now, member_count, is_active, now, now))
+
+    async def add_target_group(self, group_id, name, member_count=0):
+        """Hedef grubu veritabanına ekler"""
+        return await self.add_group(group_id, name, None, member_count, True)
+
+    async def update_group_stats(self, group_id, last_message=None, message_count=1):
+        """Grup istatistiklerini günceller"""
+        now = datetime.now()
+        return await self.execute('''
+            UPDATE groups
+            SET last_message = %s,
+                message_count = message_count + %s,
+                updated_at = %s
+            WHERE group_id = %s
+        ''', (last_message or now, message_count, now, group_id))
+
+    async def mark_group_inactive(self, group_id, error_message=None, retry_time=None, permanent=False):
+        """Grubu devre dışı bırakır"""
+        if retry_time is None and not permanent:
+            retry_time = datetime.now() + timedelta(hours=24)
+
+        success = await self.execute('''
+            UPDATE groups
+            SET is_active = FALSE,
+                error_count = error_count + 1,
+                last_error = %s,
+                retry_after = %s,
+                permanent_error = %s,
+                updated_at = %s
+            WHERE group_id = %s
+        ''', (error_message or "Bilinmeyen hata", retry_time, permanent, datetime.now(), group_id))
+
+        if success:
+            if permanent:
+                logger.warning(f"Grup {group_id} kalıcı olarak devre dışı bırakıldı: {error_message}")
+            else:
+                logger.info(f"Grup {group_id} şu tarihe kadar devre dışı bırakıldı: {retry_time}")
+        return success
+
+    async def reactivate_group(self, group_id):
+        """Grubu tekrar aktif eder"""
+        success = await self.execute('''
+            UPDATE groups
+            SET is_active = TRUE,
+                retry_after = NULL,
+                updated_at = %s
+            WHERE group_id = %s
+        ''', (datetime.now(), group_id))
+        if success:
+            logger.info(f"Grup {group_id} tekrar aktifleştirildi")
+        return success
+
+    # ------------------------------------------------------------------ #
+    # Kullanıcı metotları
+    # ------------------------------------------------------------------ #
+
+    async def get_user(self, user_id):
+        """Kullanıcı bilgilerini getirir"""
+        return await self.fetchone('SELECT * FROM users WHERE user_id = %s', (user_id,))
+
+    async def get_user_by_id(self, user_id):
+        """Fetch a user by Telegram ID."""
+        return await self.get_user(user_id)
+
+    async def user_exists(self, user_id) -> bool:
+        """Kullanıcının veritabanında olup olmadığını kontrol eder"""
+        return await self.fetchval('SELECT 1 FROM users WHERE user_id = %s', (user_id,)) is not None
+
+    async def add_user_if_not_exists(self, user_id, username=None, first_name=None, last_name=None, source_group=None, is_bot=False):
+        """Kullanıcıyı veritabanına ekler (yoksa), varsa bilgilerini günceller"""
+        now = datetime.now()
+        try:
+            return await self.execute('''
+                INSERT INTO users
+                (user_id, username, first_name, last_name, source_group, join_date, is_bot, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE
+                SET username = COALESCE(EXCLUDED.username, users.username),
+                    first_name = COALESCE(EXCLUDED.first_name, users.first_name),
+                    last_name = COALESCE(EXCLUDED.last_name, users.last_name),
+                    source_group = COALESCE(EXCLUDED.source_group, users.source_group),
+                    is_bot = EXCLUDED.is_bot,
+                    updated_at = EXCLUDED.updated_at
+            ''', (user_id, username, first_name, last_name, source_group, now, is_bot, now, now))
+        finally:
+            # Yazma bittikten sonra silinir; yazma sürerken önbelleğe alınan eski değer de gider
+            invalidate_user(user_id)
+
+    async def update_user_activity(self, user_id):
+        """Kullanıcının son aktivite zamanını günceller"""
+        return await self.execute(
+            'UPDATE users SET updated_at = %s WHERE user_id = %s',
+            (datetime.now(), user_id)
+        )
+
+    async def get_users_for_invite(self, limit=50, cooldown_hours=24):
+        """
+        Davet gönderilecek kullanıcıları getirir.
+
+        Args:
+            limit: Maksimum kullanıcı sayısı
+            cooldown_hours: Son davet sonrası bekleme süresi (saat)
+
+        Returns:
+            list: Kullanıcı listesi
+        """
+        cooldown_time = datetime.now() - timedelta(hours=cooldown_hours)
+        return await self.fetchall('''
+            SELECT * FROM users
+            WHERE (last_invited IS NULL OR last_invited < %s)
+            AND is_bot = FALSE
+            AND status = 'active'
+            ORDER BY RANDOM()
+            LIMIT %s
+        ''', (cooldown_time, limit))
+
+    async def mark_user_invited(self, user_id):
+        """
+        Kullanıcıyı davet edildi olarak işaretler
+
+        Args:
+            user_id: Kullanıcı ID
+
+        Returns:
+            bool: İşlem başarılıysa True
+        """
+        now = datetime.now()
+        try:
+            return await self.execute('''
+                UPDATE users
+                SET last_invited = %s,
+                    invite_count = invite_count + 1,
+                    updated_at = %s
+                WHERE user_id = %s
+            ''', (now, now, user_id))
+        finally:
+            invalidate_user(user_id)
+
+    async def mark_as_invited(self, user_id):
+        """mark_user_invited için handler'ların kullandığı eş ad"""
+        return await self.mark_user_invited(user_id)
+
+    async def is_invited(self, user_id) -> bool:
+        """Kullanıcının daha önce davet edilip edilmediğini döndürür"""
+        value = await self.fetchval(
+            'SELECT invite_count > 0 OR last_invited IS NOT NULL FROM users WHERE user_id = %s',
+            (user_id,)
+        )
+        return bool(value)
+
+    async def was_recently_invited(self, user_id, hours=4) -> bool:
+        """Kullanıcının son `hours` saat içinde davet edilip edilmediğini döndürür"""
+        threshold = datetime.now() - timedelta(hours=hours)
+        value = await self.fetchval(
+            'SELECT 1 FROM users WHERE user_id = %s AND last_invited >= %s',
+            (user_id, threshold)
+        )
+        return value is not None
+
+    async def reset_invite_cooldowns(self):
+        """Davet bekleme sürelerini sıfırlar (acil davet durumunda kullanılır)"""
+        old_date = datetime.now() - timedelta(days=14)
+        self._write_generation += 1
+        try:
+            pool = await self._ensure_pool()
+            status = await pool.execute(
+                to_asyncpg_query('UPDATE users SET last_invited = NULL WHERE last_invited < %s'),
+                old_date
+            )
+            # asyncpg durum metni: "UPDATE <n>"
+            return int(status.split()[-1]) if status else 0
+        except Exception as e:
+            logger.error(f"Davet sürelerini sıfırlama hatası: {str(e)}")
+            return 0
+
+    async def close(self):
+        """Depo havuzu paylaşımlı olduğundan yalnızca referansı bırakır"""
+        self.connected = False
+        self.pool = None
@@ -0,0 +1,335 @@
+"""
+# ============================================================================ #
+# Dosya: engagement_buffer.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/engagement_buffer.py
+# İşlev: message_effectiveness etkileşim metrikleri için toplayıcı tampon.
+#
+# Yanıt, görüntülenme, tepki ve iletme güncellemeleri her biri ayrı bir
+# oku-değiştir-yaz işlemi yerine takip edilen mesaj bazında bellekte
+# birleştirilir ve belirli aralıklarla tek bir `UPDATE ... FROM (VALUES ...)`
+# ifadesiyle yazılır. Çok yanıt alan bir mesaj binlerce satır kilidi yerine
+# boşaltma başına tek bir satır güncellemesi üretir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.core.metrics import track_write_behind_flush
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_METRICS = ("views", "reactions", "replies", "forwards")
+
+# Satır başına parametre: id + metrik başına (mutlak değer, artış)
+PARAMS_PER_ROW = 1 + 2 * len(ENGAGEMENT_METRICS)
+
+
+@dataclass
+class EngagementDelta:
+    """Tek bir takip edilen mesajın tampondaki birleştirilmiş metrikleri"""
+    tracked_id: int
+    enqueued_at: float
+    # API'den okunan mutlak değerler (son gözlem geçerli)
+    absolute: Dict[str, int] = field(default_factory=dict)
+    # Olay bazlı artışlar (ör. her yanıt için +1)
+    increments: Dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: "EngagementDelta") -> None:
+        """Daha yeni bir birikimi bu kaydın üzerine ekler"""
+        for metric, value in other.absolute.items():
+            self.absolute[metric] = value
+            self.increments.pop(metric, None)
+        for metric, value in other.increments.items():
+            self.increments[metric] = self.increments.get(metric, 0) + value
+
+    def as_row(self) -> Tuple:
+        """build_update_query() parametre sırasına göre satır döndürür"""
+        row: List[Any] = [self.tracked_id]
+        for metric in ENGAGEMENT_METRICS:
+            row.append(self.absolute.get(metric))
+            row.append(self.increments.get(metric, 0))
+        return tuple(row)
+
+
+def build_update_query(row_count: int) -> str:
+    """
+    `row_count` satır için toplu UPDATE ... FROM (VALUES ...) ifadesini oluşturur.
+
+    Her metrik için yeni değer COALESCE(mutlak, mevcut) + artış olarak
+    hesaplanır; mutlak gözlem yoksa mevcut değer artış kadar büyür.
+
+    Args:
+        row_count: VALUES satır sayısı
+
+    Returns:
+        str: SQL ifadesi
+    """
+    rows = []
+    for index in range(row_count):
+        base = index * PARAMS_PER_ROW
+        params = [f"${base + 1}::int"]
+        for offset in range(len(ENGAGEMENT_METRICS)):
+            params.append(f"${base + 2 + offset * 2}::int")
+            params.append(f"${base + 3 + offset * 2}::int")
+        rows.append(f"({', '.join(params)})")
+
+    value_columns = ["id"]
+    for metric in ENGAGEMENT_METRICS:
+        value_columns += [f"{metric}_abs", f"{metric}_inc"]
+    assignments = ",\n            ".join(
+        f"{metric} = COALESCE(v.{metric}_abs, m.{metric}) + v.{metric}_inc"
+        for metric in ENGAGEMENT_METRICS
+    )
+    return f"""
+        UPDATE message_effectiveness AS m
+        SET {assignments},
+            updated_at = NOW()
+        FROM (VALUES {", ".join(rows)}) AS v({", ".join(value_columns)})
+        WHERE m.id = v.id
+    """
+
+
+class EngagementBuffer:
+    """
+    message_effectiveness metrikleri için write-behind toplayıcı.
+
+    increment() olay bazlı artışları, observe() API'den okunan mutlak
+    değerleri biriktirir. Arka plan görevi her `flush_interval_ms`
+    milisaniyede veya tampon `max_batch_rows` mesaja ulaştığında bekleyen
+    tüm mesajları `batch_rows` satırlık toplu UPDATE ifadeleriyle yazar.
+
+    Tampon sınırsız büyümez: boşaltma görevi çalışmıyorsa (start() hiç
+    çağrılmadı veya stop() sonrası) en fazla `max_batch_rows`, çalışırken
+    (ör. veritabanı erişilemezken) en fazla `max_pending_rows` mesaj
+    tutulur. Sınırdayken yeni mesajlar reddedilir ve "dropped" olarak
+    sayılır; bekleyen mesajlara gelen metrikler birleştirilmeye devam eder.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        flush_interval_ms: int = 5000,
+        max_batch_rows: int = 500,
+        batch_rows: int = 500,
+        max_pending_rows: int = 50000,
+        name: str = "engagement"
+    ):
+        """
+        Tamponu yapılandırır.
+
+        Args:
+            pool: Paylaşılan asyncpg bağlantı havuzu (None ise start() içinde alınır)
+            flush_interval_ms: İki boşaltma arasındaki maksimum süre (milisaniye)
+            max_batch_rows: Erken boşaltmayı tetikleyen mesaj sayısı
+            batch_rows: Tek UPDATE ifadesindeki en fazla satır
+            max_pending_rows: Görev çalışırken tamponda tutulabilecek en fazla mesaj
+            name: Metriklerde kullanılacak tampon adı
+        """
+        self.pool = pool
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.max_batch_rows = max(max_batch_rows, 1)
+        # PostgreSQL ifade başına en fazla 32767 parametre kabul eder
+        self.batch_rows = max(1, min(batch_rows, 32767 // PARAMS_PER_ROW))
+        self.max_pending_rows = max(max_pending_rows, self.max_batch_rows)
+        self.name = name
+
+        self._pending: Dict[int, EngagementDelta] = {}
+        self._flush_needed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        self.stats = {
+            "recorded": 0,
+            "merged": 0,
+            "flushed_rows": 0,
+            "statements": 0,
+            "flushes": 0,
+            "errors": 0,
+            "dropped": 0,
+            "last_flush": None
+        }
+
+    async def start(self) -> bool:
+        """
+        Havuzu hazırlar ve arka plan boşaltma görevini başlatır.
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        if self.is_running:
+            return True
+        try:
+            if self.pool is None:
+                self.pool = await get_db_pool()
+            self.is_running = True
+            self._task = asyncio.create_task(self._flush_loop())
+            logger.info(
+                f"Etkileşim tamponu başlatıldı ({self.name}): "
+                f"{int(self.flush_interval * 1000)}ms / {self.max_batch_rows} mesaj"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Etkileşim tamponu başlatılamadı: {str(e)}")
+            self.is_running = False
+            return False
+
+    async def stop(self) -> None:
+        """
+        Arka plan görevini durdurur ve bekleyen metrikleri yazar.
+
+        Görev iptal edilmez; döngü uyandırılır ve süren boşaltmayı
+        bitirip kendiliğinden çıkar.
+        """
+        self.is_running = False
+        self._flush_needed.set()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def _restore(self, entries: List[EngagementDelta]) -> None:
+        """Yazılamayan birikimleri, sonradan gelenleri üzerine ekleyerek geri koyar."""
+        for entry in entries:
+            newer = self._pending.get(entry.tracked_id)
+            if newer is not None:
+                entry.merge(newer)
+            self._pending[entry.tracked_id] = entry
+
+    def _entry(self, tracked_id: int) -> Optional[EngagementDelta]:
+        entry = self._pending.get(tracked_id)
+        if entry is None:
+            limit = self.max_pending_rows if self.is_running else self.max_batch_rows
+            if len(self._pending) >= limit:
+                # Boşaltılamayan tampon büyümesin: yeni mesajı reddet ve say
+                self.stats["dropped"] += 1
+                if self.stats["dropped"] % 1000 == 1:
+                    logger.warning(
+                        f"Etkileşim tamponu dolu ({self.name}, {len(self._pending)} mesaj, "
+                        f"çalışıyor={self.is_running}); metrikler atlanıyor"
+                    )
+                return None
+            entry = EngagementDelta(tracked_id=tracked_id, enqueued_at=time.monotonic())
+            self._pending[tracked_id] = entry
+            if len(self._pending) >= self.max_batch_rows:
+                self._flush_needed.set()
+        else:
+            self.stats["merged"] += 1
+        self.stats["recorded"] += 1
+        return entry
+
+    def increment(self, tracked_id: int, metric: str, amount: int = 1) -> None:
+        """
+        Bir metriği artış olarak biriktirir (veritabanına dokunmaz).
+
+        Args:
+            tracked_id: message_effectiveness ID
+            metric: views/reactions/replies/forwards
+            amount: Artış miktarı
+        """
+        if metric not in ENGAGEMENT_METRICS:
+            raise ValueError(f"Bilinmeyen etkileşim metriği: {metric}")
+        entry = self._entry(tracked_id)
+        if entry is None:
+            return
+        entry.increments[metric] = entry.increments.get(metric, 0) + amount
+
+    def observe(self, tracked_id: int, metrics: Dict[str, int]) -> None:
+        """
+        API'den okunan mutlak metrik değerlerini biriktirir.
+
+        Mutlak değer o metrik için bekleyen artışları geçersiz kılar.
+
+        Args:
+            tracked_id: message_effectiveness ID
+            metrics: Metrik -> mutlak değer
+        """
+        entry = self._entry(tracked_id)
+        if entry is None:
+            return
+        for metric, value in metrics.items():
+            if metric not in ENGAGEMENT_METRICS:
+                continue
+            entry.absolute[metric] = int(value or 0)
+            entry.increments.pop(metric, None)
+
+    @property
+    def pending_count(self) -> int:
+        """Tamponda bekleyen mesaj sayısı"""
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """
+        Bekleyen tüm metrikleri toplu UPDATE ifadeleriyle yazar.
+
+        Returns:
+            int: Güncellenen mesaj satırı sayısı (gönderilen)
+        """
+        async with self._flush_lock:
+            if not self._pending or self.pool is None:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+            oldest = min(entry.enqueued_at for entry in batch.values())
+            entries = list(batch.values())
+            written = 0
+
+            for start in range(0, len(entries), self.batch_rows):
+                chunk = entries[start:start + self.batch_rows]
+                args = [value for entry in chunk for value in entry.as_row()]
+                try:
+                    await self.pool.execute(build_update_query(len(chunk)), *args)
+                    written += len(chunk)
+                    self.stats["statements"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"Etkileşim boşaltma hatası ({len(chunk)} satır): {str(e)}")
+                    # Birikimi kaybetme
+                    self._restore(chunk)
+                except BaseException:
+                    # İptal edilirse yazılmamış parçalar bir sonraki boşaltmaya kalır
+                    self._restore(entries[start:])
+                    raise
+
+            if written:
+                lag = time.monotonic() - oldest
+                self.stats["flushes"] += 1
+                self.stats["flushed_rows"] += written
+                self.stats["last_flush"] = datetime.now()
+                track_write_behind_flush(self.name, written, lag, len(self._pending))
+                logger.debug(f"Etkileşim tamponu: {written} mesaj güncellendi (gecikme {lag:.3f}s)")
+            return written
+
+    async def _flush_loop(self) -> None:
+        """Zaman veya satır sınırına göre periyodik boşaltma döngüsü"""
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Etkileşim tamponu döngü hatası: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Tampon istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {**self.stats, "pending": len(self._pending)}
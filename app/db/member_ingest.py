@@ -0,0 +1,322 @@
+"""
+# ============================================================================ #
+# Dosya: member_ingest.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/member_ingest.py
+# İşlev: Grup üyelerinin COPY ile akış halinde toplu içe aktarımı.
+#
+# `iter_participants` sayfaları bir async generator üzerinden satırlara
+# çevrilir ve sabit boyutlu parçalar halinde biriktirilir. Her parça kendi
+# kısa işleminde geçici bir hazırlık (staging) tablosuna `COPY` ile yazılır
+# ve `users`, `telegram_users` ve `group_members` tablolarına tablo başına
+# tek bir küme tabanlı `INSERT ... SELECT ... ON CONFLICT` birleştirmesi
+# yapılır. Telegram ağ beklemeleri (FloodWait dahil) sırasında bağlantı
+# tutulmaz. Bellekte en fazla bir parça tutulur; üye başına
+# SELECT/UPDATE/INSERT gidiş-dönüşleri ortadan kalkar.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.db.schema_catalog import schema_catalog, SchemaCatalog
+
+logger = logging.getLogger(__name__)
+
+STAGE_TABLE = "member_ingest_stage"
+
+# Hazırlık tablosu sütunları (COPY ve satır tuple sırası)
+STAGE_COLUMNS = (
+    "user_id", "username", "first_name", "last_name", "is_bot",
+    "is_premium", "language_code", "phone", "is_admin"
+)
+
+CREATE_STAGE_TABLE = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (
+        user_id BIGINT NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        is_bot BOOLEAN,
+        is_premium BOOLEAN,
+        language_code TEXT,
+        phone TEXT,
+        is_admin BOOLEAN
+    ) ON COMMIT DROP
+"""
+
+# Aynı kullanıcı birden çok sayfada gelebilir; birleştirmeler tekilleştirilmiş okur
+STAGED_USERS = f"SELECT DISTINCT ON (user_id) * FROM {STAGE_TABLE} ORDER BY user_id, is_admin DESC"
+
+MERGE_TELEGRAM_USERS = f"""
+    INSERT INTO telegram_users (
+        user_id, username, first_name, last_name, is_bot, is_premium,
+        language_code, phone, first_seen, last_seen, created_at, updated_at
+    )
+    SELECT user_id, username, first_name, last_name, is_bot, is_premium,
+           language_code, phone, NOW(), NOW(), NOW(), NOW()
+    FROM ({STAGED_USERS}) s
+    ON CONFLICT (user_id) DO UPDATE SET
+        username = EXCLUDED.username,
+        first_name = EXCLUDED.first_name,
+        last_name = EXCLUDED.last_name,
+        is_bot = EXCLUDED.is_bot,
+        is_premium = EXCLUDED.is_premium,
+        language_code = EXCLUDED.language_code,
+        phone = EXCLUDED.phone,
+        last_seen = NOW(),
+        updated_at = NOW()
+"""
+
+MERGE_GROUP_MEMBERS = f"""
+    INSERT INTO group_members (user_id, group_id, is_admin, joined_at, last_seen, is_active, created_at, updated_at)
+    SELECT user_id, $1, is_admin, NOW(), NOW(), TRUE, NOW(), NOW()
+    FROM ({STAGED_USERS}) s
+    ON CONFLICT (user_id, group_id) DO UPDATE SET
+        is_admin = EXCLUDED.is_admin,
+        last_seen = NOW(),
+        is_active = TRUE,
+        updated_at = NOW()
+"""
+
+DEFAULT_TARGETS = ("users", "telegram_users", "group_members")
+
+
+def build_users_merge(catalog: SchemaCatalog) -> Tuple[str, bool]:
+    """
+    users tablosunun mevcut sütunlarına göre birleştirme ifadesini oluşturur.
+
+    Mevcut değerler COALESCE ile korunur (kullanıcı adı gizlenmiş üyeler
+    eski kullanıcı adını kaybetmez); is_bot, source_group ve updated_at
+    yalnızca tabloda varsa yazılır.
+
+    Args:
+        catalog: Şema kataloğu
+
+    Returns:
+        Tuple[str, bool]: (SQL ifadesi, $1 = kaynak grup adı parametresi kullanılıyor mu)
+    """
+    columns = ["user_id", "username", "first_name", "last_name"]
+    values = ["user_id", "username", "first_name", "last_name"]
+    updates = [
+        "username = COALESCE(EXCLUDED.username, users.username)",
+        "first_name = COALESCE(EXCLUDED.first_name, users.first_name)",
+        "last_name = COALESCE(EXCLUDED.last_name, users.last_name)",
+    ]
+    if catalog.has_column("users", "is_bot"):
+        columns.append("is_bot")
+        values.append("COALESCE(is_bot, FALSE)")
+        updates.append("is_bot = EXCLUDED.is_bot")
+    has_source = catalog.has_column("users", "source_group")
+    if has_source:
+        columns.append("source_group")
+        values.append("$1::text")
+        updates.append("source_group = COALESCE(EXCLUDED.source_group, users.source_group)")
+    if catalog.has_column("users", "updated_at"):
+        updates.append("updated_at = NOW()")
+    query = f"""
+        INSERT INTO users ({", ".join(columns)})
+        SELECT {", ".join(values)}
+        FROM ({STAGED_USERS}) s
+        ON CONFLICT (user_id) DO UPDATE SET
+            {", ".join(updates)}
+    """
+    return query, has_source
+
+
+def participant_row(user: Any, admin_ids: Optional[Set[int]] = None) -> Tuple:
+    """
+    Telethon User nesnesini hazırlık tablosu satırına çevirir.
+
+    Returns:
+        Tuple: STAGE_COLUMNS sırasında değerler
+    """
+    return (
+        int(user.id),
+        getattr(user, "username", None),
+        getattr(user, "first_name", None),
+        getattr(user, "last_name", None),
+        bool(getattr(user, "bot", False)),
+        bool(getattr(user, "premium", False)),
+        getattr(user, "lang_code", None),
+        getattr(user, "phone", None),
+        bool(admin_ids and user.id in admin_ids),
+    )
+
+
+async def iter_member_rows(
+    client: Any,
+    entity: Any,
+    admin_ids: Optional[Set[int]] = None,
+    skip_bots: bool = False,
+    skip_admins: bool = False,
+    limit: Optional[int] = None
+) -> AsyncIterator[Tuple]:
+    """
+    Grubun üyelerini sayfa sayfa okuyup hazırlık satırları olarak üretir.
+
+    Args:
+        client: Telethon istemcisi
+        entity: Grup varlığı
+        admin_ids: Admin kullanıcı ID'leri
+        skip_bots: Botları ve silinmiş hesapları atla
+        skip_admins: Adminleri atla
+        limit: En fazla üye sayısı (None ise tümü)
+
+    Yields:
+        Tuple: STAGE_COLUMNS sırasında satır
+    """
+    async for user in client.iter_participants(entity, limit=limit):
+        if skip_bots and (getattr(user, "bot", False) or getattr(user, "deleted", False)):
+            continue
+        if skip_admins and admin_ids and user.id in admin_ids:
+            continue
+        yield participant_row(user, admin_ids)
+
+
+async def _chunks(rows: Any, size: int) -> AsyncIterator[List[Tuple]]:
+    """Senkron veya asenkron satır kaynağını sabit boyutlu parçalara böler"""
+    chunk: List[Tuple] = []
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class MemberIngestor:
+    """
+    Grup üyelerini hazırlık tablosu + küme tabanlı birleştirme ile içe aktarır.
+
+    Bağlantı yalnızca bir parça tamamlandığında alınır: her parça kendi
+    işleminde kopyalanır ve birleştirilir, hazırlık tablosu işlem sonunda
+    kendiliğinden düşer. Akışın ortasındaki bir hata yalnızca o parçayı
+    geri alır; önceki parçalar kalıcıdır. `chunk_sink` verilirse her parça
+    COPY sonrası, işlemdeki bağlantıyla birlikte ona da iletilir (ör. anlık
+    görüntü deposu); sink bu bağlantıyla yazarsa yazdıkları parça ile
+    birlikte commit veya rollback olur.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        chunk_rows: int = 5000,
+        targets: Iterable[str] = DEFAULT_TARGETS
+    ):
+        """
+        İçe aktarıcıyı yapılandırır.
+
+        Args:
+            pool: Asenkron bağlantı havuzu (None ise ilk kullanımda alınır)
+            chunk_rows: COPY başına satır sayısı (bellekte tutulan en fazla satır)
+            targets: Birleştirilecek tablolar (users, telegram_users, group_members)
+        """
+        self.pool = pool
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.targets = tuple(targets)
+
+        self.stats = {
+            "ingests": 0,
+            "rows_staged": 0,
+            "copies": 0,
+            "merged": {},
+            "last_duration": None
+        }
+
+    async def _get_pool(self) -> AsyncDbConnectionPool:
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        return self.pool
+
+    def _merge_statements(self, group_id: int, source_group: Optional[str]) -> List[Tuple[str, str, Tuple]]:
+        """Mevcut hedef tablolar için (tablo, ifade, parametreler) listesi"""
+        statements = []
+        for table in self.targets:
+            if schema_catalog.loaded and not schema_catalog.has_table(table):
+                logger.debug(f"Üye aktarımı: {table} tablosu yok, atlanıyor")
+                continue
+            if table == "users":
+                query, has_source = schema_catalog.statement(("member_ingest", "users"), build_users_merge)
+                statements.append((table, query, (source_group,) if has_source else ()))
+            elif table == "telegram_users":
+                statements.append((table, MERGE_TELEGRAM_USERS, ()))
+            elif table == "group_members":
+                statements.append((table, MERGE_GROUP_MEMBERS, (int(group_id),)))
+        return statements
+
+    async def ingest(
+        self,
+        group_id: int,
+        rows: Any,
+        source_group: Optional[str] = None,
+        chunk_sink: Optional[Callable[[List[Tuple], Any], Awaitable[Any]]] = None
+    ) -> Dict[str, int]:
+        """
+        Satır akışını parça parça hazırlık tablosuna kopyalar ve hedef tablolara birleştirir.
+
+        Args:
+            group_id: Üyelerin grubu
+            rows: STAGE_COLUMNS sırasında satırlar (async/sync iterable)
+            source_group: users.source_group için grup adı
+            chunk_sink: Her parça için (parça, bağlantı) ile çağrılacak coroutine fonksiyonu
+
+        Returns:
+            Dict[str, int]: 'staged' ve tablo başına etkilenen satır sayıları
+        """
+        started = time.monotonic()
+        pool = await self._get_pool()
+        await schema_catalog.ensure_loaded_async(pool)
+
+        result: Dict[str, int] = {"staged": 0}
+        merges = self._merge_statements(group_id, source_group)
+        async for chunk in _chunks(rows, self.chunk_rows):
+            async with pool.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute(CREATE_STAGE_TABLE)
+                    await connection.copy_records_to_table(
+                        STAGE_TABLE, records=chunk, columns=list(STAGE_COLUMNS)
+                    )
+                    self.stats["copies"] += 1
+                    affected: Dict[str, int] = {}
+                    for table, statement, args in merges:
+                        status = await connection.execute(statement, *args)
+                        try:
+                            affected[table] = int(str(status).split()[-1])
+                        except (ValueError, IndexError):
+                            affected[table] = 0
+                    if chunk_sink is not None:
+                        await chunk_sink(chunk, connection)
+
+            # Sayaçlar yalnızca commit edilen parçalar için güncellenir
+            result["staged"] += len(chunk)
+            for table, count in affected.items():
+                result[table] = result.get(table, 0) + count
+                self.stats["merged"][table] = self.stats["merged"].get(table, 0) + count
+
+        duration = time.monotonic() - started
+        self.stats["ingests"] += 1
+        self.stats["rows_staged"] += result["staged"]
+        self.stats["last_duration"] = duration
+        logger.info(f"Grup {group_id} üyeleri aktarıldı: {result['staged']} satır, {duration:.2f}s")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        İçe aktarım istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {**self.stats, "merged": dict(self.stats["merged"])}
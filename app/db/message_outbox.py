@@ -0,0 +1,617 @@
+"""
+# ============================================================================ #
+# Dosya: message_outbox.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/message_outbox.py
+# İşlev: Giden mesajlar için kalıcı, öncelik sıralı outbox kuyruğu.
+#
+# Gönderilecek her mesaj `message_outbox` tablosuna idempotency anahtarıyla
+# bir kez yazılır. Tüketiciler kayıtları `FOR UPDATE SKIP LOCKED` ile
+# öncelik ve vade sırasına göre talep eder; talep edilen kayıt görünürlük
+# süresi boyunca diğer tüketicilerden gizlenir. Süreç çökerse onaylanmamış
+# kayıtlar süre dolunca yeniden talep edilir, böylece gönderimler kaybolmaz.
+# Kalıcı hatalar (silinmiş mesaj, bulunamayan sohbet) yeniden denenmeden
+# doğrudan başarısız olarak işaretlenir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.core.metrics import track_outbox_event
+from app.core.scheduler import wakeups
+
+logger = logging.getLogger(__name__)
+
+# Kuyruk kaydı durumları
+OUTBOX_QUEUED = "queued"
+OUTBOX_PROCESSING = "processing"
+OUTBOX_DONE = "done"
+OUTBOX_FAILED = "failed"
+
+CREATE_OUTBOX_TABLE = """
+    CREATE TABLE IF NOT EXISTS message_outbox (
+        id BIGSERIAL PRIMARY KEY,
+        message_id INTEGER NOT NULL,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        priority SMALLINT NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        available_at TIMESTAMP NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        claimed_by TEXT,
+        last_error TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        completed_at TIMESTAMP
+    )
+"""
+
+# Talep sorgusu yalnızca bekleyen/işlenen kayıtları tarar; kısmi indeks
+# tamamlanan kayıtlar büyüse de küçük kalır ve sıralamayı doğrudan sağlar.
+CREATE_OUTBOX_INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_message_outbox_claim
+    ON message_outbox (priority DESC, available_at)
+    WHERE status IN ('queued', 'processing')
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_message_outbox_message_id
+    ON message_outbox (message_id)
+    """,
+    # Vadesi gelen zamanlanmış mesaj taraması için (UPPER(status) yerine)
+    """
+    CREATE INDEX IF NOT EXISTS idx_messages_status_scheduled_for
+    ON messages (status, scheduled_for)
+    """,
+]
+
+ENQUEUE_QUERY = """
+    INSERT INTO message_outbox
+    (message_id, idempotency_key, priority, status, available_at, max_attempts)
+    VALUES ($1, $2, $3, 'queued', $4, $5)
+    ON CONFLICT (idempotency_key) DO NOTHING
+    RETURNING id
+"""
+
+# Vadesi gelen zamanlanmış mesajları tek ifadede kuyruğa taşır. Mesaj
+# satırları da SKIP LOCKED ile kilitlenir; eşzamanlı taramalar aynı satırı
+# iki kez almaz, idempotency anahtarı ise ikinci bir kaydı engeller.
+PROMOTE_SCHEDULED_QUERY = """
+    WITH due AS (
+        UPDATE messages m
+        SET status = $3, updated_at = $1
+        FROM (
+            SELECT id FROM messages
+            WHERE status = ANY($2::text[]) AND scheduled_for <= $1
+            ORDER BY scheduled_for
+            LIMIT $4
+            FOR UPDATE SKIP LOCKED
+        ) d
+        WHERE m.id = d.id
+        RETURNING m.id, m.scheduled_for
+    )
+    INSERT INTO message_outbox
+    (message_id, idempotency_key, priority, status, available_at, max_attempts)
+    SELECT id, 'message:' || id, $5, 'queued', scheduled_for, $6 FROM due
+    ON CONFLICT (idempotency_key) DO NOTHING
+    RETURNING id
+"""
+
+CLAIM_QUERY = """
+    UPDATE message_outbox o
+    SET status = 'processing',
+        attempts = o.attempts + 1,
+        claimed_by = $2,
+        available_at = $1 + $4::float8 * INTERVAL '1 second',
+        updated_at = $1
+    FROM (
+        SELECT id, available_at FROM message_outbox
+        WHERE status IN ('queued', 'processing') AND available_at <= $1
+        ORDER BY priority DESC, available_at
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    ) c
+    WHERE o.id = c.id
+    RETURNING o.id, o.message_id, o.idempotency_key, o.priority, o.attempts,
+              o.max_attempts, c.available_at AS due_at
+"""
+
+# attempts değeri talep jetonu olarak kullanılır: görünürlük süresi dolup
+# kayıt başka bir tüketiciye geçtiyse eski tüketicinin onayı etkisiz kalır.
+ACK_QUERY = """
+    UPDATE message_outbox
+    SET status = 'done', completed_at = $3, updated_at = $3, last_error = NULL
+    WHERE id = $1 AND attempts = $2 AND status = 'processing'
+"""
+
+RETRY_QUERY = """
+    UPDATE message_outbox
+    SET status = 'queued', available_at = $3, updated_at = $4, last_error = $5
+    WHERE id = $1 AND attempts = $2 AND status = 'processing'
+"""
+
+FAIL_QUERY = """
+    UPDATE message_outbox
+    SET status = 'failed', completed_at = $3, updated_at = $3, last_error = $4
+    WHERE id = $1 AND attempts = $2 AND status = 'processing'
+"""
+
+CANCEL_QUERY = """
+    DELETE FROM message_outbox
+    WHERE message_id = $1 AND status = 'queued'
+"""
+
+COUNT_QUERY = """
+    SELECT status, COUNT(*) AS count FROM message_outbox
+    WHERE status IN ('queued', 'processing')
+    GROUP BY status
+"""
+
+# Yeniden denenmesi anlamsız Telegram hataları; telethon'u bu katmana
+# bağlamamak için sınıf adıyla eşleştirilir
+TERMINAL_ERROR_NAMES = frozenset({
+    "MessageIdInvalidError",
+    "ChatIdInvalidError",
+    "PeerIdInvalidError",
+    "ChannelInvalidError",
+    "ChannelPrivateError",
+    "ChatWriteForbiddenError",
+    "ChatAdminRequiredError",
+    "UserBannedInChannelError",
+    "UserIsBlockedError",
+    "InputUserDeactivatedError",
+    "UserDeactivatedError",
+})
+
+
+class OutboxTerminalError(Exception):
+    """Handler'ın yeniden denemenin anlamsız olduğunu bildirdiği kalıcı hata"""
+
+
+def is_terminal_error(error: BaseException) -> bool:
+    """
+    Hatanın kalıcı olup olmadığını döndürür.
+
+    Args:
+        error: Handler'dan yükselen hata
+
+    Returns:
+        bool: Kayıt yeniden denenmeden başarısız sayılmalıysa True
+    """
+    return isinstance(error, OutboxTerminalError) or type(error).__name__ in TERMINAL_ERROR_NAMES
+
+
+@dataclass
+class OutboxItem:
+    """Talep edilmiş tek bir outbox kaydı"""
+    id: int
+    message_id: int
+    idempotency_key: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    due_at: Optional[datetime] = None
+
+    @property
+    def is_last_attempt(self) -> bool:
+        """Bu deneme başarısız olursa kayıt kalıcı olarak başarısız sayılır"""
+        return self.attempts >= self.max_attempts
+
+
+def message_idempotency_key(message_id: int) -> str:
+    """
+    Bir mesaj için varsayılan idempotency anahtarını döndürür.
+
+    Args:
+        message_id: Mesaj ID
+
+    Returns:
+        str: Anahtar
+    """
+    return f"message:{message_id}"
+
+
+class MessageOutbox:
+    """
+    Kalıcı, öncelik sıralı outbox kuyruğu ve süreç içi tüketici havuzu.
+
+    enqueue() kaydı veritabanına yazar ve uyuyan tüketicileri uyandırır.
+    start() ile başlatılan `consumers` adet tüketici kayıtları `batch_size`
+    kadar talep eder, handler'a verir ve sonuca göre onaylar veya artan
+    bekleme ile yeniden kuyruğa koyar. Handler True döndürürse kayıt
+    tamamlanır; False döndürür veya hata fırlatırsa yeniden denenir.
+    Kalıcı hatalar (bkz. is_terminal_error) deneme hakkı beklenmeden
+    başarısız olarak işaretlenir.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        consumers: int = 4,
+        batch_size: int = 10,
+        visibility_timeout: float = 300.0,
+        poll_interval: float = 5.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 30.0,
+        drain_timeout: float = 30.0,
+        name: str = "message_outbox"
+    ):
+        """
+        Kuyruğu yapılandırır.
+
+        Args:
+            pool: Paylaşılan asyncpg bağlantı havuzu (None ise start() içinde alınır)
+            consumers: Süreç içi tüketici sayısı
+            batch_size: Bir tüketicinin tek seferde talep ettiği kayıt sayısı
+            visibility_timeout: Talep edilen kaydın gizli kalacağı süre (saniye)
+            poll_interval: Kuyruk boşken iki yoklama arasındaki maksimum süre (saniye)
+            max_attempts: Kaydın kalıcı olarak başarısız sayılmadan önceki deneme sayısı
+            retry_backoff: İlk yeniden deneme gecikmesi, her denemede iki katına çıkar (saniye)
+            drain_timeout: stop() sırasında süren gönderimlerin bitmesi için beklenecek süre (saniye)
+            name: Loglarda ve talep sahibi alanında kullanılacak ad
+        """
+        self.pool = pool
+        self.consumers = max(int(consumers), 1)
+        self.batch_size = max(int(batch_size), 1)
+        self.visibility_timeout = max(float(visibility_timeout), 1.0)
+        self.poll_interval = max(float(poll_interval), 0.01)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.retry_backoff = max(float(retry_backoff), 0.0)
+        self.drain_timeout = max(float(drain_timeout), 0.0)
+        self.name = name
+        # Sahip servisin (ör. MessageService) bekleme anahtarıyla çakışmasın;
+        # aynı anahtarı bekleyen ilk taraf olayı ve vadeyi temizler
+        self.wake_key = f"{name}_outbox"
+
+        self._handler: Optional[Callable[[OutboxItem], Awaitable[bool]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stop_event = asyncio.Event()
+        self.is_running = False
+
+        self.stats = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "promoted": 0,
+            "claimed": 0,
+            "reclaimed": 0,
+            "acked": 0,
+            "retried": 0,
+            "failed": 0,
+            "dead_lettered": 0,
+            "errors": 0
+        }
+
+    async def ensure_schema(self) -> None:
+        """Outbox tablosunu ve indeksleri oluşturur (varsa dokunmaz)."""
+        await self.pool.execute(CREATE_OUTBOX_TABLE)
+        for statement in CREATE_OUTBOX_INDEXES:
+            await self.pool.execute(statement)
+
+    async def start(self, handler: Callable[[OutboxItem], Awaitable[bool]]) -> bool:
+        """
+        Şemayı hazırlar ve tüketici görevlerini başlatır.
+
+        Args:
+            handler: Talep edilen kaydı işleyen coroutine (tamamlandıysa True)
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        if self.is_running:
+            return True
+        try:
+            if self.pool is None:
+                self.pool = await get_db_pool()
+            await self.ensure_schema()
+        except Exception as e:
+            logger.error(f"Outbox başlatılamadı ({self.name}): {str(e)}")
+            return False
+
+        self._handler = handler
+        self._stop_event = asyncio.Event()
+        self.is_running = True
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self.name}-{index}"))
+            for index in range(self.consumers)
+        ]
+        logger.info(
+            f"Outbox başlatıldı ({self.name}): {self.consumers} tüketici, "
+            f"görünürlük süresi {self.visibility_timeout:.0f}s"
+        )
+        return True
+
+    async def stop(self) -> None:
+        """
+        Tüketicileri durdurur.
+
+        Süren gönderim yarıda kesilmez: tüketiciler elindeki kaydı bitirip
+        onayladıktan sonra çıkar, yoksa kayıt onaylanmadan kalır ve yeniden
+        başlatmada mesaj ikinci kez gönderilir. `drain_timeout` içinde
+        bitmeyen tüketiciler iptal edilir; onların kayıtları görünürlük
+        süresi dolduğunda yeniden talep edilir.
+        """
+        self.is_running = False
+        self._stop_event.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=self.drain_timeout or None)
+        if pending:
+            logger.warning(
+                f"Outbox ({self.name}): {len(pending)} tüketici {self.drain_timeout:.0f}s "
+                f"içinde bitmedi, iptal ediliyor"
+            )
+        for task in pending:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Outbox tüketicisi hatayla sonlandı ({self.name}): {str(e)}")
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Uyuyan tüketicileri yoklama süresini beklemeden uyandırır."""
+        wakeups.wake(self.wake_key)
+
+    async def enqueue(
+        self,
+        message_id: int,
+        priority: int = 0,
+        available_at: Optional[datetime] = None,
+        idempotency_key: Optional[str] = None
+    ) -> bool:
+        """
+        Mesajı kuyruğa ekler; aynı idempotency anahtarı ikinci kez eklenmez.
+
+        Args:
+            message_id: Gönderilecek mesajın ID'si
+            priority: Öncelik (büyük değer önce işlenir)
+            available_at: En erken işlenme zamanı (UTC, None ise hemen)
+            idempotency_key: Tekrarlayan eklemeleri ayırt eden anahtar
+
+        Returns:
+            bool: Yeni kayıt eklendiyse True, anahtar zaten varsa False
+        """
+        key = idempotency_key or message_idempotency_key(message_id)
+        available_at = available_at or datetime.utcnow()
+        row_id = await self.pool.fetchval(
+            ENQUEUE_QUERY, message_id, key, priority, available_at, self.max_attempts
+        )
+        if row_id is None:
+            self.stats["duplicates"] += 1
+            logger.debug(f"Outbox: {key} zaten kuyrukta")
+            return False
+
+        self.stats["enqueued"] += 1
+        track_outbox_event("enqueued")
+        delay = (available_at - datetime.utcnow()).total_seconds()
+        if delay <= 0:
+            self.notify()
+        else:
+            # İleri tarihli kayıt için tüketicileri tam vadesinde uyandır
+            wakeups.schedule(self.wake_key, delay)
+        return True
+
+    async def promote_scheduled(
+        self,
+        statuses: List[str],
+        new_status: str,
+        limit: int,
+        priority: int = 0,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Vadesi gelen zamanlanmış mesajları kuyruğa taşır.
+
+        Args:
+            statuses: Zamanlanmış sayılan mesaj durumları
+            new_status: Kuyruğa alınan mesajlara yazılacak durum
+            limit: Tek seferde taşınacak en fazla mesaj
+            priority: Taşınan kayıtların önceliği
+            now: Referans zaman (UTC, None ise şimdiki zaman)
+
+        Returns:
+            int: Kuyruğa yeni eklenen kayıt sayısı
+        """
+        now = now or datetime.utcnow()
+        rows = await self.pool.fetch(
+            PROMOTE_SCHEDULED_QUERY, now, list(statuses), new_status, limit,
+            priority, self.max_attempts
+        )
+        if rows:
+            self.stats["promoted"] += len(rows)
+            track_outbox_event("enqueued", len(rows))
+            self.notify()
+        return len(rows)
+
+    async def claim(self, consumer: str, limit: Optional[int] = None) -> List[OutboxItem]:
+        """
+        İşlenmeye hazır kayıtları öncelik ve vade sırasına göre talep eder.
+
+        Args:
+            consumer: Talep eden tüketicinin adı
+            limit: Talep edilecek en fazla kayıt (None ise batch_size)
+
+        Returns:
+            List[OutboxItem]: Talep edilen kayıtlar
+        """
+        now = datetime.utcnow()
+        rows = await self.pool.fetch(
+            CLAIM_QUERY, now, consumer, limit or self.batch_size, self.visibility_timeout
+        )
+        items = []
+        for row in rows:
+            item = OutboxItem(
+                id=row["id"],
+                message_id=row["message_id"],
+                idempotency_key=row["idempotency_key"],
+                priority=row["priority"],
+                attempts=row["attempts"],
+                max_attempts=row["max_attempts"],
+                due_at=row["due_at"]
+            )
+            items.append(item)
+            if item.attempts > 1:
+                self.stats["reclaimed"] += 1
+                track_outbox_event("reclaimed")
+            lag = (now - item.due_at).total_seconds() if item.due_at else None
+            track_outbox_event("claimed", lag=lag)
+
+        self.stats["claimed"] += len(items)
+        # UPDATE ... RETURNING sırası garanti değildir
+        items.sort(key=lambda item: (-item.priority, item.due_at or now))
+        return items
+
+    async def ack(self, item: OutboxItem) -> bool:
+        """
+        Kaydı tamamlandı olarak işaretler.
+
+        Returns:
+            bool: Kayıt hâlâ bu talebe aitse True
+        """
+        result = await self.pool.execute(ACK_QUERY, item.id, item.attempts, datetime.utcnow())
+        if not _affected(result):
+            logger.warning(f"Outbox: {item.idempotency_key} onaylanamadı, talep süresi dolmuş")
+            return False
+        self.stats["acked"] += 1
+        track_outbox_event("acked")
+        return True
+
+    async def nack(self, item: OutboxItem, error: Optional[str] = None) -> bool:
+        """
+        Başarısız denemeyi kaydeder; deneme hakkı kaldıysa kaydı geciktirerek
+        yeniden kuyruğa koyar, kalmadıysa kalıcı olarak başarısız işaretler.
+
+        Returns:
+            bool: Kayıt hâlâ bu talebe aitse True
+        """
+        now = datetime.utcnow()
+        if item.is_last_attempt:
+            result = await self.pool.execute(FAIL_QUERY, item.id, item.attempts, now, error)
+            event = "failed"
+        else:
+            delay = self.retry_backoff * (2 ** (item.attempts - 1))
+            result = await self.pool.execute(
+                RETRY_QUERY, item.id, item.attempts, now + timedelta(seconds=delay), now, error
+            )
+            event = "retried"
+
+        if not _affected(result):
+            return False
+        self.stats[event] += 1
+        track_outbox_event(event)
+        return True
+
+    async def dead_letter(self, item: OutboxItem, error: Optional[str] = None) -> bool:
+        """
+        Kalıcı hatayla sonuçlanan kaydı kalan deneme hakkına bakmadan
+        başarısız olarak işaretler.
+
+        Returns:
+            bool: Kayıt hâlâ bu talebe aitse True
+        """
+        result = await self.pool.execute(FAIL_QUERY, item.id, item.attempts, datetime.utcnow(), error)
+        if not _affected(result):
+            return False
+        self.stats["dead_lettered"] += 1
+        track_outbox_event("dead_lettered")
+        return True
+
+    async def cancel(self, message_id: int) -> int:
+        """
+        Mesajın henüz talep edilmemiş kuyruk kayıtlarını siler.
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        if self.pool is None:
+            return 0
+        return _affected(await self.pool.execute(CANCEL_QUERY, message_id))
+
+    async def process(self, item: OutboxItem) -> bool:
+        """
+        Tek bir kaydı handler ile işler ve sonucu kuyruğa yansıtır.
+
+        Returns:
+            bool: Handler başarılı olduysa True
+        """
+        try:
+            success = bool(await self._handler(item))
+            error = None if success else "handler başarısız"
+        except Exception as e:
+            if is_terminal_error(e):
+                logger.warning(f"Outbox kalıcı hata, yeniden denenmeyecek ({item.idempotency_key}): {str(e)}")
+                await self.dead_letter(item, f"{type(e).__name__}: {str(e)}")
+                return False
+            logger.error(f"Outbox işleme hatası ({item.idempotency_key}): {str(e)}")
+            success, error = False, str(e)
+
+        if success:
+            await self.ack(item)
+        else:
+            await self.nack(item, error)
+        return success
+
+    async def _consume(self, consumer: str) -> None:
+        """Tek bir tüketicinin talep/işle/onayla döngüsü"""
+        while self.is_running:
+            try:
+                items = await self.claim(consumer)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Outbox talep hatası ({consumer}): {str(e)}")
+                items = []
+
+            if not items:
+                await wakeups.wait(self.wake_key, timeout=self.poll_interval, stop_event=self._stop_event)
+                continue
+
+            for item in items:
+                if not self.is_running:
+                    # Kalan kayıtlar görünürlük süresi dolunca yeniden talep edilir
+                    break
+                try:
+                    await self.process(item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"Outbox onay hatası ({item.idempotency_key}): {str(e)}")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Kuyruk istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        stats: Dict[str, Any] = {
+            **self.stats,
+            "consumers": self.consumers,
+            "running": self.is_running
+        }
+        if self.pool is not None:
+            try:
+                rows = await self.pool.fetch(COUNT_QUERY)
+                stats["depth"] = {row["status"]: row["count"] for row in rows}
+            except Exception as e:
+                logger.debug(f"Outbox derinliği okunamadı: {str(e)}")
+        return stats
+
+
+def _affected(status: Any) -> int:
+    """asyncpg komut durumundan ("UPDATE 1") etkilenen satır sayısını çıkarır"""
+    try:
+        return int(str(status).rsplit(" ", 1)[-1])
+    except (TypeError, ValueError):
+        return 0
@@ -139,6 +139,8 @@ def create_tables():
         CREATE INDEX IF NOT EXISTS idx_message_effectiveness_category ON message_effectiveness(category);
         CREATE INDEX IF NOT EXISTS idx_dm_conversions_user_id ON dm_conversions(user_id);
         CREATE INDEX IF NOT EXISTS idx_dm_conversions_source_message_id ON dm_conversions(source_message_id);
+        CREATE INDEX IF NOT EXISTS idx_message_effectiveness_updated_at ON message_effectiveness(updated_at);
+        CREATE INDEX IF NOT EXISTS idx_dm_conversions_updated_at ON dm_conversions(updated_at);
         """)
         
         # Değişiklikleri kaydet
@@ -0,0 +1,28 @@
+"""Analitik aktarımının değişen gün taraması için updated_at indeksleri
+
+Revision ID: a7c3e9d2b4f1
+Revises: dde5ca6fd54b
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a7c3e9d2b4f1"
+down_revision = "dde5ca6fd54b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # AnalyticsExporter her döngüde `updated_at > son aktarım` ile değişen
+    # günleri arar; indeks olmadan her döngü tabloyu baştan sona tarar
+    op.create_index('ix_message_effectiveness_updated_at', 'message_effectiveness', ['updated_at'], unique=False)
+    op.create_index('ix_dm_conversions_updated_at', 'dm_conversions', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dm_conversions_updated_at', table_name='dm_conversions')
+    op.drop_index('ix_message_effectiveness_updated_at', table_name='message_effectiveness')
@@ -0,0 +1,398 @@
+"""
+# ============================================================================ #
+# Dosya: mining_snapshots.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/mining_snapshots.py
+# İşlev: Veri madenciliği için değişim algılayan anlık görüntü deposu.
+#
+# `data_mining` tablosuna her taramada tam JSON eklemek yerine varlık
+# (grup/kullanıcı) başına son durum `mining_snapshot_latest` tablosunda tek
+# satır olarak tutulur. Geçmiş, yalnızca içerik özeti değiştiğinde
+# `mining_snapshot_history` tablosuna değişen alanların farkı (diff) olarak
+# yazılır. Geçmiş tablosu aylık bölümlenir; saklama süresini aşan aylar
+# satır silmek yerine bölüm düşürülerek temizlenir. Depolama ve tarama
+# maliyeti tarama sıklığıyla değil gerçek değişikliklerle büyür.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import json
+import hashlib
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = "mining_snapshot_history"
+
+# Her taramada değişen, özete katılmayan alanlar
+VOLATILE_KEYS = frozenset({"last_update", "last_seen", "updated_at", "scanned_at"})
+
+CREATE_LATEST_TABLE = """
+    CREATE TABLE IF NOT EXISTS mining_snapshot_latest (
+        entity_type TEXT NOT NULL,
+        entity_id BIGINT NOT NULL,
+        group_id BIGINT,
+        source TEXT,
+        content_hash TEXT NOT NULL,
+        data JSONB NOT NULL,
+        first_seen TIMESTAMP NOT NULL DEFAULT NOW(),
+        last_changed TIMESTAMP NOT NULL DEFAULT NOW(),
+        last_seen TIMESTAMP NOT NULL DEFAULT NOW(),
+        change_count INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (entity_type, entity_id)
+    )
+"""
+
+CREATE_HISTORY_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+        entity_type TEXT NOT NULL,
+        entity_id BIGINT NOT NULL,
+        changed_at TIMESTAMP NOT NULL,
+        content_hash TEXT NOT NULL,
+        diff JSONB NOT NULL
+    ) PARTITION BY RANGE (changed_at)
+"""
+
+CREATE_HISTORY_INDEX = f"""
+    CREATE INDEX IF NOT EXISTS idx_{HISTORY_TABLE}_entity
+    ON {HISTORY_TABLE} (entity_type, entity_id, changed_at)
+"""
+
+CREATE_PARTITION = """
+    CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+    FOR VALUES FROM ('{start}') TO ('{end}')
+"""
+
+LIST_PARTITIONS_QUERY = """
+    SELECT child.relname AS name
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = $1
+"""
+
+# Tek ifadede: önceki durumu oku, son durumu upsert et, değişenler için
+# geçmişe fark yaz ve değişen varlık ID'lerini döndür. Değişmeyen
+# varlıkların satırına yalnızca `last_seen` eskidiyse dokunulur.
+RECORD_BATCH_QUERY = f"""
+    WITH incoming AS (
+        SELECT DISTINCT ON (entity_id) *
+        FROM unnest($2::bigint[], $3::bigint[], $4::text[], $5::jsonb[])
+            AS t(entity_id, group_id, content_hash, data)
+    ),
+    prev AS (
+        SELECT l.entity_id, l.content_hash, l.data
+        FROM mining_snapshot_latest l
+        WHERE l.entity_type = $1 AND l.entity_id = ANY($2::bigint[])
+    ),
+    changes AS (
+        SELECT i.entity_id, i.content_hash, i.data, p.data AS prev_data
+        FROM incoming i LEFT JOIN prev p USING (entity_id)
+        WHERE p.entity_id IS NULL OR p.content_hash <> i.content_hash
+    ),
+    latest AS (
+        INSERT INTO mining_snapshot_latest AS l (entity_type, entity_id, group_id, source, content_hash, data)
+        SELECT $1, entity_id, group_id, $6, content_hash, data FROM incoming
+        ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+            group_id = COALESCE(EXCLUDED.group_id, l.group_id),
+            source = EXCLUDED.source,
+            content_hash = EXCLUDED.content_hash,
+            data = EXCLUDED.data,
+            last_seen = NOW(),
+            last_changed = CASE WHEN l.content_hash <> EXCLUDED.content_hash THEN NOW() ELSE l.last_changed END,
+            change_count = l.change_count + (l.content_hash <> EXCLUDED.content_hash)::int
+        WHERE l.content_hash <> EXCLUDED.content_hash
+           OR l.last_seen < NOW() - make_interval(secs => $7)
+    ),
+    history AS (
+        INSERT INTO {HISTORY_TABLE} (entity_type, entity_id, changed_at, content_hash, diff)
+        SELECT $1, c.entity_id, NOW(), c.content_hash,
+            CASE WHEN c.prev_data IS NULL THEN c.data ELSE (
+                SELECT COALESCE(jsonb_object_agg(d.key, d.value), '{{}}'::jsonb)
+                FROM (
+                    SELECT n.key, n.value FROM jsonb_each(c.data) n
+                    WHERE c.prev_data -> n.key IS DISTINCT FROM n.value
+                    UNION ALL
+                    SELECT o.key, 'null'::jsonb FROM jsonb_each(c.prev_data) o
+                    WHERE NOT c.data ? o.key
+                ) d
+            ) END
+        FROM changes c
+    )
+    SELECT entity_id FROM changes
+"""
+
+
+def snapshot_hash(data: Dict[str, Any], ignore: Iterable[str] = VOLATILE_KEYS) -> str:
+    """
+    Verinin (geçici alanlar hariç) sıralı JSON gösteriminin özetini döndürür.
+
+    Args:
+        data: Varlık verisi
+        ignore: Özete katılmayacak alanlar
+
+    Returns:
+        str: SHA-1 özeti (hex)
+    """
+    ignored = set(ignore)
+    stable = {key: value for key, value in data.items() if key not in ignored}
+    canonical = json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """Günün ayının (offset kadar kaydırılmış) ilk gününü döndürür"""
+    index = day.year * 12 + (day.month - 1) + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Aylık geçmiş bölümünün tablo adını döndürür (ör. mining_snapshot_history_p202505)"""
+    return f"{HISTORY_TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Bölüm adından ayı çıkarır"""
+    prefix = f"{HISTORY_TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        stamp = name[len(prefix):]
+        return date(int(stamp[:4]), int(stamp[4:6]), 1)
+    except ValueError:
+        return None
+
+
+class MiningSnapshotStore:
+    """
+    Varlık başına son durum ve aylık bölümlü fark geçmişi deposu.
+
+    record_many() bir partiyi tek ifadeyle yazar ve içeriği değişen (veya
+    ilk kez görülen) varlıkların ID'lerini döndürür; çağıranlar türetilmiş
+    tabloları yalnızca bu varlıklar için güncelleyebilir.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        retention_months: int = 6,
+        touch_interval: int = 3600,
+        batch_size: int = 1000
+    ):
+        """
+        Depoyu yapılandırır.
+
+        Args:
+            pool: Asenkron bağlantı havuzu (None ise ilk kullanımda alınır)
+            retention_months: Geçmişin saklanacağı ay sayısı (içinde bulunulan ay hariç)
+            touch_interval: Değişmeyen varlıkların last_seen güncelleme aralığı (saniye)
+            batch_size: Tek ifadedeki en fazla varlık sayısı
+        """
+        self.pool = pool
+        self.retention_months = max(int(retention_months), 1)
+        self.touch_interval = max(int(touch_interval), 0)
+        self.batch_size = max(int(batch_size), 1)
+        self._schema_ready = False
+        self._partitions: Set[date] = set()
+
+        self.stats = {
+            "recorded": 0,
+            "changed": 0,
+            "statements": 0,
+            "partitions_dropped": 0
+        }
+
+    async def _get_pool(self) -> AsyncDbConnectionPool:
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        return self.pool
+
+    # ------------------------------------------------------------------ #
+    # Şema
+    # ------------------------------------------------------------------ #
+
+    async def ensure_schema(self) -> None:
+        """Son durum ve geçmiş tablolarını ve güncel ay bölümlerini oluşturur"""
+        if not self._schema_ready:
+            pool = await self._get_pool()
+            await pool.execute(CREATE_LATEST_TABLE)
+            await pool.execute(CREATE_HISTORY_TABLE)
+            await pool.execute(CREATE_HISTORY_INDEX)
+            self._schema_ready = True
+        today = date.today()
+        for offset in (0, 1):
+            await self.ensure_partition(month_start(today, offset))
+
+    async def ensure_partition(self, month: date) -> None:
+        """
+        Bir ayın geçmiş bölümünü yoksa oluşturur.
+
+        Args:
+            month: Ayın herhangi bir günü
+        """
+        month = month_start(month)
+        if month in self._partitions:
+            return
+        pool = await self._get_pool()
+        await pool.execute(CREATE_PARTITION.format(
+            name=partition_name(month),
+            table=HISTORY_TABLE,
+            start=month.isoformat(),
+            end=month_start(month, 1).isoformat()
+        ))
+        self._partitions.add(month)
+
+    # ------------------------------------------------------------------ #
+    # Yazma
+    # ------------------------------------------------------------------ #
+
+    async def record_many(
+        self,
+        entity_type: str,
+        items: Iterable[Tuple[int, Dict[str, Any], Optional[int]]],
+        source: str = "discover",
+        connection=None
+    ) -> List[int]:
+        """
+        Varlık verilerini partiler halinde yazar.
+
+        Args:
+            entity_type: Varlık türü ('group', 'user', ...)
+            items: (entity_id, data, group_id) üçlüleri
+            source: Verinin kaynağı
+            connection: Çağıranın transaction'ındaki bağlantı (None ise havuz);
+                verilirse anlık görüntüler o transaction ile birlikte commit/rollback olur
+
+        Returns:
+            List[int]: İçeriği değişen veya yeni eklenen varlık ID'leri
+        """
+        rows = [(int(entity_id), data, group_id) for entity_id, data, group_id in items]
+        if not rows:
+            return []
+        await self.ensure_schema()
+        executor = connection or await self._get_pool()
+
+        changed: List[int] = []
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            records = await executor.fetch(
+                RECORD_BATCH_QUERY,
+                entity_type,
+                [row[0] for row in chunk],
+                [int(row[2]) if row[2] is not None else None for row in chunk],
+                [snapshot_hash(row[1]) for row in chunk],
+                [json.dumps(row[1], ensure_ascii=False, default=str) for row in chunk],
+                source,
+                float(self.touch_interval)
+            )
+            changed.extend(record["entity_id"] for record in records)
+            self.stats["statements"] += 1
+
+        self.stats["recorded"] += len(rows)
+        self.stats["changed"] += len(changed)
+        return changed
+
+    async def record(self, entity_type: str, entity_id: int, data: Dict[str, Any],
+                     group_id: Optional[int] = None, source: str = "discover") -> bool:
+        """
+        Tek bir varlığın verisini yazar.
+
+        Returns:
+            bool: İçerik değiştiyse veya varlık yeniyse True
+        """
+        return bool(await self.record_many(entity_type, [(entity_id, data, group_id)], source))
+
+    # ------------------------------------------------------------------ #
+    # Okuma
+    # ------------------------------------------------------------------ #
+
+    async def latest(self, entity_type: str, entity_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Varlığın son durumunu döndürür.
+
+        Returns:
+            Optional[Dict[str, Any]]: Son veri veya kayıt yoksa None
+        """
+        pool = await self._get_pool()
+        data = await pool.fetchval(
+            "SELECT data FROM mining_snapshot_latest WHERE entity_type = $1 AND entity_id = $2",
+            entity_type, int(entity_id)
+        )
+        if data is None:
+            return None
+        return json.loads(data) if isinstance(data, str) else data
+
+    async def history(self, entity_type: str, entity_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Varlığın değişiklik geçmişini yeniden eskiye döndürür.
+
+        Returns:
+            List[Dict[str, Any]]: changed_at ve diff alanlı kayıtlar
+        """
+        pool = await self._get_pool()
+        rows = await pool.fetch(
+            f"""
+            SELECT changed_at, content_hash, diff FROM {HISTORY_TABLE}
+            WHERE entity_type = $1 AND entity_id = $2
+            ORDER BY changed_at DESC
+            LIMIT $3
+            """,
+            entity_type, int(entity_id), limit
+        )
+        return [
+            {
+                "changed_at": row["changed_at"],
+                "content_hash": row["content_hash"],
+                "diff": json.loads(row["diff"]) if isinstance(row["diff"], str) else row["diff"]
+            }
+            for row in rows
+        ]
+
+    # ------------------------------------------------------------------ #
+    # Bakım
+    # ------------------------------------------------------------------ #
+
+    async def prune(self, today: Optional[date] = None) -> List[str]:
+        """
+        Saklama süresini aşan aylık geçmiş bölümlerini düşürür.
+
+        Args:
+            today: Referans gün (None ise bugün)
+
+        Returns:
+            List[str]: Düşürülen bölüm adları
+        """
+        await self.ensure_schema()
+        pool = await self._get_pool()
+        cutoff = month_start(today or date.today(), -self.retention_months)
+
+        dropped = []
+        for row in await pool.fetch(LIST_PARTITIONS_QUERY, HISTORY_TABLE):
+            month = partition_month(row["name"])
+            if month is None or month >= cutoff:
+                continue
+            await pool.execute(f"DROP TABLE IF EXISTS {row['name']}")
+            self._partitions.discard(month)
+            dropped.append(row["name"])
+
+        if dropped:
+            self.stats["partitions_dropped"] += len(dropped)
+            logger.info(f"Madencilik geçmişi bölümleri düşürüldü: {', '.join(sorted(dropped))}")
+        return dropped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Depo istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "retention_months": self.retention_months,
+            "partitions": sorted(month.isoformat() for month in self._partitions)
+        }
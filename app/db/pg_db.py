@@ -3,6 +3,8 @@ from psycopg2.extras import RealDictCursor
 import logging
 from datetime import datetime, timedelta
 
+from app.utils.ttl_cache import invalidate_user
+
 logger = logging.getLogger(__name__)
 
 class PgDatabase:
@@ -348,6 +350,8 @@ class PgDatabase:
             self.conn.rollback()
             logger.error(f"Kullanıcı davet işaretleme hatası: {str(e)}")
             return False
+        finally:
+            invalidate_user(user_id)
 
     async def add_user_if_not_exists(self, user_id, username=None, first_name=None, last_name=None, source_group=None, is_bot=False):
         """Kullanıcıyı veritabanına ekler (yoksa)"""
@@ -384,6 +388,8 @@ class PgDatabase:
             self.conn.rollback()
             logger.error(f"Kullanıcı ekleme hatası: {str(e)}")
             return False
+        finally:
+            invalidate_user(user_id)
 
     async def get_user(self, user_id):
         """
@@ -0,0 +1,225 @@
+"""
+# ============================================================================ #
+# Dosya: schema_catalog.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/schema_catalog.py
+# İşlev: Süreç genelinde paylaşılan, bellek içi veritabanı şema kataloğu.
+#
+# Servisler "tablo/sütun var mı" sorusunu her çağrıda information_schema'ya
+# sormak yerine başlangıçta tek sorguyla yüklenen bu katalogdan yanıtlar.
+# Şemaya bağlı SQL ifadeleri statement() ile bir kez oluşturulup saklanır;
+# migrasyonlardan sonra refresh()/invalidate() çağrılınca katalog ve
+# saklanan ifadeler birlikte yenilenir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+CATALOG_QUERY = """
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'public'
+    ORDER BY table_name, ordinal_position
+"""
+
+
+class SchemaCatalog:
+    """
+    Tablo ve sütun bilgilerini bellekte tutan şema kataloğu.
+
+    Katalog yüklenmemişken sorgular False/boş döner; senkron oturum kullanan
+    servisler ensure_loaded(session), asenkron olanlar ensure_loaded_async()
+    ile ilk kullanımda yüklemeyi garanti eder. Yükleme başına tek bir
+    information_schema sorgusu çalışır.
+    """
+
+    def __init__(self):
+        self._tables: Dict[str, Dict[str, str]] = {}
+        self._statements: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.version = 0
+        self.loaded_at: Optional[datetime] = None
+
+        self.stats = {
+            "loads": 0,
+            "statement_hits": 0,
+            "statement_builds": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Yükleme
+    # ------------------------------------------------------------------ #
+
+    @property
+    def loaded(self) -> bool:
+        """Katalog yüklendiyse True"""
+        return self._loaded
+
+    def _apply(self, rows: Iterable[Any]) -> None:
+        """Sorgu satırlarından katalog sözlüğünü kurar ve ifadeleri sıfırlar"""
+        tables: Dict[str, Dict[str, str]] = {}
+        for row in rows:
+            table_name, column_name, data_type = row[0], row[1], row[2]
+            tables.setdefault(table_name, {})[column_name] = data_type
+        with self._lock:
+            self._tables = tables
+            self._statements = {}
+            self._loaded = True
+            self.version += 1
+            self.loaded_at = datetime.now()
+            self.stats["loads"] += 1
+        logger.info(f"Şema kataloğu yüklendi: {len(tables)} tablo (sürüm {self.version})")
+
+    def load_sync(self, session) -> None:
+        """
+        Kataloğu senkron SQLAlchemy oturumu/bağlantısı ile yükler.
+
+        Args:
+            session: SQLAlchemy Session veya Connection
+        """
+        result = session.execute(text(CATALOG_QUERY))
+        self._apply(result.fetchall())
+
+    async def load(self, pool=None) -> None:
+        """
+        Kataloğu asenkron bağlantı havuzu ile yükler.
+
+        Args:
+            pool: AsyncDbConnectionPool (None ise get_db_pool() kullanılır)
+        """
+        if pool is None:
+            from app.db.async_connection_pool import get_db_pool
+            pool = await get_db_pool()
+        rows = await pool.fetch(CATALOG_QUERY)
+        self._apply(rows)
+
+    def ensure_loaded(self, session) -> bool:
+        """
+        Katalog yüklenmemişse senkron oturumla yükler.
+
+        Returns:
+            bool: Katalog kullanılabilir durumdaysa True
+        """
+        if self._loaded:
+            return True
+        try:
+            self.load_sync(session)
+        except Exception as e:
+            logger.error(f"Şema kataloğu yüklenemedi: {str(e)}")
+            # Başarısız sorgu PostgreSQL işlemini iptal durumunda bırakır;
+            # geri alınmazsa çağıranın oturumdaki sonraki sorguları da başarısız olur
+            try:
+                session.rollback()
+            except Exception as rollback_error:
+                logger.debug(f"Şema kataloğu oturumu geri alınamadı: {str(rollback_error)}")
+        return self._loaded
+
+    async def ensure_loaded_async(self, pool=None) -> bool:
+        """
+        Katalog yüklenmemişse asenkron havuzla yükler.
+
+        Returns:
+            bool: Katalog kullanılabilir durumdaysa True
+        """
+        if self._loaded:
+            return True
+        try:
+            await self.load(pool)
+        except Exception as e:
+            logger.error(f"Şema kataloğu yüklenemedi: {str(e)}")
+        return self._loaded
+
+    def invalidate(self) -> None:
+        """Kataloğu ve saklanan ifadeleri geçersiz kılar; sonraki ensure_loaded yeniden yükler"""
+        with self._lock:
+            self._tables = {}
+            self._statements = {}
+            self._loaded = False
+
+    # ------------------------------------------------------------------ #
+    # Sorgular
+    # ------------------------------------------------------------------ #
+
+    def has_table(self, table: str) -> bool:
+        """Tablo katalogda varsa True"""
+        return table in self._tables
+
+    def has_column(self, table: str, column: str) -> bool:
+        """Tabloda sütun varsa True"""
+        return column in self._tables.get(table, ())
+
+    def columns(self, table: str) -> List[str]:
+        """Tablonun sütunlarını tanım sırasıyla döndürür"""
+        return list(self._tables.get(table, ()))
+
+    def first_column(self, table: str, candidates: Iterable[str]) -> Optional[str]:
+        """
+        Adaylardan tabloda bulunan ilk sütunu döndürür.
+
+        Args:
+            table: Tablo adı
+            candidates: Öncelik sırasına göre sütun adları
+
+        Returns:
+            Optional[str]: Bulunan sütun veya None
+        """
+        columns = self._tables.get(table, ())
+        for candidate in candidates:
+            if candidate in columns:
+                return candidate
+        return None
+
+    def statement(self, key: Hashable, builder: Callable[["SchemaCatalog"], Any]) -> Any:
+        """
+        Şemaya göre oluşturulan SQL ifadesini bir kez kurar ve saklar.
+
+        Katalog yenilendiğinde saklanan ifadeler silinir, böylece migrasyon
+        sonrası ifade yeni şemaya göre yeniden kurulur.
+
+        Args:
+            key: İfade anahtarı
+            builder: Kataloğu alıp ifadeyi (ör. text(...)) döndüren fonksiyon
+
+        Returns:
+            Any: Oluşturulan ifade
+        """
+        statement = self._statements.get(key)
+        if statement is not None:
+            self.stats["statement_hits"] += 1
+            return statement
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is None:
+                statement = builder(self)
+                self._statements[key] = statement
+                self.stats["statement_builds"] += 1
+        return statement
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Katalog istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "loaded": self._loaded,
+            "version": self.version,
+            "tables": len(self._tables),
+            "statements": len(self._statements),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None
+        }
+
+
+# Süreç genelinde paylaşılan katalog
+schema_catalog = SchemaCatalog()
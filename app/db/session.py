@@ -234,4 +234,9 @@ def init_db() -> None:
             )
             
             session.add(admin)
-            session.commit()
\ No newline at end of file
+            session.commit()
+        
+        # Şema kataloğunu tablolar oluşturulduktan sonra bir kez yükle
+        from app.db.schema_catalog import schema_catalog
+        schema_catalog.invalidate()
+        schema_catalog.ensure_loaded(session)
\ No newline at end of file
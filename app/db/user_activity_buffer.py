@@ -0,0 +1,297 @@
+"""
+# ============================================================================ #
+# Dosya: user_activity_buffer.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/db/user_activity_buffer.py
+# İşlev: Grup mesajlarından gelen kullanıcı görülmelerini toplayan write-behind tamponu.
+#
+# Her grup mesajı için ayrı ayrı INSERT/UPDATE yapmak yerine görülmeler
+# user_id bazında birleştirilir ve belirli aralıklarla (veya satır sınırına
+# ulaşıldığında) tek bir `INSERT ... ON CONFLICT` toplu yazımı ile
+# AsyncDbConnectionPool.execute_many üzerinden veritabanına aktarılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.core.metrics import track_write_behind_flush
+
+logger = logging.getLogger(__name__)
+
+UPSERT_USERS_QUERY = """
+    INSERT INTO users
+    (user_id, username, first_name, last_name, source_group, join_date, is_bot, created_at, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6, FALSE, $6, $7)
+    ON CONFLICT (user_id) DO UPDATE
+    SET username = COALESCE(EXCLUDED.username, users.username),
+        first_name = COALESCE(EXCLUDED.first_name, users.first_name),
+        last_name = COALESCE(EXCLUDED.last_name, users.last_name),
+        source_group = COALESCE(users.source_group, EXCLUDED.source_group),
+        updated_at = GREATEST(users.updated_at, EXCLUDED.updated_at)
+"""
+
+
+@dataclass
+class UserSighting:
+    """Tek bir kullanıcının tampondaki birleştirilmiş görülme kaydı"""
+    user_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    source_group: Optional[str]
+    first_seen: datetime
+    last_seen: datetime
+    enqueued_at: float
+    count: int = 1
+
+    def as_row(self) -> tuple:
+        """UPSERT_USERS_QUERY parametre sırasına göre satır döndürür"""
+        return (
+            self.user_id, self.username, self.first_name, self.last_name,
+            self.source_group, self.first_seen, self.last_seen
+        )
+
+
+class UserActivityBuffer:
+    """
+    Kullanıcı görülmeleri için write-behind tamponu.
+
+    record() çağrıları bellekte user_id anahtarıyla birleştirilir; arka plan
+    görevi her `flush_interval_ms` milisaniyede veya tampon `max_batch_rows`
+    satıra ulaştığında tüm kayıtları tek toplu yazımla boşaltır.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        flush_interval_ms: int = 500,
+        max_batch_rows: int = 500,
+        name: str = "user_activity"
+    ):
+        """
+        Tamponu yapılandırır.
+
+        Args:
+            pool: Paylaşılan asyncpg bağlantı havuzu (None ise start() içinde alınır)
+            flush_interval_ms: İki boşaltma arasındaki maksimum süre (milisaniye)
+            max_batch_rows: Erken boşaltmayı tetikleyen satır sayısı
+            name: Metriklerde kullanılacak tampon adı
+        """
+        self.pool = pool
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.max_batch_rows = max(max_batch_rows, 1)
+        self.name = name
+
+        self._pending: Dict[int, UserSighting] = {}
+        self._flush_needed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        self.stats = {
+            "recorded": 0,
+            "merged": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "last_flush_lag": 0.0,
+            "max_flush_lag": 0.0,
+            "last_flush": None
+        }
+
+    async def start(self) -> bool:
+        """
+        Havuzu hazırlar ve arka plan boşaltma görevini başlatır.
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        if self.is_running:
+            return True
+        try:
+            if self.pool is None:
+                self.pool = await get_db_pool()
+            self.is_running = True
+            self._task = asyncio.create_task(self._flush_loop())
+            logger.info(
+                f"Write-behind tamponu başlatıldı ({self.name}): "
+                f"{int(self.flush_interval * 1000)}ms / {self.max_batch_rows} satır"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Write-behind tamponu başlatılamadı: {str(e)}")
+            self.is_running = False
+            return False
+
+    async def stop(self) -> None:
+        """
+        Arka plan görevini durdurur ve bekleyen kayıtları yazar.
+
+        Görev iptal edilmez; döngü uyandırılır ve süren boşaltmayı
+        bitirip kendiliğinden çıkar.
+        """
+        self.is_running = False
+        self._flush_needed.set()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(
+        self,
+        user_id: int,
+        username: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        source_group: Optional[str] = None
+    ) -> None:
+        """
+        Bir kullanıcı görülmesini tampona ekler (veritabanına dokunmaz).
+
+        Args:
+            user_id: Kullanıcı ID
+            username: Kullanıcı adı
+            first_name: İlk adı
+            last_name: Soyadı
+            source_group: Kullanıcının görüldüğü grup
+        """
+        now = datetime.now()
+        self.stats["recorded"] += 1
+
+        sighting = self._pending.get(user_id)
+        if sighting is None:
+            self._pending[user_id] = UserSighting(
+                user_id=user_id,
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                source_group=source_group,
+                first_seen=now,
+                last_seen=now,
+                enqueued_at=time.monotonic()
+            )
+            if len(self._pending) >= self.max_batch_rows:
+                self._flush_needed.set()
+            return
+
+        # Aynı kullanıcının tekrar görülmesi: en güncel bilgilerle birleştir
+        self.stats["merged"] += 1
+        sighting.username = username or sighting.username
+        sighting.first_name = first_name or sighting.first_name
+        sighting.last_name = last_name or sighting.last_name
+        sighting.source_group = sighting.source_group or source_group
+        sighting.last_seen = now
+        sighting.count += 1
+
+    def is_pending(self, user_id: int) -> bool:
+        """Kullanıcının henüz yazılmamış bir kaydı varsa True döndürür"""
+        return user_id in self._pending
+
+    @property
+    def pending_count(self) -> int:
+        """Tamponda bekleyen satır sayısı"""
+        return len(self._pending)
+
+    def _restore(self, batch: Dict[int, UserSighting]) -> None:
+        """
+        Yazılamayan kayıtları geri koyar.
+
+        Boşaltma sürerken aynı kullanıcı için yeni kayıt oluştuysa ikisi
+        birleştirilir: sayaçlar toplanır, ilk/son görülme zamanlarının
+        en eskisi/en yenisi alınır, ad alanlarında yeni kaydın dolu
+        değerleri, kaynak grupta ise record() gibi ilk değer korunur.
+        """
+        for user_id, old in batch.items():
+            sighting = self._pending.get(user_id)
+            if sighting is None:
+                self._pending[user_id] = old
+                continue
+            sighting.username = sighting.username or old.username
+            sighting.first_name = sighting.first_name or old.first_name
+            sighting.last_name = sighting.last_name or old.last_name
+            sighting.source_group = old.source_group or sighting.source_group
+            sighting.first_seen = min(sighting.first_seen, old.first_seen)
+            sighting.last_seen = max(sighting.last_seen, old.last_seen)
+            sighting.enqueued_at = min(sighting.enqueued_at, old.enqueued_at)
+            sighting.count += old.count
+
+    async def flush(self) -> int:
+        """
+        Bekleyen tüm kayıtları tek toplu yazımla veritabanına aktarır.
+
+        Returns:
+            int: Yazılan satır sayısı
+        """
+        async with self._flush_lock:
+            if not self._pending or self.pool is None:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+            oldest = min(s.enqueued_at for s in batch.values())
+
+            try:
+                await self.pool.execute_many(
+                    UPSERT_USERS_QUERY,
+                    [s.as_row() for s in batch.values()]
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Write-behind boşaltma hatası ({len(batch)} satır): {str(e)}")
+                # Kayıtları kaybetme: yeni gelenlerle birleştirerek geri koy
+                self._restore(batch)
+                return 0
+            except BaseException:
+                # İptal edilirse kayıtlar bir sonraki boşaltmaya kalır
+                self._restore(batch)
+                raise
+
+            lag = time.monotonic() - oldest
+            batch_size = len(batch)
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += batch_size
+            self.stats["last_batch_size"] = batch_size
+            self.stats["last_flush_lag"] = lag
+            self.stats["max_flush_lag"] = max(self.stats["max_flush_lag"], lag)
+            self.stats["last_flush"] = datetime.now()
+            track_write_behind_flush(self.name, batch_size, lag, len(self._pending))
+
+            logger.debug(f"Write-behind: {batch_size} satır yazıldı (gecikme {lag:.3f}s)")
+            return batch_size
+
+    async def _flush_loop(self) -> None:
+        """Zaman veya satır sınırına göre periyodik boşaltma döngüsü"""
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind döngü hatası: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Tampon istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        stats = dict(self.stats)
+        stats["pending"] = len(self._pending)
+        if stats["last_flush"]:
+            stats["last_flush"] = stats["last_flush"].strftime("%Y-%m-%d %H:%M:%S")
+        return stats
@@ -20,6 +20,7 @@ import sqlite3
 import aiosqlite
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
+from app.db.schema_catalog import schema_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -917,6 +918,9 @@ class UserDatabase:
             insert_version = "INSERT INTO migrations (version) VALUES (%s)"
             await self.execute(insert_version, ("2.1",))
             
+            # Şema değişti: katalog bir sonraki kullanımda yeniden yüklensin
+            schema_catalog.invalidate()
+            
             logger.info(f"Veritabanı migrasyonları tamamlandı")
             return True
             
@@ -62,8 +62,12 @@ from app.services.group_service import GroupService
 from app.services.user_service import UserService
 from app.utils.db_setup import Database
 from app.utils.progress import ProgressManager
+from app.utils.send_pipeline import SendPipeline
+from app.utils.flood_limiter import flood_limiter
+from app.db.member_ingest import MemberIngestor, iter_member_rows
+from app.core.scheduler import wakeups
+from app.utils.template_registry import template_registry
 
-import json
 import os
 import traceback
 
@@ -125,35 +129,16 @@ class GroupHandler:
         # Servisleri oluşturalım - stop_event parametresi ile
         self.group_service = GroupService(self.client, self.config, self.db, self.stop_event)
         self.user_service = UserService(self.client, self.config, self.db, self.stop_event)
+        # Toplanan üyeler yalnızca users tablosuna yazılır; groups satırı olmayabilir ve
+        # group_members yabancı anahtar hatası users aktarımını da geri alırdı
+        self.member_ingestor = MemberIngestor(targets=("users",))
         
-        # Mesaj şablonlarını yükle - varsa yükle yoksa boş oluştur
-        self.messages = []
-        self.responses = {}
-        self.invites = {}
-        
-        try:
-            if os.path.exists('data/messages.json'):
-                with open('data/messages.json', 'r', encoding='utf-8') as f:
-                    self.messages = json.load(f)
-                logger.info(f"Mesaj şablonları yüklendi: {len(self.messages)} şablon")
-        except Exception as e:
-            logger.warning(f"Mesaj şablonları yüklenemedi: {str(e)}")
-            
-        try:
-            if os.path.exists('data/responses.json'):
-                with open('data/responses.json', 'r', encoding='utf-8') as f:
-                    self.responses = json.load(f)
-                logger.info(f"Yanıt şablonları yüklendi: {len(self.responses)} şablon")
-        except Exception as e:
-            logger.warning(f"Yanıt şablonları yüklenemedi: {str(e)}")
-            
-        try:
-            if os.path.exists('data/invites.json'):
-                with open('data/invites.json', 'r', encoding='utf-8') as f:
-                    self.invites = json.load(f)
-                logger.info(f"Davet şablonları yüklendi: {len(self.invites)} şablon")
-        except Exception as e:
-            logger.warning(f"Davet şablonları yüklenemedi: {str(e)}")
+        # Mesaj şablonları paylaşılan kayıttan okunur (bkz. messages/responses/invites)
+        templates = template_registry.snapshot
+        logger.info(
+            f"Şablonlar hazır: {len(templates.source('messages'))} mesaj, "
+            f"{len(templates.source('responses'))} yanıt, {len(templates.source('invites'))} davet kategorisi"
+        )
         
         # Grup ve mesaj veri yapıları    
         self.active_groups: Dict[int, Dict] = {}
@@ -174,6 +159,7 @@ class GroupHandler:
         self.processed_groups: Set[int] = set()
         self.last_message_time = datetime.now()
         self.last_sent_time: Dict[int, datetime] = {}
+        self.stats = {"flood_waits": 0}
         
         # Rich konsol ve log yapılandırması
         self.logger = logging.getLogger(__name__)
@@ -194,6 +180,7 @@ class GroupHandler:
         self.min_message_interval = 60
         self.max_retries = 5
         self.prioritize_active = True
+        self.send_workers = None
         
         # Config'den ayarları yükle (varsa)
         if hasattr(config, 'group_messaging'):
@@ -203,9 +190,37 @@ class GroupHandler:
             self.min_message_interval = msg_config.get('min_message_interval', 60)
             self.max_retries = msg_config.get('max_retries', 5)
             self.prioritize_active = msg_config.get('prioritize_active_groups', True)
+            self.send_workers = msg_config.get('send_workers')
+        
+        # Gönderim hattı: hesap genelinde batch_size/batch_interval hız sınırı,
+        # grup başına min_message_interval aralığı ve işçi havuzu
+        self.send_pipeline = SendPipeline.from_config(
+            send_func=self._send_message_to_group,
+            batch_size=self.batch_size,
+            batch_interval=self.batch_interval,
+            min_message_interval=self.min_message_interval,
+            workers=self.send_workers,
+            stop_event=self.stop_event,
+            name="group_messages"
+        )
             
         logger.info("GroupHandler başlatıldı")
     
+    @property
+    def messages(self) -> Any:
+        """Güncel şablon görüntüsündeki mesaj şablonları"""
+        return template_registry.source('messages')
+    
+    @property
+    def responses(self) -> Any:
+        """Güncel şablon görüntüsündeki yanıt şablonları"""
+        return template_registry.source('responses')
+    
+    @property
+    def invites(self) -> Any:
+        """Güncel şablon görüntüsündeki davet şablonları"""
+        return template_registry.source('invites')
+    
     async def initialize(self) -> None:
         """
         Grup işleyicisini başlatır ve hedef grupları veritabanından yükler.
@@ -437,29 +452,25 @@ class GroupHandler:
                     # Başlangıç değerlerini sıfırla
                     self.sent_count = 0
                     
+                    def on_result(group: Any, result: Optional[bool]) -> None:
+                        # İlerlemeyi güncelle
+                        if result:
+                            message = f"Mesaj gönderildi: {group.title}"
+                        elif result is None:
+                            message = f"Bekleme süresi dolmadı: {group.title}"
+                        else:
+                            message = f"Hata: {group.title}"
+                        progress_mgr.update_progress(progress, task_id, advance=1, message=message)
+                    
                     with progress:
-                        for group in groups:
-                            # Mesaj gönderme
-                            result = await self._send_message_to_group(group)
-                            
-                            # İlerlemeyi güncelle
-                            if result:
-                                progress_mgr.update_progress(
-                                    progress, task_id, advance=1,
-                                    message=f"Mesaj gönderildi: {group.title}"
-                                )
-                            else:
-                                progress_mgr.update_progress(
-                                    progress, task_id, advance=1,
-                                    message=f"Hata: {group.title}"
-                                )
-                                
-                            # Gruplar arası bekleme
-                            if not self.stop_event.is_set():
-                                await asyncio.sleep(5)
+                        # Gruplar işçi havuzunca hız sınırları içinde paralel işlenir
+                        summary = await self.send_pipeline.run_round(groups, on_result=on_result)
                     
                     # Özet göster
-                    self.console.print(f"[green]✉️ Bu turda: {self.sent_count} mesaj | 📈 Toplam: {self.total_sent}[/green]")
+                    self.console.print(
+                        f"[green]✉️ Bu turda: {self.sent_count} mesaj | "
+                        f"⏭️ Atlanan: {summary['skipped']} | 📈 Toplam: {self.total_sent}[/green]"
+                    )
                     
                     # Bir sonraki tura kadar bekle
                     wait_time = 300  # 5 dakika
@@ -534,8 +545,10 @@ class GroupHandler:
             # Daha az log üret - debug level'a çek
             self.logger.debug(f"📨 '{group.title}' grubuna mesaj gönderiliyor...")
             
-            # Telethon client ayarlarında optimizasyon
-            await self.client.send_message(
+            # Telethon client ayarlarında optimizasyon - paylaşılan hız sınırlayıcı üzerinden
+            await flood_limiter.run(
+                "group_message",
+                self.client.send_message,
                 group.id,
                 message,
                 schedule=None,
@@ -911,7 +924,10 @@ class GroupHandler:
 
     async def _handle_flood_wait(self, group: Any, wait_time: int) -> None:
         """
-        Flood wait hatalarını ayrı bir görevde işler.
+        Flood wait hatalarını işler.
+        
+        FloodWait hesap genelinde geçerli olduğundan işçiyi uyutmak yerine
+        gönderim hattının tamamı bekleme süresi boyunca duraklatılır.
         
         Args:
             group: Telethon grup nesnesi
@@ -921,8 +937,8 @@ class GroupHandler:
             None
         """
         try:
-            await asyncio.sleep(wait_time)
-            logger.info(f"⏱️ {group.title} için bekleme tamamlandı")
+            self.send_pipeline.pause(wait_time)
+            logger.info(f"⏱️ {group.title} nedeniyle gönderimler {wait_time} saniye bekletiliyor")
         except Exception as e:
             logger.error(f"Flood wait işleme hatası: {e}")
     
@@ -956,11 +972,14 @@ class GroupHandler:
             None
         """
         try:
-            # Küçük parçalar halinde bekleyerek sık sık kontrol et
-            for _ in range(min(duration, 300)):  # En fazla 5 dakika
-                if self.stop_event.is_set() or self.shutdown_event.is_set():
-                    break
-                await asyncio.sleep(1)
+            # Saniyelik yoklama yerine süre sonunda veya durdurma sinyalinde uyan
+            if self.shutdown_event.is_set():
+                return
+            await wakeups.wait(
+                "group_handler",
+                timeout=min(duration, 300),  # En fazla 5 dakika
+                stop_event=self.stop_event
+            )
         except asyncio.CancelledError:
             logger.debug("Uyku iptal edildi")
             
@@ -1054,32 +1073,11 @@ class GroupHandler:
                         # Üyeleri alma işlemi için ayrı bir ilerleme çubuğu
                         member_progress, member_task = progress_mgr.create_progress_bar(
                             total=100,  # Başlangıçta toplam bilinmiyor
-                            description=f"Üyeler alınıyor: {group_name}"
+                            description=f"Üyeler aktarılıyor: {group_name}"
                         )
                         
                         try:
                             with member_progress:
-                                # Grup üyelerini al
-                                all_members = []
-                                # Sayfa sayfa üyeleri al
-                                offset = 0
-                                limit = 100
-                                while True:
-                                    members_page = await self.client.get_participants(
-                                        group, offset=offset, limit=limit
-                                    )
-                                    if not members_page:
-                                        break
-                                    all_members.extend(members_page)
-                                    offset += len(members_page)
-                                    
-                                    # İlerleme çubuğunu güncelle
-                                    member_progress.update(member_task, completed=offset, total=max(offset+1, 100))
-                                    
-                                    # Her 100 üyede bir biraz bekle
-                                    if offset % 100 == 0:
-                                        await asyncio.sleep(1)
-                                
                                 # Adminleri ve kurucuyu bul
                                 admins_list = []
                                 try:
@@ -1089,77 +1087,21 @@ class GroupHandler:
                                 except Exception as e:
                                     logger.warning(f"Admin listesi alınamadı: {group.title} - {str(e)}")
                                 
-                                # Filtrelenmiş üye listesi (adminler, kurucular ve botlar hariç)
-                                filtered_members = [member for member in all_members 
-                                                   if not member.bot and not member.deleted and member.id not in admins_list]
+                                async def report_chunk(chunk, connection):
+                                    member_progress.update(member_task, advance=len(chunk))
                                 
-                                progress_mgr.console.print(f"[green]► '{group.title}' grubundan {len(filtered_members)} üye bulundu (toplam {len(all_members)}, {len(admins_list)} admin)[/green]")
-                                
-                                # Üyeleri veritabanına ekle - toplu işlem
-                                batch_size = 50
-                                
-                                batch_progress, batch_task = progress_mgr.create_progress_bar(
-                                    total=len(filtered_members), 
-                                    description=f"Veritabanına ekleniyor"
+                                # Üyeler sayfa sayfa akar, parçalar halinde COPY ile aktarılır
+                                # (adminler, kurucular, botlar ve silinmiş hesaplar hariç)
+                                rows = iter_member_rows(
+                                    self.client, group, admin_ids=set(admins_list),
+                                    skip_bots=True, skip_admins=True
+                                )
+                                result = await self.member_ingestor.ingest(
+                                    group.id, rows, source_group=str(group.title), chunk_sink=report_chunk
                                 )
+                                total_members += result["staged"]
                                 
-                                with batch_progress:
-                                    # Toplu işleme var mı kontrol et
-                                    if hasattr(self.user_service, 'add_users_batch'):
-                                        # Kullanıcıları grupla (her 50 kullanıcı bir batch)
-                                        user_batches = []
-                                        current_batch = []
-                                        
-                                        for member in filtered_members:
-                                            user_data = {
-                                                'user_id': member.id,
-                                                'username': member.username,
-                                                'first_name': member.first_name,
-                                                'last_name': member.last_name,
-                                                'source_group': str(group.title)
-                                            }
-                                            current_batch.append(user_data)
-                                            
-                                            if len(current_batch) >= batch_size:
-                                                user_batches.append(current_batch)
-                                                current_batch = []
-                                                
-                                        # Son batch'i ekle
-                                        if current_batch:
-                                            user_batches.append(current_batch)
-                                            
-                                        # Her batch'i işle
-                                        for batch in user_batches:
-                                            success, error = await self.user_service.add_users_batch(batch)
-                                            total_members += success
-                                            
-                                            # İlerleme çubuğunu güncelle  
-                                            batch_progress.update(batch_task, advance=len(batch))
-                                            await asyncio.sleep(0.5)
-                                            
-                                    else:
-                                        # Toplu işleme yoksa tek tek ekle
-                                        batch_members_added = 0
-                                        for i, member in enumerate(filtered_members):
-                                            user_data = {
-                                                'user_id': member.id,
-                                                'username': member.username,
-                                                'first_name': member.first_name,
-                                                'last_name': member.last_name,
-                                                'source_group': str(group.title)
-                                            }
-                                            
-                                            if hasattr(self.db, 'add_or_update_user'):
-                                                self.db.add_or_update_user(user_data)
-                                                total_members += 1
-                                                batch_members_added += 1
-                                            
-                                            # İlerleme çubuğunu güncelle
-                                            batch_progress.update(batch_task, advance=1)
-                                            
-                                            # Her 50 kullanıcıda bir bekle
-                                            if i % batch_size == 0 and i > 0:
-                                                await asyncio.sleep(0.5)
+                                progress_mgr.console.print(f"[green]► '{group.title}' grubundan {result['staged']} üye aktarıldı ({len(admins_list)} admin hariç)[/green]")
                                 
                                 successful_groups += 1
                                 
@@ -1255,7 +1197,8 @@ class GroupHandler:
             "error_types": error_types,
             "last_run": self.last_run.strftime("%H:%M:%S"),
             "last_message_time": self.last_message_time.strftime("%H:%M:%S") if self.last_message_time else "Hiç",
-            "running_since": (datetime.now() - self.last_run).total_seconds() // 60
+            "running_since": (datetime.now() - self.last_run).total_seconds() // 60,
+            "send_pipeline": self.send_pipeline.get_stats()
         }
 
     async def handle_command(self, message: Message):
@@ -48,9 +48,22 @@ from app.handlers.group_handler import GroupHandler
 from app.handlers.message_handler import MessageHandler
 from app.handlers.user_handler import UserHandler
 from app.handlers.invite_handler import InviteHandler
+from app.db.user_activity_buffer import UserActivityBuffer
+from app.utils.ttl_cache import MISSING, user_cache, invalidate_user
+from app.utils.time_wheel import ExpiringIdSet
+from app.utils.single_flight import get_chat, get_sender
 
 logger = logging.getLogger(__name__)
 
+# Sonuçları kullanıcı önbelleğinde tutulan okuma metotları
+CACHED_DB_METHODS = {'is_invited', 'was_recently_invited'}
+
+# Çağrıldığında kullanıcının önbellek kayıtlarını geçersiz kılan yazma metotları
+INVALIDATING_DB_METHODS = {'mark_as_invited', 'mark_user_invited', 'add_user_if_not_exists'}
+
+# Veritabanında bulunamayan kullanıcıların önbellekte kalma süresi (saniye)
+NEGATIVE_CACHE_TTL = 60
+
 class MessageHandlers:
     """
     Telegram mesaj işleyicileri ve yönlendirme merkezi.
@@ -65,8 +78,9 @@ class MessageHandlers:
         message_handler: Genel mesajları işleyen handler
         user_handler: Kullanıcı komutlarını işleyen handler
         invite_handler: Davet işlemlerini yöneten handler
-        displayed_users: Görüntülenen kullanıcıları takip eden set
-        last_user_logs: Son kullanıcı loglarını tutan sözlük
+        displayed_users: Görüntülenen kullanıcı ID'lerini son görüntülenme
+            zamanıyla tutan, 24 saatte kendiliğinden temizlenen zaman çarkı
+        activity_buffer: Kullanıcı görülmelerini toplu yazan write-behind tamponu
         is_running: Servisin çalışma durumunu belirten bayrak
         stop_event: Durdurma sinyali için kullanılan Event nesnesi
         stats: İstatistik verileri tutan sözlük
@@ -86,9 +100,15 @@ class MessageHandlers:
         self.user_handler = UserHandler(bot)
         self.invite_handler = InviteHandler(bot)
         
-        # Kullanıcı aktivite kayıtları
-        self.displayed_users = set()
-        self.last_user_logs = {}
+        # Kullanıcı aktivite kayıtları (user_id -> son görüntülenme, 24 saat)
+        self.displayed_users = ExpiringIdSet(horizon=86400, slot_seconds=60)
+        
+        # Kullanıcı görülmeleri için write-behind tamponu
+        config = getattr(bot, 'config', None)
+        self.activity_buffer = UserActivityBuffer(
+            flush_interval_ms=getattr(config, 'USER_BUFFER_FLUSH_MS', 500),
+            max_batch_rows=getattr(config, 'USER_BUFFER_MAX_ROWS', 500)
+        )
         
         # Servis durumu
         self.is_running = False
@@ -168,6 +188,10 @@ class MessageHandlers:
                     except Exception as handler_error:
                         logger.error(f"{handler_name} start hatası: {str(handler_error)}")
             
+            # Write-behind tamponunu başlat (başarısız olursa doğrudan DB yazımı kullanılır)
+            if not await self.activity_buffer.start():
+                logger.warning("Write-behind tamponu kullanılamıyor, kullanıcılar doğrudan yazılacak")
+            
             # Event handler'ları ayarla
             self.setup_handlers()
             
@@ -200,6 +224,12 @@ class MessageHandlers:
                 except Exception as handler_error:
                     logger.error(f"{handler_name} stop hatası: {str(handler_error)}")
         
+        # Bekleyen kullanıcı görülmelerini yaz
+        try:
+            await self.activity_buffer.stop()
+        except Exception as buffer_error:
+            logger.error(f"Write-behind tamponu durdurma hatası: {str(buffer_error)}")
+        
         logger.info("MessageHandlers durduruldu")
     
     async def run(self) -> None:
@@ -416,7 +446,7 @@ class MessageHandlers:
             event: Telethon mesaj olayı
         """
         try:
-            user = await event.get_sender()
+            user = await get_sender(event)
             if user is None:
                 logger.debug("Özel mesaj için kullanıcı bilgisi alınamadı")
                 return
@@ -550,7 +580,7 @@ class MessageHandlers:
                 logger.debug(f"GetUsersRequest için {wait_time}s bekliyor (throttling)")
                 return
                 
-            user = await event.get_sender()
+            user = await get_sender(event)
             if not user:
                 logger.debug("Kullanıcı bilgisi alınamadı")
                 return
@@ -586,18 +616,21 @@ class MessageHandlers:
             chat_id = event.chat_id
             chat_title = getattr(event.chat, 'title', str(chat_id))
             
-            # Önce veritabanında kullanıcı kaydı var mı kontrol et
-            is_in_db = await self._check_user_in_db(user_id)
+            # Tamponda bekleyen kaydı olan kullanıcı için DB'ye gitme
+            if self.activity_buffer.is_pending(user_id):
+                is_in_db = True
+            else:
+                is_in_db = await self._check_user_in_db(user_id)
                 
             # Bu kullanıcı için son görüntüleme zamanını kontrol et
             current_time = asyncio.get_event_loop().time()
-            last_displayed = self.last_user_logs.get(user_info, 0)
+            last_displayed = self.displayed_users.last_seen(user_id, current_time)
             
             # En az 4 saat (14400 saniye) geçmedikçe aynı kullanıcıyı tekrar gösterme
-            recently_displayed = current_time - last_displayed < 14400
+            recently_displayed = last_displayed is not None and current_time - last_displayed < 14400
                 
             # Kullanıcı daha önce görüntülendi mi?
-            if user_info in self.displayed_users and recently_displayed:
+            if recently_displayed:
                 # Loglama seviyesini düşür - debug modunda veya veritabanında yoksa göster
                 if self.bot.debug_mode and not is_in_db:
                     print(self.bot.terminal_format['user_activity_exists'].format(user_info))
@@ -608,8 +641,7 @@ class MessageHandlers:
             # Kullanıcı önceden veritabanında yoksa veya hiç gösterilmemişse göster
             if not is_in_db or not recently_displayed:
                 # Kullanıcıyı göster ve listeye ekle
-                self.displayed_users.add(user_info)
-                self.last_user_logs[user_info] = current_time
+                self.displayed_users.touch(user_id, current_time)
                 
                 # Veritabanı kontrolü
                 was_invited = await self._run_db_method('is_invited', user_id)
@@ -639,19 +671,15 @@ class MessageHandlers:
                         f"{user_info}{invite_status}"
                     ))
                 
-                # Kullanıcı henüz veritabanında yoksa ekle
-                if not is_in_db:
-                    # Genişletilmiş kullanıcı verisi ile ekle
-                    await self._add_user_to_db(
-                        user_id=user_id,
-                        username=username,
-                        first_name=first_name,
-                        last_name=last_name,
-                        source_group=chat_title
-                    )
-                else:
-                    # Sadece aktivite kaydı güncelle
-                    await self._run_db_method('update_user_activity', user_id)
+                # Kullanıcıyı ekle veya aktivitesini güncelle
+                await self._record_user_activity(
+                    user_id=user_id,
+                    username=username,
+                    first_name=first_name,
+                    last_name=last_name,
+                    source_group=chat_title,
+                    is_in_db=is_in_db
+                )
                 
         except errors.FloodWaitError as e:
             wait_time = e.seconds + random.randint(5, 15)
@@ -695,7 +723,7 @@ class MessageHandlers:
                 return
                 
             # Grup bilgisi
-            chat = await event.get_chat()
+            chat = await get_chat(event)
             chat_title = getattr(chat, 'title', str(event.chat_id))
             
             # Kullanıcıyı veritabanına ekle/güncelle
@@ -767,7 +795,7 @@ class MessageHandlers:
                 return
                 
             # Tıklayan kullanıcı bilgisi
-            sender = await event.get_sender()
+            sender = await get_sender(event)
             user_id = getattr(sender, 'id', None)
             username = getattr(sender, 'username', None)
             
@@ -905,11 +933,17 @@ class MessageHandlers:
         Returns:
             bool: Kullanıcı veritabanında varsa True
         """
+        cached = user_cache.get((user_id, 'exists'))
+        if cached is not MISSING:
+            return cached
+        
         try:
+            exists = False
+            
             # UserService entegrasyonu
             if hasattr(self.bot, 'user_service'):
                 user_info = await self.bot.user_service.get_user_info(user_id)
-                return user_info is not None
+                exists = user_info is not None
             
             # Doğrudan veritabanı bağlantısı
             elif hasattr(self.bot.db, 'connection'):
@@ -918,13 +952,15 @@ class MessageHandlers:
                         "SELECT user_id FROM users WHERE user_id = ?", 
                         (user_id,)
                     )
-                    return cursor.fetchone() is not None
+                    exists = cursor.fetchone() is not None
             
             # Alternatif metodlar
             elif hasattr(self.bot.db, 'check_user_exists'):
-                return self.bot.db.check_user_exists(user_id)
-                
-            return False
+                exists = self.bot.db.check_user_exists(user_id)
+            
+            # Olmayan kullanıcılar kısa süre tutulur, kısa sürede eklenebilirler
+            user_cache.set((user_id, 'exists'), exists, None if exists else NEGATIVE_CACHE_TTL)
+            return exists
             
         except Exception as e:
             logger.error(f"Kullanıcı DB kontrolü hatası: {str(e)}")
@@ -947,37 +983,115 @@ class MessageHandlers:
             bool: İşlem başarılı ise True
         """
         try:
-            # UserService entegrasyonu
-            if hasattr(self.bot, 'user_service'):
-                return await self.bot.user_service.add_user(
-                    user_id=user_id,
-                    username=username,
-                    first_name=first_name,
-                    last_name=last_name,
-                    source_group=source_group
-                )
+            result = False
+            try:
+                # UserService entegrasyonu
+                if hasattr(self.bot, 'user_service'):
+                    result = await self.bot.user_service.add_user(
+                        user_id=user_id,
+                        username=username,
+                        first_name=first_name,
+                        last_name=last_name,
+                        source_group=source_group
+                    )
             
-            # Doğrudan veritabanı methodları
-            elif hasattr(self.bot.db, 'add_user'):
-                if asyncio.iscoroutinefunction(self.bot.db.add_user):
-                    return await self.bot.db.add_user(user_id, username, first_name, last_name, source_group)
-                else:
-                    return self.bot.db.add_user(user_id, username, first_name, last_name, source_group)
+                # Doğrudan veritabanı methodları
+                elif hasattr(self.bot.db, 'add_user'):
+                    if asyncio.iscoroutinefunction(self.bot.db.add_user):
+                        result = await self.bot.db.add_user(user_id, username, first_name, last_name, source_group)
+                    else:
+                        result = self.bot.db.add_user(user_id, username, first_name, last_name, source_group)
                     
-            # Basit durum - sadece temel bilgileri ekle
-            elif hasattr(self.bot.db, 'add_user_basic'):
-                return self.bot.db.add_user_basic(user_id, username)
-                
-            return False
+                # Basit durum - sadece temel bilgileri ekle
+                elif hasattr(self.bot.db, 'add_user_basic'):
+                    result = self.bot.db.add_user_basic(user_id, username)
+            finally:
+                # Yazma bittikten sonra silinir; arada önbelleğe giren eski değer kalmaz
+                invalidate_user(user_id)
+            
+            if result:
+                user_cache.set((user_id, 'exists'), True)
+            return result
             
         except Exception as e:
             logger.error(f"Kullanıcı DB ekleme hatası: {str(e)}")
             return False
     
+    async def _record_user_activity(self, user_id: int, username: Optional[str] = None,
+                                    first_name: Optional[str] = None, last_name: Optional[str] = None,
+                                    source_group: Optional[str] = None, is_in_db: bool = False) -> None:
+        """
+        Kullanıcı görülmesini kaydeder.
+        
+        Write-behind tamponu çalışıyorsa kayıt tampona eklenir ve toplu olarak
+        yazılır; aksi halde kullanıcı doğrudan veritabanına eklenir/güncellenir.
+        
+        Args:
+            user_id: Kullanıcı ID
+            username: Kullanıcı adı (opsiyonel)
+            first_name: İlk adı (opsiyonel)
+            last_name: Soyadı (opsiyonel)
+            source_group: Kullanıcının görüldüğü grup (opsiyonel)
+            is_in_db: Kullanıcı veritabanında zaten varsa True
+        """
+        if self.activity_buffer.is_running:
+            self.activity_buffer.record(user_id, username, first_name, last_name, source_group)
+            user_cache.set((user_id, 'exists'), True)
+            return
+        
+        if not is_in_db:
+            # Genişletilmiş kullanıcı verisi ile ekle
+            await self._add_user_to_db(
+                user_id=user_id,
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                source_group=source_group
+            )
+        else:
+            # Sadece aktivite kaydı güncelle
+            await self._run_db_method('update_user_activity', user_id)
+    
     async def _run_db_method(self, method_name: str, *args, **kwargs) -> Any:
         """
         Veritabanı methodunu asenkron olarak çalıştırır.
         
+        CACHED_DB_METHODS içindeki okuma metotlarının sonuçları kullanıcı
+        önbelleğinden döner; INVALIDATING_DB_METHODS içindeki yazma metotları
+        kullanıcının önbellek kayıtlarını siler. İlk argüman user_id'dir.
+        
+        Args:
+            method_name: Çağrılacak method adı
+            *args: Pozisyonel argumentler
+            **kwargs: Keyword argumentler
+            
+        Returns:
+            Any: Method sonucu
+        """
+        cache_key = None
+        if args and method_name in CACHED_DB_METHODS:
+            # hours=4 ile hours=24 gibi farklı argümanlar ayrı kayıtlarda tutulur
+            cache_key = (args[0], method_name) + tuple(args[1:]) + tuple(sorted(kwargs.items()))
+            cached = user_cache.get(cache_key)
+            if cached is not MISSING:
+                return cached
+        elif args and method_name in INVALIDATING_DB_METHODS:
+            # Önbellek yazma bittikten sonra silinir; yazma sürerken başlayan
+            # bir okumanın önbelleğe koyduğu eski değer de böylece temizlenir
+            try:
+                return await self._call_db_method(method_name, *args, **kwargs)
+            finally:
+                invalidate_user(args[0])
+        
+        result = await self._call_db_method(method_name, *args, **kwargs)
+        if cache_key is not None and result is not None:
+            user_cache.set(cache_key, result)
+        return result
+    
+    async def _call_db_method(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        Veritabanı methodunu önbelleğe bakmadan çalıştırır.
+        
         Args:
             method_name: Çağrılacak method adı
             *args: Pozisyonel argumentler
@@ -1012,25 +1126,14 @@ class MessageHandlers:
     async def _cleanup_displayed_users(self) -> None:
         """
         Görüntülenen kullanıcı önbelleğini temizler.
+        
+        Zaman çarkı yalnızca süresi dolan dilimleri taradığı için tüm
+        kayıtların üzerinden geçilmez.
         """
         try:
             # 24 saatten daha eski kayıtları temizle
-            current_time = asyncio.get_event_loop().time()
-            expired_users = []
-            
-            # 24 saat öncesinden daha eski kayıtları temizle
-            for user_info, timestamp in list(self.last_user_logs.items()):
-                if current_time - timestamp > 86400:  # 24 saat
-                    expired_users.append(user_info)
-            
-            # Temizleme işlemi
-            for user_info in expired_users:
-                if user_info in self.last_user_logs:
-                    del self.last_user_logs[user_info]
-                if user_info in self.displayed_users:
-                    self.displayed_users.remove(user_info)
-            
-            logger.debug(f"Kullanıcı önbelleği temizlendi: {len(expired_users)} kayıt silindi")
+            expired_count = self.displayed_users.expire(asyncio.get_event_loop().time())
+            logger.debug(f"Kullanıcı önbelleği temizlendi: {expired_count} kayıt silindi")
             
         except Exception as e:
             logger.error(f"Kullanıcı önbelleği temizleme hatası: {str(e)}")
@@ -1133,5 +1236,7 @@ class MessageHandlers:
             "errors": self.stats["errors"],
             "messages_per_hour": round(self.stats.get("messages_per_hour", 0), 2),
             "cached_users": len(self.displayed_users),
+            "activity_buffer": self.activity_buffer.get_stats(),
+            "user_cache": user_cache.get_stats(),
             "last_activity": self.stats["last_activity"].strftime("%Y-%m-%d %H:%M:%S") if self.stats["last_activity"] else None
         }
\ No newline at end of file
@@ -40,7 +40,7 @@ import random
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Union, Tuple
+from typing import List, Dict, Any, Mapping, Optional, Union, Tuple
 
 # Telethon kütüphaneleri
 from telethon import errors
@@ -51,6 +51,7 @@ from colorama import Fore, Style
 # Proje içi modüller
 from app.utils.rate_limiter import RateLimiter
 from app.utils.adaptive_rate_limiter import AdaptiveRateLimiter
+from app.utils.template_registry import template_registry
 
 logger = logging.getLogger(__name__)
 
@@ -470,44 +471,41 @@ class InviteHandler:
             List[str]: Davet şablonları listesi
         """
         try:
-            # Şablon dosyası kontrolü 
-            template_paths = [
-                "data/invites.json",
-                "data/invite_templates.json",
-                "data/templates/invite_messages.json",
-                "config/templates.json"
+            # data/ altındaki şablonlar paylaşılan kayıttan, diğerleri dosyadan okunur
+            template_sources = [
+                ("data/invites.json", lambda: template_registry.source("invites", None)),
+                ("data/invite_templates.json", lambda: template_registry.source("invite_templates", None)),
+                ("data/templates/invite_messages.json", lambda: self._read_json("data/templates/invite_messages.json")),
+                ("config/templates.json", lambda: self._read_json("config/templates.json"))
             ]
             
-            import json
-            for path in template_paths:
-                if os.path.exists(path):
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        # Sözlük formatı (yeni format)
-                        if isinstance(data, dict):
-                            templates = []
+            for path, load in template_sources:
+                data = load()
+                # Sözlük formatı (yeni format)
+                if isinstance(data, Mapping):
+                    templates = []
+                    
+                    if "invite_templates" in data:
+                        templates = data["invite_templates"]
+                    elif "invites" in data:
+                        templates = data["invites"]
+                    elif "first_invite" in data:
+                        templates = data["first_invite"]
+                    # Yeni format: ID-içerik yapısı
+                    else:
+                        for key, value in data.items():
+                            if isinstance(value, Mapping) and "content" in value:
+                                templates.append(value["content"])
                             
-                            if "invite_templates" in data:
-                                templates = data["invite_templates"]
-                            elif "invites" in data:
-                                templates = data["invites"]
-                            elif "first_invite" in data:
-                                templates = data["first_invite"]
-                            # Yeni format: ID-içerik yapısı
-                            else:
-                                for key, value in data.items():
-                                    if isinstance(value, dict) and "content" in value:
-                                        templates.append(value["content"])
-                                    
-                            if templates:
-                                logger.info(f"{len(templates)} davet şablonu {path} dosyasından yüklendi")
-                                return templates
-                                
-                        # Liste formatı (eski format)
-                        elif isinstance(data, list):
-                            if data:
-                                logger.info(f"{len(data)} davet şablonu {path} dosyasından yüklendi")
-                                return data
+                    if templates:
+                        logger.info(f"{len(templates)} davet şablonu {path} kaynağından yüklendi")
+                        return list(templates)
+                        
+                # Liste formatı (eski format)
+                elif isinstance(data, (list, tuple)):
+                    if data:
+                        logger.info(f"{len(data)} davet şablonu {path} kaynağından yüklendi")
+                        return list(data)
                                 
             # Bottan şablonları almayı dene
             if hasattr(self.bot, 'invite_templates'):
@@ -527,6 +525,15 @@ class InviteHandler:
         logger.info(f"{len(default_templates)} varsayılan davet şablonu kullanılıyor")
         return default_templates
     
+    @staticmethod
+    def _read_json(path: str) -> Any:
+        """data/ dışındaki şablon dosyasını okur (yoksa None)."""
+        if not os.path.exists(path):
+            return None
+        import json
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     async def _send_message_to_user(self, user_id: int, message: str) -> None:
         """
         Kullanıcıya doğrudan mesaj gönderir.
@@ -61,6 +61,8 @@ from telethon.errors import (
     PhoneNumberBannedError, UserBannedInChannelError
 )
 
+from app.utils.ttl_cache import MISSING, user_cache
+
 # Opsiyonel harici metrik sistemi bağımlılıkları
 try:
     import prometheus_client
@@ -782,29 +784,38 @@ class UserHandler:
         Returns:
             Dict[str, Any]: Kullanıcı verisi sözlüğü veya boş sözlük
         """
+        cached = user_cache.get((user_id, 'data'))
+        if cached is not MISSING:
+            return cached
+        
         try:
+            user_data = {}
+            
             # UserService üzerinden veri al
             if hasattr(self.bot, 'user_service') and hasattr(self.bot.user_service, 'get_user_data'):
                 if asyncio.iscoroutinefunction(self.bot.user_service.get_user_data):
-                    return await self.bot.user_service.get_user_data(user_id) or {}
+                    user_data = await self.bot.user_service.get_user_data(user_id) or {}
                 else:
-                    return self.bot.user_service.get_user_data(user_id) or {}
+                    user_data = self.bot.user_service.get_user_data(user_id) or {}
                     
             # Farklı metot ismi olabilir
-            if hasattr(self.bot, 'user_service') and hasattr(self.bot.user_service, 'get_user'):
+            elif hasattr(self.bot, 'user_service') and hasattr(self.bot.user_service, 'get_user'):
                 if asyncio.iscoroutinefunction(self.bot.user_service.get_user):
-                    return await self.bot.user_service.get_user(user_id) or {}
+                    user_data = await self.bot.user_service.get_user(user_id) or {}
                 else:
-                    return self.bot.user_service.get_user(user_id) or {}
+                    user_data = self.bot.user_service.get_user(user_id) or {}
             
             # DB üzerinden
-            if hasattr(self.bot, 'db') and hasattr(self.bot.db, 'get_user'):
+            elif hasattr(self.bot, 'db') and hasattr(self.bot.db, 'get_user'):
                 if asyncio.iscoroutinefunction(self.bot.db.get_user):
-                    return await self.bot.db.get_user(user_id) or {}
+                    user_data = await self.bot.db.get_user(user_id) or {}
                 else:
-                    return self.bot.db.get_user(user_id) or {}
+                    user_data = self.bot.db.get_user(user_id) or {}
             
-            return {}
+            # Boş sonuçlar önbelleğe alınmaz, kullanıcı kısa sürede eklenebilir
+            if user_data:
+                user_cache.set((user_id, 'data'), user_data)
+            return user_data
             
         except Exception as e:
             logger.error(f"Kullanıcı verisi alınamadı (user_id: {user_id}): {e}")
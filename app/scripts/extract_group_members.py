@@ -21,7 +21,6 @@ from datetime import datetime
 from urllib.parse import urlparse
 
 import psycopg2
-from psycopg2.extras import Json
 from telethon import TelegramClient
 from telethon.tl.functions.channels import GetFullChannelRequest, GetParticipantsRequest
 from telethon.tl.types import ChannelParticipantsRecent, ChannelParticipantsAdmins
@@ -31,6 +30,10 @@ from telethon.errors import FloodWaitError, ChannelPrivateError
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database.models import Group, TelegramUser, GroupMember
 from bot.utils.adaptive_rate_limiter import AdaptiveRateLimiter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from app.db.async_connection_pool import get_db_pool
+from app.db.mining_snapshots import MiningSnapshotStore
+from app.db.member_ingest import MemberIngestor, STAGE_COLUMNS, participant_row
 
 # Log formatını ayarla
 logging.basicConfig(
@@ -50,6 +53,11 @@ API_HASH = os.getenv('API_HASH')
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 SESSION_NAME = os.getenv('SESSION_NAME', 'session/anon')
 
+# Kullanıcı anlık görüntüsü yalnızca kullanıcıya ait sütunlardan oluşur;
+# grup üyeliğine bağlı is_admin (ve group_id) hash'e girerse birden çok
+# grupta görülen kullanıcı her grup ziyaretinde "değişmiş" sayılır
+USER_SNAPSHOT_COLUMNS = tuple(column for column in STAGE_COLUMNS if column != 'is_admin')
+
 # Veritabanı bağlantı bilgileri
 db_url = os.getenv('DATABASE_URL')
 if not db_url:
@@ -70,6 +78,12 @@ db_params = {
     'port': url.port or 5432
 }
 
+# Değişim algılayan anlık görüntü deposu (havuz main() içinde bağlanır)
+snapshot_store = MiningSnapshotStore()
+
+# COPY tabanlı üye aktarıcı (bu betik users tablosuna yazmaz)
+member_ingestor = MemberIngestor(targets=("telegram_users", "group_members"))
+
 # Rate limiter oluştur
 rate_limiter = AdaptiveRateLimiter(
     initial_rate=0.2,  # Saniyede 0.2 istek (5 saniyede 1)
@@ -126,7 +140,11 @@ async def get_group_info(client, group_id):
         return None
 
 async def get_group_members(client, group_id, limit=1000):
-    """Grup üyelerini alır"""
+    """
+    Grup üyelerini sayfa sayfa alıp hazırlık satırları (STAGE_COLUMNS) olarak üretir.
+    
+    Üyeler listeye biriktirilmez; her sayfa alındıkça aktarıma akar.
+    """
     try:
         logger.info(f"Grup üyeleri alınıyor: {group_id} (limit: {limit})")
         
@@ -134,77 +152,62 @@ async def get_group_members(client, group_id, limit=1000):
         entity = await client.get_entity(group_id)
         if not entity:
             logger.error(f"Grup bulunamadı: {group_id}")
-            return []
-        
-        # Adım 2: Önce admin listesini al
-        admins = []
+            return
+    except Exception as e:
+        logger.error(f"Grup üyeleri alınırken hata: {str(e)}")
+        return
+    
+    # Adım 2: Önce admin listesini al
+    admins = set()
+    try:
+        admin_participants = await client(GetParticipantsRequest(
+            entity, ChannelParticipantsAdmins(), offset=0, limit=100, hash=0
+        ))
+        admins = {admin.id for admin in admin_participants.users}
+        logger.info(f"{len(admins)} admin bulundu")
+    except Exception as e:
+        logger.error(f"Adminler alınırken hata: {str(e)}")
+    
+    # Adım 3: Üyeleri sayfa sayfa akıt
+    fetched = 0
+    offset = 0
+    chunk_size = 200  # Telethon'un sınırı
+    
+    while fetched < limit:
         try:
-            admin_participants = await client(GetParticipantsRequest(
-                entity, ChannelParticipantsAdmins(), offset=0, limit=100, hash=0
+            # Rate limit kontrolü
+            await rate_limiter.wait()
+            
+            participants = await client(GetParticipantsRequest(
+                entity, ChannelParticipantsRecent(), offset=offset, limit=chunk_size, hash=0
             ))
-            admins = [admin.id for admin in admin_participants.users]
-            logger.info(f"{len(admins)} admin bulundu")
+        except FloodWaitError as e:
+            wait_time = e.seconds
+            logger.warning(f"Rate limit aşıldı, {wait_time} saniye bekleniyor...")
+            await asyncio.sleep(wait_time)
+            continue
         except Exception as e:
-            logger.error(f"Adminler alınırken hata: {str(e)}")
+            logger.error(f"Üyeler alınırken hata: {str(e)}")
+            break
         
-        # Adım 3: Tüm üyeleri al
-        all_members = []
-        offset = 0
-        chunk_size = 200  # Telethon'un sınırı
+        if not participants.users:
+            break
         
-        while len(all_members) < limit:
-            try:
-                # Rate limit kontrolü
-                await rate_limiter.wait()
-                
-                participants = await client(GetParticipantsRequest(
-                    entity, ChannelParticipantsRecent(), offset=offset, limit=chunk_size, hash=0
-                ))
-                
-                if not participants.users:
-                    break
-                
-                # Her kullanıcı için
-                for user in participants.users:
-                    # Kullanıcı verilerini hazırla
-                    user_data = {
-                        'user_id': user.id,
-                        'username': getattr(user, 'username', None),
-                        'first_name': getattr(user, 'first_name', None),
-                        'last_name': getattr(user, 'last_name', None),
-                        'is_bot': getattr(user, 'bot', False),
-                        'is_premium': getattr(user, 'premium', False),
-                        'language_code': getattr(user, 'lang_code', None),
-                        'phone': getattr(user, 'phone', None),
-                        'is_admin': user.id in admins,
-                        'group_id': group_id
-                    }
-                    all_members.append(user_data)
-                
-                offset += len(participants.users)
-                logger.info(f"{len(all_members)} üye alındı...")
-                
-                # Limit kontrolü
-                if len(participants.users) < chunk_size:
-                    break
-                    
-                # Kısa bir bekleme
-                await asyncio.sleep(1)
-                
-            except FloodWaitError as e:
-                wait_time = e.seconds
-                logger.warning(f"Rate limit aşıldı, {wait_time} saniye bekleniyor...")
-                await asyncio.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"Üyeler alınırken hata: {str(e)}")
-                break
+        for user in participants.users:
+            yield participant_row(user, admins)
         
-        logger.info(f"Toplam {len(all_members)} üye alındı")
-        return all_members
+        fetched += len(participants.users)
+        offset += len(participants.users)
+        logger.info(f"{fetched} üye alındı...")
         
-    except Exception as e:
-        logger.error(f"Grup üyeleri alınırken hata: {str(e)}")
-        return []
+        # Limit kontrolü
+        if len(participants.users) < chunk_size:
+            break
+            
+        # Kısa bir bekleme
+        await asyncio.sleep(1)
+    
+    logger.info(f"Toplam {fetched} üye alındı")
 
 async def save_group_to_db(conn, group_data):
     """Grup bilgilerini veritabanına kaydeder"""
@@ -259,128 +262,51 @@ async def save_group_to_db(conn, group_data):
             ))
             logger.info(f"Yeni grup eklendi: {group_data['name']} ({group_data['group_id']})")
         
-        # Data mining tablosuna da kaydet
-        cursor.execute("""
-            INSERT INTO data_mining (
-                telegram_id, group_id, type, source, data, 
-                is_processed, created_at, updated_at
-            ) VALUES (%s, %s, %s, %s, %s, TRUE, NOW(), NOW())
-        """, (
-            group_data['group_id'],
-            group_data['group_id'],
-            'group',
-            'extract_script',
-            Json(group_data)
-        ))
-        
         cursor.close()
+        
+        # Anlık görüntüyü kaydet; veri değişmediyse geçmişe kayıt eklenmez
+        await snapshot_store.record(
+            'group', group_data['group_id'], group_data,
+            group_id=group_data['group_id'], source='extract_script'
+        )
         return True
         
     except Exception as e:
         logger.error(f"Grup veritabanına kaydedilirken hata: {str(e)}")
         return False
 
-async def save_users_to_db(conn, users):
-    """Kullanıcıları veritabanına kaydeder"""
+def _user_snapshot(row):
+    """Hazırlık satırından gruptan bağımsız kullanıcı verisini çıkarır."""
+    values = dict(zip(STAGE_COLUMNS, row))
+    return {column: values[column] for column in USER_SNAPSHOT_COLUMNS}
+
+async def save_users_to_db(group_id, rows):
+    """
+    Üye satırı akışını COPY hazırlık tablosu üzerinden telegram_users ve
+    group_members tablolarına küme tabanlı birleştirmeyle kaydeder.
+    """
+    changed_count = 0
+    
+    async def record_snapshots(chunk, connection):
+        # Her COPY parçası anlık görüntü deposuna içe aktarımın bağlantısı ve
+        # transaction'ı içinde yazılır; parça geri alınırsa bunlar da geri alınır
+        nonlocal changed_count
+        changed = await snapshot_store.record_many(
+            'user',
+            [(row[0], _user_snapshot(row), group_id) for row in chunk],
+            source='extract_script',
+            connection=connection
+        )
+        changed_count += len(changed)
+    
     try:
-        cursor = conn.cursor()
-        
-        success_count = 0
-        failed_count = 0
-        
-        for user in users:
-            try:
-                # 1. Önce kullanıcıyı kaydet/güncelle
-                cursor.execute(
-                    "SELECT user_id FROM telegram_users WHERE user_id = %s",
-                    (user['user_id'],)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    # Kullanıcıyı güncelle
-                    cursor.execute("""
-                        UPDATE telegram_users SET 
-                            username = %s, 
-                            first_name = %s, 
-                            last_name = %s, 
-                            is_bot = %s,
-                            is_premium = %s,
-                            language_code = %s,
-                            phone = %s,
-                            last_seen = NOW(),
-                            updated_at = NOW()
-                        WHERE user_id = %s
-                    """, (
-                        user['username'],
-                        user['first_name'],
-                        user['last_name'],
-                        user['is_bot'],
-                        user['is_premium'],
-                        user['language_code'],
-                        user['phone'],
-                        user['user_id']
-                    ))
-                else:
-                    # Yeni kullanıcı ekle
-                    cursor.execute("""
-                        INSERT INTO telegram_users (
-                            user_id, username, first_name, last_name, 
-                            is_bot, is_premium, language_code, phone,
-                            first_seen, last_seen, created_at, updated_at
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), NOW(), NOW())
-                    """, (
-                        user['user_id'],
-                        user['username'],
-                        user['first_name'],
-                        user['last_name'],
-                        user['is_bot'],
-                        user['is_premium'],
-                        user['language_code'],
-                        user['phone']
-                    ))
-                
-                # 2. Grup-kullanıcı ilişkisini kaydet
-                cursor.execute("""
-                    INSERT INTO group_members (
-                        user_id, group_id, is_admin, joined_at, 
-                        last_seen, is_active, created_at, updated_at
-                    ) VALUES (%s, %s, %s, NOW(), NOW(), TRUE, NOW(), NOW())
-                    ON CONFLICT (user_id, group_id) DO UPDATE SET
-                        is_admin = EXCLUDED.is_admin, 
-                        last_seen = NOW(), 
-                        is_active = TRUE, 
-                        updated_at = NOW()
-                """, (
-                    user['user_id'],
-                    user['group_id'],
-                    user['is_admin']
-                ))
-                
-                # 3. Data mining tablosuna kaydet
-                cursor.execute("""
-                    INSERT INTO data_mining (
-                        telegram_id, user_id, group_id, type, source, data, 
-                        is_processed, created_at, updated_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, TRUE, NOW(), NOW())
-                """, (
-                    user['user_id'],
-                    user['user_id'],
-                    user['group_id'],
-                    'user',
-                    'extract_script',
-                    Json(user)
-                ))
-                
-                success_count += 1
-                
-            except Exception as user_error:
-                logger.error(f"Kullanıcı kaydedilirken hata (ID: {user['user_id']}): {str(user_error)}")
-                failed_count += 1
-        
-        cursor.close()
-        logger.info(f"Kullanıcı kayıtları tamamlandı: {success_count} başarılı, {failed_count} başarısız")
-        return success_count, failed_count
+        # Şema/bölüm DDL'i transaction dışında, önceden hazırlanır
+        await snapshot_store.ensure_schema()
+        result = await member_ingestor.ingest(group_id, rows, chunk_sink=record_snapshots)
+        logger.info(f"Kullanıcı kayıtları tamamlandı: {result['staged']} üye aktarıldı, "
+                    f"{result.get('telegram_users', 0)} kullanıcı ve {result.get('group_members', 0)} üyelik birleştirildi, "
+                    f"{changed_count} kullanıcının verisi değişti")
+        return result['staged'], 0
         
     except Exception as e:
         logger.error(f"Kullanıcılar veritabanına kaydedilirken hata: {str(e)}")
@@ -409,6 +335,8 @@ async def main():
     await client.start()
     
     conn = await get_db_connection()
+    snapshot_store.pool = await get_db_pool(db_url=db_url)
+    member_ingestor.pool = snapshot_store.pool
     
     try:
         # Belirli bir grup için
@@ -420,10 +348,8 @@ async def main():
             if group_data:
                 await save_group_to_db(conn, group_data)
                 
-                # Grup üyelerini al ve kaydet
-                members = await get_group_members(client, group_id)
-                if members:
-                    await save_users_to_db(conn, members)
+                # Grup üyelerini akış halinde al ve kaydet
+                await save_users_to_db(group_id, get_group_members(client, group_id))
             
         # Tüm gruplar için
         elif args.all:
@@ -439,10 +365,8 @@ async def main():
                 if group_data:
                     await save_group_to_db(conn, group_data)
                     
-                    # Grup üyelerini al ve kaydet
-                    members = await get_group_members(client, group_id)
-                    if members:
-                        await save_users_to_db(conn, members)
+                    # Grup üyelerini akış halinde al ve kaydet
+                    await save_users_to_db(group_id, get_group_members(client, group_id))
                 
                 # Her grup arasında biraz bekle
                 await asyncio.sleep(5)
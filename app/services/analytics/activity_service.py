@@ -8,6 +8,7 @@
 # ============================================================================ #
 """
 
+import json
 import logging
 import asyncio
 import time
@@ -20,7 +21,10 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.config import settings
 from app.db.session import get_session
+from app.db.async_connection_pool import get_db_pool
+from app.db.activity_rollups import ActivityRollups
 from app.services.base_service import BaseService
+from app.core.scheduler import wakeups
 from app.models.user import User
 from app.models.message import Message
 from app.models.group import Group
@@ -55,11 +59,16 @@ class ActivityService(BaseService):
         }
         self.db_retry_count = 0
         self.max_db_retries = 3
+        # Analizler ham tablolar yerine saatlik/günlük rollup tablolarından okunur
+        self.pool = None
+        self.rollups = ActivityRollups()
     
     async def initialize(self) -> bool:
         """Servisi başlat."""
         try:
             self.db = self.db or next(get_session())
+            if await self._ensure_db_connection():
+                await self.rollups.ensure_schema()
             self.initialized = True
             self.last_analysis_time = datetime.now()
             logger.info("Activity monitoring service initialized")
@@ -81,16 +90,21 @@ class ActivityService(BaseService):
                 # İstatistikleri raporla
                 await self._log_activity_stats()
                 
-                # Belirlenen aralıkta bekle
+                # Belirlenen aralıkta bekle; cleanup() beklemeyi hemen sonlandırır
                 interval = int(settings.SCHEDULER_INTERVAL)
-                await asyncio.sleep(interval)
+                await wakeups.wait(self.service_name, timeout=interval)
                 
             except Exception as e:
                 logger.error(f"Error in activity monitoring loop: {str(e)}", exc_info=True)
-                await asyncio.sleep(60)  # Hata durumunda 1 dakika bekle
+                await wakeups.wait(self.service_name, timeout=60)  # Hata durumunda 1 dakika bekle
     
     async def _analyze_activity(self):
-        """Aktivite verilerini analiz et."""
+        """
+        Aktivite verilerini analiz et.
+
+        Önce rollup tabloları yeni satırlarla güncellenir, ardından tüm
+        istatistikler birkaç indeksli rollup okumasıyla hesaplanır.
+        """
         logger.debug("Analyzing activity data")
         self.last_analysis_time = datetime.now()
         
@@ -100,75 +114,39 @@ class ActivityService(BaseService):
             return
         
         try:
-            # Yeni bir transaction başlat
-            self.db.rollback()
-            
-            # Son 24 saatteki aktiviteyi analiz et
-            since = datetime.now() - timedelta(hours=24)
-            
-            # Kullanıcı istatistikleri
+            # Son analizden bu yana eklenen satırları kovalara ekle
             try:
-                await self._analyze_user_activity(since)
+                await self.rollups.refresh()
             except Exception as e:
-                logger.error(f"User activity analysis failed: {str(e)}")
-                self.db.rollback()  # Hata durumunda transaction'ı rollback yap
+                logger.error(f"Activity rollup refresh failed: {str(e)}")
             
-            # Grup istatistikleri
-            try:
-                await self._analyze_group_activity(since)
-            except Exception as e:
-                logger.error(f"Group activity analysis failed: {str(e)}")
-                self.db.rollback()  # Hata durumunda transaction'ı rollback yap
+            # Son 24 saatteki aktiviteyi analiz et (kayıt zamanları UTC)
+            since = datetime.utcnow() - timedelta(hours=24)
+            summary = await self.rollups.summary(since)
             
-            # Mesaj istatistikleri
-            try:
-                await self._analyze_message_activity(since)
-            except Exception as e:
-                logger.error(f"Message activity analysis failed: {str(e)}")
-                self.db.rollback()  # Hata durumunda transaction'ı rollback yap
+            self._analyze_user_activity(summary["users"])
+            self._analyze_group_activity(summary["groups"])
+            self._analyze_message_activity(summary["messages"])
             
             # Aktivite kaydı oluştur
-            try:
-                await self._create_activity_record()
-            except Exception as e:
-                logger.error(f"Activity record creation failed: {str(e)}")
-                self.db.rollback()  # Hata durumunda transaction'ı rollback yap
+            await self._create_activity_record()
             
         except Exception as e:
             logger.error(f"Error analyzing activity: {str(e)}", exc_info=True)
-            # Genel hata durumunda rollback
-            try:
-                self.db.rollback()
-            except:
-                pass
+            error = {"error": str(e)}
+            self.activity_stats = {"users": error, "groups": error, "messages": error}
     
     async def _ensure_db_connection(self) -> bool:
-        """Veritabanı bağlantısını kontrol et, gerekirse yeniden bağlan."""
+        """Bağlantı havuzunu kontrol et, gerekirse yeniden bağlan."""
         try:
-            if not self.db:
-                self.db = next(get_session())
+            if self.pool is None:
+                self.pool = await get_db_pool()
+                self.rollups.pool = self.pool
             
-            # Muhtemel bir bekleyen transaction'ı rollback yapalım
-            try:
-                self.db.rollback()
-            except Exception as rollback_error:
-                logger.warning(f"Rollback error: {str(rollback_error)}")
-                # Hatada oturumu yenile
-                try:
-                    self.db.close()
-                except:
-                    pass
-                self.db = next(get_session())
-                
-            # Bağlantıyı test et
-            query_result = self.db.execute(text("SELECT 1 as result"))
-            row = query_result.fetchone()
-            if row and row.result == 1:
-                # Bağlantı başarılı
+            if await self.pool.ping():
                 self.db_retry_count = 0
                 return True
             
-            # Bağlantı başarısız
             logger.warning("Database connection test failed")
             
         except Exception as e:
@@ -178,317 +156,53 @@ class ActivityService(BaseService):
         if self.db_retry_count < self.max_db_retries:
             self.db_retry_count += 1
             logger.info(f"Attempting to reconnect to database (attempt {self.db_retry_count})")
-            
-            try:
-                # Mevcut bağlantıyı kapat
-                if self.db:
-                    try:
-                        self.db.close()
-                    except:
-                        pass
-                
-                # Yeni bağlantı oluştur
-                self.db = next(get_session())
-                
-                # Test et
-                query_result = self.db.execute(text("SELECT 1 as result"))
-                row = query_result.fetchone()
-                if row and row.result == 1:
-                    logger.info("Database reconnection successful")
-                    self.db_retry_count = 0
-                    return True
-            except Exception as reconnect_error:
-                logger.error(f"Database reconnection failed: {str(reconnect_error)}")
+            self.pool = None
         
         return False
     
-    async def _analyze_user_activity(self, since: datetime):
-        """Kullanıcı aktivitelerini analiz et."""
-        try:
-            # Transaction'ı sıfırlayalım
-            self.db.rollback()
-            
-            # Son N saatte aktif olan kullanıcılar - users tablosunu kullan
-            active_users_query = text("""
-                SELECT COUNT(DISTINCT id) as count
-                FROM users 
-                WHERE created_at > :since
-            """)
-            
-            result = self.db.execute(active_users_query, {"since": since})
-            row = result.fetchone()
-            active_users_count = row.count if row else 0
-            
-            # Toplam kullanıcı sayısı
-            total_users_query = text("SELECT COUNT(*) as count FROM users")
-            result = self.db.execute(total_users_query)
-            row = result.fetchone()
-            total_users = row.count if row else 0
-            
-            # Son kayıt olan kullanıcılar
-            new_users_query = text("""
-                SELECT COUNT(*) as count
-                FROM users 
-                WHERE created_at > :since
-            """)
-            
-            result = self.db.execute(new_users_query, {"since": since})
-            row = result.fetchone()
-            new_users_count = row.count if row else 0
-            
-            # Sonuçları kaydet
-            self.activity_stats["users"] = {
-                "total": total_users,
-                "active": active_users_count,
-                "new": new_users_count,
-                "active_percentage": round((active_users_count / total_users) * 100, 2) if total_users > 0 else 0
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing user activity: {str(e)}", exc_info=True)
-            self.activity_stats["users"] = {
-                "error": str(e)
-            }
-            # Hata durumunda rollback yaparak transaction'ı temizle
-            try:
-                self.db.rollback()
-            except:
-                pass
+    def _analyze_user_activity(self, users: Dict[str, Any]):
+        """Kullanıcı istatistiklerini rollup özetinden hazırla."""
+        total_users = users["total"]
+        self.activity_stats["users"] = {
+            **users,
+            "active_percentage": round((users["active"] / total_users) * 100, 2) if total_users > 0 else 0
+        }
     
-    async def _analyze_group_activity(self, since: datetime):
-        """Grup aktivitelerini analiz et."""
-        try:
-            # Her fonksiyon çağrısı başında transaction sıfırlama
-            self.db.rollback()
-            
-            # Aktif gruplar
-            active_groups_query = text("""
-                SELECT COUNT(DISTINCT group_id) as count
-                FROM messages 
-                WHERE created_at > :since
-            """)
-            
-            result = self.db.execute(active_groups_query, {"since": since})
-            row = result.fetchone()
-            active_groups_count = row.count if row else 0
-            
-            # Toplam grup sayısı
-            total_groups_query = text("SELECT COUNT(*) as count FROM groups")
-            result = self.db.execute(total_groups_query)
-            row = result.fetchone()
-            total_groups = row.count if row else 0
-            
-            # En aktif gruplar (en çok mesaj olan)
-            # Güvenli ve esnek bir sorgu - tablo yapısına uyumlu
-            try:
-                # Önce groups tablosunun alanlarını kontrol et
-                columns_query = text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'groups';
-                """)
-                
-                result = self.db.execute(columns_query)
-                columns = [row.column_name for row in result.fetchall()]
-                
-                # Grup adı için olası alan adları
-                name_fields = ['name', 'title', 'group_name']
-                group_name_field = None
-                
-                # Mevcut alan adını bul
-                for field in name_fields:
-                    if field in columns:
-                        group_name_field = field
-                        break
-                
-                if not group_name_field:
-                    logger.warning("Groups tablosunda grup adı alanı bulunamadı!")
-                    group_name_field = 'id'  # Varsayılan olarak ID kullan
-                
-                # Doğru alan adıyla SQL sorgusunu oluştur
-                top_groups_query = text(f"""
-                    SELECT g.{group_name_field} as title, COUNT(m.id) as message_count 
-                    FROM messages m
-                    JOIN groups g ON m.group_id = g.id
-                    WHERE m.created_at > :since
-                    GROUP BY g.id, g.{group_name_field}
-                    ORDER BY message_count DESC
-                    LIMIT 5
-                """)
-                
-                result = self.db.execute(top_groups_query, {"since": since})
-                top_groups = [{"title": row.title, "message_count": row.message_count} for row in result.fetchall()]
-                
-            except Exception as e:
-                logger.error(f"En aktif grupları çekerken hata: {e}")
-                top_groups = []
-            
-            # Sonuçları kaydet
-            self.activity_stats["groups"] = {
-                "total": total_groups,
-                "active": active_groups_count,
-                "active_percentage": round((active_groups_count / total_groups) * 100, 2) if total_groups > 0 else 0,
-                "top_active": top_groups
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing group activity: {str(e)}", exc_info=True)
-            self.activity_stats["groups"] = {
-                "error": str(e)
-            }
-            # Hata durumunda rollback yaparak transaction'ı temizle
-            try:
-                self.db.rollback()
-            except:
-                pass
+    def _analyze_group_activity(self, groups: Dict[str, Any]):
+        """Grup istatistiklerini rollup özetinden hazırla."""
+        total_groups = groups["total"]
+        self.activity_stats["groups"] = {
+            "total": total_groups,
+            "active": groups["active"],
+            "active_percentage": round((groups["active"] / total_groups) * 100, 2) if total_groups > 0 else 0,
+            "top_active": groups["top_active"]
+        }
     
-    async def _analyze_message_activity(self, since: datetime):
-        """Mesaj aktivitelerini analiz et."""
-        try:
-            # Her fonksiyon çağrısı başında transaction sıfırlama
-            self.db.rollback()
-            
-            # Toplam mesaj sayısı
-            total_messages_query = text("SELECT COUNT(*) as count FROM messages")
-            result = self.db.execute(total_messages_query)
-            row = result.fetchone()
-            total_messages = row.count if row else 0
-            
-            # Son N saatte gönderilen mesajlar
-            recent_messages_query = text("""
-                SELECT COUNT(*) as count
-                FROM messages 
-                WHERE created_at > :since
-            """)
-            
-            result = self.db.execute(recent_messages_query, {"since": since})
-            row = result.fetchone()
-            recent_messages_count = row.count if row else 0
-            
-            # Mesaj türü dağılımı
-            try:
-                # Önce messages tablosunun alanlarını kontrol et
-                columns_query = text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'messages';
-                """)
-                
-                result = self.db.execute(columns_query)
-                columns = [row.column_name for row in result.fetchall()]
-                
-                # Mesaj türü için olası alan adları
-                type_fields = ['type', 'message_type', 'msg_type']
-                message_type_field = None
-                
-                # Mevcut alan adını bul
-                for field in type_fields:
-                    if field in columns:
-                        message_type_field = field
-                        break
-                
-                if message_type_field:
-                    # Doğru alan adıyla SQL sorgusunu oluştur
-                    message_types_query = text(f"""
-                        SELECT m.{message_type_field} as message_type, COUNT(*) as count
-                        FROM messages m
-                        WHERE m.created_at > :since
-                        GROUP BY m.{message_type_field}
-                        ORDER BY count DESC
-                    """)
-                    
-                    result = self.db.execute(message_types_query, {"since": since})
-                    message_types = [{"type": row.message_type, "count": row.count} for row in result.fetchall()]
-                else:
-                    logger.warning("Messages tablosunda mesaj türü alanı bulunamadı!")
-                    message_types = []
-            except Exception as e:
-                logger.error(f"Mesaj türlerini çekerken hata: {e}")
-                message_types = []
-            
-            # Sonuçları kaydet
-            self.activity_stats["messages"] = {
-                "total": total_messages,
-                "recent": recent_messages_count,
-                "hourly_average": round(recent_messages_count / 24, 2),
-                "types": message_types
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing message activity: {str(e)}", exc_info=True)
-            self.activity_stats["messages"] = {
-                "error": str(e)
-            }
-            # Hata durumunda rollback yaparak transaction'ı temizle
-            try:
-                self.db.rollback()
-            except:
-                pass
+    def _analyze_message_activity(self, messages: Dict[str, Any]):
+        """Mesaj istatistiklerini rollup özetinden hazırla."""
+        self.activity_stats["messages"] = {
+            "total": messages["total"],
+            "recent": messages["recent"],
+            "hourly_average": round(messages["recent"] / 24, 2),
+            "types": messages["types"]
+        }
     
     async def _create_activity_record(self):
         """Aktivite istatistiklerini veritabanına kaydet."""
         try:
-            # Önceki hatalı transaction'ları temizle
-            self.db.rollback()
-            
-            # Hata durumunda yeni bir session oluştur
-            if "error" in self.activity_stats.get("users", {}) or "error" in self.activity_stats.get("groups", {}) or "error" in self.activity_stats.get("messages", {}):
-                # Mevcut oturumu kapat
-                try:
-                    self.db.close()
-                except:
-                    pass
-                # Yeni oturum oluştur
-                self.db = next(get_session())
-            
-            # activities tablosunun var olup olmadığını kontrol et
-            check_table_query = text("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'activities'
-                ) as table_exists;
-            """)
-            
-            result = self.db.execute(check_table_query)
-            row = result.fetchone()
-            table_exists = row.table_exists if row else False
-            
-            # Tablo yoksa oluştur
-            if not table_exists:
-                create_table_query = text("""
-                    CREATE TABLE IF NOT EXISTS activities (
-                        id SERIAL PRIMARY KEY,
-                        activity_type VARCHAR(50) NOT NULL,
-                        activity_data JSONB,
-                        created_at TIMESTAMP DEFAULT NOW()
-                    );
-                """)
-                self.db.execute(create_table_query)
-                self.db.commit()
-                logger.info("Activities tablosu oluşturuldu")
-            
-            # JSON olarak aktivite verilerini hazırla
-            import json
-            activity_data = json.dumps(self.activity_stats)
-            
-            # Yeni aktivite kaydı oluştur
-            new_activity_query = text("""
+            # activities tablosu rollups.ensure_schema() ile oluşturulur
+            await self.pool.execute(
+                """
                 INSERT INTO activities (activity_type, activity_data, created_at)
-                VALUES ('daily_stats', :activity_data, NOW())
-            """)
-            
-            self.db.execute(new_activity_query, {"activity_data": activity_data})
-            self.db.commit()
+                VALUES ('daily_stats', $1::jsonb, NOW())
+                """,
+                json.dumps(self.activity_stats, default=str)
+            )
             
             logger.debug("Activity record created successfully")
             
         except Exception as e:
             logger.error(f"Error creating activity record: {str(e)}", exc_info=True)
-            # Rollback işlemi
-            try:
-                self.db.rollback()
-            except:
-                pass
     
     async def _log_activity_stats(self):
         """Aktivite istatistiklerini log olarak raporla."""
@@ -526,12 +240,14 @@ class ActivityService(BaseService):
         return {
             "timestamp": datetime.now().isoformat(),
             "stats": self.activity_stats,
+            "rollups": self.rollups.get_stats(),
             "last_update": self.last_analysis_time.isoformat() if self.last_analysis_time else None
         }
     
     async def cleanup(self):
         """Servis kapatılırken temizlik işleri."""
         self.running = False
+        wakeups.wake(self.service_name)
         if self.db:
             try:
                 await self.db.close()
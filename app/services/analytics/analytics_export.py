@@ -0,0 +1,275 @@
+"""
+# ============================================================================ #
+# Dosya: analytics_export.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/analytics_export.py
+# İşlev: Mesaj analitiği tablolarının gün bazlı kolon dosyalarına aktarımı.
+#
+# `message_effectiveness` ve `dm_conversions` tabloları gün bölümlü
+# (ör. message_effectiveness/day=2025-05-01.parquet) dosyalara aktarılır.
+# Yalnızca son aktarımdan beri değişen günler yeniden yazılır; satırlar
+# sunucu taraflı imleçle parça parça okunur ve dosya geçici adla yazılıp
+# atomik olarak yerine taşınır. Raporlar bu dosyalardan üretildiği için
+# ağır analizler botun yazma yoluyla yarışmaz.
+#
+# pyarrow kuruluysa Parquet, değilse pandas pickle biçimi kullanılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import os
+import json
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+EXPORT_SUFFIX = ".parquet" if PARQUET_AVAILABLE else ".pkl"
+DEFAULT_EXPORT_DIR = "app/data/analytics_export"
+STATE_FILE = "_export_state.json"
+
+# Tablo -> (gün sütunu, aktarılacak sütunlar)
+EXPORT_TABLES: Dict[str, Dict[str, Any]] = {
+    "message_effectiveness": {
+        "day_column": "sent_at",
+        "columns": [
+            "id", "message_id", "group_id", "category", "content", "sent_at",
+            "views", "reactions", "replies", "forwards", "updated_at"
+        ],
+    },
+    "dm_conversions": {
+        "day_column": "converted_at",
+        "columns": [
+            "id", "user_id", "source_message_id", "group_id", "conversion_type",
+            "converted_at", "message_count", "response_time", "session_duration",
+            "is_successful", "updated_at"
+        ],
+    },
+}
+
+# updated_at indeksi sayesinde yalnızca son aktarımdan beri değişen satırlar taranır
+CHANGED_DAYS_QUERY = """
+    SELECT DISTINCT ({day_column})::date AS day
+    FROM {table}
+    WHERE updated_at > $1 AND {day_column} IS NOT NULL
+    ORDER BY day
+"""
+
+DAY_ROWS_QUERY = """
+    SELECT {columns}
+    FROM {table}
+    WHERE {day_column} >= $1 AND {day_column} < $2
+    ORDER BY id
+"""
+
+
+def partition_path(export_dir: str, table: str, day: date) -> str:
+    """Bir günün bölüm dosyasının yolunu döndürür"""
+    return os.path.join(export_dir, table, f"day={day.isoformat()}{EXPORT_SUFFIX}")
+
+
+def write_frame(frame: pd.DataFrame, path: str) -> None:
+    """
+    DataFrame'i geçici dosyaya yazıp atomik olarak yerine taşır.
+
+    Args:
+        frame: Yazılacak veri
+        path: Hedef dosya yolu
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if PARQUET_AVAILABLE:
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Bölüm dosyasını okur.
+
+    Args:
+        path: Dosya yolu
+        columns: Okunacak sütunlar (None ise tümü)
+
+    Returns:
+        pd.DataFrame: Okunan veri
+    """
+    if PARQUET_AVAILABLE:
+        return pd.read_parquet(path, columns=columns)
+    frame = pd.read_pickle(path)
+    return frame[columns] if columns else frame
+
+
+class AnalyticsExporter:
+    """
+    Analitik tablolarını gün bölümlü kolon dosyalarına aktarır.
+
+    Her tablo için son aktarım zamanı `_export_state.json` içinde tutulur.
+    export() bu zamandan sonra `updated_at` değeri değişen günleri bulur ve
+    yalnızca o günlerin dosyalarını yeniden yazar; kapanmış günler bir kez
+    yazıldıktan sonra dokunulmaz.
+    """
+
+    def __init__(
+        self,
+        export_dir: str = DEFAULT_EXPORT_DIR,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        chunk_size: int = 5000,
+        overlap_seconds: int = 60
+    ):
+        """
+        Aktarıcıyı yapılandırır.
+
+        Args:
+            export_dir: Bölüm dosyalarının kök dizini
+            pool: Asenkron bağlantı havuzu (None ise ilk kullanımda alınır)
+            chunk_size: İmleçten tek seferde okunacak satır sayısı
+            overlap_seconds: Saat farkı ve geç commit'ler için filigran payı
+        """
+        self.export_dir = export_dir
+        self.pool = pool
+        self.chunk_size = max(int(chunk_size), 1)
+        self.overlap_seconds = max(int(overlap_seconds), 0)
+        self._lock = asyncio.Lock()
+
+        self.stats = {
+            "exports": 0,
+            "partitions_written": 0,
+            "rows_exported": 0
+        }
+
+    async def _get_pool(self) -> AsyncDbConnectionPool:
+        if self.pool is None:
+            self.pool = await get_db_pool()
+        return self.pool
+
+    # ------------------------------------------------------------------ #
+    # Durum
+    # ------------------------------------------------------------------ #
+
+    def _state_path(self) -> str:
+        return os.path.join(self.export_dir, STATE_FILE)
+
+    def load_state(self) -> Dict[str, str]:
+        """Tablo başına son aktarım zamanlarını okur"""
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, str]) -> None:
+        os.makedirs(self.export_dir, exist_ok=True)
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path())
+
+    # ------------------------------------------------------------------ #
+    # Aktarım
+    # ------------------------------------------------------------------ #
+
+    async def export(self, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Değişen günleri aktarır.
+
+        Args:
+            tables: Aktarılacak tablolar (None ise tümü)
+
+        Returns:
+            Dict[str, int]: Tablo -> yeniden yazılan gün sayısı
+        """
+        async with self._lock:
+            pool = await self._get_pool()
+            state = self.load_state()
+            written: Dict[str, int] = {}
+
+            for table in tables or list(EXPORT_TABLES):
+                spec = EXPORT_TABLES[table]
+                started_at = datetime.now()
+                since = datetime.min
+                if table in state:
+                    since = datetime.fromisoformat(state[table]) - timedelta(seconds=self.overlap_seconds)
+
+                rows = await pool.fetch(
+                    CHANGED_DAYS_QUERY.format(table=table, day_column=spec["day_column"]),
+                    since
+                )
+                for row in rows:
+                    await self.export_day(table, row["day"])
+                written[table] = len(rows)
+
+                state[table] = started_at.isoformat()
+                await asyncio.get_running_loop().run_in_executor(None, self._save_state, dict(state))
+
+            self.stats["exports"] += 1
+            return written
+
+    async def export_day(self, table: str, day: date) -> int:
+        """
+        Bir günün tüm satırlarını imleçle okuyup bölüm dosyasını yeniden yazar.
+
+        Args:
+            table: Tablo adı
+            day: Gün
+
+        Returns:
+            int: Yazılan satır sayısı
+        """
+        spec = EXPORT_TABLES[table]
+        query = DAY_ROWS_QUERY.format(
+            table=table,
+            columns=", ".join(spec["columns"]),
+            day_column=spec["day_column"]
+        )
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+
+        chunks: List[pd.DataFrame] = []
+        pool = await self._get_pool()
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                cursor = await connection.cursor(query, start, end)
+                while True:
+                    records = await cursor.fetch(self.chunk_size)
+                    if not records:
+                        break
+                    chunks.append(pd.DataFrame.from_records(
+                        [tuple(record) for record in records], columns=spec["columns"]
+                    ))
+
+        frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=spec["columns"])
+        path = partition_path(self.export_dir, table, day)
+        await asyncio.get_running_loop().run_in_executor(None, write_frame, frame, path)
+
+        self.stats["partitions_written"] += 1
+        self.stats["rows_exported"] += len(frame)
+        logger.debug(f"{table} {day} bölümü aktarıldı: {len(frame)} satır")
+        return len(frame)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Aktarım istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "format": EXPORT_SUFFIX.lstrip("."),
+            "last_exports": self.load_state()
+        }
@@ -2,6 +2,10 @@
 # DataMining servisi - veri madenciliği ve analiz için kullanılır
 """
 from app.services.base_service import BaseService
+from app.core.scheduler import wakeups
+from app.services.analytics.group_mining import GroupMiningPipeline
+from app.db.mining_snapshots import MiningSnapshotStore
+from app.utils.entity_resolver import get_entity_resolver
 import logging
 import json
 import asyncio
@@ -31,6 +35,19 @@ class DataMiningService(BaseService):
             'total_processed': 0,
             'last_processed': None
         }
+        
+        # Değişim algılayan anlık görüntü deposu (son durum + aylık fark geçmişi)
+        mining_config = config.get('datamining', {}) if isinstance(config, dict) else {}
+        self.snapshots = MiningSnapshotStore(
+            retention_months=mining_config.get('snapshot_retention_months', 6)
+        )
+        
+        # Artımlı grup madenciliği: tekrarsız grup kümesi, toplu çözümleme ve upsert
+        self.group_pipeline = GroupMiningPipeline(client, snapshots=self.snapshots)
+        self.entity_resolver = get_entity_resolver(client)
+        self.group_refresh_interval = 5 * 60  # saniye
+        self._last_group_update: Optional[datetime] = None
+        self._group_update_lock = asyncio.Lock()
     
     async def _start(self) -> bool:
         """
@@ -94,16 +111,11 @@ class DataMiningService(BaseService):
             # İstatistikleri güncelle
             await self._load_mining_stats()
             
-            # Zamanı gelmiş madencilik işlerini çalıştır
+            # Aktif madencilik işlerinin grupları tek bir güncellemede toplanır
             active_jobs = [job for job in self.mining_data.values() if job.get('is_active', True)]
-            for job in active_jobs:
-                try:
-                    group_id = job.get('group_id')
-                    if group_id:
-                        # Grup verilerini güncelle
-                        await self.update_group_data()
-                except Exception as e:
-                    logger.error(f"Madencilik işi çalıştırılırken hata: {str(e)}", exc_info=True)
+            job_group_ids = [job.get('group_id') for job in active_jobs if job.get('group_id')]
+            if job_group_ids:
+                await self.update_group_data(job_group_ids)
             
             self.last_update = datetime.now()
             self.stats['total_processed'] += len(active_jobs)
@@ -176,6 +188,7 @@ class DataMiningService(BaseService):
         """
         # Önce durum değişkenini güncelle
         self.running = False
+        wakeups.wake(self.service_name)
         
         # Durdurma sinyalini ayarla (varsa)
         if hasattr(self, 'stop_event') and self.stop_event:
@@ -393,159 +406,92 @@ class DataMiningService(BaseService):
         # Her 5 dakikada bir grup ve kullanıcı verilerini topla (önceden 30 dakikaydı)
         while self.running and not self.stop_event.is_set():
             try:
-                # Grupları güncelle
-                await self.update_group_data()
+                # Grupları güncelle (madencilik işlerinin grupları dahil)
+                job_group_ids = [job.get('group_id') for job in self.mining_data.values()
+                                 if job.get('is_active', True) and job.get('group_id')]
+                await self.update_group_data(job_group_ids, force=True)
                 
                 # Her 1 saatte bir grup kullanıcılarını güncelle
                 current_hour = datetime.now().hour
                 if current_hour % 1 == 0:  # 00:00, 03:00, 06:00, 09:00, 12:00, 15:00, 18:00, 21:00
                     await self.update_group_members()
                 
-                # 15 dakika bekle (önceden 30 dakikaydı)
-                await asyncio.sleep(15 * 60)
+                # Saklama süresini aşan aylık geçmiş bölümlerini düşür
+                try:
+                    await self.snapshots.prune()
+                except Exception as e:
+                    logger.error(f"Madencilik geçmişi temizlenirken hata: {str(e)}")
+                
+                # 15 dakika bekle (önceden 30 dakikaydı); durdurma sinyali beklemeyi keser
+                await wakeups.wait(self.service_name, timeout=15 * 60, stop_event=self._async_stop_event())
                 
             except asyncio.CancelledError:
                 logger.info("Veri toplama görevi iptal edildi")
                 break
             except Exception as e:
                 logger.error(f"Veri toplama sırasında hata: {str(e)}", exc_info=True)
-                await asyncio.sleep(2 * 60)  # 2 dakika bekle ve tekrar dene (önceden 5 dakikaydı)
+                # 2 dakika bekle ve tekrar dene (önceden 5 dakikaydı)
+                await wakeups.wait(self.service_name, timeout=2 * 60, stop_event=self._async_stop_event())
+
+    def _async_stop_event(self) -> Optional[asyncio.Event]:
+        """stop_event asyncio olayıysa döndürür (wakeups.wait için)"""
+        return self.stop_event if isinstance(self.stop_event, asyncio.Event) else None
 
-    async def update_group_data(self):
+    async def update_group_data(self, job_group_ids: Optional[List[Any]] = None, force: bool = False):
         """
-        Tüm grupların verilerini günceller ve PostgreSQL'e kaydeder
+        Hedef grupların ve madencilik işlerinin gruplarını tek seferde günceller.
+
+        Grup kümesi tekrarsız hale getirilir, varlıklar toplu çözülür ve
+        yalnızca verisi değişen gruplar yazılır (bkz. GroupMiningPipeline).
+        Son çalıştırmadan bu yana `group_refresh_interval` geçmediyse
+        (force hariç) tekrar çalışmaz.
+
+        Args:
+            job_group_ids: Aktif madencilik işlerinin grup ID'leri
+            force: Aralığı beklemeden çalıştır
+
+        Returns:
+            bool: Başarılı ise True
         """
-        try:
-            logger.info("Grup verilerini güncelleme görevi başladı")
-            
-            # Grup servisine erişim kontrolü
-            if not hasattr(self, 'group_service') or not self.group_service:
-                logger.warning("Grup servisi bulunamadı, grup verileri güncellenemiyor")
+        async with self._group_update_lock:
+            now = datetime.now()
+            if (not force and self._last_group_update
+                    and (now - self._last_group_update).total_seconds() < self.group_refresh_interval):
+                logger.debug("Grup verileri yakın zamanda güncellendi, atlanıyor")
+                return True
+
+            try:
+                logger.info("Grup verilerini güncelleme görevi başladı")
                 
-                # Alternatif olarak, eğer servisler içinde grup servisi varsa kullan
-                if hasattr(self, 'services') and 'group' in self.services:
+                # Grup servisine erişim kontrolü
+                if not getattr(self, 'group_service', None) and hasattr(self, 'services') and 'group' in self.services:
                     self.group_service = self.services['group']
                     logger.info("Grup servisi servisler listesinden bulundu")
+                
+                target_groups = []
+                if getattr(self, 'group_service', None) and hasattr(self.group_service, 'get_target_groups'):
+                    try:
+                        target_groups = await self.group_service.get_target_groups() or []
+                    except Exception as e:
+                        logger.error(f"Grup verilerini alma hatası: {str(e)}")
                 else:
-                    return False
-            
-            # Grup servisinden grupları al
-            try:
-                # get_target_groups metodu var mı kontrol et
-                if hasattr(self.group_service, 'get_target_groups'):
-                    groups = await self.group_service.get_target_groups()
-                    if not groups:
-                        logger.warning("Grup servisi grupları getirmedi")
-                        return False
-                else:
-                    logger.warning("Grup servisinde get_target_groups metodu bulunamadı")
-                    return False
-            except Exception as e:
-                logger.error(f"Grup verilerini alma hatası: {str(e)}")
-                return False
+                    logger.warning("Grup servisi bulunamadı, yalnızca madencilik işlerinin grupları güncellenecek")
                 
-            # Veritabanı bağlantısını kontrol et
-            if not self.db.connected:
-                await self.db.connect()
+                if not target_groups and not job_group_ids:
+                    logger.warning("Güncellenecek grup bulunamadı")
+                    return False
                 
-            updated_count = 0
-            new_count = 0
-            
-            # Her grup için:
-            for group in groups:
-                try:
-                    group_id = group.get('group_id')
-                    if not group_id:
-                        continue
-                    
-                    # Grup entity'sini al
-                    entity = None
-                    try:
-                        # ID'nin türünü kontrol et ve debug bilgisi ekle
-                        real_id = int(group_id)
-                        logger.debug(f"Entity almaya çalışılıyor: ID={real_id}, tip={type(real_id)}")
-                        entity = await self.client.get_entity(real_id)
-                    except ValueError:
-                        # Sayısal değilse doğrudan kullan (username olabilir)
-                        logger.debug(f"Entity almaya çalışılıyor: ID={group_id}, (sayısal olmayan)")
-                        entity = await self.client.get_entity(group_id)
-                    except RPCError as e:
-                        logger.warning(f"Grup entity alma hatası: {group_id} -> {str(e)}")
-                        continue
-                        
-                    # Entity alınamadıysa
-                    if not entity:
-                        logger.warning(f"Grup entity alınamadı: {group_id}")
-                        continue
-                    
-                    # Entity'den grup verilerini çıkar
-                    group_data = {
-                        'id': group_id,
-                        'name': getattr(entity, 'title', None) or group.get('name', f"Grup {group_id}"),
-                        'username': getattr(entity, 'username', None),
-                        'description': getattr(entity, 'about', None),
-                        'member_count': getattr(entity, 'participants_count', 0),
-                        'is_public': getattr(entity, 'username', None) is not None,
-                        'source': 'discover'
-                    }
-                    
-                    # Mevcut grup mu kontrol et
-                    query = "SELECT group_id FROM groups WHERE group_id = %s"
-                    existing_group = await self.db.fetchone(query, (group_id,))
+                result = await self.group_pipeline.run(target_groups, job_group_ids or [])
+                self._last_group_update = now
+                logger.info(
+                    f"Grup verileri güncellendi: {result['resolved']}/{result['groups']} grup çözüldü, "
+                    f"{result['changed']} grup değişti"
+                )
+                return True
                     
-                    if existing_group:
-                        # Grubu güncelle
-                        update_query = """
-                        UPDATE groups SET
-                            name = %s, 
-                            username = %s, 
-                            description = %s, 
-                            is_public = %s
-                        WHERE group_id = %s
-                        """
-                        
-                        params = (
-                            group_data['name'], 
-                            group_data['username'], 
-                            group_data['description'], 
-                            group_data['is_public'],
-                            group_id
-                        )
-                        await self.db.execute(update_query, params)
-                        updated_count += 1
-                    else:
-                        # Yeni grup ekle
-                        insert_query = """
-                        INSERT INTO groups (
-                            group_id, name, username, description, is_public, source
-                        ) VALUES (%s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        params = (
-                            group_id, 
-                            group_data['name'], 
-                            group_data['username'], 
-                            group_data['description'], 
-                            group_data['is_public'],
-                            group_data['source']
-                        )
-                        await self.db.execute(insert_query, params)
-                        new_count += 1
-                        
-                    # Mining verisini kaydet
-                    await self.store_group_mining_data(group_id, group_data)
-                    
-                except Exception as e:
-                    logger.error(f"Grup verisi güncellenirken hata: {str(e)}")
-                    logger.debug(traceback.format_exc())
-            
-            logger.info(f"Grup verileri güncellendi: {updated_count} güncellendi, {new_count} yeni eklendi")
-            return True
-                
-        except Exception as e:
-            logger.error(f"Grup verilerini güncelleme işlemi başarısız: {str(e)}")
-            logger.debug(traceback.format_exc())
-            return False
+            except Exception as e:
+                logger.error(f"Grup verilerini güncelleme işlemi başarısız: {str(e)}", exc_info=True)
+                return False
 
     async def update_group_members(self):
         """
@@ -570,6 +516,11 @@ class DataMiningService(BaseService):
             processed_groups = 0
             error_groups = 0
             
+            # Grup varlıklarını tek tek değil, toplu isteklerle önceden çöz
+            await self.entity_resolver.get_entities(
+                group[0] if isinstance(group, tuple) else group.get('group_id') for group in groups
+            )
+            
             # Rate limit önlemi - işlem adımı başına gecikme ekle
             delay_between_groups = 5  # saniye
             
@@ -590,15 +541,9 @@ class DataMiningService(BaseService):
                     logger.info(f"Grubun üyeleri alınıyor: {group_name} ({group_id})")
                     
                     try:
-                        # ID'nin türünü kontrol et ve debug bilgisi ekle
-                        real_id = int(group_id)
-                        logger.debug(f"Entity almaya çalışılıyor: ID={real_id}, tip={type(real_id)}")
-                        entity = await self.client.get_entity(real_id)
-                    except ValueError:
-                        # Sayısal değilse doğrudan kullan (username olabilir)
-                        logger.debug(f"Entity almaya çalışılıyor: ID={group_id}, (sayısal olmayan)")
-                        entity = await self.client.get_entity(group_id)
-                    except RPCError as e:
+                        # Önceden toplu çözüldüyse önbellekten gelir
+                        entity = await self.entity_resolver.get_entity(group_id)
+                    except (ValueError, RPCError) as e:
                         logger.warning(f"Grup entity alma hatası: {group_id} -> {str(e)}")
                         continue
                         
@@ -700,6 +645,7 @@ class DataMiningService(BaseService):
                     
                     # Her kullanıcı için
                     user_count = 0
+                    user_snapshots = []
                     for user in participants.users:
                         if not hasattr(user, 'id'):
                             continue
@@ -778,14 +724,20 @@ class DataMiningService(BaseService):
                             """
                             await self.db.execute(relation_query, (user_id, group_id))
                             
-                            # Data mining tablosuna da kaydet
-                            await self.store_user_mining_data(user_id, user_data, group_id)
+                            # Anlık görüntü grup sonunda tek seferde yazılır
+                            user_snapshots.append((user_id, user_data, group_id))
                             
                             user_count += 1
                             
                         except Exception as user_error:
                             logger.error(f"Kullanıcı {user_id} kaydedilirken hata: {str(user_error)}")
                     
+                    try:
+                        changed = await self.snapshots.record_many('user', user_snapshots)
+                        logger.debug(f"Grup {group_name}: {len(changed)} kullanıcının verisi değişti")
+                    except Exception as snapshot_error:
+                        logger.error(f"Kullanıcı anlık görüntüleri kaydedilirken hata: {str(snapshot_error)}")
+                    
                     logger.info(f"Grup {group_name} için {user_count} kullanıcı işlendi")
                     total_users += user_count
                     processed_groups += 1
@@ -803,26 +755,13 @@ class DataMiningService(BaseService):
 
     async def store_group_mining_data(self, group_id, group_data):
         """
-        Grup verilerini data_mining tablosuna kaydeder
+        Grup verilerini anlık görüntü deposuna kaydeder.
+        
+        Veri değişmediyse geçmişe yeni kayıt eklenmez.
         """
         try:
-            if not self.db.connected:
-                await self.db.connect()
-                
-            import json
-            data_json = json.dumps(group_data)
-            
-            query = """
-            INSERT INTO data_mining (
-                telegram_id, user_id, group_id, type, source, data, 
-                is_processed, created_at
-            ) VALUES (%s, NULL, %s, 'group', 'discover', %s, TRUE, NOW())
-            """
-            
-            # Parametre olarak tuple kullan, yıldız operatörü kullanma
-            await self.db.execute(query, (group_id, group_id, data_json))
-            
-            logger.debug(f"Grup verisi kaydedildi: {group_id}")
+            changed = await self.snapshots.record('group', int(group_id), group_data, group_id=int(group_id))
+            logger.debug(f"Grup verisi kaydedildi: {group_id} (değişti: {changed})")
             return True
             
         except Exception as e:
@@ -831,26 +770,16 @@ class DataMiningService(BaseService):
             
     async def store_user_mining_data(self, user_id, user_data, group_id=None):
         """
-        Kullanıcı verilerini data_mining tablosuna kaydeder
+        Kullanıcı verilerini anlık görüntü deposuna kaydeder.
+        
+        Veri değişmediyse geçmişe yeni kayıt eklenmez.
         """
         try:
-            if not self.db.connected:
-                await self.db.connect()
-                
-            import json
-            data_json = json.dumps(user_data)
-            
-            query = """
-            INSERT INTO data_mining (
-                telegram_id, user_id, group_id, type, source, data, 
-                is_processed, created_at
-            ) VALUES (%s, %s, %s, 'user', 'discover', %s, TRUE, NOW())
-            """
-            
-            # Parametre olarak tuple kullan, yıldız operatörü kullanma
-            await self.db.execute(query, (user_id, user_id, group_id, data_json))
-            
-            logger.debug(f"Kullanıcı verisi kaydedildi: {user_id}")
+            changed = await self.snapshots.record(
+                'user', int(user_id), user_data,
+                group_id=int(group_id) if group_id is not None else None
+            )
+            logger.debug(f"Kullanıcı verisi kaydedildi: {user_id} (değişti: {changed})")
             return True
             
         except Exception as e:
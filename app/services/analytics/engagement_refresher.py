@@ -0,0 +1,362 @@
+"""
+# ============================================================================ #
+# Dosya: engagement_refresher.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/engagement_refresher.py
+# İşlev: Takip edilen mesajların görüntülenme/iletme/tepki metriklerini toplu yeniler.
+#
+# Takip edilen mesajlar sohbet bazında gruplanır; vadesi gelen mesajlar için
+# sohbet başına API sınırı kadar (100) ID'lik tek bir GetMessagesViews ve
+# tek bir GetMessagesReactions isteği gönderilir. Her mesajın kendi yenileme
+# aralığı vardır: metrikleri değişen yeni mesajlar sık, değişmeyen ve
+# yaşlanan mesajlar giderek seyrek yenilenir; belirli yaşı aşanlar takipten
+# çıkar. Böylece binlerce mesaj için istek sayısı mesaj değil sohbet
+# sayısıyla büyür.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telethon.tl.functions.messages import GetMessagesViewsRequest, GetMessagesReactionsRequest
+from telethon.tl.types import UpdateMessageReactions
+
+from app.core.scheduler import wakeups
+from app.utils.flood_limiter import AdaptiveFloodLimiter, flood_limiter
+
+logger = logging.getLogger(__name__)
+
+# messages.getMessagesViews / getMessagesReactions çağrı başına ID sınırı
+MAX_IDS_PER_CALL = 100
+
+WAKEUP_KEY = "engagement_refresher"
+
+
+@dataclass
+class TrackedMessage:
+    """Yenilenen tek bir mesajın takip durumu"""
+    chat_id: int
+    message_id: int
+    tracked_id: int
+    sent_at: float
+    next_due: float
+    interval: float
+    views: Optional[int] = None
+    forwards: Optional[int] = None
+    reactions: Optional[int] = None
+
+    def metrics(self) -> Dict[str, int]:
+        """Son okunan metrikleri döndürür"""
+        return {
+            "views": self.views or 0,
+            "forwards": self.forwards or 0,
+            "reactions": self.reactions or 0
+        }
+
+
+def count_reactions(updates: Any) -> Dict[int, int]:
+    """
+    GetMessagesReactions yanıtındaki tepki sayılarını mesaj bazında toplar.
+
+    Args:
+        updates: Updates nesnesi
+
+    Returns:
+        Dict[int, int]: Mesaj ID -> toplam tepki sayısı
+    """
+    counts: Dict[int, int] = {}
+    for update in getattr(updates, "updates", None) or []:
+        if not isinstance(update, UpdateMessageReactions):
+            continue
+        results = getattr(update.reactions, "results", None) or []
+        counts[update.msg_id] = sum(result.count for result in results)
+    return counts
+
+
+class EngagementRefresher:
+    """
+    Takip edilen mesaj metriklerini sohbet bazında toplu isteklerle yeniler.
+
+    track() ile eklenen mesajlar `min_interval` aralıkla başlar. Her
+    yenilemede metrikleri değişen mesajın aralığı `min_interval`'e döner,
+    değişmeyenin aralığı iki katına çıkar; aralık mesaj yaşının 1/24'ünden
+    küçük ve `max_interval`'den büyük olamaz. `max_age` saniyeden eski
+    mesajlar takipten çıkarılır. Okunan değerler `sink(tracked_id, metrics)`
+    ile iletilir (ör. MessageAnalyticsService.observe_message_metrics).
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        sink: Callable[[int, Dict[str, int]], None],
+        max_ids_per_call: int = MAX_IDS_PER_CALL,
+        min_interval: float = 60.0,
+        max_interval: float = 3600.0,
+        max_age: float = 2 * 24 * 3600.0,
+        error_threshold: int = 5,
+        limiter: Optional[AdaptiveFloodLimiter] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Yenileyiciyi yapılandırır.
+
+        Args:
+            client: Telethon istemcisi
+            sink: Okunan metrikleri alan fonksiyon
+            max_ids_per_call: Tek istekteki en fazla mesaj ID'si
+            min_interval: En kısa yenileme aralığı (saniye)
+            max_interval: En uzun yenileme aralığı (saniye)
+            max_age: Bu yaştan eski mesajlar takipten çıkar (saniye)
+            error_threshold: Bir sohbet takipten çıkmadan önceki ardışık hata sayısı
+            limiter: İstek hız sınırlayıcısı (None ise paylaşılan flood_limiter)
+            clock: Zaman kaynağı (testler için)
+        """
+        self.client = client
+        self.sink = sink
+        self.max_ids_per_call = max(1, min(int(max_ids_per_call), MAX_IDS_PER_CALL))
+        self.min_interval = max(float(min_interval), 1.0)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.max_age = float(max_age)
+        self.error_threshold = max(int(error_threshold), 1)
+        self.limiter = limiter or flood_limiter
+        self.clock = clock
+
+        self._messages: Dict[int, Dict[int, TrackedMessage]] = {}
+        self._chat_errors: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self.is_running = False
+
+        self.stats = {
+            "refreshes": 0,
+            "requests": 0,
+            "messages_refreshed": 0,
+            "changed": 0,
+            "expired": 0,
+            "errors": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Takip
+    # ------------------------------------------------------------------ #
+
+    def track(self, chat_id: Any, message_id: int, tracked_id: int,
+              sent_at: Optional[float] = None) -> None:
+        """
+        Bir mesajı yenileme listesine ekler.
+
+        Args:
+            chat_id: Sohbet ID (str veya int)
+            message_id: Telegram mesaj ID
+            tracked_id: message_effectiveness ID
+            sent_at: Gönderim zamanı (epoch, None ise şimdi)
+        """
+        now = self.clock()
+        chat_id = int(chat_id)
+        self._messages.setdefault(chat_id, {})[int(message_id)] = TrackedMessage(
+            chat_id=chat_id,
+            message_id=int(message_id),
+            tracked_id=tracked_id,
+            sent_at=sent_at if sent_at is not None else now,
+            next_due=now + self.min_interval,
+            interval=self.min_interval
+        )
+        self._chat_errors.pop(chat_id, None)
+        # Döngü daha uzak bir vade bekliyorsa yeni mesajın vadesine çek
+        try:
+            wakeups.schedule(WAKEUP_KEY, self.min_interval)
+        except RuntimeError:
+            pass
+
+    def lookup(self, chat_id: Any, message_id: int) -> Optional[int]:
+        """
+        Takip edilen mesajın message_effectiveness ID'sini döndürür.
+
+        Returns:
+            Optional[int]: tracked_id veya takip edilmiyorsa None
+        """
+        try:
+            entry = self._messages.get(int(chat_id), {}).get(int(message_id))
+        except (TypeError, ValueError):
+            return None
+        return entry.tracked_id if entry else None
+
+    def untrack(self, chat_id: Any, message_id: int) -> None:
+        """Mesajı takipten çıkarır"""
+        chat = self._messages.get(int(chat_id))
+        if chat is None:
+            return
+        chat.pop(int(message_id), None)
+        if not chat:
+            self._messages.pop(int(chat_id), None)
+
+    @property
+    def tracked_count(self) -> int:
+        """Takip edilen mesaj sayısı"""
+        return sum(len(chat) for chat in self._messages.values())
+
+    def next_due_in(self) -> Optional[float]:
+        """
+        En yakın vadeye kalan süreyi döndürür.
+
+        Returns:
+            Optional[float]: Saniye veya takip edilen mesaj yoksa None
+        """
+        due = [entry.next_due for chat in self._messages.values() for entry in chat.values()]
+        if not due:
+            return None
+        return max(0.0, min(due) - self.clock())
+
+    # ------------------------------------------------------------------ #
+    # Yenileme
+    # ------------------------------------------------------------------ #
+
+    def _due_batches(self, now: float) -> List[Tuple[int, List[TrackedMessage]]]:
+        """Vadesi gelen mesajları sohbet bazında, en yeni mesaj önce olacak şekilde döndürür"""
+        batches = []
+        for chat_id, chat in list(self._messages.items()):
+            due = []
+            for entry in list(chat.values()):
+                if now - entry.sent_at > self.max_age:
+                    del chat[entry.message_id]
+                    self.stats["expired"] += 1
+                elif entry.next_due <= now:
+                    due.append(entry)
+            if not chat:
+                self._messages.pop(chat_id, None)
+                continue
+            if due:
+                due.sort(key=lambda entry: entry.sent_at, reverse=True)
+                batches.append((chat_id, due))
+        return batches
+
+    def _reschedule(self, entry: TrackedMessage, changed: bool, now: float) -> None:
+        """Mesajın yeni aralığını değişime ve yaşa göre belirler"""
+        interval = self.min_interval if changed else entry.interval * 2
+        interval = max(interval, (now - entry.sent_at) / 24)
+        entry.interval = min(interval, self.max_interval)
+        entry.next_due = now + entry.interval
+
+    async def _fetch_chunk(self, chat_id: int,
+                           chunk: List[TrackedMessage]) -> Dict[int, Dict[str, Optional[int]]]:
+        """Bir ID grubu için görüntülenme/iletme ve tepki sayılarını iki istekle okur"""
+        ids = [entry.message_id for entry in chunk]
+        views = await self.limiter.run(
+            "get_messages_views", self.client, GetMessagesViewsRequest(peer=chat_id, id=ids, increment=False)
+        )
+        self.stats["requests"] += 1
+
+        result: Dict[int, Dict[str, Optional[int]]] = {}
+        # Yanıt istekteki ID sırasını izler
+        for message_id, item in zip(ids, getattr(views, "views", None) or []):
+            result[message_id] = {"views": item.views, "forwards": item.forwards}
+
+        try:
+            updates = await self.limiter.run(
+                "get_messages_views", self.client, GetMessagesReactionsRequest(peer=chat_id, id=ids)
+            )
+            self.stats["requests"] += 1
+            reactions = count_reactions(updates)
+            for message_id in result:
+                result[message_id]["reactions"] = reactions.get(message_id, 0)
+        except Exception as e:
+            # Tepkiler kapalı olabilir; görüntülenme verisi yine de kullanılır
+            logger.debug(f"Tepki sayıları alınamadı ({chat_id}): {str(e)}")
+        return result
+
+    async def _refresh_chat(self, chat_id: int, due: List[TrackedMessage], now: float) -> int:
+        """Bir sohbetin vadesi gelen mesajlarını yeniler"""
+        refreshed = 0
+        for start in range(0, len(due), self.max_ids_per_call):
+            chunk = due[start:start + self.max_ids_per_call]
+            fetched = await self._fetch_chunk(chat_id, chunk)
+            for entry in chunk:
+                values = fetched.get(entry.message_id)
+                if values is None or values.get("views") is None:
+                    # Silinmiş veya erişilemeyen mesaj
+                    self.untrack(chat_id, entry.message_id)
+                    continue
+                previous = (entry.views, entry.forwards, entry.reactions)
+                entry.views = values["views"]
+                entry.forwards = values.get("forwards") or 0
+                if "reactions" in values:
+                    entry.reactions = values["reactions"]
+                changed = (entry.views, entry.forwards, entry.reactions) != previous
+                if changed:
+                    self.stats["changed"] += 1
+                    self.sink(entry.tracked_id, entry.metrics())
+                self._reschedule(entry, changed, now)
+                refreshed += 1
+        return refreshed
+
+    async def refresh_once(self) -> int:
+        """
+        Vadesi gelen tüm mesajları sohbet başına toplu isteklerle yeniler.
+
+        Returns:
+            int: Yenilenen mesaj sayısı
+        """
+        async with self._lock:
+            now = self.clock()
+            refreshed = 0
+            for chat_id, due in self._due_batches(now):
+                try:
+                    refreshed += await self._refresh_chat(chat_id, due, now)
+                    self._chat_errors.pop(chat_id, None)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    errors = self._chat_errors.get(chat_id, 0) + 1
+                    self._chat_errors[chat_id] = errors
+                    if errors >= self.error_threshold:
+                        logger.warning(f"Sohbet {chat_id} çok fazla hata verdiği için takipten çıkarıldı ({errors})")
+                        self._messages.pop(chat_id, None)
+                        self._chat_errors.pop(chat_id, None)
+                    else:
+                        logger.error(f"Sohbet {chat_id} metrikleri yenilenemedi: {str(e)}")
+                        for entry in due:
+                            self._reschedule(entry, False, now)
+
+            self.stats["refreshes"] += 1
+            self.stats["messages_refreshed"] += refreshed
+            if refreshed:
+                logger.debug(f"Etkileşim metrikleri yenilendi: {refreshed} mesaj, {self.tracked_count} takipte")
+            return refreshed
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """
+        Vadeler geldikçe yenileme yapan döngü.
+
+        Args:
+            stop_event: Ayarlandığında döngüyü sonlandıran olay
+        """
+        self.is_running = True
+        try:
+            while self.is_running:
+                timeout = self.next_due_in()
+                if timeout is None:
+                    timeout = self.min_interval
+                if not await wakeups.wait(WAKEUP_KEY, timeout=timeout, stop_event=stop_event):
+                    break
+                try:
+                    await self.refresh_once()
+                except Exception as e:
+                    logger.error(f"Etkileşim yenileme döngüsü hatası: {str(e)}")
+        finally:
+            self.is_running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Yenileyici istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "tracked": self.tracked_count,
+            "chats": len(self._messages),
+            "failing_chats": len(self._chat_errors)
+        }
@@ -0,0 +1,416 @@
+"""
+# ============================================================================ #
+# Dosya: error_log_writer.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/error_log_writer.py
+# İşlev: Hata kayıtları için toplu, yalnızca sona eklenen (append-only) log yazıcısı.
+#
+# Hata başına ayrı JSON dosyaları yerine kayıtlar satır bazlı JSON (NDJSON)
+# segmentlerine eklenir. Yazım arka plandaki tek bir iş parçacığında,
+# kuyrukta biriken kayıtlar toplanarak yapılır; olay döngüsü diske hiç
+# dokunmaz. Segmentler boyut veya yaş sınırında döndürülür. Her segmentin
+# yanında kategori -> (ofset, uzunluk) girdilerinden oluşan küçük bir indeks
+# dosyası tutulur; kategori görünümleri kopya dosyalar yerine bu indeksten
+# okunur.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".ndjson"
+INDEX_SUFFIX = ".idx"
+
+
+class ErrorLogWriter:
+    """
+    Arka plan iş parçacığıyla toplu yazan NDJSON segment yazıcısı.
+
+    append() yalnızca kuyruğa ekler. İş parçacığı kuyruktan en fazla
+    `batch_size` kaydı alır, hepsini tek bir write() ile aktif segmente
+    yazar ve kategori indeksini günceller. Segment `max_segment_bytes`
+    boyutunu veya `max_segment_age` yaşını aşınca yeni segmente geçilir.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 8 * 1024 * 1024,
+        max_segment_age: float = 3600.0,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        prefix: str = "errors"
+    ):
+        """
+        Yazıcıyı yapılandırır.
+
+        Args:
+            directory: Segmentlerin yazılacağı dizin
+            max_segment_bytes: Segment döndürme boyutu (bayt)
+            max_segment_age: Segment döndürme yaşı (saniye)
+            batch_size: Tek yazımda işlenecek en fazla kayıt
+            flush_interval: Kuyruk boşken iş parçacığının uyanma aralığı (saniye)
+            prefix: Segment dosya adı öneki
+        """
+        self.directory = directory
+        self.max_segment_bytes = max(int(max_segment_bytes), 1024)
+        self.max_segment_age = max(float(max_segment_age), 1.0)
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = max(float(flush_interval), 0.01)
+        self.prefix = prefix
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+
+        self._segment_path: Optional[str] = None
+        self._segment_file = None
+        self._index_file = None
+        self._segment_size = 0
+        self._segment_opened = 0.0
+        self._sequence = 0
+
+        # kategori -> [(segment_yolu, ofset, uzunluk), ...]
+        self._category_index: Dict[str, List[Tuple[str, int, int]]] = {}
+
+        self.stats = {
+            "appended": 0,
+            "written": 0,
+            "batches": 0,
+            "segments": 0,
+            "errors": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Yaşam döngüsü
+    # ------------------------------------------------------------------ #
+
+    def start(self) -> None:
+        """Dizini hazırlar, kategori indeksini yükler ve yazıcı iş parçacığını başlatır."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_category_index()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="error-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Kuyruktaki kayıtları yazar, iş parçacığını durdurur ve segmenti kapatır.
+
+        Args:
+            timeout: İş parçacığının bitmesi için beklenecek süre (saniye)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # İş parçacığı çalışmıyorsa kalan kayıtları burada yaz
+        self._drain()
+        self._close_segment()
+
+    def flush(self) -> None:
+        """Kuyruktaki tüm kayıtlar diske yazılana kadar bekler (bloklayıcı)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+        else:
+            self._drain()
+
+    # ------------------------------------------------------------------ #
+    # Yazma
+    # ------------------------------------------------------------------ #
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Kaydı yazım kuyruğuna ekler; diske dokunmaz.
+
+        Args:
+            record: JSON'a çevrilebilir kayıt (ErrorRecord.to_dict())
+        """
+        self._queue.put(record)
+        self.stats["appended"] += 1
+
+    def _run(self) -> None:
+        """Yazıcı iş parçacığı döngüsü"""
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate_by_age()
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _drain(self) -> None:
+        """Kuyruktaki kayıtları çağıran iş parçacığında yazar"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Bir grup kaydı tek yazımla aktif segmente ekler"""
+        try:
+            with self._write_lock:
+                if self._segment_file is None or self._needs_rotation():
+                    self._open_segment()
+
+                chunks = []
+                index_lines = []
+                offset = self._segment_size
+                for record in batch:
+                    line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                    category = str(record.get("category") or "GENERAL")
+                    chunks.append(line)
+                    index_lines.append(f"{category}\t{offset}\t{len(line)}\n")
+                    self._category_index.setdefault(category, []).append(
+                        (self._segment_path, offset, len(line))
+                    )
+                    offset += len(line)
+
+                self._segment_file.write(b"".join(chunks))
+                self._segment_file.flush()
+                self._index_file.write("".join(index_lines))
+                self._index_file.flush()
+                self._segment_size = offset
+
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Hata log segmenti yazılamadı ({len(batch)} kayıt): {str(e)}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    # ------------------------------------------------------------------ #
+    # Segment yönetimi
+    # ------------------------------------------------------------------ #
+
+    def _needs_rotation(self) -> bool:
+        """Aktif segment boyut veya yaş sınırını aştıysa True döndürür"""
+        return (
+            self._segment_size >= self.max_segment_bytes
+            or time.monotonic() - self._segment_opened >= self.max_segment_age
+        )
+
+    def _maybe_rotate_by_age(self) -> None:
+        """Boşta kalan eski segmenti kapatır; yeni segment ilk yazımda açılır"""
+        with self._write_lock:
+            if self._segment_file is not None and \
+                    time.monotonic() - self._segment_opened >= self.max_segment_age:
+                self._close_segment()
+
+    def _open_segment(self) -> None:
+        """Yeni bir segment ve indeks dosyası açar (kilit altında çağrılır)"""
+        self._close_segment()
+        self._sequence += 1
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._sequence:04d}{SEGMENT_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._segment_file = open(self._segment_path, "ab")
+        self._index_file = open(self._segment_path + INDEX_SUFFIX, "a", encoding="utf-8")
+        self._segment_size = self._segment_file.tell()
+        self._segment_opened = time.monotonic()
+        self.stats["segments"] += 1
+
+    def _close_segment(self) -> None:
+        """Aktif segmenti kapatır"""
+        for handle in (self._segment_file, self._index_file):
+            if handle is not None:
+                try:
+                    handle.close()
+                except Exception as e:
+                    logger.debug(f"Segment kapatılamadı: {str(e)}")
+        self._segment_file = None
+        self._index_file = None
+        self._segment_size = 0
+
+    def segments(self, since: Optional[datetime] = None) -> List[str]:
+        """
+        Segment dosyalarını eskiden yeniye döndürür.
+
+        Args:
+            since: Verilirse son yazımı bu zamandan eski segmentler atlanır
+
+        Returns:
+            List[str]: Segment yolları
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        cutoff = since.timestamp() if since else None
+        paths = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(self.prefix + "-") and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if cutoff is not None and mtime < cutoff:
+                continue
+            paths.append((mtime, name, path))
+        return [path for _, _, path in sorted(paths)]
+
+    def prune(self, older_than: datetime) -> int:
+        """
+        Son yazımı verilen zamandan eski segmentleri siler.
+
+        Args:
+            older_than: Silme sınırı
+
+        Returns:
+            int: Silinen segment sayısı
+        """
+        cutoff = older_than.timestamp()
+        removed = []
+        with self._write_lock:
+            for path in self.segments():
+                if path == self._segment_path and self._segment_file is not None:
+                    continue
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                    os.remove(path)
+                    if os.path.exists(path + INDEX_SUFFIX):
+                        os.remove(path + INDEX_SUFFIX)
+                    removed.append(path)
+                except OSError as e:
+                    logger.debug(f"Segment silinemedi ({path}): {str(e)}")
+            if removed:
+                removed_set = set(removed)
+                for category, entries in list(self._category_index.items()):
+                    kept = [entry for entry in entries if entry[0] not in removed_set]
+                    if kept:
+                        self._category_index[category] = kept
+                    else:
+                        del self._category_index[category]
+        return len(removed)
+
+    # ------------------------------------------------------------------ #
+    # Okuma
+    # ------------------------------------------------------------------ #
+
+    def iter_records(self, since: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Segmentlerdeki kayıtları eskiden yeniye satır satır akıtır.
+
+        Args:
+            since: Verilirse bu zamandan önce kapanmış segmentler okunmaz
+
+        Yields:
+            Dict[str, Any]: Kayıt sözlüğü
+        """
+        for path in self.segments(since):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            # Yarım kalmış son satır (ör. çökme) atlanır
+                            continue
+            except OSError as e:
+                logger.error(f"Hata log segmenti okunamadı ({path}): {str(e)}")
+
+    def _load_category_index(self) -> None:
+        """Segment indeks dosyalarından kategori indeksini kurar"""
+        self._category_index = {}
+        for path in self.segments():
+            index_path = path + INDEX_SUFFIX
+            if not os.path.exists(index_path):
+                continue
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.rstrip("\n").split("\t")
+                        if len(parts) != 3:
+                            continue
+                        self._category_index.setdefault(parts[0], []).append(
+                            (path, int(parts[1]), int(parts[2]))
+                        )
+            except (OSError, ValueError) as e:
+                logger.debug(f"Segment indeksi okunamadı ({index_path}): {str(e)}")
+
+    def read_category(self, category: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Kategorinin en yeni kayıtlarını indeks üzerinden okur.
+
+        Args:
+            category: Hata kategorisi
+            limit: En fazla kayıt sayısı
+
+        Returns:
+            List[Dict[str, Any]]: Yeniden eskiye kayıtlar
+        """
+        with self._write_lock:
+            entries = list(self._category_index.get(category, ())[-limit:])
+        records = []
+        handles: Dict[str, Any] = {}
+        try:
+            for path, offset, length in reversed(entries):
+                handle = handles.get(path)
+                if handle is None:
+                    handle = open(path, "rb")
+                    handles[path] = handle
+                handle.seek(offset)
+                try:
+                    records.append(json.loads(handle.read(length).decode("utf-8")))
+                except ValueError:
+                    continue
+        except OSError as e:
+            logger.error(f"Kategori kayıtları okunamadı ({category}): {str(e)}")
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return records
+
+    def categories(self) -> Dict[str, int]:
+        """
+        Kategori başına indekslenmiş kayıt sayılarını döndürür.
+
+        Returns:
+            Dict[str, int]: Kategori -> kayıt sayısı
+        """
+        with self._write_lock:
+            return {category: len(entries) for category, entries in self._category_index.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Yazıcı istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "pending": self._queue.qsize(),
+            "segment": os.path.basename(self._segment_path) if self._segment_path else None,
+            "segment_bytes": self._segment_size
+        }
@@ -21,6 +21,8 @@ from functools import wraps
 import socket
 
 from app.services.base_service import BaseService
+from app.services.analytics.error_store import ErrorStore
+from app.services.analytics.error_log_writer import ErrorLogWriter
 # from app.services.event_service import Event, on_event
 # from database.db_connection import get_db_pool
 
@@ -109,11 +111,15 @@ class ErrorService(BaseService):
             self.db_pool = None
             logger.warning("Veritabanı bağlantı havuzu oluşturulamadı, bazı özellikler çalışmayabilir")
         
-        self.errors = {}  # error_id -> ErrorRecord
+        self.max_retained_errors = 1000
+        # error_id -> ErrorRecord; zaman sıralı, kaynak/kategori/şiddet indeksli
+        self.errors = ErrorStore(capacity=self.max_retained_errors)
         self.error_queue = asyncio.Queue()
         self.processing_task = None
-        self.max_retained_errors = 1000
         self.error_log_path = "logs/errors"
+        # NDJSON segment yazıcısı; _start'ta yapılandırılmış yol ile kurulur
+        self.log_writer: Optional[ErrorLogWriter] = None
+        self.log_retention_days = 30
         self.notify_critical = True
         self.notify_error = True
         self.alert_threshold = 5  # Belirli bir sürede bu sayıdan fazla hata olursa uyarı
@@ -146,13 +152,13 @@ class ErrorService(BaseService):
         try:
             logger.info("ErrorService başlatılıyor...")
             
-            # Log dizinini oluştur
+            # Log dizinini oluştur ve segment yazıcısını başlat
             os.makedirs(self.error_log_path, exist_ok=True)
+            self.log_writer = ErrorLogWriter(self.error_log_path)
+            self.log_writer.start()
             
-            # Kategori bazlı log dizinleri oluştur
-            for category in self.category_thresholds.keys():
-                category_path = os.path.join(self.error_log_path, category.lower())
-                os.makedirs(category_path, exist_ok=True)
+            # Son 24 saatin kayıtlarını segmentlerden geri yükle
+            await self._load_error_records()
             
             # Hata işleme görevini başlat
             self.processing_task = asyncio.create_task(self._process_errors())
@@ -183,8 +189,9 @@ class ErrorService(BaseService):
                 except asyncio.CancelledError:
                     pass
             
-            # Tüm hata kayıtlarını kaydet
-            await self._save_error_records()
+            # Kuyruktaki kayıtları yaz ve segment yazıcısını durdur
+            if self.log_writer is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.log_writer.stop)
             
             # Original excepthook'u geri getir
             sys.excepthook = sys.__excepthook__
@@ -207,16 +214,18 @@ class ErrorService(BaseService):
             now = datetime.now()
             cutoff_time = now - timedelta(days=30)  # 30 günden eski hataları tut
             
-            # Çok sayıda hata varsa eski çözülmüş olanları temizle
-            if len(self.errors) > self.max_retained_errors:
-                # Çözülmüş hataları ve eski hataları temizle
-                self.errors = {
-                    error_id: error for error_id, error in self.errors.items()
-                    if (not error.resolved or error.resolved_at > cutoff_time)
-                }
+            # Kapasite sınırını depo uygular; burada eski çözülmüş hatalar temizlenir
+            self.errors.prune(
+                lambda error: error.resolved and error.resolved_at is not None
+                and error.resolved_at <= cutoff_time
+            )
                 
-            # Hata istatistiklerini kaydet
-            await self._save_error_records()
+            # Saklama süresini aşan segmentleri sil
+            if self.log_writer is not None:
+                retention_cutoff = now - timedelta(days=self.log_retention_days)
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.log_writer.prune, retention_cutoff
+                )
                 
         except Exception as e:
             logger.error(f"ErrorService güncelleme hatası: {str(e)}", exc_info=True)
@@ -293,21 +302,8 @@ class ErrorService(BaseService):
             error: İşlenecek hata kaydı
         """
         try:
-            # Hatayı kayıtlara ekle
-            self.errors[error.error_id] = error
-            
-            # Eski kayıtları temizle (max_retained_errors sayısını geçmemek için)
-            if len(self.errors) > self.max_retained_errors:
-                # En eski kayıtlardan başlayarak temizle
-                old_errors = sorted(
-                    [e for e in self.errors.values() if not e.resolved],
-                    key=lambda x: x.created_at
-                )
-                # Kaç kayıt temizleyeceğimizi hesapla
-                to_remove = len(self.errors) - self.max_retained_errors
-                # Temizle
-                for e in old_errors[:to_remove]:
-                    del self.errors[e.error_id]
+            # Hatayı kayıtlara ekle (kapasite aşılırsa en eski kayıt düşer)
+            self.errors.add(error)
             
             # Dosyaya kaydet
             self._log_error_to_file(error)
@@ -329,65 +325,64 @@ class ErrorService(BaseService):
     
     def _log_error_to_file(self, error: ErrorRecord):
         """
-        Hatayı dosyaya kaydeder
+        Hatayı segment yazıcısının kuyruğuna ekler; disk yazımı arka planda yapılır.
+        
+        Aynı error_id ile sonradan eklenen kayıt (ör. çözüm) öncekinin yerini alır.
         
         Args:
             error: Kaydedilecek hata
         """
         try:
-            # Önce ana log dizinine kaydet
-            timestamp = error.created_at.strftime("%Y%m%d-%H%M%S")
-            filename = f"{timestamp}_{error.error_id}_{error.severity.lower()}.json"
-            filepath = os.path.join(self.error_log_path, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(error.to_dict(), f, ensure_ascii=False, indent=2)
-            
-            # Yeni: Kategori bazlı dizine de kaydet
-            category_path = os.path.join(self.error_log_path, error.category.lower())
-            category_filepath = os.path.join(category_path, filename)
-            
-            with open(category_filepath, 'w', encoding='utf-8') as f:
-                json.dump(error.to_dict(), f, ensure_ascii=False, indent=2)
-                
-            logger.debug(f"Hata dosyaya kaydedildi: {filepath} ve {category_filepath}")
+            if self.log_writer is None:
+                return
+            self.log_writer.append(error.to_dict())
             
         except Exception as e:
-            logger.error(f"Hata dosyaya kaydedilirken beklenmeyen hata: {str(e)}")
+            logger.error(f"Hata log kuyruğuna eklenirken beklenmeyen hata: {str(e)}")
     
     async def _load_error_records(self):
         """
-        Mevcut hata kayıtlarını yükler
+        Son 24 saatin hata kayıtlarını NDJSON segmentlerinden akıtarak yükler.
+        
+        Segmentler yalnızca sona eklendiği için aynı error_id'nin son satırı
+        geçerli durumdur. Eski sürümün günlük errors_YYYY-MM-DD.json
+        dosyaları da okunur.
         """
         try:
             if not os.path.exists(self.error_log_path):
                 return
                 
-            # Son 24 saatteki hataları yükle
-            today = datetime.now().strftime('%Y-%m-%d')
-            yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+            cutoff = datetime.now() - timedelta(days=1)
+            latest: Dict[int, ErrorRecord] = {}
             
-            files_to_check = [
-                os.path.join(self.error_log_path, f"errors_{today}.json"),
-                os.path.join(self.error_log_path, f"errors_{yesterday}.json")
-            ]
+            def apply(error_dict: Dict) -> None:
+                try:
+                    error = ErrorRecord.from_dict(error_dict)
+                    if error.created_at > cutoff:
+                        latest[error.error_id] = error
+                except Exception as e:
+                    logger.error(f"Hata kaydı yüklenirken beklenmeyen hata: {str(e)}")
             
-            for file_path in files_to_check:
+            # Eski biçim: günlük dosyalar
+            for day in (cutoff, datetime.now()):
+                file_path = os.path.join(self.error_log_path, f"errors_{day.strftime('%Y-%m-%d')}.json")
                 if not os.path.exists(file_path):
                     continue
-                    
                 with open(file_path, 'r', encoding='utf-8') as f:
                     for line in f:
-                        try:
-                            error_dict = json.loads(line.strip())
-                            error = ErrorRecord.from_dict(error_dict)
-                            
-                            # Son 24 saat içindeki hataları yükle
-                            if error.created_at > datetime.now() - timedelta(days=1):
-                                self.errors[error.error_id] = error
-                                
-                        except Exception as e:
-                            logger.error(f"Hata kaydı yüklenirken beklenmeyen hata: {str(e)}")
+                        if line.strip():
+                            try:
+                                apply(json.loads(line))
+                            except ValueError:
+                                continue
+            
+            if self.log_writer is not None:
+                for error_dict in self.log_writer.iter_records(since=cutoff):
+                    apply(error_dict)
+            
+            # Depo zaman sıralı tutulduğu için oluşturulma zamanına göre ekle
+            for error in sorted(latest.values(), key=lambda e: e.created_at):
+                self.errors.add(error)
                             
             logger.info(f"{len(self.errors)} hata kaydı belleğe yüklendi")
                 
@@ -396,23 +391,14 @@ class ErrorService(BaseService):
     
     async def _save_error_records(self):
         """
-        Hata kayıtlarını dosyaya kaydeder
+        Kuyruktaki hata kayıtlarının diske yazılmasını bekler.
+        
+        Kayıtlar zaten eklendikçe segmentlere yazılır; dosya yeniden yazılmaz.
         """
         try:
-            if not self.errors:
+            if self.log_writer is None:
                 return
-                
-            # Günlük log dosyası adı
-            today = datetime.now().strftime('%Y-%m-%d')
-            log_file = os.path.join(self.error_log_path, f"errors_{today}.json")
-            
-            # Hatayı JSON formatına dönüştür ve dosyaya yaz
-            with open(log_file, 'w', encoding='utf-8') as f:
-                for error in self.errors.values():
-                    error_json = json.dumps(error.to_dict(), ensure_ascii=False, default=str)
-                    f.write(error_json + '\n')
-                    
-            logger.info(f"{len(self.errors)} hata kaydı dosyaya kaydedildi")
+            await asyncio.get_running_loop().run_in_executor(None, self.log_writer.flush)
                 
         except Exception as e:
             logger.error(f"Hata kayıtları kaydedilirken beklenmeyen hata: {str(e)}", exc_info=True)
@@ -473,14 +459,8 @@ class ErrorService(BaseService):
         threshold = self.category_thresholds.get(category, self.alert_threshold)
         window = self.category_windows.get(category, self.alert_window)
         
-        now = datetime.now()
-        window_start = now - timedelta(seconds=window)
-        
-        # Son window süresindeki hataları say
-        error_count = sum(
-            1 for e in self.errors.values()
-            if e.source == source and e.category == category and e.created_at >= window_start
-        )
+        # Son window süresindeki hataları kayan pencere sayacından al
+        error_count = self.errors.window_count(source, category, window)
         
         logger.debug(f"Hata eşiği kontrolü: {source} kaynağı, {category} kategorisi, {error_count}/{threshold} hata")
         
@@ -500,13 +480,9 @@ class ErrorService(BaseService):
         window = self.category_windows.get(category, self.alert_window)
         
         now = datetime.now()
-        window_start = now - timedelta(seconds=window)
         
         # Son window süresindeki hatalar
-        recent_errors = [
-            e for e in self.errors.values()
-            if e.source == source and e.category == category and e.created_at >= window_start
-        ]
+        recent_errors = self.errors.window_records(source, category, window, now)
         
         # Olayı yayınla
         event_data = {
@@ -644,9 +620,10 @@ class ErrorService(BaseService):
             error.resolved = True
             error.resolved_at = datetime.now()
             error.resolution_info = resolution_info
+            self.errors.mark_resolved(error_id)
             
-            # Dosyalara kaydet
-            await self._save_error_records()
+            # Güncel durumu segmente ekle (yükleme sırasında son satır geçerlidir)
+            self._log_error_to_file(error)
             
             return True
                 
@@ -672,39 +649,16 @@ class ErrorService(BaseService):
             List[Dict]: Bulunan hata kayıtları
         """
         try:
-            # Filtreleri uygula
-            filtered_errors = []
-            
-            for error in self.errors.values():
-                # Çözülmüş hataları filtrele
-                if not include_resolved and error.resolved:
-                    continue
-                    
-                # Kaynağa göre filtrele
-                if source and error.source != source:
-                    continue
-                    
-                # Şiddete göre filtrele
-                if severity and error.severity != severity:
-                    continue
-                    
-                # Zamana göre filtrele
-                if start_time and error.created_at < start_time:
-                    continue
-                    
-                if end_time and error.created_at > end_time:
-                    continue
-                    
-                filtered_errors.append(error.to_dict())
-                
-                # Limit kontrolü
-                if len(filtered_errors) >= limit:
-                    break
-            
-            # Oluşturulma zamanına göre sırala (en yeniden en eskiye)
-            filtered_errors.sort(key=lambda x: x['created_at'], reverse=True)
-            
-            return filtered_errors
+            # İndeks üzerinden yalnızca eşleşen kayıtları en yeniden en eskiye dolaş
+            filtered_errors = self.errors.query(
+                limit=limit,
+                source=source or None,
+                severity=severity or None,
+                include_resolved=include_resolved,
+                start_time=start_time,
+                end_time=end_time
+            )
+            return [error.to_dict() for error in filtered_errors]
                 
         except Exception as e:
             logger.error(f"Hatalar filtrelenirken beklenmeyen hata: {str(e)}", exc_info=True)
@@ -747,23 +701,13 @@ class ErrorService(BaseService):
                 }
             }
             
-            for error in self.errors.values():
-                # Çözülmüş hataları filtrele
-                if not include_resolved and error.resolved:
-                    continue
-                    
-                # Kaynağa göre filtrele
-                if source and error.source != source:
-                    continue
-                    
-                # Şiddete göre filtrele
-                if severity and error.severity != severity:
-                    continue
-                    
-                # Zamana göre filtrele
-                if start_time and error.created_at < start_time:
-                    continue
-                
+            matching = self.errors.iter_matching(
+                source=source or None,
+                severity=severity or None,
+                include_resolved=include_resolved,
+                start_time=start_time
+            )
+            for error in matching:
                 # Toplam sayı
                 counts["total"] += 1
                 
@@ -805,22 +749,35 @@ class ErrorService(BaseService):
         now = datetime.now()
         start_time = now - timedelta(hours=hours)
         
-        # Filtreleme
-        filtered_errors = [
-            e.to_dict() for e in self.errors.values()
-            if e.category == category and 
-               e.created_at >= start_time and
-               (include_resolved or not e.resolved)
-        ]
-        
-        # Tarih sırasına göre sırala (en yeniler önce)
-        sorted_errors = sorted(
-            filtered_errors,
-            key=lambda x: datetime.fromisoformat(x['created_at']),
-            reverse=True
+        # Kategori indeksinden en yeniler önce
+        filtered_errors = self.errors.query(
+            limit=limit,
+            category=category,
+            include_resolved=include_resolved,
+            start_time=start_time
         )
         
-        return sorted_errors[:limit]
+        return [e.to_dict() for e in filtered_errors]
+
+    async def get_category_log(self, category: str, limit: int = 100) -> List[Dict]:
+        """
+        Kategorinin diske yazılmış kayıtlarını segment indeksinden okur.
+
+        Bellekteki kapasiteden düşmüş eski kayıtlar dahil, yeniden eskiye döner.
+        Aynı hatanın çözüm kaydı ayrı bir satır olarak yer alabilir.
+
+        Args:
+            category: Hata kategorisi
+            limit: En fazla kaç kayıt döndürüleceği
+
+        Returns:
+            List[Dict]: Hata kayıtları listesi
+        """
+        if self.log_writer is None:
+            return []
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.log_writer.read_category, category, limit
+        )
 
     async def get_category_stats(self, hours: int = 24) -> Dict:
         """
@@ -838,26 +795,26 @@ class ErrorService(BaseService):
         # Kategorileri ve sayıları hesapla
         categories = {}
         
-        for error in self.errors.values():
-            if error.created_at >= start_time:
-                category = error.category
-                if category not in categories:
-                    categories[category] = {
-                        'total': 0,
-                        'resolved': 0,
-                        'by_severity': {
-                            'DEBUG': 0,
-                            'INFO': 0,
-                            'WARNING': 0,
-                            'ERROR': 0,
-                            'CRITICAL': 0
-                        }
+        # Yalnızca zaman penceresindeki kayıtlar dolaşılır
+        for error in self.errors.iter_matching(start_time=start_time):
+            category = error.category
+            if category not in categories:
+                categories[category] = {
+                    'total': 0,
+                    'resolved': 0,
+                    'by_severity': {
+                        'DEBUG': 0,
+                        'INFO': 0,
+                        'WARNING': 0,
+                        'ERROR': 0,
+                        'CRITICAL': 0
                     }
-                
-                categories[category]['total'] += 1
-                if error.resolved:
-                    categories[category]['resolved'] += 1
-                categories[category]['by_severity'][error.severity] += 1
+                }
+            
+            categories[category]['total'] += 1
+            if error.resolved:
+                categories[category]['resolved'] += 1
+            categories[category]['by_severity'][error.severity] += 1
         
         return {
             'timespan_hours': hours,
@@ -873,7 +830,9 @@ class ErrorService(BaseService):
             error_config (dict): Hata servisi konfigürasyonu
         """
         self.max_retained_errors = error_config.get('max_retained_errors', 1000)
+        self.errors.set_capacity(self.max_retained_errors)
         self.error_log_path = error_config.get('error_log_path', self.error_log_path)
+        self.log_retention_days = error_config.get('log_retention_days', self.log_retention_days)
         self.notify_critical = error_config.get('notify_critical', True)
         self.notify_error = error_config.get('notify_error', True)
         self.alert_threshold = error_config.get('alert_threshold', 5)
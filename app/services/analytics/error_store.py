@@ -0,0 +1,396 @@
+"""
+# ============================================================================ #
+# Dosya: error_store.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/error_store.py
+# İşlev: ErrorService için indeksli, kapasite sınırlı bellek içi hata deposu.
+#
+# Kayıtlar eklenme (zaman) sırasıyla halka tampon gibi tutulur; kapasite
+# aşıldığında en eski kayıt O(1) ile düşer. Kaynak, kategori, şiddet ve
+# çözülmemiş durum için ikincil indeksler tutulur; filtreli sorgular yalnızca
+# eşleşen indeksteki kayıtları yeniden eskiye dolaşır ve zaman sınırına
+# ulaşınca durur. (kaynak, kategori) çiftleri için kayan pencere sayaçları
+# eşik kontrolünü tüm kayıtları taramadan yapar.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sıralı küme olarak kullanılan indeks tipi (error_id -> None)
+IdIndex = "OrderedDict[int, None]"
+
+
+class SlidingWindowCounter:
+    """
+    Tek bir (kaynak, kategori) çifti için kayan pencere sayacı.
+
+    Her hata (zaman, error_id) olarak kuyruğa eklenir; sayım sırasında
+    pencere dışına düşen girdiler baştan atılır. Her girdi bir kez eklenip
+    bir kez atıldığı için işlem başına maliyet amortize O(1)'dir.
+    """
+
+    def __init__(self):
+        self._events: Deque[Tuple[datetime, int]] = deque()
+
+    def add(self, timestamp: datetime, error_id: int) -> None:
+        """Yeni bir hata girdisi ekler"""
+        self._events.append((timestamp, error_id))
+
+    def _trim(self, window_start: datetime) -> None:
+        """Pencere başlangıcından eski girdileri atar"""
+        events = self._events
+        while events and events[0][0] < window_start:
+            events.popleft()
+
+    def count(self, window: float, now: Optional[datetime] = None) -> int:
+        """
+        Son `window` saniyedeki hata sayısını döndürür.
+
+        Args:
+            window: Pencere genişliği (saniye)
+            now: Referans zaman (None ise şimdiki zaman)
+
+        Returns:
+            int: Penceredeki hata sayısı
+        """
+        now = now or datetime.now()
+        self._trim(now - timedelta(seconds=window))
+        return len(self._events)
+
+    def error_ids(self, window: float, now: Optional[datetime] = None) -> List[int]:
+        """
+        Penceredeki hataların ID'lerini eskiden yeniye döndürür.
+
+        Returns:
+            List[int]: Hata ID'leri
+        """
+        now = now or datetime.now()
+        self._trim(now - timedelta(seconds=window))
+        return [error_id for _, error_id in self._events]
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+class ErrorStore:
+    """
+    İndeksli hata deposu.
+
+    Sözlük arayüzünü (errors[id], id in errors, values(), len()) korur,
+    böylece ErrorService.errors olarak doğrudan kullanılabilir. Kayıtların
+    `created_at`, `source`, `category`, `severity` ve `resolved` alanları
+    ErrorRecord ile aynıdır; `resolved` değiştiğinde mark_resolved()
+    çağrılmalıdır.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Depoyu yapılandırır.
+
+        Args:
+            capacity: Tutulacak en fazla kayıt sayısı
+        """
+        self.capacity = max(int(capacity), 1)
+        self._records: "OrderedDict[int, Any]" = OrderedDict()
+        self._by_source: Dict[str, IdIndex] = {}
+        self._by_category: Dict[str, IdIndex] = {}
+        self._by_severity: Dict[str, IdIndex] = {}
+        self._unresolved: IdIndex = OrderedDict()
+        self._windows: Dict[Tuple[str, str], SlidingWindowCounter] = {}
+
+        self.stats = {
+            "added": 0,
+            "replaced": 0,
+            "evicted": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Ekleme / silme
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _index_add(index: Dict[str, IdIndex], key: str, error_id: int) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = OrderedDict()
+            index[key] = bucket
+        bucket[error_id] = None
+
+    @staticmethod
+    def _index_remove(index: Dict[str, IdIndex], key: str, error_id: int) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(error_id, None)
+        if not bucket:
+            del index[key]
+
+    def add(self, record: Any) -> None:
+        """
+        Kaydı ekler; kapasite aşılırsa en eski kayıt düşer.
+
+        Args:
+            record: ErrorRecord
+        """
+        error_id = record.error_id
+        if error_id in self._records:
+            # Aynı milisaniyede oluşan ID'ler: eski kaydın indekslerini temizle
+            self._remove(error_id)
+            self.stats["replaced"] += 1
+
+        self._records[error_id] = record
+        self._index_add(self._by_source, record.source, error_id)
+        self._index_add(self._by_category, record.category, error_id)
+        self._index_add(self._by_severity, record.severity, error_id)
+        if not record.resolved:
+            self._unresolved[error_id] = None
+
+        key = (record.source, record.category)
+        counter = self._windows.get(key)
+        if counter is None:
+            counter = SlidingWindowCounter()
+            self._windows[key] = counter
+        counter.add(record.created_at, error_id)
+        self.stats["added"] += 1
+
+        while len(self._records) > self.capacity:
+            oldest_id = next(iter(self._records))
+            self._remove(oldest_id)
+            self.stats["evicted"] += 1
+
+    def _remove(self, error_id: int) -> Optional[Any]:
+        """Kaydı ve tüm indeks girdilerini siler"""
+        record = self._records.pop(error_id, None)
+        if record is None:
+            return None
+        self._index_remove(self._by_source, record.source, error_id)
+        self._index_remove(self._by_category, record.category, error_id)
+        self._index_remove(self._by_severity, record.severity, error_id)
+        self._unresolved.pop(error_id, None)
+        return record
+
+    def remove(self, error_id: int) -> bool:
+        """
+        Kaydı siler (pencere sayaçları etkilenmez).
+
+        Returns:
+            bool: Kayıt varsa True
+        """
+        return self._remove(error_id) is not None
+
+    def mark_resolved(self, error_id: int) -> None:
+        """Çözülen kaydı çözülmemiş indeksinden çıkarır"""
+        self._unresolved.pop(error_id, None)
+
+    def prune(self, predicate) -> int:
+        """
+        Koşulu sağlayan kayıtları siler.
+
+        Args:
+            predicate: ErrorRecord alıp True dönerse kaydın silineceği fonksiyon
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        to_remove = [error_id for error_id, record in self._records.items() if predicate(record)]
+        for error_id in to_remove:
+            self._remove(error_id)
+        return len(to_remove)
+
+    def set_capacity(self, capacity: int) -> None:
+        """Kapasiteyi günceller ve fazla kayıtları düşürür"""
+        self.capacity = max(int(capacity), 1)
+        while len(self._records) > self.capacity:
+            self._remove(next(iter(self._records)))
+            self.stats["evicted"] += 1
+
+    def clear(self) -> None:
+        """Tüm kayıtları ve indeksleri siler"""
+        self._records.clear()
+        self._by_source.clear()
+        self._by_category.clear()
+        self._by_severity.clear()
+        self._unresolved.clear()
+        self._windows.clear()
+
+    # ------------------------------------------------------------------ #
+    # Pencere sayaçları
+    # ------------------------------------------------------------------ #
+
+    def window_count(self, source: str, category: str, window: float,
+                     now: Optional[datetime] = None) -> int:
+        """
+        (kaynak, kategori) için son `window` saniyedeki hata sayısını döndürür.
+
+        Returns:
+            int: Hata sayısı
+        """
+        counter = self._windows.get((source, category))
+        if counter is None:
+            return 0
+        count = counter.count(window, now)
+        if not count:
+            # Boşalan sayaçları at ki anahtar sayısı sınırsız büyümesin
+            del self._windows[(source, category)]
+        return count
+
+    def window_records(self, source: str, category: str, window: float,
+                       now: Optional[datetime] = None) -> List[Any]:
+        """
+        (kaynak, kategori) için penceredeki ve hâlâ depoda olan kayıtları döndürür.
+
+        Returns:
+            List[Any]: Eskiden yeniye ErrorRecord listesi
+        """
+        counter = self._windows.get((source, category))
+        if counter is None:
+            return []
+        records = self._records
+        return [records[error_id] for error_id in counter.error_ids(window, now) if error_id in records]
+
+    # ------------------------------------------------------------------ #
+    # Sorgular
+    # ------------------------------------------------------------------ #
+
+    def _candidates(self, source: Optional[str], category: Optional[str],
+                    severity: Optional[str], include_resolved: bool) -> Iterator[int]:
+        """
+        Filtrelerden en küçük indeksi seçip ID'leri yeniden eskiye döndürür.
+        """
+        indexes = []
+        if source is not None:
+            indexes.append(self._by_source.get(source, {}))
+        if category is not None:
+            indexes.append(self._by_category.get(category, {}))
+        if severity is not None:
+            indexes.append(self._by_severity.get(severity, {}))
+        if not include_resolved:
+            indexes.append(self._unresolved)
+        if not indexes:
+            return reversed(self._records)
+        return reversed(min(indexes, key=len))
+
+    def iter_matching(
+        self,
+        source: Optional[str] = None,
+        category: Optional[str] = None,
+        severity: Optional[str] = None,
+        include_resolved: bool = True,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Iterator[Any]:
+        """
+        Filtrelere uyan kayıtları yeniden eskiye doğru üretir.
+
+        Kayıtlar zaman sırasıyla eklendiği için `start_time`'dan eski ilk
+        kayıtta dolaşım durur.
+
+        Args:
+            source: Kaynak filtresi
+            category: Kategori filtresi
+            severity: Şiddet filtresi
+            include_resolved: Çözülmüş kayıtlar dahil edilsin mi
+            start_time: Başlangıç zamanı
+            end_time: Bitiş zamanı
+
+        Yields:
+            ErrorRecord: Eşleşen kayıt
+        """
+        records = self._records
+        for error_id in self._candidates(source, category, severity, include_resolved):
+            record = records[error_id]
+            if start_time is not None and record.created_at < start_time:
+                break
+            if end_time is not None and record.created_at > end_time:
+                continue
+            if source is not None and record.source != source:
+                continue
+            if category is not None and record.category != category:
+                continue
+            if severity is not None and record.severity != severity:
+                continue
+            if not include_resolved and record.resolved:
+                continue
+            yield record
+
+    def query(self, limit: int = 100, **filters) -> List[Any]:
+        """
+        Filtrelere uyan en yeni `limit` kaydı döndürür.
+
+        Args:
+            limit: En fazla kayıt sayısı
+            **filters: iter_matching() filtreleri
+
+        Returns:
+            List[Any]: Yeniden eskiye ErrorRecord listesi
+        """
+        results = []
+        if limit <= 0:
+            return results
+        for record in self.iter_matching(**filters):
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    # ------------------------------------------------------------------ #
+    # Sözlük arayüzü
+    # ------------------------------------------------------------------ #
+
+    def __setitem__(self, error_id: int, record: Any) -> None:
+        record.error_id = error_id
+        self.add(record)
+
+    def __getitem__(self, error_id: int) -> Any:
+        return self._records[error_id]
+
+    def __delitem__(self, error_id: int) -> None:
+        if self._remove(error_id) is None:
+            raise KeyError(error_id)
+
+    def __contains__(self, error_id: object) -> bool:
+        return error_id in self._records
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __bool__(self) -> bool:
+        return bool(self._records)
+
+    def get(self, error_id: int, default: Any = None) -> Any:
+        return self._records.get(error_id, default)
+
+    def keys(self):
+        return self._records.keys()
+
+    def values(self):
+        return self._records.values()
+
+    def items(self):
+        return self._records.items()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Depo istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "size": len(self._records),
+            "capacity": self.capacity,
+            "unresolved": len(self._unresolved),
+            "sources": len(self._by_source),
+            "categories": len(self._by_category),
+            "window_keys": len(self._windows)
+        }
@@ -0,0 +1,287 @@
+"""
+# ============================================================================ #
+# Dosya: group_mining.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/group_mining.py
+# İşlev: DataMiningService için artımlı grup madenciliği hattı.
+#
+# Tüm madencilik işlerinin ve hedef grupların grup kümesi tek bir tekrarsız
+# listeye indirilir; varlıklar oturum önbelleğindeki erişim anahtarlarıyla
+# 100'lük GetChannels/GetChats istekleriyle toplu çözülür. Her parti önce
+# MiningSnapshotStore'a tek ifadeyle yazılır; içerik özeti (hash) değişmeyen
+# grupların `groups` satırına dokunulmaz ve geçmişe kayıt eklenmez.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.messages import GetChatsRequest
+from telethon.tl.types import InputChannel, InputPeerChannel, InputPeerChat
+
+from app.db.async_connection_pool import AsyncDbConnectionPool, get_db_pool
+from app.db.mining_snapshots import MiningSnapshotStore
+from app.utils.flood_limiter import AdaptiveFloodLimiter, flood_limiter
+
+logger = logging.getLogger(__name__)
+
+# channels.getChannels / messages.getChats çağrı başına ID sınırı
+MAX_IDS_PER_CALL = 100
+
+# Yalnızca içeriği değişen grupların satırlarını tek ifadede upsert eder
+UPSERT_GROUPS_QUERY = """
+    INSERT INTO groups AS g (group_id, name, username, description, is_public, source)
+    SELECT *, 'discover'
+    FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $5::boolean[])
+    ON CONFLICT (group_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        username = EXCLUDED.username,
+        description = EXCLUDED.description,
+        is_public = EXCLUDED.is_public
+"""
+
+
+def dedupe_groups(*sources: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Birden çok kaynaktaki grupları group_id'ye göre tekrarsız birleştirir.
+
+    Kaynak öğeleri grup sözlükleri ({'group_id': ..., 'name': ...}) veya
+    yalın grup ID'leri olabilir; aynı grup için ilk görülen ad korunur.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: group_id (str) -> grup sözlüğü
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        for item in source or []:
+            group = item if isinstance(item, dict) else {"group_id": item}
+            group_id = group.get("group_id")
+            if group_id in (None, ""):
+                continue
+            key = str(group_id)
+            if key not in groups:
+                groups[key] = {**group, "group_id": key}
+            elif not groups[key].get("name") and group.get("name"):
+                groups[key]["name"] = group["name"]
+    return groups
+
+
+class GroupMiningPipeline:
+    """
+    Grup verilerini toplu çözüp değişenleri tek ifadeyle yazan hat.
+
+    run() sırasıyla: tekrarsız grup kümesini oturum önbelleğinden giriş
+    varlıklarına çevirir, kanalları GetChannels ve basit grupları GetChats
+    ile 100'lük partiler halinde çözer, ardından her partiyi
+    önce anlık görüntü deposuna, sonra yalnızca değişen gruplar için
+    groups tablosuna yazar.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        pool: Optional[AsyncDbConnectionPool] = None,
+        batch_size: int = MAX_IDS_PER_CALL,
+        limiter: Optional[AdaptiveFloodLimiter] = None,
+        snapshots: Optional[MiningSnapshotStore] = None
+    ):
+        """
+        Hattı yapılandırır.
+
+        Args:
+            client: Telethon istemcisi
+            pool: Asenkron bağlantı havuzu (None ise ilk kullanımda alınır)
+            batch_size: Çözümleme ve yazma partisi boyutu (en fazla 100)
+            limiter: İstek hız sınırlayıcısı (None ise paylaşılan flood_limiter)
+            snapshots: Anlık görüntü deposu (None ise aynı havuzla oluşturulur)
+        """
+        self.client = client
+        self.pool = pool
+        self.batch_size = max(1, min(int(batch_size), MAX_IDS_PER_CALL))
+        self.limiter = limiter or flood_limiter
+        self.snapshots = snapshots or MiningSnapshotStore(pool=pool)
+
+        self.stats = {
+            "runs": 0,
+            "groups_seen": 0,
+            "resolved": 0,
+            "unresolved": 0,
+            "requests": 0,
+            "snapshots": 0
+        }
+
+    async def _get_pool(self) -> AsyncDbConnectionPool:
+        if self.pool is None:
+            self.pool = await get_db_pool()
+            self.snapshots.pool = self.snapshots.pool or self.pool
+        return self.pool
+
+    # ------------------------------------------------------------------ #
+    # Çözümleme
+    # ------------------------------------------------------------------ #
+
+    async def _input_peer(self, group_id: str) -> Any:
+        """Grup ID'sini oturum önbelleğinden giriş varlığına çevirir"""
+        try:
+            peer = int(group_id)
+        except ValueError:
+            # Sayısal değilse kullanıcı adıdır
+            peer = group_id
+        try:
+            return await self.client.get_input_entity(peer)
+        except ValueError:
+            # Önbellekte yok; tekil çözümlemeye düş
+            entity = await self.client.get_entity(peer)
+            return await self.client.get_input_entity(entity)
+
+    async def resolve(self, group_ids: List[str]) -> Dict[str, Any]:
+        """
+        Grupların varlıklarını toplu isteklerle çözer.
+
+        Args:
+            group_ids: Grup ID'leri (str)
+
+        Returns:
+            Dict[str, Any]: group_id -> Channel/Chat varlığı (çözülemeyenler yok)
+        """
+        channels: Dict[int, Tuple[str, InputChannel]] = {}
+        chats: Dict[int, str] = {}
+        for group_id in group_ids:
+            try:
+                peer = await self._input_peer(group_id)
+            except Exception as e:
+                self.stats["unresolved"] += 1
+                logger.warning(f"Grup giriş varlığı alınamadı: {group_id} -> {str(e)}")
+                continue
+            if isinstance(peer, InputPeerChannel):
+                channels[peer.channel_id] = (group_id, InputChannel(peer.channel_id, peer.access_hash))
+            elif isinstance(peer, InputPeerChat):
+                chats[peer.chat_id] = group_id
+            else:
+                self.stats["unresolved"] += 1
+                logger.debug(f"Grup olmayan varlık atlandı: {group_id} ({type(peer).__name__})")
+
+        resolved: Dict[str, Any] = {}
+        channel_items = list(channels.items())
+        for start in range(0, len(channel_items), self.batch_size):
+            chunk = channel_items[start:start + self.batch_size]
+            result = await self.limiter.run(
+                "get_channels", self.client, GetChannelsRequest(id=[item[1][1] for item in chunk])
+            )
+            self.stats["requests"] += 1
+            for entity in getattr(result, "chats", None) or []:
+                if entity.id in channels:
+                    resolved[channels[entity.id][0]] = entity
+
+        chat_ids = list(chats)
+        for start in range(0, len(chat_ids), self.batch_size):
+            chunk = chat_ids[start:start + self.batch_size]
+            result = await self.limiter.run("get_channels", self.client, GetChatsRequest(id=chunk))
+            self.stats["requests"] += 1
+            for entity in getattr(result, "chats", None) or []:
+                if entity.id in chats:
+                    resolved[chats[entity.id]] = entity
+
+        missing = len(channels) + len(chats) - len(resolved)
+        if missing > 0:
+            self.stats["unresolved"] += missing
+        self.stats["resolved"] += len(resolved)
+        return resolved
+
+    # ------------------------------------------------------------------ #
+    # Yazma
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def group_data(group: Dict[str, Any], entity: Any) -> Dict[str, Any]:
+        """Varlıktan data_mining anlık görüntüsüne yazılacak grup verisini çıkarır"""
+        group_id = group["group_id"]
+        username = getattr(entity, "username", None)
+        return {
+            "id": group_id,
+            "name": getattr(entity, "title", None) or group.get("name") or f"Grup {group_id}",
+            "username": username,
+            "description": getattr(entity, "about", None),
+            "member_count": getattr(entity, "participants_count", None) or 0,
+            "is_public": username is not None,
+            "source": "discover"
+        }
+
+    async def store(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Grup verilerini anlık görüntü deposuna yazar, değişen grupları upsert eder.
+
+        Args:
+            rows: group_data() çıktıları
+
+        Returns:
+            int: İçeriği değişen (veya yeni) grup sayısı
+        """
+        if not rows:
+            return 0
+        pool = await self._get_pool()
+        await self.snapshots.ensure_schema()
+        changed_total = 0
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            # Anlık görüntü ile groups satırı aynı transaction'da yazılır; upsert
+            # başarısız olursa yeni hash de geri alınır ve grup sonraki turda onarılır
+            async with pool.acquire() as connection:
+                async with connection.transaction():
+                    changed_ids = set(await self.snapshots.record_many(
+                        "group", [(int(row["id"]), row, int(row["id"])) for row in chunk],
+                        connection=connection
+                    ))
+                    changed = [row for row in chunk if int(row["id"]) in changed_ids]
+                    if not changed:
+                        continue
+                    await connection.execute(
+                        UPSERT_GROUPS_QUERY,
+                        [int(row["id"]) for row in changed],
+                        [row["name"] for row in changed],
+                        [row["username"] for row in changed],
+                        [row["description"] for row in changed],
+                        [row["is_public"] for row in changed]
+                    )
+            changed_total += len(changed)
+        self.stats["snapshots"] += changed_total
+        return changed_total
+
+    async def run(self, *sources: Iterable[Any]) -> Dict[str, int]:
+        """
+        Kaynaklardaki tekrarsız grup kümesini çözer ve değişenleri yazar.
+
+        Args:
+            *sources: Grup sözlüğü veya grup ID'si listeleri
+
+        Returns:
+            Dict[str, int]: groups/resolved/changed sayıları
+        """
+        groups = dedupe_groups(*sources)
+        self.stats["runs"] += 1
+        self.stats["groups_seen"] += len(groups)
+        if not groups:
+            return {"groups": 0, "resolved": 0, "changed": 0}
+
+        entities = await self.resolve(list(groups))
+        rows = []
+        for group_id, entity in entities.items():
+            group = groups[group_id]
+            if not group_id.lstrip("-").isdigit():
+                # Kullanıcı adıyla verilen gruplar gerçek ID ile saklanır
+                group = {**group, "group_id": str(entity.id)}
+            rows.append(self.group_data(group, entity))
+        changed = await self.store(rows)
+        logger.info(f"Grup madenciliği: {len(groups)} grup, {len(entities)} çözüldü, {changed} değişti")
+        return {"groups": len(groups), "resolved": len(entities), "changed": changed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Hat istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return dict(self.stats)
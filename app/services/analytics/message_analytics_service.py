@@ -23,6 +23,9 @@ from app.models.messaging import (
     MessageEffectivenessCreate, DMConversionCreate
 )
 from app.core.logger import get_logger
+from app.services.analytics.analytics_export import AnalyticsExporter
+from app.db.engagement_buffer import EngagementBuffer
+from app.services.analytics.report_engine import AnalyticsReportEngine
 
 logger = get_logger(__name__)
 
@@ -75,6 +78,13 @@ class MessageAnalyticsService(BaseService):
             "by_source": {}
         }
         
+        # Etkileşim metrikleri mesaj bazında birleştirilip toplu yazılır
+        self.engagement = EngagementBuffer()
+        
+        # Raporlar canlı tablolar yerine gün bölümlü aktarım dosyalarından üretilir
+        self.exporter = AnalyticsExporter(export_dir=kwargs.get('export_dir', 'app/data/analytics_export'))
+        self.report_engine = AnalyticsReportEngine(self.exporter.export_dir)
+        
         # Son rapor oluşturma zamanı
         self.last_report_time = datetime.now() - timedelta(days=1)
         
@@ -93,7 +103,12 @@ class MessageAnalyticsService(BaseService):
         try:
             logger.info(f"{self.service_name} başlatılıyor...")
             
-            # İlk metrikleri yükle
+            # Etkileşim tamponunu başlat
+            await self.engagement.start()
+            
+            # Aktarım dosyaları önceki çalışmadan kalmış olabilir; servis hazır
+            # bildirilmeden önce bir kez aktarıp metrikleri güncel verilerden yükle
+            await self._export_analytics()
             await self._load_metrics()
             
             self.initialized = True
@@ -114,6 +129,7 @@ class MessageAnalyticsService(BaseService):
         """
         try:
             logger.info(f"{self.service_name} durduruluyor...")
+            await self.engagement.stop()
             self.running = False
             self.initialized = False
             logger.info(f"{self.service_name} durduruldu")
@@ -133,6 +149,9 @@ class MessageAnalyticsService(BaseService):
                 
             logger.debug(f"{self.service_name} güncelleniyor...")
             
+            # Değişen günleri kolon dosyalarına aktar
+            await self._export_analytics()
+            
             # Metrikleri güncelle
             await self._update_metrics()
             
@@ -146,7 +165,49 @@ class MessageAnalyticsService(BaseService):
         except Exception as e:
             logger.error(f"{self.service_name} güncelleme hatası: {str(e)}", exc_info=True)
     
+    async def _export_analytics(self) -> None:
+        """Son aktarımdan beri değişen günleri dosyalara yazar."""
+        try:
+            written = await self.exporter.export()
+            logger.debug(f"Analitik aktarımı tamamlandı: {written}")
+        except Exception as e:
+            logger.error(f"Analitik aktarım hatası: {str(e)}", exc_info=True)
+    
+    async def _run_report(self, func, *args):
+        """Rapor motoru hesabını olay döngüsü dışında çalıştırır."""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    
     async def _load_metrics(self) -> None:
+        """Metrikleri aktarım dosyalarından, yoksa veritabanından yükler."""
+        try:
+            if self.report_engine.has_data("message_effectiveness"):
+                engine = self.report_engine
+                self.category_metrics = await self._run_report(engine.category_performance)
+                by_type = await self._run_report(engine.conversion_stats)
+                funnel = await self._run_report(engine.conversion_funnel)
+                
+                self.conversion_metrics["by_type"] = {
+                    conv_type: {key: stats[key] for key in ("count", "successful", "unique_users")}
+                    for conv_type, stats in by_type.items()
+                }
+                self.conversion_metrics["total"] = sum(s["count"] for s in by_type.values())
+                self.conversion_metrics["successful"] = sum(s["successful"] for s in by_type.values())
+                self.conversion_metrics["by_source"] = {
+                    category: {
+                        "count": steps["converted"],
+                        "successful": steps["successful"],
+                        "conversion_rate": steps["successful"] / steps["converted"] if steps["converted"] > 0 else 0
+                    }
+                    for category, steps in funnel.items() if steps["converted"] > 0
+                }
+                logger.info(f"Metrikler aktarım dosyalarından yüklendi: {len(self.category_metrics)} kategori")
+                return
+        except Exception as e:
+            logger.error(f"Aktarım dosyalarından metrik yükleme hatası: {str(e)}", exc_info=True)
+        
+        await self._load_metrics_from_db()
+    
+    async def _load_metrics_from_db(self) -> None:
         """Mevcut metrikleri veritabanından yükler."""
         try:
             session = next(get_session())
@@ -251,107 +312,13 @@ class MessageAnalyticsService(BaseService):
         try:
             session = next(get_session())
             yesterday = datetime.now() - timedelta(days=1)
-            yesterday_start = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-            yesterday_end = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            # Günlük mesaj istatistikleri
-            daily_msg_query = text("""
-                SELECT category, COUNT(*) as count,
-                       AVG(views) as avg_views,
-                       AVG(reactions) as avg_reactions,
-                       AVG(replies) as avg_replies,
-                       AVG(forwards) as avg_forwards
-                FROM message_effectiveness
-                WHERE sent_at BETWEEN :start AND :end
-                GROUP BY category
-            """)
             
-            daily_msg_result = session.execute(
-                daily_msg_query, 
-                {"start": yesterday_start, "end": yesterday_end}
-            )
-            
-            daily_msg_stats = {}
-            for row in daily_msg_result:
-                daily_msg_stats[row[0]] = {
-                    "count": row[1],
-                    "avg_views": row[2] or 0,
-                    "avg_reactions": row[3] or 0,
-                    "avg_replies": row[4] or 0,
-                    "avg_forwards": row[5] or 0
-                }
-            
-            # Günlük dönüşüm istatistikleri
-            daily_conv_query = text("""
-                SELECT conversion_type, COUNT(*) as count,
-                       SUM(CASE WHEN is_successful THEN 1 ELSE 0 END) as successful,
-                       AVG(message_count) as avg_messages,
-                       AVG(session_duration) as avg_duration
-                FROM dm_conversions
-                WHERE converted_at BETWEEN :start AND :end
-                GROUP BY conversion_type
-            """)
-            
-            daily_conv_result = session.execute(
-                daily_conv_query,
-                {"start": yesterday_start, "end": yesterday_end}
-            )
-            
-            daily_conv_stats = {}
-            for row in daily_conv_result:
-                daily_conv_stats[row[0]] = {
-                    "count": row[1],
-                    "successful": row[2],
-                    "avg_messages": row[3] or 0,
-                    "avg_duration": row[4] or 0
-                }
-            
-            # Günlük en etkili mesajlar
-            top_msgs_query = text("""
-                SELECT id, category, content, views, reactions, replies, forwards
-                FROM message_effectiveness
-                WHERE sent_at BETWEEN :start AND :end
-                ORDER BY (views + reactions * 2 + replies * 3 + forwards * 5) DESC
-                LIMIT 5
-            """)
-            
-            top_msgs_result = session.execute(
-                top_msgs_query,
-                {"start": yesterday_start, "end": yesterday_end}
-            )
-            
-            top_messages = []
-            for row in top_msgs_result:
-                top_messages.append({
-                    "id": row[0],
-                    "category": row[1],
-                    "content": row[2],
-                    "views": row[3],
-                    "reactions": row[4],
-                    "replies": row[5],
-                    "forwards": row[6]
-                })
-            
-            # Raporu oluştur
-            report = {
-                "date": yesterday.strftime("%Y-%m-%d"),
-                "generated_at": datetime.now().isoformat(),
-                "message_stats": daily_msg_stats,
-                "conversion_stats": daily_conv_stats,
-                "top_messages": top_messages,
-                "summary": {
-                    "total_messages": sum(s["count"] for s in daily_msg_stats.values()),
-                    "total_conversions": sum(s["count"] for s in daily_conv_stats.values()),
-                    "successful_conversions": sum(s["successful"] for s in daily_conv_stats.values()),
-                    "conversion_rate": 0.0  # Aşağıda hesaplanacak
-                }
-            }
-            
-            # Dönüşüm oranını hesapla
-            total_messages = report["summary"]["total_messages"]
-            total_conversions = report["summary"]["total_conversions"]
-            if total_messages > 0:
-                report["summary"]["conversion_rate"] = total_conversions / total_messages
+            if self.report_engine.has_data("message_effectiveness"):
+                # Dün bölümünü güncel hale getirip raporu dosyalardan üret
+                await self.exporter.export()
+                report = await self._run_report(self.report_engine.daily_report, yesterday.date())
+            else:
+                report = self._query_daily_report(session, yesterday)
             
             # Raporu kaydet
             report_json = json.dumps(report, ensure_ascii=False)
@@ -376,6 +343,120 @@ class MessageAnalyticsService(BaseService):
             logger.error(f"Günlük rapor oluşturma hatası: {str(e)}", exc_info=True)
             return {}
     
+    def _query_daily_report(self, session, yesterday: datetime) -> Dict[str, Any]:
+        """
+        Günlük raporu canlı tablolardan hesaplar (aktarım dosyası yoksa).
+        
+        Args:
+            session: Veritabanı oturumu
+            yesterday: Rapor günü
+            
+        Returns:
+            Dict[str, Any]: Rapor
+        """
+        yesterday_start = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
+        yesterday_end = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
+        # Günlük mesaj istatistikleri
+        daily_msg_query = text("""
+            SELECT category, COUNT(*) as count,
+                   AVG(views) as avg_views,
+                   AVG(reactions) as avg_reactions,
+                   AVG(replies) as avg_replies,
+                   AVG(forwards) as avg_forwards
+            FROM message_effectiveness
+            WHERE sent_at BETWEEN :start AND :end
+            GROUP BY category
+        """)
+        
+        daily_msg_result = session.execute(
+            daily_msg_query, 
+            {"start": yesterday_start, "end": yesterday_end}
+        )
+        
+        daily_msg_stats = {}
+        for row in daily_msg_result:
+            daily_msg_stats[row[0]] = {
+                "count": row[1],
+                "avg_views": row[2] or 0,
+                "avg_reactions": row[3] or 0,
+                "avg_replies": row[4] or 0,
+                "avg_forwards": row[5] or 0
+            }
+        
+        # Günlük dönüşüm istatistikleri
+        daily_conv_query = text("""
+            SELECT conversion_type, COUNT(*) as count,
+                   SUM(CASE WHEN is_successful THEN 1 ELSE 0 END) as successful,
+                   AVG(message_count) as avg_messages,
+                   AVG(session_duration) as avg_duration
+            FROM dm_conversions
+            WHERE converted_at BETWEEN :start AND :end
+            GROUP BY conversion_type
+        """)
+        
+        daily_conv_result = session.execute(
+            daily_conv_query,
+            {"start": yesterday_start, "end": yesterday_end}
+        )
+        
+        daily_conv_stats = {}
+        for row in daily_conv_result:
+            daily_conv_stats[row[0]] = {
+                "count": row[1],
+                "successful": row[2],
+                "avg_messages": row[3] or 0,
+                "avg_duration": row[4] or 0
+            }
+        
+        # Günlük en etkili mesajlar
+        top_msgs_query = text("""
+            SELECT id, category, content, views, reactions, replies, forwards
+            FROM message_effectiveness
+            WHERE sent_at BETWEEN :start AND :end
+            ORDER BY (views + reactions * 2 + replies * 3 + forwards * 5) DESC
+            LIMIT 5
+        """)
+        
+        top_msgs_result = session.execute(
+            top_msgs_query,
+            {"start": yesterday_start, "end": yesterday_end}
+        )
+        
+        top_messages = []
+        for row in top_msgs_result:
+            top_messages.append({
+                "id": row[0],
+                "category": row[1],
+                "content": row[2],
+                "views": row[3],
+                "reactions": row[4],
+                "replies": row[5],
+                "forwards": row[6]
+            })
+        
+        # Raporu oluştur
+        report = {
+            "date": yesterday.strftime("%Y-%m-%d"),
+            "generated_at": datetime.now().isoformat(),
+            "message_stats": daily_msg_stats,
+            "conversion_stats": daily_conv_stats,
+            "top_messages": top_messages,
+            "summary": {
+                "total_messages": sum(s["count"] for s in daily_msg_stats.values()),
+                "total_conversions": sum(s["count"] for s in daily_conv_stats.values()),
+                "successful_conversions": sum(s["successful"] for s in daily_conv_stats.values()),
+                "conversion_rate": 0.0  # Aşağıda hesaplanacak
+            }
+        }
+        
+        # Dönüşüm oranını hesapla
+        total_messages = report["summary"]["total_messages"]
+        total_conversions = report["summary"]["total_conversions"]
+        if total_messages > 0:
+            report["summary"]["conversion_rate"] = total_conversions / total_messages
+        
+        return report
+    
     async def track_message(self, message_data: MessageEffectivenessCreate) -> Optional[MessageEffectiveness]:
         """
         Yeni bir mesajı takip etmeye başlar.
@@ -409,6 +490,27 @@ class MessageAnalyticsService(BaseService):
             logger.error(f"Mesaj takip hatası: {str(e)}", exc_info=True)
             return None
     
+    def record_engagement(self, message_id: int, metric: str, amount: int = 1) -> None:
+        """
+        Olay bazlı bir metrik artışını tampona ekler (ör. her yanıt için +1).
+        
+        Args:
+            message_id: Mesaj ID
+            metric: views/reactions/replies/forwards
+            amount: Artış miktarı
+        """
+        self.engagement.increment(message_id, metric, amount)
+    
+    def observe_message_metrics(self, message_id: int, metrics: Dict[str, int]) -> None:
+        """
+        Telegram'dan okunan mutlak metrik değerlerini tampona ekler.
+        
+        Args:
+            message_id: Mesaj ID
+            metrics: Metrik -> mutlak değer
+        """
+        self.engagement.observe(message_id, metrics)
+    
     async def update_message_metrics(self, message_id: int, metrics: Dict[str, int]) -> bool:
         """
         Mesaj metriklerini günceller.
@@ -526,9 +628,15 @@ class MessageAnalyticsService(BaseService):
             List[Dict[str, Any]]: Mesaj listesi
         """
         try:
-            session = next(get_session())
             start_date = datetime.now() - timedelta(days=days)
             
+            # Aktarım dosyaları varsa puanlama vektörel olarak dosyalardan yapılır
+            if self.report_engine.has_data("message_effectiveness"):
+                return await self._run_report(
+                    self.report_engine.top_messages, start_date.date(), None, 20, category
+                )
+            
+            session = next(get_session())
             query_text = """
                 SELECT id, message_id, group_id, category, content, sent_at,
                        views, reactions, replies, forwards
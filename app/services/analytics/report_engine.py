@@ -0,0 +1,335 @@
+"""
+# ============================================================================ #
+# Dosya: report_engine.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/services/analytics/report_engine.py
+# İşlev: Aktarılmış analitik dosyaları üzerinde vektörel rapor motoru.
+#
+# AnalyticsExporter'ın yazdığı gün bölümlü dosyaları okur ve kategori
+# performansı, dönüşüm istatistikleri, dönüşüm hunisi ve en iyi N mesaj
+# hesaplarını pandas/NumPy ile satır döngüsü olmadan yapar. Okunan
+# bölümler (yol, mtime) anahtarıyla önbelleklenir; değişmeyen günler
+# tekrar diskten okunmaz.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import os
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.analytics.analytics_export import (
+    DEFAULT_EXPORT_DIR, EXPORT_SUFFIX, EXPORT_TABLES, read_frame
+)
+
+logger = logging.getLogger(__name__)
+
+# Etkileşim puanı ağırlıkları: views + reactions*2 + replies*3 + forwards*5
+SCORE_WEIGHTS = {"views": 1, "reactions": 2, "replies": 3, "forwards": 5}
+
+MESSAGE_TABLE = "message_effectiveness"
+CONVERSION_TABLE = "dm_conversions"
+
+
+def _day_from_name(name: str) -> Optional[date]:
+    """'day=2025-05-01.parquet' adından günü çıkarır"""
+    if not (name.startswith("day=") and name.endswith(EXPORT_SUFFIX)):
+        return None
+    try:
+        return date.fromisoformat(name[4:-len(EXPORT_SUFFIX)])
+    except ValueError:
+        return None
+
+
+class AnalyticsReportEngine:
+    """
+    Gün bölümlü analitik dosyalarından rapor üreten motor.
+
+    Tüm metotlar senkron ve CPU-yoğundur; servisler bunları
+    run_in_executor ile olay döngüsü dışında çağırır.
+    """
+
+    def __init__(self, export_dir: str = DEFAULT_EXPORT_DIR, cache_partitions: int = 120):
+        """
+        Motoru yapılandırır.
+
+        Args:
+            export_dir: Bölüm dosyalarının kök dizini
+            cache_partitions: Bellekte tutulacak en fazla bölüm sayısı
+        """
+        self.export_dir = export_dir
+        self.cache_partitions = max(int(cache_partitions), 1)
+        self._cache: "OrderedDict[Tuple[str, float], pd.DataFrame]" = OrderedDict()
+
+        self.stats = {
+            "partition_reads": 0,
+            "cache_hits": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Okuma
+    # ------------------------------------------------------------------ #
+
+    def partitions(self, table: str, start: Optional[date] = None,
+                   end: Optional[date] = None) -> List[Tuple[date, str]]:
+        """
+        Tablonun [start, end] aralığındaki bölüm dosyalarını gün sırasıyla döndürür.
+
+        Returns:
+            List[Tuple[date, str]]: (gün, yol) listesi
+        """
+        table_dir = os.path.join(self.export_dir, table)
+        if not os.path.isdir(table_dir):
+            return []
+        result = []
+        for name in os.listdir(table_dir):
+            day = _day_from_name(name)
+            if day is None:
+                continue
+            if (start and day < start) or (end and day > end):
+                continue
+            result.append((day, os.path.join(table_dir, name)))
+        return sorted(result)
+
+    def has_data(self, table: str) -> bool:
+        """Tablo için en az bir bölüm varsa True"""
+        return bool(self.partitions(table))
+
+    def _read_partition(self, path: str) -> pd.DataFrame:
+        """Bölümü önbellekten veya diskten okur"""
+        key = (path, os.path.getmtime(path))
+        frame = self._cache.get(key)
+        if frame is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return frame
+        frame = read_frame(path)
+        self._cache[key] = frame
+        self.stats["partition_reads"] += 1
+        while len(self._cache) > self.cache_partitions:
+            self._cache.popitem(last=False)
+        return frame
+
+    def load(self, table: str, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        """
+        Aralıktaki bölümleri tek DataFrame olarak döndürür.
+
+        Args:
+            table: Tablo adı
+            start: İlk gün (dahil)
+            end: Son gün (dahil)
+
+        Returns:
+            pd.DataFrame: Birleştirilmiş veri (bölüm yoksa boş)
+        """
+        frames = [self._read_partition(path) for _, path in self.partitions(table, start, end)]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=EXPORT_TABLES[table]["columns"])
+        return pd.concat(frames, ignore_index=True)
+
+    # ------------------------------------------------------------------ #
+    # Hesaplamalar
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def engagement_score(messages: pd.DataFrame) -> pd.Series:
+        """Etkileşim puanını vektörel olarak hesaplar"""
+        score = np.zeros(len(messages), dtype=np.int64)
+        for column, weight in SCORE_WEIGHTS.items():
+            score += messages[column].fillna(0).to_numpy(dtype=np.int64) * weight
+        return pd.Series(score, index=messages.index)
+
+    def category_performance(self, start: Optional[date] = None,
+                             end: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Kategori başına mesaj sayısı ve ortalama etkileşimleri hesaplar.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Kategori -> metrikler
+        """
+        messages = self.load(MESSAGE_TABLE, start, end)
+        if messages.empty:
+            return {}
+        grouped = messages.groupby("category").agg(
+            count=("id", "size"),
+            avg_views=("views", "mean"),
+            avg_reactions=("reactions", "mean"),
+            avg_replies=("replies", "mean"),
+            avg_forwards=("forwards", "mean"),
+        ).fillna(0)
+        return {
+            str(category): {
+                "count": int(row["count"]),
+                "avg_views": float(row["avg_views"]),
+                "avg_reactions": float(row["avg_reactions"]),
+                "avg_replies": float(row["avg_replies"]),
+                "avg_forwards": float(row["avg_forwards"]),
+            }
+            for category, row in grouped.iterrows()
+        }
+
+    def conversion_stats(self, start: Optional[date] = None,
+                         end: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Dönüşüm türü başına sayı, başarı ve ortalamaları hesaplar.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Dönüşüm türü -> metrikler
+        """
+        conversions = self.load(CONVERSION_TABLE, start, end)
+        if conversions.empty:
+            return {}
+        conversions = conversions.assign(is_successful=conversions["is_successful"].fillna(False).astype(bool))
+        grouped = conversions.groupby("conversion_type").agg(
+            count=("id", "size"),
+            successful=("is_successful", "sum"),
+            unique_users=("user_id", "nunique"),
+            avg_messages=("message_count", "mean"),
+            avg_duration=("session_duration", "mean"),
+        ).fillna(0)
+        return {
+            str(conversion_type): {
+                "count": int(row["count"]),
+                "successful": int(row["successful"]),
+                "unique_users": int(row["unique_users"]),
+                "avg_messages": float(row["avg_messages"]),
+                "avg_duration": float(row["avg_duration"]),
+            }
+            for conversion_type, row in grouped.iterrows()
+        }
+
+    def conversion_funnel(self, start: Optional[date] = None,
+                          end: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Kategori başına gönderim -> görüntülenme -> etkileşim -> dönüşüm -> başarı hunisi.
+
+        Dönüşümler kaynak mesaja (source_message_id) göre eşlenir; kaynak
+        mesajı aralıkta olmayan dönüşümler huniye katılmaz.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Kategori -> huni adımları ve oranları
+        """
+        messages = self.load(MESSAGE_TABLE, start, end)
+        if messages.empty:
+            return {}
+        conversions = self.load(CONVERSION_TABLE, start, end + timedelta(days=7) if end else None)
+
+        engaged = (messages[["reactions", "replies", "forwards"]].fillna(0).sum(axis=1) > 0)
+        steps = pd.DataFrame({
+            "category": messages["category"],
+            "sent": 1,
+            "viewed": (messages["views"].fillna(0) > 0).astype(int),
+            "engaged": engaged.astype(int),
+        }).groupby("category").sum()
+
+        if not conversions.empty:
+            linked = conversions.merge(
+                messages[["id", "category"]], left_on="source_message_id", right_on="id",
+                how="inner", suffixes=("", "_message")
+            )
+            linked = linked.assign(is_successful=linked["is_successful"].fillna(False).astype(bool))
+            converted = linked.groupby("category").agg(
+                converted=("id", "size"), successful=("is_successful", "sum")
+            )
+            steps = steps.join(converted, how="left")
+        steps = steps.reindex(columns=["sent", "viewed", "engaged", "converted", "successful"]).fillna(0)
+
+        sent = steps["sent"].to_numpy(dtype=float)
+        rates = np.divide(steps["converted"].to_numpy(dtype=float), sent,
+                          out=np.zeros_like(sent), where=sent > 0)
+
+        funnel = {}
+        for (category, row), rate in zip(steps.iterrows(), rates):
+            funnel[str(category)] = {
+                "sent": int(row["sent"]),
+                "viewed": int(row["viewed"]),
+                "engaged": int(row["engaged"]),
+                "converted": int(row["converted"]),
+                "successful": int(row["successful"]),
+                "conversion_rate": float(rate),
+            }
+        return funnel
+
+    def top_messages(self, start: Optional[date] = None, end: Optional[date] = None,
+                     limit: int = 20, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Etkileşim puanına göre en iyi N mesajı döndürür.
+
+        Returns:
+            List[Dict[str, Any]]: Puan sırasına göre mesajlar
+        """
+        messages = self.load(MESSAGE_TABLE, start, end)
+        if category is not None and not messages.empty:
+            messages = messages[messages["category"] == category]
+        if messages.empty:
+            return []
+        messages = messages.assign(total_score=self.engagement_score(messages))
+        # Henüz ölçülmemiş metrikler NaN gelir; int() dönüşümünden önce sıfırlanır
+        top = messages.nlargest(limit, "total_score").fillna({column: 0 for column in SCORE_WEIGHTS})
+
+        result = []
+        for row in top.itertuples(index=False):
+            sent_at = row.sent_at
+            result.append({
+                "id": int(row.id),
+                "message_id": int(row.message_id),
+                "group_id": int(row.group_id),
+                "category": row.category,
+                "content": row.content,
+                "sent_at": sent_at.isoformat() if hasattr(sent_at, "isoformat") else sent_at,
+                "views": int(row.views),
+                "reactions": int(row.reactions),
+                "replies": int(row.replies),
+                "forwards": int(row.forwards),
+                "total_score": int(row.total_score),
+            })
+        return result
+
+    def daily_report(self, day: date) -> Dict[str, Any]:
+        """
+        Bir günün mesaj ve dönüşüm raporunu üretir.
+
+        Args:
+            day: Rapor günü
+
+        Returns:
+            Dict[str, Any]: MessageAnalyticsService günlük rapor yapısı
+        """
+        message_stats = self.category_performance(day, day)
+        conversion_stats = self.conversion_stats(day, day)
+        top_messages = [
+            {key: message[key] for key in ("id", "category", "content", "views", "reactions", "replies", "forwards")}
+            for message in self.top_messages(day, day, limit=5)
+        ]
+
+        total_messages = sum(s["count"] for s in message_stats.values())
+        total_conversions = sum(s["count"] for s in conversion_stats.values())
+        return {
+            "date": day.strftime("%Y-%m-%d"),
+            "generated_at": datetime.now().isoformat(),
+            "message_stats": message_stats,
+            "conversion_stats": conversion_stats,
+            "funnel": self.conversion_funnel(day, day),
+            "top_messages": top_messages,
+            "summary": {
+                "total_messages": total_messages,
+                "total_conversions": total_conversions,
+                "successful_conversions": sum(s["successful"] for s in conversion_stats.values()),
+                "conversion_rate": total_conversions / total_messages if total_messages > 0 else 0.0
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Motor istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {**self.stats, "cached_partitions": len(self._cache)}
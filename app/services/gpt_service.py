@@ -19,6 +19,7 @@ from sqlalchemy import text
 
 from app.services.base_service import BaseService
 from app.db.session import get_session
+from app.core.scheduler import wakeups, notify_listener
 
 logger = logging.getLogger(__name__)
 
@@ -140,6 +141,9 @@ class GPTService(BaseService):
         # İstatistikleri yükle
         await self.load_stats()
         
+        # Yeni GPT isteği eklendiğinde run() döngüsünü hemen uyandır
+        await notify_listener.listen("gpt_requests", self.service_name)
+        
         self.logger.info(f"GPT servisi başlatıldı. Model: {self.model}, Max Tokens: {self.max_tokens}")
         return True
     
@@ -152,7 +156,9 @@ class GPTService(BaseService):
         """
         self.logger.info("GPT servisi durduruluyor...")
         
-        # Kapatma işlemleri - özel bir işlem gerekmiyor
+        # Bekleyen run() döngüsünü uyandır
+        self.running = False
+        wakeups.wake(self.service_name)
         
         self.logger.info("GPT servisi durduruldu")
         return True
@@ -174,6 +180,25 @@ class GPTService(BaseService):
         except Exception as e:
             self.logger.error(f"GPT istekleri işlenirken hata: {str(e)}", exc_info=True)
     
+    async def run(self) -> None:
+        """
+        Servis ana döngüsü.
+        
+        Bekleyen istekler işlendikten sonra yeni istek bildirimi (NOTIFY)
+        gelene veya `default_interval` dolana kadar beklenir.
+        """
+        self.logger.info("GPT servisi döngüsü başladı")
+        self.running = True
+        stop_event = self.stop_event if isinstance(self.stop_event, asyncio.Event) else None
+        
+        while self.running:
+            await self._update()
+            if not await wakeups.wait(self.service_name, timeout=self.default_interval, stop_event=stop_event):
+                break
+        
+        self.running = False
+        self.logger.info("GPT servisi döngüsü sonlandı")
+    
     async def load_stats(self) -> None:
         """GPT istatistiklerini veritabanından yükle"""
         try:
@@ -16,7 +16,6 @@ import os
 import re
 import json
 import time
-import random
 import logging
 import asyncio
 from datetime import datetime, timedelta
@@ -35,6 +34,7 @@ from sqlalchemy import text
 from app.services.base_service import BaseService
 from app.utils.adaptive_rate_limiter import AdaptiveRateLimiter
 from app.db.session import get_session
+from app.utils.template_registry import template_registry, DB_SOURCE
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -64,7 +64,6 @@ class GroupService(BaseService):
         self.groups = {}
         self.active_groups = set()
         self.admin_groups = set()
-        self.message_templates = {}
         self.group_stats = {}
         self.stats = {
             'total_groups': 0,
@@ -107,8 +106,6 @@ class GroupService(BaseService):
                 await self.load_message_templates()
             except Exception as e:
                 self.logger.error(f"Mesaj şablonları yüklenirken hata: {str(e)}", exc_info=True)
-                # Hata olursa boş bir dict ile devam et
-                self.message_templates = {}
             
             try:
                 await self.load_group_stats()
@@ -342,39 +339,25 @@ class GroupService(BaseService):
     
     async def load_message_templates(self):
         """
-        Mesaj şablonlarını veritabanından yükler.
+        Paylaşılan şablon kaydının "db" kaynağının yüklendiğinden emin olur.
+        
+        Şablonların kopyası tutulmaz; get_message_template() her çağrıda
+        güncel kayıt görüntüsünü okur, böylece yenilemeler hemen görünür.
         """
         try:
             logger.info("Mesaj şablonları yükleniyor...")
             
-            # Veritabanı bağlantısını kontrol et
-            if not self.db.connected or not self.db.cursor:
-                await self.db.connect()
-                if not self.db.cursor:
-                    logger.error("Veritabanı bağlantısı kurulamadı, DB cursor null")
-                    return
+            # message_templates tablosu kayıt tarafından bir kez okunur
+            snapshot = await template_registry.ensure_db()
+            count = sum(len(snapshot.get(DB_SOURCE, t)) for t in snapshot.categories(DB_SOURCE))
             
-            query = "SELECT id, content, category, language FROM message_templates WHERE is_active = TRUE"
-            rows = await self.db.fetchall(query)
-            
-            if not rows:
+            if not count:
                 logger.warning("Aktif mesaj şablonu bulunamadı.")
                 return
             
-            for row in rows:
-                if len(row) >= 4:
-                    template_id = row[0]
-                    self.message_templates[template_id] = {
-                        "content": row[1],
-                        "category": row[2],
-                        "language": row[3]
-                    }
-            
-            logger.info(f"{len(self.message_templates)} mesaj şablonu yüklendi")
+            logger.info(f"{count} mesaj şablonu yüklendi")
         except Exception as e:
             logger.error(f"Mesaj şablonları yüklenirken hata: {str(e)}", exc_info=True)
-            # Hata durumunda varsayılan şablonlarla devam et
-            self.message_templates = {}
     
     async def load_group_stats(self):
         """
@@ -384,11 +367,9 @@ class GroupService(BaseService):
             logger.info("Grup istatistikleri yükleniyor...")
             
             # Veritabanı bağlantısını kontrol et
-            if not self.db.connected or not self.db.cursor:
-                await self.db.connect()
-                if not self.db.cursor:
-                    logger.error("Veritabanı bağlantısı kurulamadı, DB cursor null")
-                    return
+            if not self.db.connected and not await self.db.connect():
+                logger.error("Veritabanı bağlantısı kurulamadı")
+                return
             
             query = """
                 SELECT group_id, COUNT(*) as message_count, 
@@ -437,10 +418,7 @@ class GroupService(BaseService):
         
     async def get_message_template(self, group_type):
         """Grup tipine göre rastgele bir mesaj şablonu getirir"""
-        templates = self.message_templates.get(group_type, [])
-        if not templates:
-            return None
-        return random.choice(templates)
+        return template_registry.snapshot.choice(DB_SOURCE, group_type)
 
     async def add_group(self, group_id, name, is_admin=False):
         """Yeni grup ekler"""
@@ -462,7 +440,7 @@ class GroupService(BaseService):
             }
             
             # Veritabanı bağlantısını kontrol et
-            if not self.db.connected or not self.db.conn or not self.db.cursor:
+            if not self.db.connected:
                 try:
                     await self.db.connect()
                 except Exception as db_error:
@@ -476,7 +454,7 @@ class GroupService(BaseService):
                     return True
             
             # Bağlantı başarılıysa
-            if self.db.connected and self.db.cursor:
+            if self.db.connected:
                 try:
                     # SQL sorgusunu ve parametrelerini hazırla
                     query = """
@@ -488,8 +466,7 @@ class GroupService(BaseService):
                     params = (group_id, name, is_admin, True, group['join_date'])
                     
                     # Execute sorgusu
-                    self.db.cursor.execute(query, params)
-                    self.db.conn.commit()
+                    await self.db.execute(query, params)
                 except Exception as db_error:
                     logger.error(f"Grup veritabanına eklenirken hata: {str(db_error)}")
                     # Hata oluşursa, groups tablosunda yetki sorunu olabilir, yine de bellekte tut
@@ -529,8 +506,7 @@ class GroupService(BaseService):
             query = "DELETE FROM groups WHERE group_id = %s"
             
             # Execute sorgusu
-            self.db.cursor.execute(query, (group_id,))
-            self.db.conn.commit()
+            await self.db.execute(query, (group_id,))
             
             if group_id in self.groups:
                 del self.groups[group_id]
@@ -693,7 +669,7 @@ class GroupService(BaseService):
         """
         try:
             # Önce veritabanı bağlantısını kontrol et
-            if not self.db.connected or not self.db.cursor:
+            if not self.db.connected:
                 await self.db.connect()
                 
             # Grup detaylarını güncelle
@@ -14,6 +14,8 @@ import functools
 
 from telethon import errors
 from app.services.base_service import BaseService
+from app.utils.flood_limiter import flood_limiter
+from app.utils.entity_resolver import get_entity_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,7 @@ class InviteService(BaseService):
     def __init__(self, name='invite_service', client=None, db=None, config=None, stop_event=None, *args, **kwargs):
         super().__init__(name=name)
         self.client = client
+        self.entity_resolver = get_entity_resolver(client)
         self.db = db
         self.config = config
         self.stop_event = stop_event
@@ -156,19 +159,19 @@ class InviteService(BaseService):
     async def _get_user_entity(self, user_id, username=None):
         try:
             try:
-                return await self.client.get_entity(user_id)
+                return await self.entity_resolver.get_entity(user_id)
             except ValueError:
                 pass
             if username:
                 try:
-                    return await self.client.get_entity(f"@{username}")
+                    return await self.entity_resolver.get_entity(f"@{username}")
                 except ValueError:
                     pass
             if hasattr(self.db, 'get_user_by_id'):
                 user_info = await self._run_async_db_method(self.db.get_user_by_id, user_id)
                 if user_info and user_info.get('username'):
                     try:
-                        return await self.client.get_entity(f"@{user_info['username']}")
+                        return await self.entity_resolver.get_entity(f"@{user_info['username']}")
                     except ValueError:
                         pass
             return None
@@ -219,7 +222,8 @@ class InviteService(BaseService):
             username = user.get("username")
             first_name = user.get("first_name", "Kullanıcı")
             try:
-                user_entity = await self.client.get_entity(user_id)
+                # Döngü başında toplu çözüldüyse önbellekten gelir
+                user_entity = await self.entity_resolver.get_entity(user_id)
             except ValueError as e:
                 logger.warning(f"Kullanıcı bulunamadı: {user_id} - {str(e)}")
                 if hasattr(self.db, 'mark_user_not_found'):
@@ -231,7 +235,8 @@ class InviteService(BaseService):
             if self.group_links:
                 group_links_text = "\n\n" + "\n".join([f"• {link}" for link in self.group_links])
             try:
-                await self.client.send_message(
+                await flood_limiter.run(
+                    "invite", self.client.send_message,
                     user_entity, 
                     personalized_message + group_links_text,
                     link_preview=False
@@ -264,6 +269,10 @@ class InviteService(BaseService):
             if not users or len(users) == 0:
                 logger.warning("Davet için uygun kullanıcı bulunamadı")
                 return 0
+            # Soğuk kullanıcılar tek tek değil, GetUsers partileriyle çözülür
+            await self.entity_resolver.get_entities(
+                user.get("user_id") for user in users if user.get("user_id")
+            )
             sent_count = 0
             for user in users:
                 if await self._process_user(user):
@@ -4,16 +4,23 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
 from sqlmodel import Session, select
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 from app.core.config import settings
 from app.db.session import get_session
 from app.models.message import Message, MessageStatus, MessageType
 from app.models.group import Group
 from app.services.base_service import BaseService
+from app.db.message_outbox import MessageOutbox, OutboxItem, OutboxTerminalError, is_terminal_error
+from app.core.scheduler import wakeups, notify_listener
+from app.utils.flood_limiter import flood_limiter
 
 logger = logging.getLogger(__name__)
 
+# Zamanlanmış sayılan durum değerleri; UPPER(status) yerine IN ile
+# karşılaştırılır ki (status, scheduled_for) indeksi kullanılabilsin.
+SCHEDULED_STATUSES = [MessageStatus.SCHEDULED.value, MessageStatus.scheduled.value]
+
 class MessageService(BaseService):
     """
     Mesaj gönderme ve planlama servisi.
@@ -35,8 +42,19 @@ class MessageService(BaseService):
         self.debug_mode = getattr(settings, 'DEBUG', False)
         self.batch_size = getattr(settings, 'MESSAGE_BATCH_SIZE', 50)
         self.batch_interval = getattr(settings, 'MESSAGE_BATCH_INTERVAL', 30)
+        # NOTIFY dinleniyorsa boşta yoklama aralığı (yeni mesajlar zaten uyandırır)
+        self.idle_interval = max(self.batch_interval, 300)
         self.initialized = False
         self.running = False  # Servis çalışma durumu
+        # Kalıcı gönderim kuyruğu ve süreç içi tüketiciler
+        self.outbox = MessageOutbox(
+            consumers=getattr(settings, 'MESSAGE_OUTBOX_CONSUMERS', 4),
+            batch_size=2,
+            visibility_timeout=getattr(settings, 'MESSAGE_OUTBOX_VISIBILITY_TIMEOUT', 300),
+            poll_interval=self.batch_interval,
+            max_attempts=getattr(settings, 'MESSAGE_OUTBOX_MAX_ATTEMPTS', 3),
+            name=name
+        )
         logger.info(f"MessageService başlatıldı. Bot aktif: {self.bot_enabled}")
     
     async def update(self):
@@ -54,6 +72,7 @@ class MessageService(BaseService):
         scheduled_for: Optional[datetime] = None,
         message_type: MessageType = MessageType.TEXT,
         media_path: Optional[str] = None,
+        priority: int = 0,
         **kwargs
     ) -> Optional[Message]:
         """
@@ -65,6 +84,7 @@ class MessageService(BaseService):
             scheduled_for: Gönderim zamanı (None ise hemen gönderilir)
             message_type: Mesaj tipi (TEXT, PHOTO vb.)
             media_path: Medya için dosya yolu
+            priority: Gönderim önceliği (büyük değer önce gönderilir)
             **kwargs: Ek parametreler
         
         Returns:
@@ -95,9 +115,11 @@ class MessageService(BaseService):
             
             logger.info(f"Mesaj planlandı: ID={message.id}, Grup={group_id}, Zaman={scheduled_for}")
             
-            # Hemen gönderilecekse doğrudan göndermeyi başlat
-            if not scheduled_for:
-                # Async olarak başlat ve sonucu bekleme
+            # Kuyruğa zamanlanmış vadesiyle eklenir; tüketiciler vadesi gelince gönderir
+            if self.outbox.is_running:
+                await self.outbox.enqueue(message.id, priority=priority, available_at=scheduled_for)
+            elif not scheduled_for:
+                # Outbox yoksa eski davranış: async olarak başlat ve sonucu bekleme
                 asyncio.create_task(self.send_message(message.id))
             
             return message
@@ -111,21 +133,33 @@ class MessageService(BaseService):
             now = datetime.utcnow()
             logger.debug(f"Zamanlanmış mesajlar kontrol ediliyor: {now}")
             
+            # Vadesi gelenleri kalıcı kuyruğa taşı; gönderimi tüketiciler yapar
+            if self.outbox.is_running:
+                promoted = await self.outbox.promote_scheduled(
+                    SCHEDULED_STATUSES,
+                    MessageStatus.PENDING.value,
+                    limit=self.batch_size,
+                    now=now
+                )
+                if promoted:
+                    logger.info(f"{promoted} adet zamanlanmış mesaj gönderim kuyruğuna alındı")
+                return
+            
             session = next(get_session())
             
             # Hem büyük harf hem küçük harf status değerlerini kontrol et
             query = text("""
                 SELECT id, group_id, content, status, scheduled_for, message_type
                 FROM messages
-                WHERE (UPPER(status) = :status_upper) AND scheduled_for <= :now
+                WHERE status IN :statuses AND scheduled_for <= :now
                 ORDER BY scheduled_for
                 LIMIT :limit
-            """)
+            """).bindparams(bindparam("statuses", expanding=True))
             
             results = session.execute(
                 query, 
                 {
-                    "status_upper": MessageStatus.SCHEDULED.value.upper(), 
+                    "statuses": SCHEDULED_STATUSES, 
                     "now": now, 
                     "limit": self.batch_size
                 }
@@ -147,12 +181,53 @@ class MessageService(BaseService):
         except Exception as e:
             logger.error(f"Zamanlanmış mesaj işleme hatası: {e}", exc_info=True)
     
-    async def send_message(self, message_id: int) -> bool:
+    async def _next_scheduled_delay(self) -> Optional[float]:
+        """
+        Bir sonraki zamanlanmış mesajın vadesine kalan süreyi döndürür.
+        
+        Returns:
+            Optional[float]: Kalan süre (saniye) veya zamanlanmış mesaj yoksa None
+        """
+        session = next(get_session())
+        try:
+            query = text("""
+                SELECT MIN(scheduled_for) FROM messages
+                WHERE status IN :statuses
+            """).bindparams(bindparam("statuses", expanding=True))
+            next_due = session.execute(query, {"statuses": SCHEDULED_STATUSES}).scalar()
+            if next_due is None:
+                return None
+            return max((next_due - datetime.utcnow()).total_seconds(), 0.0)
+        except Exception as e:
+            logger.debug(f"Sonraki zamanlanmış mesaj okunamadı: {e}")
+            return None
+        finally:
+            session.close()
+    
+    async def wait_for_work(self) -> bool:
+        """
+        Bir sonraki işe kadar bekler: en yakın zamanlanmış mesajın vadesi,
+        yeni mesaj bildirimi (NOTIFY) veya boşta yoklama süresi.
+        
+        Returns:
+            bool: Uyandırıldıysa True, durdurulduysa False
+        """
+        delay = await self._next_scheduled_delay()
+        if delay is not None:
+            wakeups.schedule(self.service_name, delay)
+        timeout = self.idle_interval if notify_listener.is_listening else self.batch_interval
+        stop_event = self.stop_event if isinstance(self.stop_event, asyncio.Event) else None
+        return await wakeups.wait(self.service_name, timeout=timeout, stop_event=stop_event)
+    
+    async def send_message(self, message_id: int, raise_terminal: bool = False) -> bool:
         """
         Mesajı gönderir
         
         Args:
             message_id: Gönderilecek mesajın ID'si
+            raise_terminal: True ise yeniden denenmesi anlamsız hatalarda
+                (silinmiş mesaj, pasif grup, kalıcı Telegram hataları) False
+                yerine OutboxTerminalError fırlatılır
             
         Returns:
             bool: Başarı durumu
@@ -172,6 +247,8 @@ class MessageService(BaseService):
             
             if not message_result:
                 logger.error(f"Mesaj bulunamadı: ID={message_id}")
+                if raise_terminal:
+                    raise OutboxTerminalError(f"Mesaj bulunamadı: ID={message_id}")
                 return False
                 
             message_id = message_result[0]
@@ -183,6 +260,12 @@ class MessageService(BaseService):
             reply_to_message_id = message_result[6]
             scheduled_for = message_result[7]
             
+            # Aynı mesaj ikinci kez teslim edilirse (ör. talep süresi dolup
+            # yeniden kuyruktan alındıysa) tekrar gönderme
+            if status and status.upper() == MessageStatus.SENT.value:
+                logger.info(f"Mesaj zaten gönderilmiş, atlanıyor: ID={message_id}")
+                return True
+            
             # Grubu veritabanından al - doğrudan SQL ile çekelim
             group_query = text("""
                 SELECT group_id, name, is_active 
@@ -331,6 +414,8 @@ class MessageService(BaseService):
                     {"status": MessageStatus.FAILED.value, "error": "Grup aktif değil", "message_id": message_id}
                 )
                 session.commit()
+                if raise_terminal:
+                    raise OutboxTerminalError(f"Grup aktif değil: {target_group_id}")
                 return False
             
             # Bot aktif değilse sadece güncelle
@@ -402,20 +487,23 @@ class MessageService(BaseService):
                 normalized_type = MessageType.normalize(message_type)
                 
                 if normalized_type == MessageType.TEXT:
-                    await client.send_message(
+                    await flood_limiter.run(
+                        "group_message", client.send_message,
                         target_group_id, 
                         content,
                         reply_to=reply_to_message_id
                     )
                 elif normalized_type == MessageType.PHOTO:
-                    await client.send_file(
+                    await flood_limiter.run(
+                        "group_message", client.send_file,
                         target_group_id,
                         media_path,
                         caption=content,
                         reply_to=reply_to_message_id
                     )
                 elif normalized_type == MessageType.VIDEO:
-                    await client.send_file(
+                    await flood_limiter.run(
+                        "group_message", client.send_file,
                         target_group_id,
                         media_path,
                         caption=content,
@@ -423,7 +511,8 @@ class MessageService(BaseService):
                         attributes=[{"ATTR_TYPES": ["video"]}]
                     )
                 elif normalized_type == MessageType.DOCUMENT:
-                    await client.send_file(
+                    await flood_limiter.run(
+                        "group_message", client.send_file,
                         target_group_id,
                         media_path,
                         caption=content,
@@ -432,7 +521,8 @@ class MessageService(BaseService):
                     )
                 else:
                     logger.warning(f"Desteklenmeyen mesaj tipi: {message_type}, TEXT olarak gönderiliyor")
-                    await client.send_message(
+                    await flood_limiter.run(
+                        "group_message", client.send_message,
                         target_group_id, 
                         content,
                         reply_to=reply_to_message_id
@@ -488,8 +578,12 @@ class MessageService(BaseService):
                 
                 session.commit()
                 
+                if raise_terminal and is_terminal_error(send_error):
+                    raise OutboxTerminalError(str(send_error)) from send_error
                 return False
                 
+        except OutboxTerminalError:
+            raise
         except Exception as e:
             logger.error(f"Mesaj gönderme işleminde beklenmeyen hata: {e}", exc_info=True)
             
@@ -511,6 +605,22 @@ class MessageService(BaseService):
             
             return False
     
+    async def _deliver_outbox_item(self, item: OutboxItem) -> bool:
+        """
+        Outbox tüketicileri için teslim fonksiyonu.
+        
+        Args:
+            item: Talep edilen kuyruk kaydı
+            
+        Returns:
+            bool: Gönderim başarılıysa True (False ise kayıt yeniden denenir)
+            
+        Raises:
+            OutboxTerminalError: Kalıcı hatada; kayıt yeniden denenmez
+        """
+        logger.debug(f"Outbox mesajı gönderiliyor: ID={item.message_id}, deneme={item.attempts}")
+        return await self.send_message(item.message_id, raise_terminal=True)
+    
     async def initialize(self) -> bool:
         """
         Mesaj servisini başlatır.
@@ -525,6 +635,13 @@ class MessageService(BaseService):
             from app.core.unified.client import get_client
             self.client = await get_client()
             
+            # Kalıcı gönderim kuyruğunu başlat (başarısızsa doğrudan gönderime düşülür)
+            if not await self.outbox.start(self._deliver_outbox_item):
+                logger.warning("Mesaj outbox'ı başlatılamadı, mesajlar doğrudan gönderilecek")
+            
+            # Yeni mesaj eklendiğinde döngüyü hemen uyandır
+            await notify_listener.listen("messages", self.service_name)
+            
             self.initialized = True
             logger.info(f"Mesaj servisi başlatıldı (batch_size: {self.batch_size}, batch_interval: {self.batch_interval}s)")
             return True
@@ -561,6 +678,8 @@ class MessageService(BaseService):
         """
         try:
             logger.info("Mesaj servisi durduruluyor")
+            await self.outbox.stop()
+            wakeups.wake(self.service_name)
             self.initialized = False
             self.running = False
             logger.info("Mesaj servisi durduruldu")
@@ -593,6 +712,8 @@ class MessageService(BaseService):
             # İstemci başka servisler tarafından da kullanılıyor olabilir
             # Bu nedenle burada kapatmıyoruz
             
+            await self.outbox.stop()
+            wakeups.wake(self.service_name)
             self.initialized = False
             self.running = False
             logger.info("Mesaj servisi durduruldu")
@@ -617,8 +738,8 @@ class MessageService(BaseService):
                     # Zamanlanmış mesajları kontrol et
                     await self.check_scheduled_messages()
                     
-                    # Bir sonraki kontrole kadar bekle
-                    await asyncio.sleep(self.batch_interval)
+                    # Bir sonraki vadeye veya yeni mesaj bildirimine kadar bekle
+                    await self.wait_for_work()
                 except asyncio.CancelledError:
                     logger.info("MessageService döngüsü iptal edildi")
                     break
@@ -658,6 +779,9 @@ class MessageService(BaseService):
                 logger.error(f"Mesaj planlanmış durumda değil: {message_id}, durum: {message.status}")
                 return False
                 
+            # Kuyruktaki henüz talep edilmemiş kaydı da sil
+            await self.outbox.cancel(message_id)
+            
             # Mesajı sil
             session.delete(message)
             session.commit()
@@ -705,13 +829,13 @@ class MessageService(BaseService):
                 
             results = session.execute(query, params).all()
             
-            # Sonuçları Message nesnelerine dönüştür
+            # Sonuçları Message nesnelerine dönüştür; sütun adları sonuç
+            # satırından gelir, şema her satır için ayrıca sorgulanmaz
             messages = []
             for row in results:
                 message = Message()
-                for i, column in enumerate(session.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name = 'messages'")).scalars().all()):
-                    if i < len(row):
-                        setattr(message, column, row[i])
+                for column, value in row._mapping.items():
+                    setattr(message, column, value)
                 messages.append(message)
                 
             return messages
@@ -5,14 +5,15 @@ Gruplarda duyuru ve tanıtım mesajları gönderimi.
 """
 
 import asyncio
-import json
 import os
 import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Set, Optional, Tuple
+from typing import Dict, List, Any, Mapping, Set, Optional, Tuple
 
 from app.services.base_service import BaseService
 from app.utils.adaptive_rate_limiter import AdaptiveRateLimiter
+from app.utils.flood_limiter import flood_limiter
+from app.utils.template_registry import template_registry
 from app.core.logger import get_logger
 from telethon import errors
 
@@ -113,20 +114,18 @@ class AnnouncementService(BaseService):
     def _load_templates(self):
         """Duyuru mesaj şablonlarını yükler."""
         try:
-            # Şablon dosyası
+            # Şablon dosyası (paylaşılan kayıttan, dosya bir kez okunur)
             templates_path = 'data/announcements.json'
-            if os.path.exists(templates_path):
-                with open(templates_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
+            data = template_registry.source('announcements', None)
+            if data is not None:
                 # Şablon formatını kontrol et ve yapılandır
-                if isinstance(data, dict):
+                if isinstance(data, Mapping):
                     # Yeni format - ID'ye göre şablonlar
                     self.announcement_templates = {}
                     
                     # Şablonları grup tipine göre kategorize et
                     for template_id, template_info in data.items():
-                        if isinstance(template_info, dict) and "group_type" in template_info:
+                        if isinstance(template_info, Mapping) and "group_type" in template_info:
                             group_type = template_info["group_type"]
                             category = template_info.get("category", "general")
                             
@@ -382,7 +381,7 @@ class AnnouncementService(BaseService):
                     await asyncio.sleep(wait_time)
                     
             # Duyuruyu gönder
-            message = await self.client.send_message(group_id, template)
+            message = await flood_limiter.run("group_message", self.client.send_message, group_id, template)
             
             # Rate limiter'ı güncelle
             if hasattr(self.rate_limiter, 'mark_used'):
@@ -527,7 +526,7 @@ class AnnouncementService(BaseService):
                             await asyncio.sleep(wait_time)
                             
                     # Duyuruyu gönder
-                    await self.client.send_message(group_id, message)
+                    await flood_limiter.run("group_message", self.client.send_message, group_id, message)
                     
                     # Rate limiter'ı güncelle
                     if hasattr(self.rate_limiter, 'mark_used'):
@@ -15,7 +15,7 @@ import os
 import asyncio
 import traceback
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -24,12 +24,66 @@ from telethon.errors import FloodWaitError, UserIsBlockedError
 
 from app.services.base_service import BaseService
 from app.db.session import get_session
+from app.db.schema_catalog import SchemaCatalog, schema_catalog
 from app.core.config import settings
+from app.utils.flood_limiter import flood_limiter
+from app.utils.template_registry import template_registry, DB_SOURCE
+from app.core.scheduler import wakeups
 from app.models.user import User
 from app.services.analytics.user_service import UserService
 
 logger = logging.getLogger(__name__)
 
+# message_templates tablosunda ilgili türde şablon yoksa kullanılan metinler
+DEFAULT_WELCOME_TEMPLATE = "Merhaba, Telegram botumuza hoş geldiniz! 👋"
+DEFAULT_SERVICE_TEMPLATE = "Hizmetlerimiz hakkında bilgi almak ister misiniz?"
+DEFAULT_INVITE_TEMPLATE = "Gruplarımıza katılarak destek olabilirsiniz."
+
+# Şablon anahtarı -> (message_templates türü, varsayılan şablon)
+DM_TEMPLATE_TYPES = {
+    "welcome": ("dm_welcome", DEFAULT_WELCOME_TEMPLATE),
+    "service": ("dm_service", DEFAULT_SERVICE_TEMPLATE),
+    "invite": ("dm_invite", DEFAULT_INVITE_TEMPLATE),
+}
+
+
+def _build_group_list_query(catalog: SchemaCatalog):
+    """
+    groups tablosunun mevcut sütunlarına göre davet grup listesi sorgusunu oluşturur.
+
+    Args:
+        catalog: Şema kataloğu
+
+    Returns:
+        TextClause: Sorgu
+    """
+    # "title" sütunu yoksa "name" veya "group_name" sütununu kullan
+    name_column = catalog.first_column("groups", ["title", "name", "group_name"]) or "title"
+    chat_id_column = catalog.first_column("groups", ["chat_id", "group_id", "telegram_id", "tg_id"])
+    
+    if not chat_id_column:
+        logger.warning("Chat ID column not found in groups table")
+        return text(f"""
+            SELECT id, {name_column} AS title
+            FROM groups
+            WHERE is_active = true
+            ORDER BY id DESC
+        """)
+    
+    def column_or(name: str, fallback: str) -> str:
+        return name if catalog.has_column("groups", name) else f"{fallback} as {name}"
+    
+    admin_check = "AND is_admin = true" if catalog.has_column("groups", "is_admin") else ""
+    
+    return text(f"""
+        SELECT id, {name_column} AS title, {chat_id_column} as chat_id,
+               {column_or("invite_link", "NULL")}, {column_or("description", "NULL")},
+               {column_or("member_count", "0")}
+        FROM groups
+        WHERE is_active = true {admin_check}
+        ORDER BY id DESC
+    """)
+
 class DirectMessageService(BaseService):
     """
     Doğrudan mesajları yöneten servis.
@@ -50,10 +104,7 @@ class DirectMessageService(BaseService):
         # Son mesaj zamanlarını takip için
         self.last_dm_times: Dict[int, datetime] = {}
         
-        # Şablonlar
-        self.welcome_templates = []
-        self.service_templates = []
-        self.group_invite_templates = []
+        # Şablonlar her kullanımda şablon kaydından okunur (bkz. _templates)
         self.service_list = []
         self.group_list = []
         
@@ -62,7 +113,6 @@ class DirectMessageService(BaseService):
         self.daily_limit = 200
         self.send_interval = 60  # saniye
         self.last_reset = datetime.now()
-        self.templates = {}
         self.active_campaigns = []
         
         # Kayıt durumu
@@ -95,9 +145,10 @@ class DirectMessageService(BaseService):
         self.handlers.append(handle_private_message)
         
         try:
-            # Servis çalışırken aktif kal
+            # Servis çalışırken aktif kal; iş event handler'larda yapılır,
+            # döngü yalnızca stop() ile uyandırılır
             while self.running:
-                await asyncio.sleep(10)  # Düzenli kontrol
+                await wakeups.wait(self.service_name)
                 
         except asyncio.CancelledError:
             logger.info("DM servisi iptal edildi")
@@ -112,6 +163,8 @@ class DirectMessageService(BaseService):
             return
             
         self.running = False
+        wakeups.wake(self.service_name)
+        wakeups.wake(f"{self.service_name}_promo")
         
         # Event handler'ları temizle
         for handler in self.handlers:
@@ -143,82 +196,62 @@ class DirectMessageService(BaseService):
         return True
     
     async def _load_templates(self):
-        """Mesaj şablonlarını yükle."""
+        """Paylaşılan şablon kaydının "db" kaynağının yüklendiğinden emin ol."""
         try:
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            tables = [row[0] for row in schema_result.fetchall()]
-            
-            if 'message_templates' not in tables:
-                logger.warning("Message templates table not found, using default templates")
-                # Varsayılan şablonlar ekle
-                self.welcome_templates = [(1, "Merhaba, Telegram botumuza hoş geldiniz! 👋")]
-                self.service_templates = [(1, "Hizmetlerimiz hakkında bilgi almak ister misiniz?")]
-                self.group_invite_templates = [(1, "Gruplarımıza katılarak destek olabilirsiniz.")]
-            else:
-                # Karşılama şablonları
-                query = """
-                    SELECT id, content FROM message_templates 
-                    WHERE is_active = true AND type = 'dm_welcome'
-                """
-                result = self.db.execute(text(query))
-                self.welcome_templates = result.fetchall()
-                
-                # Hizmet tanıtım şablonları
-                query = """
-                    SELECT id, content FROM message_templates 
-                    WHERE is_active = true AND type = 'dm_service'
-                """
-                result = self.db.execute(text(query))
-                self.service_templates = result.fetchall()
-                
-                # Grup davet şablonları
-                query = """
-                    SELECT id, content FROM message_templates 
-                    WHERE is_active = true AND type = 'dm_invite'
-                """
-                result = self.db.execute(text(query))
-                self.group_invite_templates = result.fetchall()
-            
-            # Templates sözlüğünü güncelle
-            self.templates = {
-                "welcome": self.welcome_templates,
-                "service": self.service_templates,
-                "invite": self.group_invite_templates
-            }
+            # message_templates tablosu kayıt tarafından bir kez okunur; servis
+            # kopya tutmaz, yenilemeler bir sonraki gönderimde görünür
+            snapshot = await template_registry.ensure_db()
+            if DB_SOURCE not in snapshot.sources:
+                logger.warning("Message templates not available, using default templates")
             
             logger.info(f"Loaded templates: welcome={len(self.welcome_templates)}, " + 
                         f"service={len(self.service_templates)}, invite={len(self.group_invite_templates)}")
         except Exception as e:
             logger.error(f"Error loading templates: {str(e)}")
-            # En azından varsayılan şablonlar ekle
-            self.welcome_templates = [(1, "Merhaba, Telegram botumuza hoş geldiniz! 👋")]
-            self.service_templates = [(1, "Hizmetlerimiz hakkında bilgi almak ister misiniz?")]
-            self.group_invite_templates = [(1, "Gruplarımıza katılarak destek olabilirsiniz.")]
-            self.templates = {
-                "welcome": self.welcome_templates,
-                "service": self.service_templates,
-                "invite": self.group_invite_templates
-            }
+    
+    def _templates(self, key: str) -> Tuple[str, ...]:
+        """
+        Şablon anahtarına ait şablonları güncel kayıt görüntüsünden döndürür.
+        
+        Args:
+            key: DM_TEMPLATE_TYPES anahtarı (welcome, service, invite)
+            
+        Returns:
+            Tuple[str, ...]: Şablonlar; türde şablon yoksa varsayılan şablon
+        """
+        template_type = DM_TEMPLATE_TYPES.get(key)
+        if template_type is None:
+            return ()
+        db_type, default = template_type
+        return template_registry.snapshot.get(DB_SOURCE, db_type) or (default,)
+    
+    @property
+    def welcome_templates(self) -> Tuple[str, ...]:
+        """Karşılama şablonları"""
+        return self._templates("welcome")
+    
+    @property
+    def service_templates(self) -> Tuple[str, ...]:
+        """Hizmet tanıtım şablonları"""
+        return self._templates("service")
+    
+    @property
+    def group_invite_templates(self) -> Tuple[str, ...]:
+        """Grup davet şablonları"""
+        return self._templates("invite")
+    
+    @property
+    def templates(self) -> Dict[str, Tuple[str, ...]]:
+        """Anahtar -> şablonlar (send_promotional_dm için)"""
+        return {key: self._templates(key) for key in DM_TEMPLATE_TYPES}
     
     async def _load_service_list(self):
         """Sunulan hizmetleri yükle."""
         try:
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            tables = [row[0] for row in schema_result.fetchall()]
-            
-            if 'services' in tables:
+            # Tablo varlığını bellek içi şema kataloğundan kontrol et
+            schema_catalog.ensure_loaded(self.db)
+            
+            if schema_catalog.has_table('services'):
                 query = """
                     SELECT id, name, description, price, is_active 
                     FROM services 
@@ -238,64 +271,20 @@ class DirectMessageService(BaseService):
     async def _load_group_list(self):
         """Davet edilecek gruplarımızı yükle."""
         try:
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'groups'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            columns = [row[0] for row in schema_result.fetchall()]
-            
-            if not columns:
+            # Sütunları bellek içi şema kataloğundan kontrol et
+            schema_catalog.ensure_loaded(self.db)
+            
+            if not schema_catalog.columns('groups'):
                 logger.warning("Groups table has no columns or doesn't exist")
                 self.group_list = []
                 return
-                
-            # Her sütun için kontrol et ve dinamik sorgu oluştur
-            # "title" sütunu yoksa "name" veya "group_name" sütununu kullan
-            name_column = "title"
-            if "title" not in columns:
-                if "name" in columns:
-                    name_column = "name"
-                elif "group_name" in columns:
-                    name_column = "group_name"
-            
-            # chat_id yerine alternatif sütun isimleri kontrol et
-            chat_id_column = None
-            for possible_column in ["chat_id", "group_id", "telegram_id", "tg_id"]:
-                if possible_column in columns:
-                    chat_id_column = possible_column
-                    break
-            
-            # Gerekli sütunlar mevcut değilse
-            if not chat_id_column:
-                logger.warning("Chat ID column not found in groups table")
-                # Sadece mevcut olan sütunlarla çalışalım
-                query = f"""
-                    SELECT id, {name_column} AS title 
-                    FROM groups 
-                    WHERE is_active = true
-                    ORDER BY id DESC
-                """
-            else:
-                # Diğer sütunları da kontrol et
-                invite_column = "invite_link" if "invite_link" in columns else "NULL as invite_link"
-                desc_column = "description" if "description" in columns else "NULL as description"
-                member_column = "member_count" if "member_count" in columns else "0 as member_count"
-                admin_check = "AND is_admin = true" if "is_admin" in columns else ""
-                
-                query = f"""
-                    SELECT id, {name_column} AS title, {chat_id_column} as chat_id, 
-                           {invite_column}, {desc_column}, {member_column}
-                    FROM groups 
-                    WHERE is_active = true {admin_check}
-                    ORDER BY id DESC
-                """
+            
+            # Sorgu şemaya göre bir kez oluşturulur; migrasyon sonrası yenilenir
+            query = schema_catalog.statement("dm.group_list", _build_group_list_query)
             
             # Sorguyu çalıştır ve sonuçları kaydet
             self.db.rollback()  # Önceki hatadan kalan işlemi temizle
-            result = self.db.execute(text(query))
+            result = self.db.execute(query)
             self.group_list = result.fetchall()
             logger.info(f"Loaded {len(self.group_list)} groups for invites")
         except Exception as e:
@@ -342,17 +331,18 @@ class DirectMessageService(BaseService):
     async def _send_welcome_message(self, user_id: int):
         """Yeni kullanıcıya karşılama mesajı gönder."""
         try:
-            if not self.welcome_templates:
+            templates = self.welcome_templates
+            if not templates:
                 logger.warning("No welcome templates found")
                 await self.client.send_message(user_id, "Merhaba, Telegram botumuza hoş geldiniz! 👋")
                 return
                 
             # Rastgele bir hoşgeldin mesajı seç
-            template = random.choice(self.welcome_templates)
-            message_text = template.content if hasattr(template, 'content') else template[1]
+            template = random.choice(templates)
+            message_text = template
             
             # Mesajı gönder
-            await self.client.send_message(user_id, message_text)
+            await flood_limiter.run("direct_message", self.client.send_message, user_id, message_text)
             logger.info(f"Sent welcome message to user {user_id}")
             
             # Kullanıcı istatistiklerini güncelle
@@ -421,10 +411,10 @@ class DirectMessageService(BaseService):
             if len(message_text) > 4000:
                 chunks = [message_text[i:i+4000] for i in range(0, len(message_text), 4000)]
                 for chunk in chunks:
-                    await self.client.send_message(user_id, chunk)
+                    await flood_limiter.run("direct_message", self.client.send_message, user_id, chunk)
                     await asyncio.sleep(0.5)  # Mesajlar arasında kısa bekle
             else:
-                await self.client.send_message(user_id, message_text)
+                await flood_limiter.run("direct_message", self.client.send_message, user_id, message_text)
                 
             logger.info(f"Sent service list to user {user_id}")
             
@@ -451,14 +441,15 @@ class DirectMessageService(BaseService):
                 return
                 
             # Davet şablonu seç
-            template = random.choice(self.group_invite_templates) if self.group_invite_templates else None
+            templates = self.group_invite_templates
+            template = random.choice(templates) if templates else None
             
             # Ana mesaj metni
             message_text = "🌟 **Telegram Gruplarımız**\n\n"
             
             # Eğer bir şablon varsa onu ekle
             if template:
-                template_text = template.content if hasattr(template, 'content') else template[1]
+                template_text = template
                 message_text += f"{template_text}\n\n"
             
             # En fazla 5 grup göster (Telegram mesaj limitleri için)
@@ -511,7 +502,7 @@ class DirectMessageService(BaseService):
             # Sonda bilgilendirme
             message_text += "Tüm gruplarımız için web sitemizi ziyaret edebilirsiniz."
             
-            await self.client.send_message(user_id, message_text)
+            await flood_limiter.run("direct_message", self.client.send_message, user_id, message_text)
             logger.info(f"Sent group invites to user {user_id}")
             
             # Kullanıcı istatistiklerini güncelle
@@ -567,16 +558,16 @@ class DirectMessageService(BaseService):
                 return False
             
             # Tanıtım türüne göre şablon seç
-            templates = self.templates.get(promo_type, [])
+            templates = self._templates(promo_type)
             if not templates:
                 logger.warning(f"No templates found for promo_type: {promo_type}")
                 return False
             
             template = random.choice(templates)
-            message_text = template.content if hasattr(template, 'content') else template[1]
+            message_text = template
             
             # Mesajı gönder
-            await self.client.send_message(user_id, message_text)
+            await flood_limiter.run("direct_message", self.client.send_message, user_id, message_text)
             
             # Son gönderim zamanını güncelle
             self.last_dm_times[user_id] = datetime.now()
@@ -602,6 +593,7 @@ class DirectMessageService(BaseService):
         """Tanıtım mesajı döngüsü."""
         logger.info("Starting promotional DM loop")
         self.running = True
+        promo_key = f"{self.service_name}_promo"
         
         while self.running:
             try:
@@ -614,7 +606,9 @@ class DirectMessageService(BaseService):
                 # Günlük limite ulaşıldıysa bekle
                 if self.sent_count >= self.daily_limit:
                     logger.info(f"Daily DM limit reached ({self.sent_count}/{self.daily_limit}). Waiting until next day.")
-                    await asyncio.sleep(3600)  # 1 saat bekle
+                    # Saatlik yoklama yerine gün dönümünde uyan
+                    next_day = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+                    await wakeups.wait(promo_key, timeout=(next_day - now).total_seconds())
                     continue
                 
                 # Hedef kullanıcıları al
@@ -632,7 +626,7 @@ class DirectMessageService(BaseService):
                 
                 if not users:
                     logger.info("No users found for DM promo, waiting 30 minutes")
-                    await asyncio.sleep(1800)
+                    await wakeups.wait(promo_key, timeout=1800)
                     continue
                 
                 # Her kullanıcıya tanıtım mesajı gönder
@@ -659,11 +653,11 @@ class DirectMessageService(BaseService):
                     await asyncio.sleep(self.send_interval)
                 
                 # İşlemler arasında ara ver
-                await asyncio.sleep(300)  # 5 dakika
+                await wakeups.wait(promo_key, timeout=300)  # 5 dakika
                 
             except Exception as e:
                 logger.error(f"Error in promo DM loop: {str(e)}", exc_info=True)
-                await asyncio.sleep(600)  # Hata durumunda 10 dakika bekle
+                await wakeups.wait(promo_key, timeout=600)  # Hata durumunda 10 dakika bekle
     
     async def cleanup(self):
         """Servis kapatılırken temizlik."""
@@ -13,6 +13,8 @@ from telethon import TelegramClient
 
 from app.core.config import settings
 from app.services.base_service import BaseService
+from app.utils.flood_limiter import flood_limiter
+from app.utils.entity_resolver import get_entity_resolver
 from app.models.group import Group
 from app.models.message import Message
 
@@ -32,6 +34,7 @@ class EngagementService(BaseService):
         """Engagement servisi başlat."""
         super().__init__(name="engagement_service", db=db)
         self.client = client
+        self.entity_resolver = get_entity_resolver(client)
         self.service_name = "engagement_service"
         self.target_groups = []
         self.message_templates = []
@@ -215,8 +218,11 @@ class EngagementService(BaseService):
                 logger.error(f"Geçersiz grup: {group}")
                 return False
             
+            # Giriş varlığı önbellekten gelir; her gönderimde yeniden çözülmez
+            entity = await self.entity_resolver.get_input(entity)
+            
             # Mesajı gönder
-            sent_message = await self.client.send_message(entity, message)
+            sent_message = await flood_limiter.run("group_message", self.client.send_message, entity, message)
             
             # Son mesaj zamanını güncelle
             self.last_message_time[entity_id] = time.time()
@@ -13,6 +13,7 @@ from typing import Dict, List, Any, Set, Optional, Tuple, Union
 
 from app.services.base_service import BaseService
 from app.utils.rate_limiter import RateLimiter
+from app.utils.flood_limiter import flood_limiter
 from app.core.logger import get_logger
 from telethon import errors
 
@@ -449,7 +450,7 @@ class InviteService(BaseService):
                 # DM servisi yoksa kendi gönder
                 try:
                     invite_message = f"Merhaba! Sizi grubumuzda görmek isteriz: {invite_link}"
-                    await self.client.send_message(user_id, invite_message)
+                    await flood_limiter.run("invite", self.client.send_message, user_id, invite_message)
                     
                     # Davet kaydını oluştur
                     if str(user_id) not in self.invites:
@@ -15,7 +15,7 @@ import os
 import asyncio
 import traceback
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -24,12 +24,56 @@ from telethon.errors import FloodWaitError, UserIsBlockedError, ChatAdminRequire
 
 from app.services.base_service import BaseService
 from app.db.session import get_session
+from app.db.schema_catalog import SchemaCatalog, schema_catalog
 from app.core.config import settings
+from app.utils.flood_limiter import flood_limiter
+from app.utils.template_registry import template_registry, DB_SOURCE
+from app.core.scheduler import wakeups, notify_listener
 from app.models.user import User
 from app.services.analytics.user_service import UserService
 
 logger = logging.getLogger(__name__)
 
+# message_templates tablosu okunamazsa kullanılan tanıtım şablonları
+DEFAULT_PROMO_TEMPLATES = {
+    "promo_general": ["Merhaba! Telegram botumuzdan haberdar mısınız?"],
+    "promo_service": ["Yeni hizmetlerimizi denediniz mi?"]
+}
+
+
+def _build_target_groups_query(catalog: SchemaCatalog):
+    """
+    groups tablosunun mevcut sütunlarına göre hedef grup sorgusunu oluşturur.
+
+    Args:
+        catalog: Şema kataloğu
+
+    Returns:
+        Optional[TextClause]: Sorgu; sohbet ID sütunu yoksa None
+    """
+    chat_id_column = catalog.first_column("groups", ["chat_id", "group_id", "telegram_id", "tg_id"])
+    if not chat_id_column:
+        return None
+    
+    def column_or(name: str, fallback: str) -> str:
+        return name if catalog.has_column("groups", name) else f"{fallback} as {name}"
+    
+    category_column = catalog.first_column("groups", ["category", "type"])
+    keywords_column = catalog.first_column("groups", ["keywords", "tags"])
+    is_active_check = "is_active = true" if catalog.has_column("groups", "is_active") else "1=1"
+    
+    return text(f"""
+        SELECT id, {chat_id_column} as chat_id,
+               {column_or("is_admin", "true")},
+               {column_or("member_count", "0")},
+               {f"{category_column} as category" if category_column else "NULL as category"},
+               {f"{keywords_column} as keywords" if keywords_column else "NULL as keywords"}
+        FROM groups
+        WHERE {is_active_check}
+        ORDER BY id DESC
+    """)
+
+
 class PromoService(BaseService):
     """
     Tanıtım kampanyaları ve promosyonları yöneten servis.
@@ -56,8 +100,7 @@ class PromoService(BaseService):
         self.initialized = False
         self.running = False
         
-        # Şablonlar ve kampanyalar
-        self.promo_templates = {}
+        # Kampanyalar (şablonlar her kullanımda şablon kaydından okunur)
         self.active_campaigns = []
         
         # Mesaj limitleri
@@ -92,62 +135,50 @@ class PromoService(BaseService):
         return True
     
     async def _load_templates(self):
-        """Tanıtım mesaj şablonlarını yükle."""
+        """Paylaşılan şablon kaydının "db" kaynağının yüklendiğinden emin ol."""
         try:
-            # Önceki işlemlerden kalan hatayı temizle
-            try:
-                self.db.rollback()
-            except:
-                pass
-                
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            tables = [row[0] for row in schema_result.fetchall()]
-            
-            if 'message_templates' not in tables:
-                logger.warning("Message templates table not found, using default templates")
-                # Varsayılan şablonlar ekle
-                self.promo_templates = {
-                    "promo_general": [(1, "promo_general", "Merhaba! Telegram botumuzdan haberdar mısınız?", True)],
-                    "promo_service": [(2, "promo_service", "Yeni hizmetlerimizi denediniz mi?", True)]
-                }
-            else:
-                # DM Tanıtım şablonları
-                query = """
-                    SELECT id, type, content, is_active FROM message_templates 
-                    WHERE is_active = true AND type LIKE 'promo_%'
-                """
-                result = self.db.execute(text(query))
-                templates = result.fetchall()
-                
-                # Şablonları kategorilere ayır
-                self.promo_templates = {}
-                for template in templates:
-                    template_type = template[1] if isinstance(template, tuple) else template.type
-                    
-                    if template_type not in self.promo_templates:
-                        self.promo_templates[template_type] = []
-                        
-                    self.promo_templates[template_type].append(template)
+            # message_templates tablosu kayıt tarafından bir kez okunur; servis
+            # kopya tutmaz, yenilemeler bir sonraki gönderimde görünür
+            snapshot = await template_registry.ensure_db()
+            if DB_SOURCE not in snapshot.sources:
+                logger.warning("Message templates not available, using default templates")
             
             logger.info(f"Loaded {sum(len(v) for v in self.promo_templates.values())} promo templates")
         except Exception as e:
             logger.error(f"Error loading promo templates: {str(e)}")
-            # Hata olduğunda işlemi geri al
-            try:
-                self.db.rollback()
-            except:
-                pass
-            # Varsayılan şablonlar ekle
-            self.promo_templates = {
-                "promo_general": [(1, "promo_general", "Merhaba! Telegram botumuzdan haberdar mısınız?", True)],
-                "promo_service": [(2, "promo_service", "Yeni hizmetlerimizi denediniz mi?", True)]
-            }
+    
+    def _templates_for(self, template_type: str) -> Tuple[str, ...]:
+        """
+        Türdeki tanıtım şablonlarını güncel kayıt görüntüsünden döndürür.
+        
+        Args:
+            template_type: Şablon türü (ör. promo_general)
+            
+        Returns:
+            Tuple[str, ...]: Şablonlar (yoksa boş demet)
+        """
+        snapshot = template_registry.snapshot
+        if DB_SOURCE not in snapshot.sources:
+            return tuple(DEFAULT_PROMO_TEMPLATES.get(template_type, ()))
+        return snapshot.get(DB_SOURCE, template_type)
+    
+    @property
+    def promo_templates(self) -> Dict[str, Tuple[str, ...]]:
+        """
+        Tanıtım şablonlarını türe göre güncel kayıt görüntüsünden döndürür.
+        
+        Returns:
+            Dict[str, Tuple[str, ...]]: promo_* türü -> şablonlar; veritabanı
+            şablonları yüklenemediyse varsayılanlar
+        """
+        snapshot = template_registry.snapshot
+        if DB_SOURCE not in snapshot.sources:
+            return {key: tuple(items) for key, items in DEFAULT_PROMO_TEMPLATES.items()}
+        return {
+            template_type: snapshot.get(DB_SOURCE, template_type)
+            for template_type in snapshot.categories(DB_SOURCE)
+            if template_type.startswith("promo_")
+        }
     
     async def _load_campaigns(self):
         """Aktif kampanyaları yükle."""
@@ -158,16 +189,10 @@ class PromoService(BaseService):
             except:
                 pass
                 
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            tables = [row[0] for row in schema_result.fetchall()]
+            # Tablo varlığını bellek içi şema kataloğundan kontrol et
+            schema_catalog.ensure_loaded(self.db)
             
-            if 'campaigns' not in tables:
+            if not schema_catalog.has_table('campaigns'):
                 logger.warning("Campaigns table not found, no active campaigns will be loaded")
                 self.active_campaigns = []
             else:
@@ -198,65 +223,22 @@ class PromoService(BaseService):
             except:
                 pass
                 
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            tables = [row[0] for row in schema_result.fetchall()]
+            # Tablo ve sütunları bellek içi şema kataloğundan kontrol et
+            schema_catalog.ensure_loaded(self.db)
             
-            if 'groups' not in tables:
+            if not schema_catalog.has_table('groups'):
                 logger.warning("Groups table not found, no target groups will be loaded")
                 self.target_groups = []
                 return
             
-            # 'groups' tablosunun sütunlarını kontrol et
-            column_query = """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'groups'
-            """
-            column_result = self.db.execute(text(column_query))
-            columns = [row[0] for row in column_result.fetchall()]
-            
-            # chat_id sütununu kontrol et ve alternatifi kullan
-            chat_id_column = None
-            for possible_column in ["chat_id", "group_id", "telegram_id", "tg_id"]:
-                if possible_column in columns:
-                    chat_id_column = possible_column
-                    break
-                    
-            if not chat_id_column:
+            # Sorgu şemaya göre bir kez oluşturulur; migrasyon sonrası yenilenir
+            query = schema_catalog.statement("promo.target_groups", _build_target_groups_query)
+            if query is None:
                 logger.warning("No chat ID column found in groups table")
                 self.target_groups = []
                 return
             
-            # Kategori ve keywords sütunlarını kontrol et
-            category_column = "category" if "category" in columns else "type"
-            if category_column not in columns:
-                category_column = "NULL as category"
-                
-            keywords_column = "keywords" if "keywords" in columns else "tags"
-            if keywords_column not in columns:
-                keywords_column = "NULL as keywords"
-            
-            # is_active kontrolü
-            is_active_check = "is_active = true" if "is_active" in columns else "1=1"
-            
-            # Tabloyu sorgula
-            query = f"""
-                SELECT id, {chat_id_column} as chat_id, 
-                       CASE WHEN 'is_admin' = ANY(ARRAY[{', '.join([f"'{col}'" for col in columns])}]) THEN is_admin ELSE true END as is_admin,
-                       CASE WHEN 'member_count' = ANY(ARRAY[{', '.join([f"'{col}'" for col in columns])}]) THEN member_count ELSE 0 END as member_count,
-                       {category_column}, {keywords_column}
-                FROM groups
-                WHERE {is_active_check}
-                ORDER BY id DESC
-            """
-            
-            result = self.db.execute(text(query))
+            result = self.db.execute(query)
             self.target_groups = result.fetchall()
             
             logger.info(f"Loaded {len(self.target_groups)} target groups for promotions")
@@ -351,7 +333,7 @@ class PromoService(BaseService):
             limit = rules.get("daily_limit", 20)
             
             # Şablon kontrolü
-            if template_type not in self.promo_templates or not self.promo_templates[template_type]:
+            if not self._templates_for(template_type):
                 logger.warning(f"No templates found for campaign {campaign_id} (type: {template_type})")
                 return
             
@@ -417,7 +399,7 @@ class PromoService(BaseService):
             limit = rules.get("daily_limit", 5)
             
             # Şablon kontrolü
-            if template_type not in self.promo_templates or not self.promo_templates[template_type]:
+            if not self._templates_for(template_type):
                 logger.warning(f"No templates found for campaign {campaign_id} (type: {template_type})")
                 return
             
@@ -594,13 +576,14 @@ class PromoService(BaseService):
                 pass
                 
             # Şablon kontrolü
-            if template_type not in self.promo_templates or not self.promo_templates[template_type]:
+            templates = self._templates_for(template_type)
+            if not templates:
                 logger.warning(f"No templates found for type: {template_type}")
                 return False
             
             # Şablon seç
-            template = random.choice(self.promo_templates[template_type])
-            message_text = template[2] if isinstance(template, tuple) else template.content
+            template = random.choice(templates)
+            message_text = template
             
             # Kullanıcı bilgilerini getir
             user = await self.user_service.get_user(user_id)
@@ -614,20 +597,13 @@ class PromoService(BaseService):
             message_text = message_text.replace("{first_name}", first_name).replace("{username}", username)
             
             # Mesajı gönder
-            await self.client.send_message(user_id, message_text, parse_mode='md')
+            await flood_limiter.run("direct_message", self.client.send_message, user_id, message_text, parse_mode='md')
             
             # Aktivite ve kullanıcı tablosunun varlığını kontrol et
             try:
-                # Önce veritabanı şemasını kontrol et
-                schema_query = """
-                    SELECT table_name
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public' AND table_name IN ('user_activity', 'users')
-                """
-                schema_result = self.db.execute(text(schema_query))
-                tables = [row[0] for row in schema_result.fetchall()]
+                schema_catalog.ensure_loaded(self.db)
                 
-                if 'user_activity' in tables:
+                if schema_catalog.has_table('user_activity'):
                     # Aktivite kaydı oluştur
                     self.db.execute(
                         text("""
@@ -637,22 +613,12 @@ class PromoService(BaseService):
                         {"user_id": user_id, "detail": f"campaign_id:{campaign_id}"}
                     )
                 
-                if 'users' in tables:
-                    # Kullanıcı son tanıtım tarihini güncelle
-                    # Önce sütun varlığını kontrol et
-                    column_query = """
-                        SELECT column_name
-                        FROM information_schema.columns
-                        WHERE table_name = 'users' AND column_name = 'last_promo_at'
-                    """
-                    column_result = self.db.execute(text(column_query))
-                    has_last_promo = column_result.fetchone() is not None
-                    
-                    if has_last_promo:
-                        self.db.execute(
-                            text("UPDATE users SET last_promo_at = NOW() WHERE user_id = :user_id"),
-                            {"user_id": user_id}
-                        )
+                # Kullanıcı son tanıtım tarihini güncelle (sütun varsa)
+                if schema_catalog.has_column('users', 'last_promo_at'):
+                    self.db.execute(
+                        text("UPDATE users SET last_promo_at = NOW() WHERE user_id = :user_id"),
+                        {"user_id": user_id}
+                    )
                 
                 self.db.commit()
             except Exception as e:
@@ -710,29 +676,23 @@ class PromoService(BaseService):
                 pass
                 
             # Şablon kontrolü
-            if template_type not in self.promo_templates or not self.promo_templates[template_type]:
+            templates = self._templates_for(template_type)
+            if not templates:
                 logger.warning(f"No templates found for type: {template_type}")
                 return False
             
             # Şablon seç
-            template = random.choice(self.promo_templates[template_type])
-            message_text = template[2] if isinstance(template, tuple) else template.content
+            template = random.choice(templates)
+            message_text = template
             
             # Mesajı gönder
-            await self.client.send_message(group_id, message_text, parse_mode='md')
+            await flood_limiter.run("group_message", self.client.send_message, group_id, message_text, parse_mode='md')
             
             # Aktivite tablosunun varlığını kontrol et
             try:
-                # Önce veritabanı şemasını kontrol et
-                schema_query = """
-                    SELECT table_name
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public' AND table_name = 'group_activity'
-                """
-                schema_result = self.db.execute(text(schema_query))
-                table_exists = schema_result.fetchone() is not None
+                schema_catalog.ensure_loaded(self.db)
                 
-                if table_exists:
+                if schema_catalog.has_table('group_activity'):
                     # Aktivite kaydı oluştur
                     self.db.execute(
                         text("""
@@ -782,16 +742,10 @@ class PromoService(BaseService):
             except:
                 pass
                 
-            # Önce veritabanı şemasını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_name = 'campaign_stats'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            table_exists = schema_result.fetchone() is not None
+            # Tablo varlığını bellek içi şema kataloğundan kontrol et
+            schema_catalog.ensure_loaded(self.db)
             
-            if not table_exists:
+            if not schema_catalog.has_table('campaign_stats'):
                 logger.warning("Campaign stats table doesn't exist, skipping update")
                 return
                 
@@ -836,15 +790,9 @@ class PromoService(BaseService):
             self.cooling_groups[group_id] = cool_until
             
             # Veritabanı tablosunun varlığını kontrol et
-            schema_query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_name = 'group_cooldowns'
-            """
-            schema_result = self.db.execute(text(schema_query))
-            table_exists = schema_result.fetchone() is not None
+            schema_catalog.ensure_loaded(self.db)
             
-            if table_exists:
+            if schema_catalog.has_table('group_cooldowns'):
                 # Veritabanına kaydedelim
                 query = """
                     INSERT INTO group_cooldowns (group_id, until, reason, created_at)
@@ -867,6 +815,9 @@ class PromoService(BaseService):
         logger.info("Starting promotional campaign loop")
         self.running = True
         
+        # Yeni kampanya eklendiğinde bekleme beklenmeden yeniden yüklensin
+        await notify_listener.listen("campaigns", self.service_name)
+        
         while self.running:
             try:
                 # Kampanyaları yeniden yükle
@@ -879,12 +830,12 @@ class PromoService(BaseService):
                 else:
                     logger.info("No active campaigns found")
                 
-                # Sonraki çalıştırma öncesi bekle
-                await asyncio.sleep(3600)  # 1 saat
+                # Sonraki çalıştırma veya yeni kampanya bildirimine kadar bekle
+                await wakeups.wait(self.service_name, timeout=3600)  # 1 saat
                 
             except Exception as e:
                 logger.error(f"Error in campaign loop: {str(e)}", exc_info=True)
-                await asyncio.sleep(1800)  # Hata durumunda 30 dakika bekle
+                await wakeups.wait(self.service_name, timeout=1800)  # Hata durumunda 30 dakika bekle
     
     async def cleanup(self):
         """Servis kapatılırken temizlik."""
@@ -921,6 +872,7 @@ class PromoService(BaseService):
         """BaseService için durdurma metodu"""
         try:
             self.running = False
+            wakeups.wake(self.service_name)
             await self.cleanup()
             return True
         except Exception as e:
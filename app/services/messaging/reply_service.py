@@ -5,7 +5,6 @@ Telegram botunun mesajlara otomatik yanıt vermesini yöneten servis.
 """
 
 import asyncio
-import json
 import random
 import functools
 from datetime import datetime
@@ -14,6 +13,9 @@ from telethon import events, utils, errors
 
 from app.services.base_service import BaseService
 from app.core.logger import get_logger
+from app.utils.single_flight import telegram_flight
+from app.utils.template_registry import template_registry
+from app.utils.keyword_matcher import KeywordMatcher
 
 logger = get_logger(__name__)
 
@@ -46,22 +48,20 @@ class ReplyService(BaseService):
         # Çalışma durumu
         self.running = False
         
-        # Yanıt şablonlarını yükle
-        try:
-            with open('data/responses.json', 'r', encoding='utf-8') as f:
-                self.responses = json.load(f)
-        except FileNotFoundError:
+        # Yanıt şablonları paylaşılan kayıttan okunur (bkz. responses özelliği)
+        self.default_responses = {
+            "flirty": ["Merhaba!", "Nasılsın?", "Size nasıl yardımcı olabilirim?"],
+            "help": ["Yardım mesajı buraya gelecek"],
+            "about": ["Hakkında bilgisi buraya gelecek"]
+        }
+        if not template_registry.source("responses"):
             logger.warning("responses.json dosyası bulunamadı, varsayılan yanıtlar kullanılacak")
-            self.responses = {
-                "flirty": ["Merhaba!", "Nasılsın?", "Size nasıl yardımcı olabilirim?"],
-                "help": ["Yardım mesajı buraya gelecek"],
-                "about": ["Hakkında bilgisi buraya gelecek"]
-            }
             
         self.reply_count = 0
         self.mention_stats: Dict[int, int] = {}  # chat_id -> mention sayısı
         self.services = {}  # Diğer servislere referans
         self.replies = {}
+        # Anahtar kelimeler atandığında eşleştirici yeniden kurulur (bkz. keywords özelliği)
         self.keywords = {}
         self.last_update = datetime.now()
         self.stats = {
@@ -76,6 +76,22 @@ class ReplyService(BaseService):
         self.is_running = False
         self.is_paused = False
         
+    @property
+    def keywords(self) -> Dict[str, Any]:
+        """Anahtar kelime -> yanıt sözlüğü"""
+        return self._keywords
+        
+    @keywords.setter
+    def keywords(self, keywords: Dict[str, Any]) -> None:
+        """Sözlüğü atar ve Aho-Corasick eşleştiricisini yeniden kurar."""
+        self._keywords = keywords
+        self._keyword_matcher = KeywordMatcher.from_mapping(keywords)
+        
+    @property
+    def responses(self) -> Dict[str, Any]:
+        """Güncel şablon görüntüsündeki yanıtlar (yoksa varsayılanlar)."""
+        return template_registry.source("responses") or self.default_responses
+        
     async def _start(self) -> bool:
         """
         ReplyService servisini başlatır.
@@ -103,6 +119,9 @@ class ReplyService(BaseService):
                     events.NewMessage
                 )
             
+            # Şablonları (veritabanı dahil) yükle ve dosya değişikliklerini izle
+            await template_registry.start()
+            
             # Yanıtları ve anahtar kelimeleri yükle
             await self._load_replies()
             await self._load_keywords()
@@ -135,6 +154,8 @@ class ReplyService(BaseService):
                 except Exception:
                     pass
                     
+            await template_registry.stop()
+            
             # İstatistikleri kaydet
             if hasattr(self.db, 'save_mention_stats'):
                 await self._run_async_db_method(self.db.save_mention_stats, self.mention_stats)
@@ -174,16 +195,16 @@ class ReplyService(BaseService):
             # Eğer mesaj bir yanıt ise ve sohbet açıcıya cevap ise
             if event.message.reply_to_msg_id:
                 try:
-                    orig_msg = await event.client.get_messages(event.chat_id, ids=event.message.reply_to_msg_id)
-                    with open('data/messages.json', 'r', encoding='utf-8') as f:
-                        messages = json.load(f)
-                    sohbet_acici_list = messages.get('sohbet_acici', [])
-                    if orig_msg.text and orig_msg.text.strip() in sohbet_acici_list:
-                        with open('data/responses.json', 'r', encoding='utf-8') as f:
-                            responses = json.load(f)
-                        reply_list = responses.get('sohbet_acici_reply', [])
-                        if reply_list:
-                            yanit = random.choice(reply_list)
+                    # Aynı mesaja gelen eşzamanlı yanıtlar tek istek paylaşır
+                    reply_to = event.message.reply_to_msg_id
+                    orig_msg = await telegram_flight.do(
+                        ("get_messages", event.chat_id, reply_to),
+                        event.client.get_messages, event.chat_id, ids=reply_to
+                    )
+                    templates = template_registry.snapshot
+                    if orig_msg and templates.contains('messages', 'sohbet_acici', orig_msg.text):
+                        yanit = templates.choice('responses', 'sohbet_acici_reply')
+                        if yanit:
                             await event.reply(yanit)
                             logger.info(f"Sohbet açıcıya otomatik yanıt gönderildi: {yanit}")
                             return
@@ -193,11 +214,8 @@ class ReplyService(BaseService):
             if event.message.mentioned:
                 # DM'e yönlendirici yanıtlar
                 try:
-                    with open('data/responses.json', 'r', encoding='utf-8') as f:
-                        responses = json.load(f)
-                    dm_yonlendirici = responses.get('sohbet_acici_reply', [])
-                    if dm_yonlendirici:
-                        yanit = random.choice(dm_yonlendirici)
+                    yanit = template_registry.snapshot.choice('responses', 'sohbet_acici_reply')
+                    if yanit:
                         await event.reply(yanit)
                         logger.info(f"Mention'a DM yönlendirici yanıt gönderildi: {yanit}")
                         return
@@ -452,15 +470,9 @@ Aktif sohbet sayısı: {len(self.mention_stats)}
         Returns:
             str: Uygun yanıt veya None
         """
-        # Mesajı küçült
-        lower_text = message_text.lower()
-        
-        # Her anahtar kelimeyi kontrol et
-        for keyword, reply in self.keywords.items():
-            if keyword.lower() in lower_text:
-                return reply
-                
-        return None
+        # Tüm anahtar kelimeler tek geçişte aranır; öncelik eşitse sözlük sırası kazanır
+        match = self._keyword_matcher.best(message_text)
+        return match.value if match else None
         
     async def add_reply(self, reply_data):
         """
@@ -7,6 +7,9 @@ import os
 import logging
 import asyncio
 import time
+
+from app.utils.ttl_cache import invalidate_user
+
 # Logger configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -564,6 +567,8 @@ class Database:
         except Exception as e:
             logger.error(f"Kullanıcının davet durumu güncellenemedi: {str(e)}")
             return False
+        finally:
+            invalidate_user(user_id)
             
     def get_users_for_invite(self, limit=50, cooldown_hours=24):
         """Davet edilecek kullanıcıları getirir"""
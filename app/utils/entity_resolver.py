@@ -0,0 +1,381 @@
+"""
+# ============================================================================ #
+# Dosya: entity_resolver.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/entity_resolver.py
+# İşlev: Önbellekli, birleştiren ve toplu çalışan Telegram varlık çözümleyici.
+#
+# Servisler aynı döngüde aynı grup/kullanıcı için tekrar tekrar
+# `client.get_entity` çağırıyordu; her çağrı ayrı bir istek ve olası bir
+# FloodWait demekti. Çözümleyici giriş varlıklarını (InputPeer) ve tam
+# varlıkları LRU önbellekte tutar, aynı anahtar için eşzamanlı aramaları
+# tek bir bekleyen işe bağlar ve önbellekte olmayan ID'leri kısa bir pencere
+# içinde biriktirip 100'lük GetUsers/GetChannels/GetChats istekleriyle
+# çözer. Yanıtlardaki erişim anahtarları Telethon tarafından oturum
+# deposuna işlenir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from telethon import utils
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.messages import GetChatsRequest
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import (
+    InputChannel, InputPeerChannel, InputPeerChat, InputPeerSelf, InputPeerUser, InputUser
+)
+
+from app.utils.flood_limiter import AdaptiveFloodLimiter, flood_limiter
+from app.utils.single_flight import SingleFlight
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# users.getUsers / channels.getChannels / messages.getChats çağrı başına ID sınırı
+MAX_IDS_PER_CALL = 100
+
+
+def peer_key(peer: Any) -> Hashable:
+    """
+    Çözümleme anahtarını normalleştirir.
+
+    Sayısal ID'ler olduğu gibi, kullanıcı adları küçük harfle ve '@'/t.me
+    öneki olmadan, Telethon nesneleri işaretli ID olarak döner.
+
+    Returns:
+        Hashable: Önbellek anahtarı
+    """
+    if isinstance(peer, int):
+        return peer
+    if isinstance(peer, str):
+        text = peer.strip()
+        if text.lstrip("-").isdigit():
+            return int(text)
+        username, is_invite = utils.parse_username(text)
+        return username.lower() if username and not is_invite else text
+    try:
+        return utils.get_peer_id(peer)
+    except (TypeError, ValueError):
+        return peer
+
+
+class EntityResolver:
+    """
+    Tek bir Telegram istemcisi için paylaşılan varlık çözümleyici.
+
+    get_input() gönderim için yeterli olan giriş varlığını, get_entity()
+    tam varlığı (User/Channel/Chat) döndürür. İkisi de önce önbelleğe
+    bakar; aynı anahtarın süren çözümlemesi varsa onu bekler. Önbellekte
+    olmayan sayısal ID'ler `batch_window` saniye biriktirilip türüne göre
+    toplu istekle çözülür; kullanıcı adları Telethon'un tekil çözümlemesine
+    bırakılır.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        maxsize: int = 20000,
+        ttl: float = 3600.0,
+        batch_window: float = 0.05,
+        max_batch: int = MAX_IDS_PER_CALL,
+        limiter: Optional[AdaptiveFloodLimiter] = None
+    ):
+        """
+        Çözümleyiciyi yapılandırır.
+
+        Args:
+            client: Telethon istemcisi
+            maxsize: Önbellekteki en fazla varlık sayısı
+            ttl: Tam varlıkların önbellek ömrü (saniye)
+            batch_window: Soğuk ID'lerin biriktirilme süresi (saniye)
+            max_batch: Toplu istek başına en fazla ID (en fazla 100)
+            limiter: İstek hız sınırlayıcısı (None ise paylaşılan flood_limiter)
+        """
+        self.client = client
+        self.batch_window = max(batch_window, 0.0)
+        self.max_batch = max(1, min(int(max_batch), MAX_IDS_PER_CALL))
+        self.limiter = limiter or flood_limiter
+
+        # Erişim anahtarı değişmediği sürece giriş varlıkları geçerlidir
+        self.inputs = TTLCache(maxsize=maxsize, ttl=24 * 3600.0, name="entity_input")
+        self.entities = TTLCache(maxsize=maxsize, ttl=ttl, name="entity")
+        # Kullanıcı adı -> işaretli ID
+        self.aliases = TTLCache(maxsize=maxsize, ttl=ttl, name="entity_alias")
+
+        # Aynı anahtarın eşzamanlı aramaları tek çözümlemeyi bekler
+        self._flight = SingleFlight("entity_resolver")
+        self._pending: Dict[str, Dict[int, Tuple[Any, asyncio.Future]]] = {"user": {}, "channel": {}, "chat": {}}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Dolan kuyruklar için başlatılan boşaltma görevleri (çöp toplayıcı silmesin diye)
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "lookups": 0,
+            "cache_hits": 0,
+            "cold": 0,
+            "requests": 0,
+            "batched_ids": 0,
+            "not_found": 0,
+            "errors": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Önbellek
+    # ------------------------------------------------------------------ #
+
+    def _canonical(self, key: Hashable) -> Hashable:
+        """Kullanıcı adı anahtarını biliniyorsa işaretli ID'ye çevirir"""
+        if isinstance(key, str):
+            marked = self.aliases.get(key, None)
+            if marked is not None:
+                return marked
+        return key
+
+    def remember(self, entity: Any) -> None:
+        """
+        Tam varlığı ve giriş varlığını önbelleğe yazar.
+
+        Args:
+            entity: Telethon User/Channel/Chat nesnesi
+        """
+        try:
+            marked = utils.get_peer_id(entity)
+            input_peer = utils.get_input_peer(entity, allow_self=False)
+        except (TypeError, ValueError):
+            return
+        self.entities.set(marked, entity)
+        self.inputs.set(marked, input_peer)
+        username = getattr(entity, "username", None)
+        if username:
+            self.aliases.set(username.lower(), marked)
+
+    def invalidate(self, peer: Any) -> None:
+        """Anahtarın önbellek kayıtlarını siler (ör. CHANNEL_INVALID sonrası)."""
+        key = self._canonical(peer_key(peer))
+        self.entities.invalidate(key)
+        self.inputs.invalidate(key)
+
+    # ------------------------------------------------------------------ #
+    # Çözümleme
+    # ------------------------------------------------------------------ #
+
+    async def get_input(self, peer: Any) -> Any:
+        """
+        Gönderim için giriş varlığını döndürür.
+
+        Args:
+            peer: ID, kullanıcı adı veya Telethon nesnesi
+
+        Returns:
+            Any: InputPeer nesnesi
+
+        Raises:
+            ValueError: Varlık çözülemezse
+        """
+        self.stats["lookups"] += 1
+        key = self._canonical(peer_key(peer))
+        cached = self.inputs.get(key, None)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        return await self._flight.do(("input", key), self._resolve_input, peer, key)
+
+    async def _resolve_input(self, peer: Any, key: Hashable) -> Any:
+        session = getattr(self.client, "session", None)
+        ensure = getattr(session, "ensure", None)
+        if ensure is not None:
+            # Havuzlu oturumda bellekte olmayan varlık önce veritabanından okunur
+            await ensure(peer)
+        input_peer = await self.client.get_input_entity(peer)
+        if not isinstance(input_peer, InputPeerSelf):
+            marked = utils.get_peer_id(input_peer)
+            self.inputs.set(marked, input_peer)
+            if isinstance(key, str):
+                self.aliases.set(key, marked)
+        return input_peer
+
+    async def get_entity(self, peer: Any) -> Any:
+        """
+        Tam varlığı (User/Channel/Chat) döndürür.
+
+        Args:
+            peer: ID, kullanıcı adı veya Telethon nesnesi
+
+        Returns:
+            Any: Varlık nesnesi
+
+        Raises:
+            ValueError: Varlık çözülemezse
+        """
+        self.stats["lookups"] += 1
+        key = self._canonical(peer_key(peer))
+        cached = self.entities.get(key, None)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        return await self._flight.do(("entity", key), self._resolve_entity, peer)
+
+    async def _resolve_entity(self, peer: Any) -> Any:
+        self.stats["cold"] += 1
+        if isinstance(peer, str) and not peer.strip().lstrip("-").isdigit():
+            # Kullanıcı adı çözümlemesi toplanamaz; tek istek tam varlığı döndürür
+            entity = await self.client.get_entity(peer)
+            self.remember(entity)
+            return entity
+
+        input_peer = await self.get_input(int(peer) if isinstance(peer, str) else peer)
+        if isinstance(input_peer, InputPeerUser):
+            kind, item = "user", InputUser(input_peer.user_id, input_peer.access_hash)
+        elif isinstance(input_peer, InputPeerChannel):
+            kind, item = "channel", InputChannel(input_peer.channel_id, input_peer.access_hash)
+        elif isinstance(input_peer, InputPeerChat):
+            kind, item = "chat", input_peer.chat_id
+        else:
+            entity = await self.client.get_entity(input_peer)
+            self.remember(entity)
+            return entity
+        return await self._enqueue(kind, utils.get_peer_id(input_peer), item)
+
+    async def get_entities(self, peers: Iterable[Any]) -> Dict[Any, Any]:
+        """
+        Birden çok varlığı eşzamanlı çözer; soğuk ID'ler toplu isteklere düşer.
+
+        Args:
+            peers: ID, kullanıcı adı veya Telethon nesneleri
+
+        Returns:
+            Dict[Any, Any]: Verilen anahtar -> varlık (çözülemeyenler yok)
+        """
+        peers = list(dict.fromkeys(peers))
+        results = await asyncio.gather(*(self.get_entity(peer) for peer in peers), return_exceptions=True)
+        resolved = {}
+        for peer, result in zip(peers, results):
+            if isinstance(result, BaseException):
+                logger.debug(f"Varlık çözülemedi: {peer} -> {str(result)}")
+                continue
+            resolved[peer] = result
+        return resolved
+
+    # ------------------------------------------------------------------ #
+    # Toplu istekler
+    # ------------------------------------------------------------------ #
+
+    async def _enqueue(self, kind: str, marked: int, item: Any) -> Any:
+        """ID'yi türünün bekleme kuyruğuna ekler ve toplu sonucu bekler"""
+        bucket = self._pending[kind]
+        if marked in bucket:
+            return await asyncio.shield(bucket[marked][1])
+
+        future = asyncio.get_running_loop().create_future()
+        bucket[marked] = (item, future)
+        if len(bucket) >= self.max_batch:
+            task = asyncio.get_running_loop().create_task(self._flush_kind(kind))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Bekleyen tüm soğuk ID'leri toplu isteklerle çözer."""
+        for kind in self._pending:
+            while self._pending[kind]:
+                await self._flush_kind(kind)
+
+    async def _flush_kind(self, kind: str) -> None:
+        """Bir türün en fazla max_batch bekleyen ID'sini tek istekle çözer"""
+        bucket = self._pending[kind]
+        if not bucket:
+            return
+        batch = dict(list(bucket.items())[:self.max_batch])
+        for marked in batch:
+            del bucket[marked]
+
+        items = [item for item, _ in batch.values()]
+        try:
+            if kind == "user":
+                result = await self.limiter.run("get_users", self.client, GetUsersRequest(id=items))
+                found = list(result or [])
+            elif kind == "channel":
+                result = await self.limiter.run("get_channels", self.client, GetChannelsRequest(id=items))
+                found = list(getattr(result, "chats", None) or [])
+            else:
+                result = await self.limiter.run("get_chats", self.client, GetChatsRequest(id=items))
+                found = list(getattr(result, "chats", None) or [])
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Toplu varlık çözümleme hatası ({kind}, {len(items)} ID): {str(e)}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["requests"] += 1
+        self.stats["batched_ids"] += len(items)
+        by_id = {}
+        for entity in found:
+            try:
+                by_id[utils.get_peer_id(entity)] = entity
+            except (TypeError, ValueError):
+                continue
+
+        for marked, (_, future) in batch.items():
+            entity = by_id.get(marked)
+            if future.done():
+                continue
+            if entity is None or type(entity).__name__.endswith("Empty"):
+                self.stats["not_found"] += 1
+                future.set_exception(ValueError(f"Varlık bulunamadı: {marked}"))
+            else:
+                self.remember(entity)
+                future.set_result(entity)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Çözümleyici istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        flight = self._flight.get_stats()
+        return {
+            **self.stats,
+            "coalesced": flight["saved"],
+            "in_flight": flight["in_flight"],
+            "cached_entities": len(self.entities),
+            "cached_inputs": len(self.inputs)
+        }
+
+
+# İstemci başına paylaşılan çözümleyiciler
+_resolvers: "weakref.WeakKeyDictionary[Any, EntityResolver]" = weakref.WeakKeyDictionary()
+
+
+def get_entity_resolver(client: Any) -> EntityResolver:
+    """
+    İstemcinin paylaşılan çözümleyicisini döndürür (yoksa oluşturur).
+
+    Args:
+        client: Telethon istemcisi
+
+    Returns:
+        EntityResolver: Paylaşılan çözümleyici
+    """
+    try:
+        resolver = _resolvers.get(client)
+    except TypeError:
+        # Zayıf referans verilemeyen istemci (ör. None) paylaşılmaz
+        return EntityResolver(client)
+    if resolver is None:
+        resolver = EntityResolver(client)
+        _resolvers[client] = resolver
+    return resolver
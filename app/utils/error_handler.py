@@ -26,6 +26,8 @@ from typing import Dict, Any, List, Tuple
 from colorama import Fore, Style
 from tabulate import tabulate
 
+from app.utils.flood_limiter import flood_limiter, flood_wait_seconds
+
 logger = logging.getLogger(__name__)
 
 class ErrorHandler:
@@ -294,8 +296,7 @@ class ErrorHandler:
             bool: Hata loglandıysa True, aksi halde False.
         """
         import re
-        wait_time_match = re.search(r'(\d+) second', error_message)
-        wait_time = int(wait_time_match.group(1)) if wait_time_match else 60
+        wait_time = flood_wait_seconds(f"FloodWait: {error_message}") or 60
         
         # İstek türünü belirle (GetUsersRequest, GetDialogsRequest vb.)
         request_type = "unknown"
@@ -352,6 +353,11 @@ class ErrorHandler:
         Returns:
             Tuple[bool, int]: (Beklemeli mi?, Ne kadar beklemeli?)
         """
+        # Paylaşılan sınırlayıcı tüm gönderimleri durdurduysa ona uy
+        global_remaining = int(flood_limiter.global_blocked_until - time.monotonic())
+        if global_remaining > 0:
+            return True, global_remaining
+        
         if request_type not in self.rate_limit_cooldowns:
             return False, 0
             
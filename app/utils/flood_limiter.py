@@ -0,0 +1,274 @@
+"""
+# ============================================================================ #
+# Dosya: flood_limiter.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/flood_limiter.py
+# İşlev: Tüm gönderici servislerin paylaştığı adaptif, FloodWait duyarlı hız sınırlayıcı.
+#
+# Her gönderim metodu (grup mesajı, DM, davet...) için ayrı bir token bucket
+# tutulur ve hızı AIMD ile öğrenilir: başarılı her istekte hız toplamsal
+# olarak artar, FloodWaitError alındığında çarpımsal olarak düşer ve metot
+# `FloodWaitError.seconds` kadar kapatılır. Uzun FloodWait'ler hesap geneli
+# baskı sayılır ve tüm metotları birlikte durdurur.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.metrics import track_send_rate
+from app.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Metot bazlı başlangıç hızları (istek/saniye)
+DEFAULT_METHOD_RATES = {
+    "group_message": 0.5,
+    "direct_message": 0.2,
+    "invite": 0.1,
+    "get_messages_views": 1.0,
+    "get_channels": 1.0,
+    "get_chats": 1.0,
+    "get_users": 1.0,
+}
+
+
+class MethodLimit:
+    """Tek bir gönderim metodunun öğrenilen hız durumu"""
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        # Son FloodWait anındaki hız; bu seviyenin üstünde hız daha yavaş artırılır
+        self.ceiling: Optional[float] = None
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.successes = 0
+        self.flood_waits = 0
+        self.last_flood_seconds = 0
+
+    def set_rate(self, rate: float) -> None:
+        """Hızı sınırlar içinde günceller ve bucket'a yansıtır"""
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        # Birikmiş token'ları eski hızla hesapla, sonra yeni hıza geç
+        self.bucket.time_to_wait()
+        self.bucket.rate = self.rate
+
+
+class AdaptiveFloodLimiter:
+    """
+    AIMD tabanlı, metot başına hız öğrenen paylaşımlı sınırlayıcı.
+
+    Kullanım:
+        await flood_limiter.run("group_message", client.send_message, chat_id, text)
+
+    run() token alır, çağrıyı yapar ve sonucu kaydeder; FloodWaitError
+    yakalanıp öğrenmede kullanılır ve çağırana yeniden fırlatılır.
+    """
+
+    def __init__(
+        self,
+        default_rate: float = 0.5,
+        min_rate: float = 0.01,
+        max_rate: float = 5.0,
+        increase_step: float = 0.01,
+        decrease_factor: float = 0.5,
+        burst: float = 3.0,
+        global_pause_threshold: int = 30,
+        method_rates: Optional[Dict[str, float]] = None
+    ):
+        """
+        Sınırlayıcıyı yapılandırır.
+
+        Args:
+            default_rate: Tanımsız metotlar için başlangıç hızı (istek/saniye)
+            min_rate: Hızın düşebileceği alt sınır
+            max_rate: Hızın çıkabileceği üst sınır
+            increase_step: Başarılı istek başına toplamsal artış
+            decrease_factor: FloodWait sonrası çarpımsal azalma katsayısı
+            burst: Metot başına biriktirilebilecek istek hakkı
+            global_pause_threshold: Bu süreyi aşan FloodWait tüm metotları durdurur (saniye)
+            method_rates: Metot bazlı başlangıç hızları
+        """
+        self.default_rate = default_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        self.global_pause_threshold = global_pause_threshold
+        self.method_rates = dict(DEFAULT_METHOD_RATES)
+        if method_rates:
+            self.method_rates.update(method_rates)
+
+        self._methods: Dict[str, MethodLimit] = {}
+        self.global_blocked_until = 0.0
+
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "flood_waits": 0,
+            "global_pauses": 0,
+            "total_wait_time": 0.0
+        }
+
+    def _limit(self, method: str) -> MethodLimit:
+        """Metoda ait hız durumunu döndürür (yoksa oluşturur)"""
+        limit = self._methods.get(method)
+        if limit is None:
+            rate = self.method_rates.get(method, self.default_rate)
+            limit = MethodLimit(rate, self.min_rate, self.max_rate, self.burst)
+            self._methods[method] = limit
+            track_send_rate(method, limit.rate)
+        return limit
+
+    def time_to_wait(self, method: str) -> float:
+        """
+        Metot için bir sonraki isteğe kadar beklenecek süreyi döndürür.
+
+        Returns:
+            float: Bekleme süresi (saniye)
+        """
+        global_wait = max(0.0, self.global_blocked_until - time.monotonic())
+        return max(global_wait, self._limit(method).bucket.time_to_wait())
+
+    async def acquire(self, method: str) -> float:
+        """
+        Metot için istek hakkı alınana kadar bekler.
+
+        Returns:
+            float: Toplam bekleme süresi (saniye)
+        """
+        limit = self._limit(method)
+        waited = 0.0
+        while True:
+            global_wait = self.global_blocked_until - time.monotonic()
+            if global_wait <= 0 and limit.bucket.try_acquire():
+                break
+            wait_time = max(global_wait, limit.bucket.time_to_wait(), 0.01)
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+
+        self.stats["requests"] += 1
+        self.stats["total_wait_time"] += waited
+        return waited
+
+    def on_success(self, method: str) -> None:
+        """
+        Başarılı isteği kaydeder ve hızı toplamsal olarak artırır.
+
+        Args:
+            method: Gönderim metodu
+        """
+        limit = self._limit(method)
+        limit.successes += 1
+        self.stats["successes"] += 1
+
+        step = self.increase_step
+        # Daha önce FloodWait görülen seviyenin üstünde temkinli artır
+        if limit.ceiling is not None and limit.rate >= limit.ceiling:
+            step /= 4
+        limit.set_rate(limit.rate + step)
+        track_send_rate(method, limit.rate)
+
+    def on_flood_wait(self, method: str, seconds: int) -> None:
+        """
+        FloodWait kaydeder, hızı çarpımsal düşürür ve metodu bekletir.
+
+        Args:
+            method: Gönderim metodu
+            seconds: Telegram'ın istediği bekleme süresi (saniye)
+        """
+        limit = self._limit(method)
+        limit.flood_waits += 1
+        limit.last_flood_seconds = seconds
+        limit.ceiling = limit.rate
+        limit.set_rate(limit.rate * self.decrease_factor)
+        limit.bucket.pause(seconds)
+        self.stats["flood_waits"] += 1
+
+        if seconds >= self.global_pause_threshold:
+            self.global_blocked_until = max(self.global_blocked_until, time.monotonic() + seconds)
+            self.stats["global_pauses"] += 1
+            logger.warning(f"⚠️ FloodWait ({method}): tüm gönderimler {seconds} saniye durduruldu")
+        else:
+            logger.warning(f"⚠️ FloodWait ({method}): {seconds} saniye, yeni hız {limit.rate:.3f}/s")
+
+        track_send_rate(method, limit.rate, seconds)
+
+    async def run(self, method: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Token alıp çağrıyı yapar ve sonucu hız öğrenmesine yansıtır.
+
+        Args:
+            method: Gönderim metodu
+            func: Çağrılacak coroutine fonksiyonu (ör. client.send_message)
+            *args: Fonksiyona geçirilecek pozisyonel argümanlar
+            **kwargs: Fonksiyona geçirilecek anahtar kelime argümanları
+
+        Returns:
+            Any: Fonksiyonun dönüş değeri
+        """
+        await self.acquire(method)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            seconds = flood_wait_seconds(e)
+            if seconds is not None:
+                self.on_flood_wait(method, seconds)
+            raise
+        self.on_success(method)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Sınırlayıcı istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "global_pause_remaining": max(0.0, round(self.global_blocked_until - time.monotonic(), 1)),
+            "methods": {
+                method: {
+                    "rate": round(limit.rate, 4),
+                    "ceiling": round(limit.ceiling, 4) if limit.ceiling is not None else None,
+                    "successes": limit.successes,
+                    "flood_waits": limit.flood_waits,
+                    "last_flood_seconds": limit.last_flood_seconds
+                }
+                for method, limit in self._methods.items()
+            }
+        }
+
+
+def flood_wait_seconds(error: Any) -> Optional[int]:
+    """
+    Hata nesnesi veya mesajından FloodWait bekleme süresini çıkarır.
+
+    Args:
+        error: Yakalanan hata veya hata mesajı
+
+    Returns:
+        Optional[int]: Bekleme süresi, FloodWait değilse None
+    """
+    seconds = getattr(error, "seconds", None)
+    if isinstance(seconds, int) and type(error).__name__.startswith("Flood"):
+        return seconds
+
+    message = str(error)
+    if "FloodWait" in message or "FLOOD_WAIT" in message:
+        match = re.search(r'FLOOD_WAIT_(\d+)|(\d+) second', message)
+        if match:
+            return int(match.group(1) or match.group(2))
+        return 60
+    return None
+
+
+# Tüm göndericilerin paylaştığı sınırlayıcı
+flood_limiter = AdaptiveFloodLimiter()
@@ -0,0 +1,262 @@
+"""
+# ============================================================================ #
+# Dosya: keyword_matcher.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/keyword_matcher.py
+# İşlev: Anahtar kelime ve mention tespiti için Aho-Corasick eşleştirici.
+#
+# Anahtar kelimeler bir kez normalize edilip tek bir otomata derlenir;
+# mesaj metni tek geçişte taranır ve tüm eşleşmeler bulunur. Maliyet
+# anahtar kelime sayısıyla değil mesaj uzunluğuyla orantılıdır.
+# Normalizasyon Türkçeye duyarlıdır: "İ"/"I" Python'un lower()
+# davranışındaki gibi bozulmaz, noktalı/noktasız i isteğe bağlı eşlenir.
+# Anahtar kelimeler değişince otomat ilk aramada yeniden derlenir.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "İ".lower() iki karakter ("i̇") üretir, "I".lower() Türkçede yanlış ("i") olur
+_TURKISH_UPPER = str.maketrans({"İ": "i", "I": "ı"})
+_DOTLESS_I = str.maketrans({"ı": "i"})
+
+
+def normalize_text(text: str, fold_dotless_i: bool = True) -> str:
+    """
+    Metni Türkçe kurallarıyla küçük harfe çevirir.
+
+    Args:
+        text: Normalize edilecek metin
+        fold_dotless_i: True ise "ı" da "i" kabul edilir (klavyesi Türkçe
+            olmayan kullanıcıların "Istanbul" yazımı "İstanbul" ile eşleşir)
+
+    Returns:
+        str: Normalize edilmiş metin
+    """
+    text = text.translate(_TURKISH_UPPER).lower()
+    if fold_dotless_i:
+        text = text.translate(_DOTLESS_I)
+    return text
+
+
+def _is_word_char(ch: str) -> bool:
+    """Karakter kelimenin parçasıysa True."""
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatch(NamedTuple):
+    """Tek bir eşleşme (konumlar normalize edilmiş metne göredir)"""
+    start: int
+    end: int
+    keyword: str
+    value: Any
+    priority: int
+
+
+class _Pattern(NamedTuple):
+    keyword: str
+    normalized: str
+    value: Any
+    priority: int
+    whole_word: bool
+    order: int
+
+
+class KeywordMatcher:
+    """
+    Çok desenli Aho-Corasick eşleştirici.
+
+    Örnek:
+        matcher = KeywordMatcher.from_mapping({"fiyat": "Fiyatlar DM'de", "merhaba": "Selam!"})
+        match = matcher.best("Merhaba, FİYAT nedir?")
+
+    Aynı önceliğe sahip eşleşmelerde ekleme sırası belirleyicidir; böylece
+    sözlük sırasıyla ilk eşleşen anahtarı döndüren eski davranış korunur.
+    """
+
+    def __init__(self, whole_word: bool = False, fold_dotless_i: bool = True):
+        """
+        Eşleştiriciyi yapılandırır.
+
+        Args:
+            whole_word: Desenlerin varsayılan olarak yalnızca tam kelime eşleşmesi
+            fold_dotless_i: normalize_text() ile aynı anlamda
+        """
+        self.whole_word = whole_word
+        self.fold_dotless_i = fold_dotless_i
+        self._patterns: List[_Pattern] = []
+        self._compiled = False
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._dict_link: List[int] = [0]
+
+    @classmethod
+    def from_mapping(cls, keywords: Mapping[str, Any], **kwargs: Any) -> "KeywordMatcher":
+        """
+        Anahtar kelime -> değer sözlüğünden eşleştirici oluşturur.
+
+        Değer "priority" / "whole_word" anahtarları içeren bir sözlükse bu
+        ayarlar desene uygulanır.
+
+        Args:
+            keywords: Anahtar kelime -> değer
+            **kwargs: KeywordMatcher parametreleri
+
+        Returns:
+            KeywordMatcher: Eşleştirici
+        """
+        matcher = cls(**kwargs)
+        for keyword, value in keywords.items():
+            options = value if isinstance(value, Mapping) else {}
+            matcher.add(
+                keyword,
+                value,
+                priority=options.get("priority", 0),
+                whole_word=options.get("whole_word")
+            )
+        return matcher
+
+    def add(self, keyword: str, value: Any = None, priority: int = 0, whole_word: Optional[bool] = None) -> None:
+        """
+        Desen ekler; otomat sonraki aramada yeniden derlenir.
+
+        Args:
+            keyword: Anahtar kelime
+            value: Eşleşmede döndürülecek değer (None ise anahtar kelime)
+            priority: Büyük olan best() sonucunda öne geçer
+            whole_word: Tam kelime eşleşmesi (None ise eşleştirici varsayılanı)
+        """
+        normalized = normalize_text(str(keyword), self.fold_dotless_i)
+        if not normalized:
+            return
+        self._patterns.append(_Pattern(
+            keyword=keyword,
+            normalized=normalized,
+            value=keyword if value is None else value,
+            priority=int(priority or 0),
+            whole_word=self.whole_word if whole_word is None else bool(whole_word),
+            order=len(self._patterns)
+        ))
+        self._compiled = False
+
+    def extend(self, keywords: Iterable[str], **kwargs: Any) -> None:
+        """Aynı ayarlarla birden çok anahtar kelime ekler."""
+        for keyword in keywords:
+            self.add(keyword, **kwargs)
+
+    def compile(self) -> None:
+        """Trie'yi kurar ve başarısızlık/çıktı bağlantılarını hesaplar."""
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for index, pattern in enumerate(self._patterns):
+            state = 0
+            for ch in pattern.normalized:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(index)
+
+        fail = [0] * len(goto)
+        dict_link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                queue.append(child)
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(ch, 0)
+                dict_link[child] = fail[child] if out[fail[child]] else dict_link[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(ids) for ids in out]
+        self._dict_link = dict_link
+        self._compiled = True
+        logger.debug(f"Anahtar kelime otomatı derlendi: {len(self._patterns)} desen, {len(goto)} durum")
+
+    def _iter_matches(self, text: str) -> Iterator[Tuple[int, int, _Pattern]]:
+        """Metni tek geçişte tarar ve (başlangıç, bitiş, desen) üçlülerini bitiş sırasıyla üretir."""
+        if not text or not self._patterns:
+            return
+        if not self._compiled:
+            self.compile()
+
+        normalized = normalize_text(text, self.fold_dotless_i)
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        patterns = self._patterns
+        length = len(normalized)
+        state = 0
+        for i, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            node = state if out[state] else dict_link[state]
+            while node:
+                for index in out[node]:
+                    pattern = patterns[index]
+                    end = i + 1
+                    start = end - len(pattern.normalized)
+                    if pattern.whole_word and (
+                        (start > 0 and _is_word_char(normalized[start - 1]) and _is_word_char(normalized[start]))
+                        or (end < length and _is_word_char(normalized[end]) and _is_word_char(normalized[end - 1]))
+                    ):
+                        continue
+                    yield start, end, pattern
+                node = dict_link[node]
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        Metindeki tüm eşleşmeleri başlangıç konumuna göre sıralı döndürür.
+
+        Args:
+            text: Taranacak metin
+
+        Returns:
+            List[KeywordMatch]: Eşleşmeler (çakışanlar dahil)
+        """
+        matches = [
+            KeywordMatch(start, end, pattern.keyword, pattern.value, pattern.priority)
+            for start, end, pattern in self._iter_matches(text)
+        ]
+        return sorted(matches, key=lambda m: (m.start, -m.end))
+
+    def best(self, text: str) -> Optional[KeywordMatch]:
+        """
+        En yüksek öncelikli eşleşmeyi döndürür.
+
+        Eşit öncelikte önce eklenen desen kazanır.
+
+        Args:
+            text: Taranacak metin
+
+        Returns:
+            Optional[KeywordMatch]: Eşleşme veya None
+        """
+        best = None
+        for start, end, pattern in self._iter_matches(text):
+            if best is None or (pattern.priority, -pattern.order) > (best[2].priority, -best[2].order):
+                best = (start, end, pattern)
+        if best is None:
+            return None
+        start, end, pattern = best
+        return KeywordMatch(start, end, pattern.keyword, pattern.value, pattern.priority)
+
+    def search(self, text: str) -> bool:
+        """Metinde en az bir eşleşme varsa True (ilk eşleşmede durur)."""
+        return next(self._iter_matches(text), None) is not None
+
+    def __len__(self) -> int:
+        return len(self._patterns)
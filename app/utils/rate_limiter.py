@@ -85,6 +85,98 @@ class RateLimiter:
         self.add_call()
         return True
         
+class TokenBucket:
+    """
+    Token bucket hız sınırlayıcı.
+    
+    Saniyede `rate` token üretir ve en fazla `capacity` token biriktirir;
+    böylece ortalama hız sınırlanırken kısa süreli patlamalara izin verilir.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Token bucket başlatma.
+        
+        Args:
+            rate: Saniyede üretilen token sayısı
+            capacity: Biriktirilebilecek maksimum token sayısı
+        """
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        
+    def _refill(self, now: float) -> None:
+        """
+        Geçen süreye göre token ekler.
+        """
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            
+    def time_to_wait(self, tokens: float = 1.0) -> float:
+        """
+        İstenen token sayısı için beklenecek süreyi hesaplar.
+        
+        Returns:
+            float: Beklenecek süre (saniye)
+        """
+        now = time.monotonic()
+        self._refill(now)
+        
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < tokens:
+            wait = max(wait, (tokens - self.tokens) / self.rate)
+        return wait
+        
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Token varsa hemen harcar.
+        
+        Returns:
+            bool: Token alındıysa True
+        """
+        if self.time_to_wait(tokens) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+        
+    def release(self, tokens: float = 1.0) -> None:
+        """
+        Harcanıp kullanılmayan token'ları geri verir (kapasiteyi aşmaz).
+        
+        Args:
+            tokens: Geri verilecek token sayısı
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + tokens)
+        
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Token alınana kadar bekler.
+        
+        Returns:
+            float: Toplam bekleme süresi (saniye)
+        """
+        waited = 0.0
+        while not self.try_acquire(tokens):
+            wait_time = self.time_to_wait(tokens)
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+        return waited
+        
+    def pause(self, seconds: float) -> None:
+        """
+        Bucket'ı belirtilen süre boyunca kapatır (ör. FloodWait sonrası).
+        
+        Args:
+            seconds: Kapalı kalma süresi (saniye)
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated_at = max(self.updated_at, self.blocked_until)
+        
 def rate_limited(limiter: RateLimiter):
     """
     Rate limit uygulayan dekoratör.
@@ -101,4 +193,4 @@ def rate_limited(limiter: RateLimiter):
             await limiter.wait_for_call()
             return await func(*args, **kwargs)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
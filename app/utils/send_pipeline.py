@@ -0,0 +1,228 @@
+"""
+# ============================================================================ #
+# Dosya: send_pipeline.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/send_pipeline.py
+# İşlev: Eşzamanlı, sohbet bazlı hız sınırlı mesaj gönderim hattı.
+#
+# Bir gönderim turundaki hedefler sabit uyumalar yerine gerçek hız
+# sınırlarına göre işlenir: hesap genelinde bir token bucket toplam hızı,
+# her sohbet için ayrı bir token bucket ise aynı sohbete iki gönderim
+# arasındaki minimum süreyi belirler. Gönderimler bir işçi havuzu
+# tarafından paralel yapılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from app.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class SendPipeline:
+    """
+    İşçi havuzlu ve iki seviyeli token bucket ile sınırlanan gönderim hattı.
+
+    Hedef nesnelerin `id` niteliği sohbet anahtarı olarak kullanılır.
+    Sohbet bucket'ı henüz dolmamış hedefler bekletilmez, o tur için atlanır;
+    böylece işçiler yalnızca gönderilebilecek hedeflerle meşgul olur.
+    """
+
+    def __init__(
+        self,
+        send_func: Callable[[Any], Awaitable[bool]],
+        workers: int = 3,
+        global_rate: float = 1.0,
+        global_burst: float = 3.0,
+        chat_interval: float = 60.0,
+        stop_event: Optional[asyncio.Event] = None,
+        name: str = "send"
+    ):
+        """
+        Gönderim hattını yapılandırır.
+
+        Args:
+            send_func: Tek bir hedefe gönderim yapan coroutine (başarıda True)
+            workers: Eşzamanlı işçi sayısı
+            global_rate: Hesap genelinde saniyedeki gönderim sayısı
+            global_burst: Hesap genelinde biriktirilebilecek gönderim hakkı
+            chat_interval: Aynı sohbete iki gönderim arasındaki minimum süre (saniye)
+            stop_event: Ayarlandığında turu yarıda kesen olay
+            name: Loglarda kullanılacak ad
+        """
+        self.send_func = send_func
+        self.workers = max(int(workers), 1)
+        self.chat_interval = max(chat_interval, 0.0)
+        self.stop_event = stop_event
+        self.name = name
+
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=global_burst)
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+
+        self.stats = {
+            "rounds": 0,
+            "sent": 0,
+            "failed": 0,
+            "skipped": 0,
+            "last_round_duration": 0.0
+        }
+
+    @classmethod
+    def from_config(
+        cls,
+        send_func: Callable[[Any], Awaitable[bool]],
+        batch_size: int,
+        batch_interval: float,
+        min_message_interval: float,
+        workers: Optional[int] = None,
+        stop_event: Optional[asyncio.Event] = None,
+        name: str = "send"
+    ) -> "SendPipeline":
+        """
+        batch_size / batch_interval / min_message_interval ayarlarından hat oluşturur.
+
+        Hesap genelinde her `batch_interval` saniyede `batch_size` gönderime
+        izin verilir; işçi sayısı belirtilmezse batch_size kullanılır.
+        """
+        batch_size = max(int(batch_size), 1)
+        return cls(
+            send_func=send_func,
+            workers=workers or batch_size,
+            global_rate=batch_size / max(float(batch_interval), 0.001),
+            global_burst=batch_size,
+            chat_interval=min_message_interval,
+            stop_event=stop_event,
+            name=name
+        )
+
+    def _is_stopped(self) -> bool:
+        """Durdurma sinyali verildiyse True döndürür"""
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        """Sohbete ait token bucket'ı döndürür (yoksa oluşturur)"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            rate = 1.0 / self.chat_interval if self.chat_interval > 0 else 1e6
+            bucket = TokenBucket(rate=rate, capacity=1.0)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def chat_ready(self, chat_id: Any) -> bool:
+        """Sohbete şu anda gönderim yapılabiliyorsa True döndürür"""
+        return self._chat_bucket(chat_id).time_to_wait() <= 0
+
+    def pause(self, seconds: float) -> None:
+        """
+        Tüm gönderimleri belirtilen süre boyunca durdurur (ör. FloodWait).
+
+        Args:
+            seconds: Bekleme süresi (saniye)
+        """
+        self.global_bucket.pause(seconds)
+        logger.warning(f"Gönderim hattı ({self.name}) {seconds} saniye duraklatıldı")
+
+    async def _acquire_global(self) -> bool:
+        """
+        Hesap genelindeki bucket'tan token alır; durdurulursa False döner.
+        """
+        while not self.global_bucket.try_acquire():
+            if self._is_stopped():
+                return False
+            # Uzun beklemelerde durdurma sinyalini kaçırmamak için parça parça bekle
+            await asyncio.sleep(min(self.global_bucket.time_to_wait(), 1.0))
+        return not self._is_stopped()
+
+    async def run_round(
+        self,
+        items: Iterable[Any],
+        on_result: Optional[Callable[[Any, Optional[bool]], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Bir gönderim turunu çalıştırır.
+
+        Args:
+            items: Gönderim hedefleri (öncelik sırasına göre)
+            on_result: Her hedef için çağrılır; sonuç True/False, atlandıysa None
+
+        Returns:
+            Dict[str, int]: Tur özeti (sent, failed, skipped)
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        summary = {"sent": 0, "failed": 0, "skipped": 0}
+
+        def report(item: Any, result: Optional[bool]) -> None:
+            key = "skipped" if result is None else ("sent" if result else "failed")
+            summary[key] += 1
+            self.stats[key] += 1
+            if on_result is not None:
+                try:
+                    on_result(item, result)
+                except Exception as e:
+                    logger.debug(f"Gönderim sonucu bildirilemedi: {str(e)}")
+
+        async def worker() -> None:
+            while not self._is_stopped():
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                # Sohbet için minimum aralık dolmadıysa bu turda atla
+                if not self.chat_ready(item.id):
+                    report(item, None)
+                    continue
+
+                # Önce hesap genelindeki token beklenir; bekleme durdurulur veya
+                # iptal edilirse sohbet token'ı boşa harcanmamış olur
+                if not await self._acquire_global():
+                    return
+
+                if not self._chat_bucket(item.id).try_acquire():
+                    # Beklerken aynı sohbete başka bir işçi gönderdi
+                    self.global_bucket.release()
+                    report(item, None)
+                    continue
+
+                try:
+                    result = bool(await self.send_func(item))
+                except Exception as e:
+                    logger.error(f"Gönderim hattı hatası ({self.name}): {str(e)}")
+                    result = False
+                report(item, result)
+
+        worker_count = min(self.workers, queue.qsize())
+        if worker_count:
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+
+        self.stats["rounds"] += 1
+        self.stats["last_round_duration"] = round(loop.time() - started, 3)
+        logger.debug(
+            f"Gönderim turu tamamlandı ({self.name}): {summary['sent']} gönderildi, "
+            f"{summary['failed']} hata, {summary['skipped']} atlandı"
+        )
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gönderim hattı istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "global_rate": self.global_bucket.rate,
+            "chat_interval": self.chat_interval,
+            "tracked_chats": len(self._chat_buckets)
+        }
@@ -0,0 +1,175 @@
+"""
+# ============================================================================ #
+# Dosya: single_flight.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/single_flight.py
+# İşlev: Yinelenen eşzamanlı çağrıları tek bir bekleyen işe bağlayan yardımcı.
+#
+# Kalabalık gruplarda aynı anda gelen olay işleyicileri aynı kullanıcı veya
+# sohbet için `event.get_sender()`, `event.get_chat()` ve aynı veritabanı
+# sorgularını paralel çalıştırır. SingleFlight, işlem ve argümanlardan
+# oluşan anahtar için süren bir çağrı varsa yeni çağrı başlatmaz; tüm
+# çağıranlar aynı sonucu (veya istisnayı) bekler. Sonuç saklanmaz; çağrı
+# bitince anahtar serbest kalır. Kazanılan çağrı sayısı istatistiklere ve
+# Prometheus'a aktarılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core.metrics import track_single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Süren paylaşılan çağrı ve onu bekleyen çağıran sayısı"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Anahtar başına en fazla bir süren çağrı garantisi veren birleştirici.
+
+    Örnek:
+        sender = await telegram_flight.do(("sender", event.sender_id), event.get_sender)
+
+    Paylaşılan çağrı kendi görevinde çalışır; her çağıran onu
+    asyncio.shield ile bekler. Bekleyenlerden biri (çağrıyı başlatan dahil)
+    iptal edilirse yalnızca o çağıran ayrılır; çağrı ancak son bekleyen de
+    ayrıldığında iptal edilir.
+    """
+
+    def __init__(self, name: str = "default"):
+        """
+        Birleştiriciyi yapılandırır.
+
+        Args:
+            name: İstatistik ve metriklerde kullanılacak ad
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats = {
+            "calls": 0,
+            "executed": 0,
+            "saved": 0,
+            "errors": 0
+        }
+
+    async def _run(self, func: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict) -> Any:
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        """Çağrı bitince anahtarı serbest bırakır"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Bekleyen kalmadıysa "alınmamış istisna" uyarısı üretme
+        if not call.task.cancelled():
+            call.task.exception()
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """
+        Anahtar için süren çağrı varsa onu bekler, yoksa func'ı çalıştırır.
+
+        Args:
+            key: İşlem ve argümanlardan oluşan anahtar
+            func: Coroutine fonksiyonu
+            *args: func argümanları
+            **kwargs: func anahtar argümanları
+
+        Returns:
+            Any: func sonucu
+        """
+        self.stats["calls"] += 1
+        call = self._calls.get(key)
+        if call is not None:
+            self.stats["saved"] += 1
+            track_single_flight(self.name, "saved")
+        else:
+            call = _Call(asyncio.ensure_future(self._run(func, args, kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._finish(key, call))
+            self.stats["executed"] += 1
+            track_single_flight(self.name, "executed")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Son bekleyen de ayrıldı: sonucu alacak kimse kalmadı
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Anahtar için süren çağrı olup olmadığını döndürür."""
+        return key in self._calls
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Birleştirici istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "in_flight": len(self._calls),
+            "saved_ratio": round(self.stats["saved"] / calls, 4) if calls else 0.0
+        }
+
+
+# Telegram istekleri ve veritabanı okumaları için paylaşılan birleştiriciler
+telegram_flight = SingleFlight("telegram")
+db_flight = SingleFlight("db")
+
+
+async def get_sender(event: Any) -> Any:
+    """
+    event.get_sender() çağrısını gönderen ID'sine göre birleştirir.
+
+    Olay gönderen varlığını zaten taşıyorsa istek yapılmaz.
+
+    Args:
+        event: Telethon mesaj olayı
+
+    Returns:
+        Any: Gönderen varlığı (veya None)
+    """
+    sender = getattr(event, "sender", None)
+    sender_id = getattr(event, "sender_id", None)
+    if sender is not None or sender_id is None:
+        return sender if sender is not None else await event.get_sender()
+    return await telegram_flight.do(("get_sender", sender_id), event.get_sender)
+
+
+async def get_chat(event: Any) -> Any:
+    """
+    event.get_chat() çağrısını sohbet ID'sine göre birleştirir.
+
+    Args:
+        event: Telethon mesaj olayı
+
+    Returns:
+        Any: Sohbet varlığı (veya None)
+    """
+    chat = getattr(event, "chat", None)
+    chat_id = getattr(event, "chat_id", None)
+    if chat is not None or chat_id is None:
+        return chat if chat is not None else await event.get_chat()
+    return await telegram_flight.do(("get_chat", chat_id), event.get_chat)
@@ -0,0 +1,421 @@
+"""
+# ============================================================================ #
+# Dosya: template_registry.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/template_registry.py
+# İşlev: data/*.json ve message_templates tablosu için paylaşılan şablon kaydı.
+#
+# Şablon dosyaları süreç başına bir kez okunur ve değişmez, önceden
+# indekslenmiş bir anlık görüntüye (TemplateSnapshot) dönüştürülür.
+# Kategoriler demet olarak, "bu bizim şablonumuz mu" kontrolleri için
+# frozenset olarak tutulur. Dosya değişiklikleri mtime izleyicisi ile,
+# elle yenileme POST /refresh-templates ile yakalanır; yeni görüntü tam
+# kurulduktan sonra tek atamayla yerine konur, okuyucular hiçbir zaman
+# yarım yüklenmiş şablon görmez.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+DB_SOURCE = "db"
+
+TEMPLATES_QUERY = """
+    SELECT id, content, type FROM message_templates
+    WHERE is_active = TRUE
+    ORDER BY id
+"""
+
+
+def _freeze(value: Any) -> Any:
+    """Sözlükleri salt okunur görünüme, listeleri demete çevirir (iç içe)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _is_text_list(value: Any) -> bool:
+    """Değer yalnızca metinlerden oluşan bir demet ise True."""
+    return isinstance(value, tuple) and all(isinstance(v, str) for v in value)
+
+
+class TemplateSnapshot:
+    """
+    Şablonların değişmez görüntüsü.
+
+    Kaynak adı dosyanın uzantısız adıdır (ör. "messages", "responses");
+    veritabanı şablonları "db" kaynağında `type` sütununa göre gruplanır.
+    """
+
+    __slots__ = ("sources", "version", "loaded_at", "mtimes", "_index", "_sets")
+
+    def __init__(
+        self,
+        sources: Mapping[str, Any],
+        version: int = 0,
+        mtimes: Optional[Mapping[str, Tuple[int, int]]] = None
+    ):
+        """
+        Görüntüyü kurar ve kategori indekslerini oluşturur.
+
+        Args:
+            sources: Kaynak adı -> dondurulmuş veri
+            version: Görüntü sürümü
+            mtimes: Dosya adı -> (mtime_ns, boyut)
+        """
+        index: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        for name, data in sources.items():
+            if isinstance(data, Mapping):
+                for category, items in data.items():
+                    if _is_text_list(items):
+                        index[(name, category)] = items
+
+        self.sources = MappingProxyType(dict(sources))
+        self.version = version
+        self.loaded_at = datetime.now()
+        self.mtimes = MappingProxyType(dict(mtimes or {}))
+        self._index = MappingProxyType(index)
+        self._sets = MappingProxyType({
+            key: frozenset(item.strip() for item in items)
+            for key, items in index.items()
+        })
+
+    def source(self, name: str, default: Any = EMPTY) -> Any:
+        """
+        Kaynağın tüm (dondurulmuş) verisini döndürür.
+
+        Args:
+            name: Kaynak adı
+            default: Kaynak yoksa dönecek değer
+
+        Returns:
+            Any: Salt okunur sözlük, demet veya default
+        """
+        return self.sources.get(name, default)
+
+    def get(self, source: str, category: str) -> Tuple[str, ...]:
+        """Kategorideki şablonları döndürür (yoksa boş demet)."""
+        return self._index.get((source, category), ())
+
+    def texts(self, source: str, category: str) -> FrozenSet[str]:
+        """Kategorideki şablonların kırpılmış metin kümesini döndürür."""
+        return self._sets.get((source, category), frozenset())
+
+    def contains(self, source: str, category: str, text: Optional[str]) -> bool:
+        """
+        Metnin kategorideki şablonlardan biri olup olmadığını O(1) kontrol eder.
+
+        Args:
+            source: Kaynak adı
+            category: Kategori adı
+            text: Kontrol edilecek metin
+
+        Returns:
+            bool: Metin şablonlardan biriyse True
+        """
+        if not text:
+            return False
+        return text.strip() in self._sets.get((source, category), ())
+
+    def choice(self, source: str, category: str, default: Optional[str] = None) -> Optional[str]:
+        """Kategoriden rastgele bir şablon seçer."""
+        items = self._index.get((source, category))
+        return random.choice(items) if items else default
+
+    def categories(self, source: str) -> Tuple[str, ...]:
+        """Kaynaktaki indekslenmiş kategorileri döndürür."""
+        return tuple(category for name, category in self._index if name == source)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._index.values())
+
+
+class LiveTemplates(Mapping):
+    """
+    Takma ad -> kaynak eşlemesini her erişimde güncel görüntüden çözen görünüm.
+
+    Şablonları bir kez alıp uzun süre tutan kod (ör. event_listener) bu
+    görünümü saklar; yenilemelerden sonra da güncel şablonları görür.
+    """
+
+    def __init__(self, registry: "TemplateRegistry", aliases: Mapping[str, str]):
+        self._registry = registry
+        self._aliases = dict(aliases)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._registry.source(self._aliases[key])
+
+    def __iter__(self):
+        return iter(self._aliases)
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+
+class TemplateRegistry:
+    """
+    Şablon görüntüsünü tutan ve yenileyen kayıt.
+
+    İlk `snapshot` erişimi dosyaları senkron yükler; böylece __init__ içinde
+    şablon okuyan sınıflar olay döngüsü olmadan da çalışır. Veritabanı
+    şablonları reload_async() ile (start(), ensure_db() ve POST
+    /refresh-templates) yüklenir; izleyici yalnızca değişen dosyalarda
+    dosyaları yeniden okur ve mevcut veritabanı şablonlarını korur.
+
+    İzleyici süreç geneldir; start()/stop() çağrıları sayılır ve izleyici
+    ancak son kullanıcı stop() çağırdığında durur.
+    """
+
+    def __init__(self, data_dir: str = "data", watch_interval: float = 5.0, pool=None):
+        """
+        Kaydı yapılandırır.
+
+        Args:
+            data_dir: JSON şablon dizini
+            watch_interval: mtime kontrol aralığı (saniye)
+            pool: AsyncDbConnectionPool (None ise get_db_pool() kullanılır)
+        """
+        self.data_dir = data_dir
+        self.watch_interval = watch_interval
+        self.pool = pool
+        self._snapshot: Optional[TemplateSnapshot] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._users = 0
+        self.is_running = False
+        self.stats = {
+            "reloads": 0,
+            "file_errors": 0,
+            "db_errors": 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Okuma
+    # ------------------------------------------------------------------ #
+
+    @property
+    def snapshot(self) -> TemplateSnapshot:
+        """Güncel görüntü (gerekirse dosyalardan ilk yükleme yapılır)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.reload()
+        return snapshot
+
+    def source(self, name: str, default: Any = EMPTY) -> Any:
+        """Güncel görüntüden kaynağı döndürür."""
+        return self.snapshot.source(name, default)
+
+    def live(self, **aliases: str) -> LiveTemplates:
+        """
+        Takma adlarla güncel kaynaklara bağlı görünüm döndürür.
+
+        Örnek:
+            templates = template_registry.live(messages="messages", dm_templates="dm_templates")
+
+        Returns:
+            LiveTemplates: Her erişimde güncel görüntüyü okuyan görünüm
+        """
+        return LiveTemplates(self, aliases)
+
+    # ------------------------------------------------------------------ #
+    # Yükleme
+    # ------------------------------------------------------------------ #
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Şablon dizinindeki JSON dosyalarının (mtime_ns, boyut) bilgisini döndürür."""
+        mtimes: Dict[str, Tuple[int, int]] = {}
+        try:
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        mtimes[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            logger.warning(f"Şablon dizini bulunamadı: {self.data_dir}")
+        return mtimes
+
+    def _read_files(self) -> Tuple[Dict[str, Any], Dict[str, Tuple[int, int]]]:
+        """Tüm JSON dosyalarını okuyup dondurur."""
+        mtimes = self._scan()
+        sources: Dict[str, Any] = {}
+        previous = self._snapshot
+        for filename in sorted(mtimes):
+            name = filename[:-len(".json")]
+            try:
+                with open(os.path.join(self.data_dir, filename), "r", encoding="utf-8") as f:
+                    sources[name] = _freeze(json.load(f))
+            except Exception as e:
+                # Bozuk dosya eski içeriğiyle kalır, diğer dosyalar yenilenir
+                self.stats["file_errors"] += 1
+                logger.error(f"Şablon dosyası okunamadı ({filename}): {str(e)}")
+                if previous is not None and name in previous.sources:
+                    sources[name] = previous.sources[name]
+        return sources, mtimes
+
+    def _swap(
+        self,
+        sources: Dict[str, Any],
+        mtimes: Dict[str, Tuple[int, int]],
+        db_rows: Optional[Iterable[Any]] = None
+    ) -> TemplateSnapshot:
+        """Yeni görüntüyü kurar ve tek atamayla yerine koyar."""
+        with self._lock:
+            previous = self._snapshot
+            if db_rows is not None:
+                grouped: Dict[str, list] = {}
+                for row in db_rows:
+                    grouped.setdefault(row[2], []).append(row[1])
+                sources[DB_SOURCE] = _freeze(grouped)
+            elif previous is not None and DB_SOURCE in previous.sources:
+                sources[DB_SOURCE] = previous.sources[DB_SOURCE]
+
+            version = previous.version + 1 if previous is not None else 1
+            snapshot = TemplateSnapshot(sources, version=version, mtimes=mtimes)
+            self._snapshot = snapshot
+            self.stats["reloads"] += 1
+        logger.info(f"Şablonlar yüklendi: {len(sources)} kaynak, {len(snapshot)} şablon (sürüm {version})")
+        return snapshot
+
+    def reload(self) -> TemplateSnapshot:
+        """
+        JSON dosyalarını yeniden okur; veritabanı şablonları korunur.
+
+        Returns:
+            TemplateSnapshot: Yeni görüntü
+        """
+        sources, mtimes = self._read_files()
+        return self._swap(sources, mtimes)
+
+    async def _fetch_db_rows(self, pool=None) -> Optional[list]:
+        """message_templates tablosundaki aktif şablonları okur (hata olursa None)."""
+        try:
+            pool = pool or self.pool
+            if pool is None:
+                from app.db.async_connection_pool import get_db_pool
+                pool = self.pool = await get_db_pool()
+            return list(await pool.fetch(TEMPLATES_QUERY))
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning(f"Veritabanı şablonları yüklenemedi: {str(e)}")
+            return None
+
+    async def reload_async(self, pool=None) -> TemplateSnapshot:
+        """
+        JSON dosyalarını ve message_templates tablosunu yeniden yükler.
+
+        Args:
+            pool: AsyncDbConnectionPool (None ise kayıt havuzu kullanılır)
+
+        Returns:
+            TemplateSnapshot: Yeni görüntü
+        """
+        sources, mtimes = await asyncio.to_thread(self._read_files)
+        db_rows = await self._fetch_db_rows(pool)
+        return self._swap(sources, mtimes, db_rows)
+
+    async def ensure_db(self) -> TemplateSnapshot:
+        """
+        Veritabanı şablonları henüz yüklenmediyse yükler.
+
+        Returns:
+            TemplateSnapshot: "db" kaynağını içeren (veya yükleme başarısızsa
+            içermeyen) güncel görüntü
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and DB_SOURCE in snapshot.sources:
+            return snapshot
+        return await self.reload_async()
+
+    def changed(self) -> bool:
+        """Dosyalar son yüklemeden beri değiştiyse True."""
+        snapshot = self._snapshot
+        return snapshot is None or self._scan() != dict(snapshot.mtimes)
+
+    # ------------------------------------------------------------------ #
+    # İzleyici
+    # ------------------------------------------------------------------ #
+
+    async def start(self) -> bool:
+        """
+        Şablonları (veritabanı dahil) yükler ve mtime izleyicisini başlatır.
+
+        İzleyici zaten çalışıyorsa yalnızca kullanıcı sayısı artırılır.
+
+        Returns:
+            bool: Başarılı ise True
+        """
+        self._users += 1
+        if self.is_running:
+            return True
+        try:
+            await self.reload_async()
+        except BaseException:
+            self._users -= 1
+            raise
+        self.is_running = True
+        self._task = asyncio.create_task(self._watch_loop())
+        logger.info(f"Şablon izleyicisi başlatıldı ({self.data_dir}, {self.watch_interval}s)")
+        return True
+
+    async def stop(self) -> None:
+        """Kullanıcı sayısını azaltır; son kullanıcı ayrılınca izleyiciyi durdurur."""
+        self._users = max(self._users - 1, 0)
+        if self._users:
+            return
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch_loop(self) -> None:
+        """Dosya değişikliklerini aralıklarla kontrol eder."""
+        while self.is_running:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                if await asyncio.to_thread(self.changed):
+                    sources, mtimes = await asyncio.to_thread(self._read_files)
+                    self._swap(sources, mtimes)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Şablon izleyici hatası: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Kayıt istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "version": snapshot.version if snapshot else 0,
+            "sources": len(snapshot.sources) if snapshot else 0,
+            "templates": len(snapshot) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at.isoformat() if snapshot else None,
+            "watching": self.is_running,
+            "users": self._users
+        }
+
+
+# Süreç genelinde paylaşılan şablon kaydı
+template_registry = TemplateRegistry()
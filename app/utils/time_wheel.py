@@ -0,0 +1,162 @@
+"""
+# ============================================================================ #
+# Dosya: time_wheel.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/time_wheel.py
+# İşlev: Tamsayı anahtarlı, dilimli (bucket) süre sonu yapısı.
+#
+# Görülen kullanıcıları belirli bir süre boyunca hatırlamak için kullanılır.
+# Her kayıt eklendiği zaman dilimine ait diziye yazılır; çark ilerledikçe
+# yalnızca süresi dolan dilimler taranır. Ekleme ve süre sonu işlemleri
+# amortize O(1)'dir ve tüm kayıtların taranması gerekmez.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import math
+import time
+import logging
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringIdSet:
+    """
+    Zaman çarkı (timing wheel) tabanlı, süreli tamsayı kümesi.
+
+    `horizon` saniyeden daha önce görülen anahtarlar otomatik olarak düşer.
+    Zaman ekseni `slot_seconds` genişliğinde dilimlere bölünür; her dilim
+    o dilimde eklenen/yenilenen ID'leri tutan kompakt bir `array('q')`'dur.
+    Yenilenen bir ID eski diliminde kalabilir, ancak süre sonu sırasında
+    son görülme zamanı kontrol edildiği için yanlışlıkla silinmez.
+    """
+
+    def __init__(self, horizon: float = 86400.0, slot_seconds: float = 60.0):
+        """
+        Yapıyı yapılandırır.
+
+        Args:
+            horizon: Kayıtların tutulacağı süre (saniye)
+            slot_seconds: Bir dilimin genişliği (saniye)
+        """
+        self.horizon = horizon
+        self.slot_seconds = max(slot_seconds, 1.0)
+        # Bir dilim tekrar süpürüldüğünde içindeki kayıtların tamamı horizon'u aşmış olmalı
+        self.slot_count = math.ceil(horizon / self.slot_seconds) + 1
+
+        self._slots: List[array] = [array('q') for _ in range(self.slot_count)]
+        self._last_seen: Dict[int, float] = {}
+        self._current_tick: Optional[int] = None
+
+        self.stats = {
+            "inserts": 0,
+            "refreshes": 0,
+            "expired": 0
+        }
+
+    def _tick(self, timestamp: float) -> int:
+        """Zaman damgasının dilim sayacını döndürür."""
+        return int(timestamp // self.slot_seconds)
+
+    def _advance(self, now: float) -> int:
+        """
+        Çarkı şimdiki zamana kadar ilerletir ve süresi dolan dilimleri boşaltır.
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        tick = self._tick(now)
+        if self._current_tick is None:
+            self._current_tick = tick
+            return 0
+        if tick <= self._current_tick:
+            return 0
+
+        expired = 0
+        # Çark tam tur attıysa tüm dilimler bir kez taranır
+        steps = min(tick - self._current_tick, self.slot_count)
+        cutoff = now - self.horizon
+        for step in range(1, steps + 1):
+            slot_index = (self._current_tick + step) % self.slot_count
+            slot = self._slots[slot_index]
+            if not slot:
+                continue
+            survivors = array('q')
+            for user_id in slot:
+                last_seen = self._last_seen.get(user_id)
+                if last_seen is None:
+                    continue
+                if last_seen <= cutoff:
+                    del self._last_seen[user_id]
+                    expired += 1
+                elif self._tick(last_seen) % self.slot_count == slot_index:
+                    # Süresi dolmamış ve hâlâ bu dilime ait kayıt
+                    survivors.append(user_id)
+            self._slots[slot_index] = survivors
+
+        self._current_tick = tick
+        self.stats["expired"] += expired
+        return expired
+
+    def touch(self, key: int, now: Optional[float] = None) -> None:
+        """
+        Anahtarı şimdiki zamanla ekler veya yeniler.
+
+        Args:
+            key: Tamsayı anahtar (ör. user_id)
+            now: Zaman damgası (None ise time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+
+        previous = self._last_seen.get(key)
+        self._last_seen[key] = now
+        if previous is None:
+            self.stats["inserts"] += 1
+        else:
+            self.stats["refreshes"] += 1
+            # Aynı dilimdeyse tekrar yazmaya gerek yok
+            if self._tick(previous) == self._tick(now):
+                return
+        self._slots[self._tick(now) % self.slot_count].append(key)
+
+    def last_seen(self, key: int, now: Optional[float] = None) -> Optional[float]:
+        """
+        Anahtarın son görülme zamanını döndürür.
+
+        Returns:
+            Optional[float]: Zaman damgası veya süresi dolmuşsa None
+        """
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+        last_seen = self._last_seen.get(key)
+        if last_seen is None or now - last_seen > self.horizon:
+            return None
+        return last_seen
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Süresi dolan kayıtları temizler.
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        return self._advance(time.monotonic() if now is None else now)
+
+    def discard(self, key: int) -> None:
+        """Anahtarı siler (dilimdeki kopyası süre sonunda atlanır)."""
+        self._last_seen.pop(key, None)
+
+    def clear(self) -> None:
+        """Tüm kayıtları siler."""
+        self._last_seen.clear()
+        self._slots = [array('q') for _ in range(self.slot_count)]
+        self._current_tick = None
+
+    def __contains__(self, key: int) -> bool:
+        return self.last_seen(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
@@ -0,0 +1,219 @@
+"""
+# ============================================================================ #
+# Dosya: ttl_cache.py
+# Yol: /Users/siyahkare/code/telegram-bot/app/utils/ttl_cache.py
+# İşlev: Boyut sınırlı, süre (TTL) destekli LRU önbellek.
+#
+# Sıcak kullanıcıların varlık ve davet durumu sorgularını veritabanına
+# gitmeden yanıtlamak için kullanılır. İsabet/ıskalama/tahliye sayaçları
+# app/core/metrics.py üzerinden Prometheus'a aktarılır.
+#
+# © 2025 SiyahKare Yazılım - Tüm Hakları Saklıdır
+# ============================================================================ #
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from app.core.metrics import track_cache_event, update_cache_size
+
+logger = logging.getLogger(__name__)
+
+# Önbellekte bulunmayan değerleri None'dan ayırmak için işaretçi
+MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU tahliyeli ve kayıt başına süre sınırlı önbellek.
+
+    Kayıtlar erişim sırasına göre tutulur; kapasite aşıldığında en uzun süredir
+    kullanılmayan kayıt çıkarılır, süresi dolan kayıtlar okunurken düşürülür.
+    `group_fn` verilirse kayıtlar gruplanır ve bir grubun tüm kayıtları
+    invalidate_group() ile tek seferde silinebilir (ör. bir kullanıcının tüm
+    durum bilgileri).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 300.0,
+        name: str = "default",
+        group_fn: Optional[Callable[[Hashable], Hashable]] = None
+    ):
+        """
+        Önbelleği yapılandırır.
+
+        Args:
+            maxsize: Maksimum kayıt sayısı
+            ttl: Varsayılan kayıt ömrü (saniye)
+            name: Metriklerde kullanılacak önbellek adı
+            group_fn: Anahtardan grup anahtarı üreten fonksiyon (opsiyonel)
+        """
+        self.maxsize = max(maxsize, 1)
+        self.ttl = ttl
+        self.name = name
+        self.group_fn = group_fn
+
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Önbellekten değer okur.
+
+        Args:
+            key: Kayıt anahtarı
+            default: Kayıt yoksa döndürülecek değer
+
+        Returns:
+            Any: Kayıtlı değer veya default
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                track_cache_event(self.name, "hit")
+                return value
+            self._remove(key)
+            self.stats["expirations"] += 1
+            track_cache_event(self.name, "expired")
+
+        self.stats["misses"] += 1
+        track_cache_event(self.name, "miss")
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Önbelleğe değer yazar.
+
+        Args:
+            key: Kayıt anahtarı
+            value: Saklanacak değer
+            ttl: Bu kayda özel ömür (saniye, None ise varsayılan)
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (value, expires_at)
+
+        if self.group_fn is not None:
+            self._groups.setdefault(self.group_fn(key), set()).add(key)
+
+        while len(self._data) > self.maxsize:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.stats["evictions"] += 1
+            track_cache_event(self.name, "eviction")
+
+        update_cache_size(self.name, len(self._data))
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Tek bir kaydı siler.
+
+        Returns:
+            bool: Kayıt varsa True
+        """
+        if key not in self._data:
+            return False
+        self._remove(key)
+        self.stats["invalidations"] += 1
+        track_cache_event(self.name, "invalidation")
+        update_cache_size(self.name, len(self._data))
+        return True
+
+    def invalidate_group(self, group: Hashable) -> int:
+        """
+        Bir gruba ait tüm kayıtları siler.
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        keys = self._groups.pop(group, None)
+        if not keys:
+            return 0
+        removed = 0
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                removed += 1
+        if removed:
+            self.stats["invalidations"] += removed
+            track_cache_event(self.name, "invalidation", removed)
+            update_cache_size(self.name, len(self._data))
+        return removed
+
+    def clear(self) -> None:
+        """Tüm kayıtları siler."""
+        self._data.clear()
+        self._groups.clear()
+        update_cache_size(self.name, 0)
+
+    def _remove(self, key: Hashable) -> None:
+        """Kaydı ve grup indeksini temizler."""
+        self._data.pop(key, None)
+        if self.group_fn is not None:
+            group = self.group_fn(key)
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Önbellek istatistiklerini döndürür.
+
+        Returns:
+            Dict[str, Any]: İstatistik değerleri
+        """
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+
+# Kullanıcı varlık/davet durumu için paylaşılan önbellek.
+# Anahtarlar (user_id, bilgi_adı) biçimindedir; bir kullanıcının tüm
+# kayıtları invalidate_user() ile silinir.
+user_cache = TTLCache(
+    maxsize=50000,
+    ttl=300.0,
+    name="user",
+    group_fn=lambda key: key[0] if isinstance(key, tuple) else key
+)
+
+
+def invalidate_user(user_id: int) -> int:
+    """
+    Bir kullanıcıya ait tüm önbellek kayıtlarını siler.
+
+    Args:
+        user_id: Kullanıcı ID
+
+    Returns:
+        int: Silinen kayıt sayısı
+    """
+    return user_cache.invalidate_group(user_id)
@@ -2,7 +2,6 @@ import asyncio
 import logging
 from datetime import datetime
 import os
-import json
 import random
 from pathlib import Path
 from dotenv import load_dotenv
@@ -23,32 +22,55 @@ DM_TEMPLATES_FILE = Path('data/dm_templates.json')
 
 # YENİ: Mesaj etkileşim takibi modelleri
 from app.models.messaging import MessageEffectivenessCreate, DMConversionCreate, ConversionType
+from app.utils.flood_limiter import flood_limiter
+from app.utils.single_flight import get_chat, get_sender
+from app.utils.template_registry import template_registry
+from app.utils.keyword_matcher import KeywordMatcher
+from app.services.analytics.engagement_refresher import EngagementRefresher
+from app.db.schema_catalog import schema_catalog
 
-async def load_templates():
-    """Mesaj şablonlarını yükler"""
-    templates = {
-        "messages": {},
-        "dm_templates": {}
-    }
+
+def _build_user_insert_query(catalog):
+    """users tablosunun sütunlarına göre kullanıcı ekleme ifadesini oluşturur"""
+    from sqlalchemy import text
     
+    has_is_bot = catalog.has_column('users', 'is_bot')
+    bot_column = ", is_bot" if has_is_bot else ""
+    bot_param = ", :is_bot" if has_is_bot else ""
+    query = text(f"""
+        INSERT INTO users (
+            user_id, first_name, last_name, username,
+            last_active, is_active{bot_column}
+        ) VALUES (
+            :user_id, :first_name, :last_name, :username,
+            NOW(), :is_active{bot_param}
+        ) ON CONFLICT (user_id) DO UPDATE
+        SET last_active = NOW(), updated_at = NOW()
+    """)
+    return query, has_is_bot
+
+async def load_templates():
+    """Mesaj şablonlarını paylaşılan kayıttan yükler ve dosya izleyicisini başlatır"""
     try:
-        if MESSAGES_FILE.exists():
-            with open(MESSAGES_FILE, 'r', encoding='utf-8') as f:
-                templates["messages"] = json.load(f)
-                logger.info(f"Mesaj şablonları yüklendi: {len(templates['messages'])} kategori")
-                
-        if DM_TEMPLATES_FILE.exists():
-            with open(DM_TEMPLATES_FILE, 'r', encoding='utf-8') as f:
-                templates["dm_templates"] = json.load(f)
-                logger.info(f"DM şablonları yüklendi: {len(templates['dm_templates'])} kategori")
+        await template_registry.start()
     except Exception as e:
         logger.error(f"Şablonları yükleme hatası: {str(e)}")
-        
+    
+    # Görünüm her erişimde güncel şablonları okur; dosya değişince yeniden yükleme gerekmez
+    templates = template_registry.live(
+        messages=MESSAGES_FILE.stem,
+        dm_templates=DM_TEMPLATES_FILE.stem
+    )
+    logger.info(f"Mesaj şablonları yüklendi: {len(templates['messages'])} kategori")
+    logger.info(f"DM şablonları yüklendi: {len(templates['dm_templates'])} kategori")
     return templates
 
 async def main():
     logger.info("Telegram olay dinleyicisi başlatılıyor...")
     
+    message_analytics = None
+    refresher_stop = asyncio.Event()
+    
     try:
         # Telethon istemci
         from telethon import TelegramClient, events
@@ -65,6 +87,11 @@ async def main():
         me = await client.get_me()
         logger.info(f"Telegram oturumu başlatıldı: {me.first_name} (@{me.username})")
         
+        # @kullanıcıadı mention'ları tek geçişte, büyük/küçük harf duyarsız ve tam kelime olarak aranır
+        mention_matcher = KeywordMatcher(whole_word=True)
+        if me.username:
+            mention_matcher.add(f"@{me.username}")
+        
         # Veritabanı bağlantısı
         from sqlalchemy import text
         from app.db.session import get_session
@@ -120,8 +147,8 @@ async def main():
         # Son aktivite zamanları
         last_activity = datetime.now()
         
-        # YENİ: Son mesaj ID'leri (DM dönüşümlerini takip etmek için)
-        last_sent_messages = {}  # {group_id: {message_id: message_db_id}}
+        # YENİ: Gönderilen mesajların takibi; metrikler sohbet bazında toplu yenilenir
+        engagement_refresher = EngagementRefresher(client, message_analytics.observe_message_metrics)
         
         @client.on(events.NewMessage)
         async def handle_messages(event):
@@ -132,7 +159,7 @@ async def main():
                 # Mesaj kaynağını al
                 if event.is_group or event.is_channel:
                     # Grup mesajı
-                    chat = await event.get_chat()
+                    chat = await get_chat(event)
                     chat_id = str(chat.id)
                     chat_title = chat.title
                     
@@ -169,7 +196,7 @@ async def main():
                         group_ids.append(chat_id)
                     
                     # Mesaj sahibini al
-                    sender = await event.get_sender()
+                    sender = await get_sender(event)
                     
                     # Kullanıcı kontrolü
                     if sender:
@@ -191,48 +218,13 @@ async def main():
                                 user_session.rollback()
                                 
                             if not user:
-                                # Önce sütunların varlığını kontrol et
-                                columns_query = text("""
-                                    SELECT column_name 
-                                    FROM information_schema.columns 
-                                    WHERE table_name = 'users'
-                                """)
+                                # Ekleme ifadesi şema kataloğundan bir kez seçilir
+                                schema_catalog.ensure_loaded(user_session)
                                 
-                                columns = None
-                                try:
-                                    columns_result = user_session.execute(columns_query)
-                                    columns = [row[0] for row in columns_result.fetchall()]
-                                except Exception as e:
-                                    logger.error(f"Sütun sorgulama hatası: {str(e)}")
-                                    # Hatalı işlemi geri al
-                                    user_session.rollback()
-                                    
-                                if columns:
-                                    # Kullanıcıyı ekle
-                                    insert_query = """
-                                        INSERT INTO users (
-                                            user_id, first_name, last_name, username, 
-                                            last_active, is_active
-                                    """
-                                    
-                                    # is_bot sütunu varsa ekle
-                                    if 'is_bot' in columns:
-                                        insert_query += ", is_bot"
-                                    
-                                    insert_query += """
-                                        ) VALUES (
-                                            :user_id, :first_name, :last_name, :username, 
-                                            NOW(), :is_active
-                                    """
-                                    
-                                    # is_bot değerini ekle
-                                    if 'is_bot' in columns:
-                                        insert_query += ", :is_bot"
-                                    
-                                    insert_query += """
-                                        ) ON CONFLICT (user_id) DO UPDATE 
-                                        SET last_active = NOW(), updated_at = NOW()
-                                    """
+                                if schema_catalog.has_table('users'):
+                                    insert_query, has_is_bot = schema_catalog.statement(
+                                        "event_listener.insert_user", _build_user_insert_query
+                                    )
                                     
                                     params = {
                                         "user_id": sender.id,
@@ -243,11 +235,11 @@ async def main():
                                     }
                                     
                                     # is_bot parametresi
-                                    if 'is_bot' in columns:
+                                    if has_is_bot:
                                         params["is_bot"] = getattr(sender, 'bot', False)
                                     
                                     try:
-                                        user_session.execute(text(insert_query), params)
+                                        user_session.execute(insert_query, params)
                                         user_session.commit()
                                     except Exception as e:
                                         logger.error(f"Kullanıcı ekleme hatası: {str(e)}")
@@ -273,18 +265,15 @@ async def main():
                     
                     # YENİ: Gönderdiğimiz mesajlara verilen tepkileri izle
                     if event.message.reply_to_msg_id:
-                        group_messages = last_sent_messages.get(chat_id, {})
-                        if event.message.reply_to_msg_id in group_messages:
+                        tracked_message_id = engagement_refresher.lookup(chat_id, event.message.reply_to_msg_id)
+                        if tracked_message_id is not None:
                             # Mesajımıza yanıt verildi, metrikleri güncelle
-                            tracked_message_id = group_messages[event.message.reply_to_msg_id]
-                            await message_analytics.update_message_metrics(
-                                tracked_message_id, 
-                                {"replies": 1}  # Yanıt sayısını artır
-                            )
+                            # Yanıt sayısını artır; toplu olarak periyodik yazılır
+                            message_analytics.record_engagement(tracked_message_id, "replies")
                             logger.debug(f"Mesaj yanıtı takip edildi: Mesaj ID={tracked_message_id}")
                     
                     # Mentions işle - bize mention edildiğinde yanıt ver
-                    if me.username and f"@{me.username}" in message_text:
+                    if mention_matcher.search(message_text):
                         logger.info(f"Mention tespit edildi: {chat_title} - {message_text[:50]}...")
                         
                         # Mention yanıtı oluştur
@@ -303,7 +292,7 @@ async def main():
                         
                 elif event.is_private:
                     # DM mesajı
-                    sender = await event.get_sender()
+                    sender = await get_sender(event)
                     
                     if sender and not sender.bot:
                         logger.info(f"DM alındı: {sender.first_name} (@{sender.username}) - {event.message.text[:50]}...")
@@ -377,9 +366,7 @@ async def main():
                     
                     if tracked_message:
                         # Mesaj takibini bellekte sakla
-                        if str(chat.id) not in last_sent_messages:
-                            last_sent_messages[str(chat.id)] = {}
-                        last_sent_messages[str(chat.id)][sent_message.id] = tracked_message.id
+                        engagement_refresher.track(chat.id, sent_message.id, tracked_message.id)
                     
                     # Yanıt sonrası kullanıcıyı DM'e davet et (50% şans)
                     if random.random() < 0.5:
@@ -501,9 +488,6 @@ async def main():
         async def send_engaging_message(client, chat_id, chat_title, templates):
             """Grup sohbetine otomatik engaging mesajı gönderir"""
             try:
-                # Rate limiting - çok fazla mesaj göndermemek için
-                await asyncio.sleep(random.uniform(1.0, 3.0))  # Her mesaj gönderimi arasında biraz bekle
-                
                 # Gönderilecek mesaj içeriğini belirle
                 messages = templates.get("messages", {})
                 message_types = list(messages.keys())
@@ -524,8 +508,8 @@ async def main():
                 message_text = random.choice(message_list)
                 
                 try:
-                    # Gruba mesaj gönder
-                    message = await client.send_message(int(chat_id), message_text)
+                    # Gruba mesaj gönder - hız paylaşılan adaptif sınırlayıcı ile belirlenir
+                    message = await flood_limiter.run("group_message", client.send_message, int(chat_id), message_text)
                     if message:
                         logger.info(f"Otomatik mesaj gönderildi: {chat_title} - Kategori: {message_type}")
                         return message, message_type
@@ -586,46 +570,16 @@ async def main():
                 logger.info(f"Engaging mesajı için {len(groups)} gruba yayın yapılacak")
                 sent_count = 0
                 
-                # Rate limiting değişkenleri - daha agresif sınırlama
-                MAX_MESSAGE_RATE = 2  # saniyede
-                MIN_WAIT_TIME = 2.0  # saniye - minimum bekleme süresini arttır
-                BATCH_SIZE = 3  # bir grup içinde gönderilebilecek maksimum mesaj sayısı
-                PAUSE_AFTER_BATCH = 10  # saniye - daha uzun bir mola ver
-                ADAPTIVE_WAIT = True  # Hata durumunda bekleme süresini artır
-                
-                # Adaptive rate limiting için değişkenler
+                # Gönderim hızı ve FloodWait sonrası geri çekilme paylaşılan
+                # flood_limiter tarafından yönetilir; burada sadece hatalar sayılır
                 consecutive_errors = 0
-                wait_multiplier = 1.0
                 
                 # Grupları yoğunluğa göre sırala (mesaj sayısı az olanlara öncelik ver)
                 groups.sort(key=lambda g: g[4] if len(g) > 4 and g[4] is not None else 9999)
                 
-                # Grup etiketlerini kontrol et ve büyük gruplara daha az mesaj gönder
-                for i, group in enumerate(groups):
+                for group in groups:
                     group_id = str(group[0])
                     group_name = group[1]
-                    member_count = group[2] if len(group) > 2 and group[2] is not None else 0
-                    recent_messages = group[4] if len(group) > 4 and group[4] is not None else 0
-                    
-                    # Büyük ve yoğun gruplara daha uzun bekleme süresiyle mesaj gönder
-                    group_wait_factor = 1.0
-                    if member_count > 1000:
-                        group_wait_factor = 1.5
-                    if member_count > 5000:
-                        group_wait_factor = 2.0
-                    if recent_messages > 10:
-                        group_wait_factor += 1.0
-                    
-                    # Flood wait hatalarına karşı rate limiting - grup faktörlerini de dikkate al
-                    wait_time = max(MIN_WAIT_TIME, (1.0 / MAX_MESSAGE_RATE) * wait_multiplier * group_wait_factor)
-                    logger.debug(f"Grup {group_id} için bekleme süresi: {wait_time:.2f} saniye (çarpan: {group_wait_factor:.1f})")
-                    await asyncio.sleep(wait_time)
-                    
-                    # Periyodik olarak daha uzun duraklamalar yap (Telegram API sınırlamalarından kaçınmak için)
-                    if i > 0 and i % BATCH_SIZE == 0:
-                        pause_time = PAUSE_AFTER_BATCH + (consecutive_errors * 2)
-                        logger.debug(f"Batch duraklaması: {pause_time} saniye")
-                        await asyncio.sleep(pause_time)
                     
                     try:
                         # Gruba engaging mesaj gönder
@@ -645,28 +599,15 @@ async def main():
                             
                             if tracked_message:
                                 # Mesaj takibini bellekte sakla
-                                if group_id not in last_sent_messages:
-                                    last_sent_messages[group_id] = {}
-                                last_sent_messages[group_id][message.id] = tracked_message.id
+                                engagement_refresher.track(group_id, message.id, tracked_message.id)
                             
                             # Başarılı gönderim - hata sayacını sıfırla
                             consecutive_errors = 0
-                            wait_multiplier = 1.0
                         else:
                             consecutive_errors += 1
-                            # Hata sayısına göre bekleme süresini artır
-                            if ADAPTIVE_WAIT:
-                                wait_multiplier = min(5.0, 1.0 + (consecutive_errors * 0.5))
-                                # Hatalardan sonra daha uzun bekle
-                                await asyncio.sleep(consecutive_errors * 1.5)
                     except Exception as e:
                         logger.error(f"Grup {group_id} için mesaj gönderme hatası: {str(e)}")
                         consecutive_errors += 1
-                        # Hata durumunda bekleme süresini artır
-                        if ADAPTIVE_WAIT:
-                            wait_multiplier = min(5.0, 1.0 + (consecutive_errors * 0.5))
-                            # Hatalardan sonra daha uzun bekle
-                            await asyncio.sleep(consecutive_errors * 1.5)
                 
                 logger.info(f"Engaging mesaj yayını tamamlandı: {sent_count}/{len(groups)} başarılı")
                 
@@ -769,136 +710,13 @@ async def main():
                     # Hata durumunda 1 dakika bekle ve tekrar dene
                     await asyncio.sleep(60)
         
-        # YENİ: Mesaj etkinlik güncellemesi için task
-        async def message_effectiveness_update():
-            """Mesaj etkinliği metriklerini günceller"""
-            try:
-                last_updated = datetime.now()
-                update_interval = 120  # Saniyede bir güncelle
-                MAX_UPDATES_PER_RUN = 30  # Bir seferde maksimum güncellenen mesaj sayısı
-                ERROR_THRESHOLD = 5  # Bir grup için maksimum hata sayısı
-                
-                # Grup başına hata sayaçları
-                group_error_counts = {}
-                
-                while True:
-                    await asyncio.sleep(update_interval)
-                    
-                    try:
-                        now = datetime.now()
-                        recently_updated = 0
-                        update_start_time = datetime.now()
-                        
-                        # Her grup için takip edilen mesajları güncelle
-                        for group_id, messages in list(last_sent_messages.items()):
-                            if not messages:
-                                continue
-                            
-                            # Eğer grup çok fazla hata veriyorsa atla
-                            if group_id in group_error_counts and group_error_counts[group_id] >= ERROR_THRESHOLD:
-                                logger.warning(f"Grup {group_id} çok fazla hata verdiği için atlanıyor (hata sayısı: {group_error_counts[group_id]})")
-                                continue
-                            
-                            # Rate limiting - mevcut işlediğimiz mesaj sayısına göre bekleme süresi ekle
-                            if recently_updated >= MAX_UPDATES_PER_RUN:
-                                logger.info(f"Maksimum güncelleme sayısına ulaşıldı: {recently_updated}. Sonraki çalıştırmada devam edilecek.")
-                                break
-                            
-                            try:
-                                for message_id, tracked_id in list(messages.items()):
-                                    try:
-                                        # Flood wait hatalarını önlemek için her mesaj arasında biraz bekle
-                                        await asyncio.sleep(0.5)
-                                        
-                                        # Mesaj detaylarını al
-                                        try:
-                                            message = await client.get_messages(int(group_id), ids=message_id)
-                                            if message:
-                                                try:
-                                                    # Mesaj etkileşim sayılarını al
-                                                    reaction_count = 0
-                                                    
-                                                    # Reactions özelliği None olabiliyor veya len() metodu olmayan bir tipte olabiliyor
-                                                    # Bu durumu güvenli şekilde handle edelim
-                                                    if hasattr(message, 'reactions') and message.reactions:
-                                                        try:
-                                                            # Bazı sürümlerde reactions bir liste, bazılarında ise özel bir sınıf
-                                                            if hasattr(message.reactions, '__len__'):
-                                                                reaction_count = len(message.reactions)
-                                                            elif hasattr(message.reactions, 'reactions'):
-                                                                # MessageReactions sınıfı olabilir
-                                                                reaction_count = len(message.reactions.reactions)
-                                                            elif hasattr(message.reactions, 'count'):
-                                                                # Doğrudan sayı tutan bir özellik olabilir
-                                                                reaction_count = message.reactions.count
-                                                            else:
-                                                                # Tip bilinmiyor, güvenli bir varsayılan değer kullan
-                                                                reaction_count = 0
-                                                                logger.warning(f"Bilinmeyen reactions tipi: {type(message.reactions)}")
-                                                        except Exception as reaction_error:
-                                                            logger.warning(f"Reactions sayısını alırken hata: {reaction_error}")
-                                                            reaction_count = 0
-                                                
-                                                    # Etkileşim sayılarını güncelle
-                                                    forward_count = message.forwards or 0
-                                                    reply_count = 0  # API'den alınamıyor, takip etmek için özel bir mekanizma gerekli
-                                                    
-                                                    # View sayısını güvenli şekilde al
-                                                    view_count = 0
-                                                    if hasattr(message, 'views') and message.views is not None:
-                                                        view_count = message.views
-                                                    
-                                                    await message_analytics.update_message_metrics(tracked_id, {
-                                                        "views": view_count,
-                                                        "forwards": forward_count,
-                                                        "reactions": reaction_count
-                                                    })
-                                                    recently_updated += 1
-                                                    
-                                                    # Çok eski mesajları temizle (24 saatten eski)
-                                                    if message.date and (now - message.date.replace(tzinfo=None)).total_seconds() > 24 * 60 * 60:
-                                                        del messages[message_id]
-                                                except Exception as metrics_error:
-                                                    logger.warning(f"Mesaj metrikleri alınırken hata: {str(metrics_error)}")
-                                                    # Sorunlu mesajı takipten çıkar
-                                                    del messages[message_id]
-                                            else:
-                                                # Mesaj bulunamadı, takipten çıkar
-                                                del messages[message_id]
-                                        except Exception as msg_error:
-                                            logger.error(f"Mesaj detayları alınırken hata: {str(msg_error)}")
-                                            # Grup hata sayacını artır
-                                            group_error_counts[group_id] = group_error_counts.get(group_id, 0) + 1
-                                            # Sorunlu mesajı takipten çıkar
-                                            del messages[message_id]
-                                    except Exception as e:
-                                        logger.error(f"Mesaj işlenirken hata: {str(e)}")
-                                        # Sorunlu mesajla işlemeye devam etmemek için atla
-                                        continue
-                            except Exception as group_error:
-                                logger.error(f"Grup mesajları işlenirken hata: {str(group_error)}")
-                                # Grup hata sayacını artır
-                                group_error_counts[group_id] = group_error_counts.get(group_id, 0) + 1
-                        
-                        # Günlük olarak hata sayaçlarını sıfırla
-                        elapsed_time = (datetime.now() - update_start_time).total_seconds()
-                        if (now - last_updated).total_seconds() > 86400:  # 24 saat
-                            group_error_counts.clear()
-                            last_updated = now
-                        
-                        logger.debug(f"Mesaj etkinliği güncelleme tamamlandı: {recently_updated} mesaj, {elapsed_time:.2f} saniye")
-                    except Exception as update_error:
-                        logger.error(f"Mesaj etkinliği güncellenirken genel hata: {str(update_error)}")
-            except Exception as e:
-                logger.error(f"Mesaj etkinliği güncelleme görevi başlatılırken hata: {str(e)}")
-        
         # Görevleri başlat
         tasks = [
             client.run_until_disconnected(),
             reset_daily_stats(),
             watchdog(),
             scheduled_message_broadcast(),
-            message_effectiveness_update()  # Yeni eklenen görev
+            engagement_refresher.run(refresher_stop)  # Takip edilen mesaj metrikleri
         ]
         
         # Tüm görevleri başlat ve bekle
@@ -907,7 +725,14 @@ async def main():
     except Exception as e:
         logger.error(f"Event Listener hatası: {str(e)}", exc_info=True)
     finally:
-        # Temizlik
+        # Temizlik: bekleyen etkileşim metrikleri bağlantı kapanmadan yazılır
+        refresher_stop.set()
+        await template_registry.stop()
+        if message_analytics is not None:
+            try:
+                await message_analytics._stop()
+            except Exception as e:
+                logger.error(f"Analitik servisi durdurma hatası: {str(e)}")
         try:
             session.close()
             await client.disconnect()
@@ -0,0 +1,135 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from app.db.activity_rollups import (
+    ActivityRollups, ROLLUP_SOURCES, LOCK_STATE_QUERY, SAVE_STATE_QUERY, _dimension_values
+)
+
+
+class FakeConnection:
+    """Filigranı bellekte tutan asyncpg bağlantısı yerine geçen nesne."""
+
+    def __init__(self, last_id=0, gaps=None):
+        self.last_id = last_id
+        self.gaps = gaps or []
+        self.executed = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield self
+
+    async def fetchval(self, query, *args):
+        if query == LOCK_STATE_QUERY:
+            return self.last_id
+        # Taze boşluk sorgusu: aralıktaki ilk açık boşluk
+        lower, upper = args[0], args[1]
+        return next((gap for gap in self.gaps if lower < gap <= upper), None)
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+        if query == SAVE_STATE_QUERY:
+            self.last_id = args[1]
+        return "INSERT 0 1"
+
+
+@pytest.fixture
+def pool():
+    pool = AsyncMock()
+    pool.execute = AsyncMock(return_value="DELETE 0")
+    pool.fetch = AsyncMock(return_value=[])
+    pool.fetchval = AsyncMock(return_value=0)
+    return pool
+
+
+def test_dimension_values_cast_keys():
+    """Mesaj boyutları LATERAL VALUES listesine çevrilir."""
+    values = _dimension_values(ROLLUP_SOURCES["messages"])
+    assert "('group', src.group_id::text)" in values
+    assert "('message_type', src.message_type)" in values
+
+
+@pytest.mark.asyncio
+async def test_refresh_advances_watermark_in_chunks(pool):
+    """Yeni satırlar parça parça toplanır ve filigran her parçada ilerler."""
+    connection = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire():
+        yield connection
+
+    pool.acquire = acquire
+    pool.fetchval = AsyncMock(side_effect=[250, 0, 0])
+    rollups = ActivityRollups(pool=pool, chunk_size=100)
+    rollups._schema_ready = True
+
+    assert await rollups.refresh() == 250
+
+    saved = [args[1] for query, args in connection.executed if query == SAVE_STATE_QUERY]
+    assert saved == [100, 200, 250]
+    upserts = [args for query, args in connection.executed if "ON CONFLICT (dimension, bucket, dim_key)" in query]
+    # Her parça saatlik ve günlük tabloya yazılır
+    assert upserts[:2] == [(0, 100), (0, 100)]
+    assert rollups.stats["rows_rolled_up"] == 250
+
+
+@pytest.mark.asyncio
+async def test_summary_reads_rollups_only(pool):
+    """Özet yalnızca rollup sorgularından oluşturulur."""
+    async def fetch(query, *args):
+        if "COUNT(DISTINCT dim_key)" in query:
+            return [
+                {"dimension": "message", "keys": 1, "events": 48},
+                {"dimension": "group", "keys": 3, "events": 48},
+                {"dimension": "user", "keys": 7, "events": 40},
+            ]
+        if "activity_rollup_daily" in query:
+            return [{"dimension": "message", "events": 900}, {"dimension": "new_user", "events": 20}]
+        if "LEFT JOIN groups" in query:
+            return [{"dim_key": "-100", "message_count": 30, "title": None}]
+        if "'message_type'" in query:
+            return [{"dim_key": "text", "count": 48}]
+        return []
+
+    pool.fetch.side_effect = fetch
+    rollups = ActivityRollups(pool=pool)
+    rollups._schema_ready = True
+
+    summary = await rollups.summary(datetime(2025, 1, 1, 12, 34))
+
+    assert summary["users"] == {"total": 20, "active": 7, "new": 0}
+    assert summary["groups"]["active"] == 3
+    assert summary["groups"]["top_active"] == [{"title": "-100", "message_count": 30}]
+    assert summary["messages"]["recent"] == 48
+    assert summary["messages"]["total"] == 900
+    assert pool.fetch.call_args_list[0][0][1] == datetime(2025, 1, 1, 12, 0)
+    assert all("information_schema" not in call[0][0] for call in pool.fetch.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_refresh_holds_watermark_below_open_gap(pool):
+    """Henüz commit edilmemiş olabilecek ID boşluğu filigranın altında kalır."""
+    connection = FakeConnection(gaps=[181])
+
+    @asynccontextmanager
+    async def acquire():
+        yield connection
+
+    pool.acquire = acquire
+    pool.fetchval = AsyncMock(side_effect=[250, 0, 0])
+    rollups = ActivityRollups(pool=pool, chunk_size=100)
+    rollups._schema_ready = True
+
+    assert await rollups.refresh() == 180
+
+    saved = [args[1] for query, args in connection.executed if query == SAVE_STATE_QUERY]
+    assert saved == [100, 180]
+    assert rollups.stats["held_at_gap"] == 1
+
+    # Boşluk kapandığında (satır commit edildi veya geri alındığı kesinleşti) devam edilir
+    connection.gaps = []
+    pool.fetchval = AsyncMock(side_effect=[250, 0, 0])
+    assert await rollups.refresh() == 70
+    upserts = [args for query, args in connection.executed if "ON CONFLICT (dimension, bucket, dim_key)" in query]
+    assert upserts[-1] == (180, 250)
@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.db.async_pg_db import AsyncPgDatabase, to_asyncpg_query
+
+
+@pytest.fixture
+def mock_pool():
+    """AsyncDbConnectionPool mock nesnesi oluşturur."""
+    pool = AsyncMock()
+    pool.fetch = AsyncMock(return_value=[])
+    pool.fetchrow = AsyncMock(return_value=None)
+    pool.fetchval = AsyncMock(return_value=None)
+    pool.execute = AsyncMock(return_value="UPDATE 1")
+    pool.execute_many = AsyncMock()
+    return pool
+
+
+def test_to_asyncpg_query():
+    """psycopg2 parametrelerinin asyncpg biçimine dönüşümü testi."""
+    query = "SELECT * FROM users WHERE user_id = %s AND username LIKE '100%%' AND status = %s"
+    assert to_asyncpg_query(query) == (
+        "SELECT * FROM users WHERE user_id = $1 AND username LIKE '100%' AND status = $2"
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetchone_uses_pool(mock_pool):
+    """fetchone çağrısının havuz üzerinden yürütüldüğünü doğrular."""
+    db = AsyncPgDatabase(pool=mock_pool)
+    await db.fetchone("SELECT * FROM groups WHERE group_id = %s", (42,))
+    mock_pool.fetchrow.assert_awaited_once_with("SELECT * FROM groups WHERE group_id = $1", 42)
+
+
+@pytest.mark.asyncio
+async def test_is_invited(mock_pool):
+    """Davet durumu sorgusu testi."""
+    db = AsyncPgDatabase(pool=mock_pool)
+    mock_pool.fetchval.return_value = True
+    assert await db.is_invited(1) is True
+    mock_pool.fetchval.return_value = None
+    assert await db.is_invited(2) is False
+
+
+@pytest.mark.asyncio
+async def test_execute_error_returns_false(mock_pool):
+    """Sorgu hatasında False döndüğünü doğrular."""
+    mock_pool.execute.side_effect = RuntimeError("bağlantı koptu")
+    db = AsyncPgDatabase(pool=mock_pool)
+    assert await db.mark_user_invited(1) is False
+
+
+@pytest.mark.asyncio
+async def test_mark_user_invited_invalidates_after_write(mock_pool):
+    """Yazma sürerken önbelleğe giren eski okuma, yazma bitince silinir."""
+    from app.utils.ttl_cache import MISSING, user_cache
+
+    async def execute(query, *args):
+        # Yazma sırasında başlayan bir okuma eski değeri önbelleğe koyar
+        user_cache.set((77, 'is_invited'), False)
+        return "UPDATE 1"
+
+    mock_pool.execute.side_effect = execute
+    db = AsyncPgDatabase(pool=mock_pool)
+    assert await db.mark_user_invited(77) is True
+    assert user_cache.get((77, 'is_invited')) is MISSING
+
+
+@pytest.mark.asyncio
+async def test_group_service_runs_on_async_repository(mock_pool):
+    """GroupService psycopg2 imleci aramadan depo üzerinden okur ve yazar."""
+    from app.services.group_service import GroupService
+
+    mock_pool.fetch.return_value = [(1, "Grup", 10, True, None, None)]
+    db = AsyncPgDatabase(pool=mock_pool)
+    service = GroupService(db=db)
+
+    assert await service.add_group(1, "Grup") is True
+    assert "INSERT INTO groups" in mock_pool.execute.await_args.args[0]
+    groups = await service.get_target_groups()
+    assert [group['group_id'] for group in groups] == [1]
@@ -0,0 +1,124 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.db.engagement_buffer import EngagementBuffer, build_update_query, PARAMS_PER_ROW
+
+
+@pytest.fixture
+def pool():
+    pool = AsyncMock()
+    pool.execute = AsyncMock(return_value="UPDATE 1")
+    return pool
+
+
+def test_update_query_uses_values_join():
+    """Toplu ifade VALUES listesiyle tek UPDATE üretir."""
+    query = build_update_query(2)
+    assert "UPDATE message_effectiveness AS m" in query
+    assert "FROM (VALUES ($1::int" in query
+    assert f"${2 * PARAMS_PER_ROW}::int)" in query
+    assert "replies = COALESCE(v.replies_abs, m.replies) + v.replies_inc" in query
+
+
+@pytest.mark.asyncio
+async def test_replies_are_merged_into_one_row(pool):
+    """Aynı mesaja gelen yanıtlar tek satırlık artışa dönüşür."""
+    buffer = EngagementBuffer(pool=pool)
+    for _ in range(1000):
+        buffer.increment(7, "replies")
+    buffer.observe(7, {"views": 250, "forwards": 3})
+    buffer.increment(8, "replies", 2)
+
+    assert await buffer.flush() == 2
+    assert pool.execute.await_count == 1
+
+    args = pool.execute.call_args[0][1:]
+    # id, views(abs, inc), reactions, replies, forwards
+    assert args[:PARAMS_PER_ROW] == (7, 250, 0, None, 0, None, 1000, 3, 0)
+    assert args[PARAMS_PER_ROW:] == (8, None, 0, None, 0, None, 2, None, 0)
+    assert buffer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_observation_overrides_pending_increments(pool):
+    """Mutlak gözlem aynı metrik için bekleyen artışı geçersiz kılar."""
+    buffer = EngagementBuffer(pool=pool)
+    buffer.increment(1, "views", 5)
+    buffer.observe(1, {"views": 40})
+    await buffer.flush()
+    assert pool.execute.call_args[0][1:3] == (1, 40)
+    assert pool.execute.call_args[0][3] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_deltas(pool):
+    """Yazım hatasında birikim kaybolmaz, yeni artışlarla birleşir."""
+    pool.execute.side_effect = [RuntimeError("bağlantı koptu"), "UPDATE 1"]
+    buffer = EngagementBuffer(pool=pool)
+    buffer.increment(3, "replies", 4)
+
+    assert await buffer.flush() == 0
+    buffer.increment(3, "replies", 1)
+    assert await buffer.flush() == 1
+    assert pool.execute.call_args[0][1:][6] == 5
+    assert buffer.stats["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_split(pool):
+    """Parametre sınırını aşmamak için satırlar birden çok ifadeye bölünür."""
+    buffer = EngagementBuffer(pool=pool, batch_rows=10)
+    for tracked_id in range(25):
+        buffer.increment(tracked_id, "replies")
+
+    assert await buffer.flush() == 25
+    assert pool.execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_stop_during_flush_loses_nothing(pool):
+    """Boşaltma sürerken stop() çağrılırsa veya boşaltma iptal edilirse birikim kaybolmaz."""
+    import asyncio
+
+    started = asyncio.Event()
+
+    async def slow_execute(query, *args):
+        started.set()
+        await asyncio.sleep(0.05)
+        return "UPDATE 1"
+
+    pool.execute = AsyncMock(side_effect=slow_execute)
+    buffer = EngagementBuffer(pool=pool, max_batch_rows=1)
+    assert await buffer.start()
+    buffer.increment(1, "replies")
+    await started.wait()
+    buffer.increment(2, "replies")
+    await buffer.stop()
+
+    assert pool.execute.await_count == 2
+    assert buffer.pending_count == 0
+
+    # Doğrudan iptal edilen boşaltma yazılmamış satırları geri koyar
+    buffer.increment(3, "views", 2)
+    task = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert buffer.pending_count == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_is_bounded_without_flush_task(pool):
+    """Görev çalışmıyorsa tampon max_batch_rows'ta durur; fazlası reddedilip sayılır."""
+    buffer = EngagementBuffer(pool=pool, max_batch_rows=3)
+    for tracked_id in range(10):
+        buffer.increment(tracked_id, "views")
+    buffer.observe(99, {"views": 5})
+    # Bekleyen mesaja gelen metrik birleştirilmeye devam eder
+    buffer.increment(0, "views", 4)
+
+    assert buffer.pending_count == 3
+    assert buffer.stats["dropped"] == 8
+    assert await buffer.flush() == 3
+    assert pool.execute.call_args[0][1:4] == (0, None, 5)
@@ -0,0 +1,135 @@
+import pytest
+
+from telethon.tl.functions.messages import GetMessagesViewsRequest, GetMessagesReactionsRequest
+from telethon.tl.types import (
+    MessageReactions, MessageViews, ReactionCount, ReactionEmoji, Updates, UpdateMessageReactions, PeerChannel
+)
+from telethon.tl.types.messages import MessageViews as MessagesMessageViews
+
+from app.services.analytics.engagement_refresher import EngagementRefresher
+from app.utils.flood_limiter import AdaptiveFloodLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """İstekleri kaydeden ve ID başına sabit metrik döndüren sahte istemci"""
+
+    def __init__(self):
+        self.requests = []
+        self.views = {}
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        if isinstance(request, GetMessagesViewsRequest):
+            return MessagesMessageViews(
+                views=[MessageViews(views=self.views.get(i, 10), forwards=1) for i in request.id],
+                chats=[], users=[]
+            )
+        if isinstance(request, GetMessagesReactionsRequest):
+            updates = [
+                UpdateMessageReactions(
+                    peer=PeerChannel(1), msg_id=i,
+                    reactions=MessageReactions(results=[
+                        ReactionCount(reaction=ReactionEmoji("👍"), count=2),
+                        ReactionCount(reaction=ReactionEmoji("🔥"), count=1),
+                    ])
+                )
+                for i in request.id
+            ]
+            return Updates(updates=updates, users=[], chats=[], date=None, seq=0)
+        raise AssertionError(request)
+
+
+@pytest.fixture
+def setup():
+    clock = FakeClock()
+    client = FakeClient()
+    observed = {}
+    refresher = EngagementRefresher(
+        client, lambda tracked_id, metrics: observed.__setitem__(tracked_id, metrics),
+        limiter=AdaptiveFloodLimiter(default_rate=1000, max_rate=1000, burst=1000), clock=clock
+    )
+    return refresher, client, clock, observed
+
+
+@pytest.mark.asyncio
+async def test_one_request_pair_per_chat_chunk(setup):
+    """Sohbet başına 100 ID'lik parçalarla tek görüntülenme ve tek tepki isteği yapılır."""
+    refresher, client, clock, observed = setup
+    for message_id in range(1, 251):
+        refresher.track("-1001", message_id, message_id, sent_at=clock.now)
+    refresher.track(-1002, 5, 999, sent_at=clock.now)
+
+    clock.now += 60
+    assert await refresher.refresh_once() == 251
+
+    views_requests = [r for r in client.requests if isinstance(r, GetMessagesViewsRequest)]
+    assert sorted(len(r.id) for r in views_requests) == [1, 50, 100, 100]
+    assert len(client.requests) == 8
+    assert observed[7] == {"views": 10, "forwards": 1, "reactions": 3}
+    assert refresher.lookup("-1002", 5) == 999
+
+
+@pytest.mark.asyncio
+async def test_unchanged_messages_back_off(setup):
+    """Metrikleri değişmeyen mesajların aralığı iki katına çıkar, değişenler sık yenilenir."""
+    refresher, client, clock, observed = setup
+    refresher.track(-1001, 1, 1, sent_at=clock.now)
+    refresher.track(-1001, 2, 2, sent_at=clock.now)
+
+    clock.now += 60
+    await refresher.refresh_once()
+    client.views[1] = 50
+    clock.now += 60
+    await refresher.refresh_once()
+
+    entries = refresher._messages[-1001]
+    assert entries[1].interval == 60
+    assert entries[2].interval == 120
+
+    # Vadesi gelmeyen mesaj için istek yapılmaz
+    client.requests.clear()
+    clock.now += 60
+    await refresher.refresh_once()
+    assert [list(r.id) for r in client.requests] == [[1], [1]]
+
+
+@pytest.mark.asyncio
+async def test_old_messages_expire_and_missing_are_dropped(setup):
+    """Yaşı sınırı aşan mesajlar takipten çıkar; silinmiş mesajlar düşürülür."""
+    refresher, client, clock, observed = setup
+    refresher.track(-1001, 1, 1, sent_at=clock.now - 3 * 24 * 3600)
+    refresher.track(-1001, 2, 2, sent_at=clock.now)
+    client.views[2] = None
+
+    clock.now += 60
+    assert await refresher.refresh_once() == 0
+    assert refresher.tracked_count == 0
+    assert refresher.stats["expired"] == 1
+    assert observed == {}
+
+
+@pytest.mark.asyncio
+async def test_failing_chat_is_dropped_after_threshold(setup):
+    """Sürekli hata veren sohbet eşik sonrası takipten çıkarılır."""
+    refresher, client, clock, observed = setup
+
+    async def failing(request):
+        raise RuntimeError("CHANNEL_PRIVATE")
+
+    refresher.client = failing
+    refresher.error_threshold = 2
+    refresher.track(-1001, 1, 1, sent_at=clock.now)
+
+    for _ in range(2):
+        clock.now += refresher.max_interval
+        await refresher.refresh_once()
+    assert refresher.tracked_count == 0
+    assert refresher.stats["errors"] == 2
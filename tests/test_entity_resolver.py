@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import Channel, InputPeerChannel, InputPeerUser, User, UserEmpty
+from telethon.tl.types.messages import Chats
+
+from app.utils.entity_resolver import EntityResolver, get_entity_resolver, peer_key
+from app.utils.flood_limiter import AdaptiveFloodLimiter
+
+
+class FakeClient:
+    """Oturum önbelleğini taklit eden, toplu istekleri kaydeden istemci"""
+
+    def __init__(self):
+        self.requests = []
+        self.input_calls = 0
+
+    async def get_input_entity(self, peer):
+        self.input_calls += 1
+        await asyncio.sleep(0)
+        if peer == 404:
+            raise ValueError("önbellekte yok")
+        if peer < 0:
+            return InputPeerChannel(channel_id=-peer - 1000000000000, access_hash=7)
+        return InputPeerUser(user_id=peer, access_hash=peer * 10)
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        if isinstance(request, GetUsersRequest):
+            return [
+                UserEmpty(id=u.user_id) if u.user_id == 13 else
+                User(id=u.user_id, access_hash=u.access_hash, first_name="Ali", username=f"user{u.user_id}")
+                for u in request.id
+            ]
+        if isinstance(request, GetChannelsRequest):
+            return Chats(chats=[
+                Channel(id=c.channel_id, title="Kanal", photo=None, date=None, access_hash=c.access_hash)
+                for c in request.id
+            ])
+        raise AssertionError(request)
+
+
+@pytest.fixture
+def resolver():
+    limiter = AdaptiveFloodLimiter(default_rate=1000, max_rate=1000, burst=1000)
+    return EntityResolver(FakeClient(), batch_window=0.01, limiter=limiter)
+
+
+def test_peer_keys_are_normalized():
+    """Kullanıcı adları ve sayısal metinler aynı anahtara indirgenir."""
+    assert peer_key("@SiyahKare") == "siyahkare"
+    assert peer_key("https://t.me/SiyahKare") == "siyahkare"
+    assert peer_key("-1001234") == -1001234
+
+
+@pytest.mark.asyncio
+async def test_cold_ids_are_batched_by_kind(resolver):
+    """Soğuk kullanıcı ve kanal ID'leri tür başına tek toplu istekle çözülür."""
+    ids = list(range(1, 151)) + [-1000000000555]
+    entities = await resolver.get_entities(ids)
+
+    kinds = sorted((type(r).__name__, len(r.id)) for r in resolver.client.requests)
+    assert kinds == [("GetChannelsRequest", 1), ("GetUsersRequest", 50), ("GetUsersRequest", 100)]
+    assert len(entities) == 150  # UserEmpty dönen 13 çözülemez
+    assert 13 not in entities
+    assert resolver.stats["not_found"] == 1
+
+    # İkinci tur tamamen önbellekten gelir
+    resolver.client.requests.clear()
+    assert (await resolver.get_entity("@User5")).id == 5
+    assert (await resolver.get_entity(7)).id == 7
+    assert resolver.client.requests == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_are_coalesced(resolver):
+    """Aynı ID için eşzamanlı aramalar tek çözümleme ve tek isteği paylaşır."""
+    results = await asyncio.gather(*(resolver.get_entity(42) for _ in range(10)))
+
+    assert {r.id for r in results} == {42}
+    assert resolver.client.input_calls == 1
+    assert len(resolver.client.requests) == 1
+    assert resolver.get_stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_unresolvable_peer_raises_value_error(resolver):
+    """Oturumda olmayan ID, client.get_entity gibi ValueError yükseltir."""
+    with pytest.raises(ValueError):
+        await resolver.get_input(404)
+    assert resolver.get_stats()["in_flight"] == 0
+
+
+def test_resolver_is_shared_per_client():
+    """Aynı istemci için tek çözümleyici paylaşılır."""
+    client = FakeClient()
+    assert get_entity_resolver(client) is get_entity_resolver(client)
+    assert get_entity_resolver(FakeClient()) is not get_entity_resolver(client)
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_tracked_and_chats_have_own_bucket(resolver):
+    """Dolan kuyruğun boşaltma görevi referansla tutulur; GetChats kendi hız kovasını kullanır."""
+    resolver.max_batch = 10
+    entities = await resolver.get_entities(list(range(1, 11)))
+
+    assert len(entities) == 10
+    assert [len(r.id) for r in resolver.client.requests] == [10]
+    assert resolver._batch_tasks == set()
+    assert "get_chats" in AdaptiveFloodLimiter().method_rates
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime, timedelta
+
+from app.services.analytics.error_log_writer import ErrorLogWriter, INDEX_SUFFIX
+
+
+def make_dict(error_id, category="GENERAL", **extra):
+    return {"error_id": error_id, "category": category, "message": f"hata {error_id}", **extra}
+
+
+def test_batched_append_streams_back_in_order(tmp_path):
+    """Kuyruğa eklenen kayıtlar tek segmente yazılır ve sırayla okunur."""
+    writer = ErrorLogWriter(str(tmp_path), batch_size=50)
+    writer.start()
+    for error_id in range(120):
+        writer.append(make_dict(error_id))
+    writer.flush()
+
+    assert [r["error_id"] for r in writer.iter_records()] == list(range(120))
+    assert writer.stats["written"] == 120
+    assert writer.stats["batches"] <= 120
+    writer.stop()
+
+    segments = writer.segments()
+    assert len(segments) == 1
+    assert os.path.exists(segments[0] + INDEX_SUFFIX)
+
+
+def test_segments_rotate_by_size(tmp_path):
+    """Boyut sınırı aşılınca yeni segmente geçilir."""
+    writer = ErrorLogWriter(str(tmp_path), max_segment_bytes=1024, batch_size=5)
+    for error_id in range(40):
+        writer.append(make_dict(error_id, payload="x" * 100))
+        writer.flush()
+    writer.stop()
+
+    assert len(writer.segments()) > 1
+    assert [r["error_id"] for r in writer.iter_records()] == list(range(40))
+
+
+def test_category_index_reads_without_duplicate_files(tmp_path):
+    """Kategori görünümü indeks üzerinden, ayrı dosya olmadan okunur."""
+    writer = ErrorLogWriter(str(tmp_path))
+    writer.start()
+    for error_id in range(10):
+        writer.append(make_dict(error_id, category="DATABASE" if error_id % 3 == 0 else "NETWORK"))
+    writer.stop()
+
+    assert not any(entry.is_dir() for entry in tmp_path.iterdir())
+
+    reopened = ErrorLogWriter(str(tmp_path))
+    reopened.start()
+    assert reopened.categories() == {"DATABASE": 4, "NETWORK": 6}
+    assert [r["error_id"] for r in reopened.read_category("DATABASE", limit=3)] == [9, 6, 3]
+    reopened.stop()
+
+
+def test_prune_removes_old_segments(tmp_path):
+    """Saklama süresini aşan segmentler ve indeksleri silinir."""
+    writer = ErrorLogWriter(str(tmp_path))
+    writer.append(make_dict(1, category="DATABASE"))
+    writer.stop()
+    old_segment = writer.segments()[0]
+    old_time = (datetime.now() - timedelta(days=40)).timestamp()
+    os.utime(old_segment, (old_time, old_time))
+
+    writer.start()
+    writer.append(make_dict(2, category="DATABASE"))
+    writer.flush()
+
+    assert writer.prune(datetime.now() - timedelta(days=30)) == 1
+    assert not os.path.exists(old_segment + INDEX_SUFFIX)
+    assert [r["error_id"] for r in writer.iter_records()] == [2]
+    assert writer.categories() == {"DATABASE": 1}
+    writer.stop()
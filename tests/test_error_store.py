@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from app.services.analytics.error_service import ErrorRecord
+from app.services.analytics.error_store import ErrorStore
+
+
+def make_record(error_id, source="svc", category="GENERAL", severity="ERROR", age=0):
+    record = ErrorRecord(
+        error_type="TestError",
+        message=f"hata {error_id}",
+        source=source,
+        severity=severity,
+        category=category,
+        created_at=datetime.now() - timedelta(seconds=age)
+    )
+    record.error_id = error_id
+    return record
+
+
+def test_capacity_evicts_oldest_and_cleans_indexes():
+    """Kapasite aşılınca en eski kayıt ve indeks girdileri düşer."""
+    store = ErrorStore(capacity=3)
+    for error_id in range(5):
+        store.add(make_record(error_id, source=f"s{error_id % 2}"))
+
+    assert list(store.keys()) == [2, 3, 4]
+    assert 0 not in store and 1 not in store
+    assert [r.error_id for r in store.query(source="s1")] == [3]
+    assert store.stats["evicted"] == 2
+
+
+def test_query_uses_filters_newest_first():
+    """Filtreli sorgu yeniden eskiye ve limit kadar döner."""
+    store = ErrorStore(capacity=100)
+    for error_id in range(10):
+        store.add(make_record(
+            error_id,
+            category="DATABASE" if error_id % 2 else "NETWORK",
+            severity="CRITICAL" if error_id == 7 else "ERROR",
+            age=100 - error_id
+        ))
+
+    assert [r.error_id for r in store.query(limit=2, category="DATABASE")] == [9, 7]
+    assert [r.error_id for r in store.query(severity="CRITICAL")] == [7]
+
+    start_time = datetime.now() - timedelta(seconds=93.5)
+    assert [r.error_id for r in store.query(start_time=start_time)] == [9, 8, 7]
+
+
+def test_resolved_records_are_filtered():
+    """Çözülen kayıtlar çözülmemiş indeksinden çıkar."""
+    store = ErrorStore()
+    for error_id in range(3):
+        store.add(make_record(error_id))
+    store[1].resolved = True
+    store.mark_resolved(1)
+
+    assert [r.error_id for r in store.query(include_resolved=False)] == [2, 0]
+    assert len(store.query(include_resolved=True)) == 3
+
+
+def test_window_counter_counts_recent_errors_only():
+    """Kayan pencere sayacı yalnızca penceredeki hataları sayar."""
+    store = ErrorStore()
+    store.add(make_record(1, age=600))
+    store.add(make_record(2, age=100))
+    store.add(make_record(3, age=10))
+    store.add(make_record(4, source="other", age=10))
+
+    assert store.window_count("svc", "GENERAL", window=300) == 2
+    assert [r.error_id for r in store.window_records("svc", "GENERAL", window=60)] == [3]
+    assert store.window_count("missing", "GENERAL", window=300) == 0
+
+
+def test_mapping_interface_and_duplicate_ids():
+    """Sözlük arayüzü korunur; aynı ID ikinci kez eklenince eski kayıt değişir."""
+    store = ErrorStore()
+    store[5] = make_record(0, source="a")
+    store[5] = make_record(0, source="b")
+
+    assert len(store) == 1
+    assert store[5].source == "b"
+    assert store.query(source="a") == []
+    del store[5]
+    assert not store
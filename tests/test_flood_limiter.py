@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from telethon.errors import FloodWaitError
+
+from app.utils.flood_limiter import AdaptiveFloodLimiter, flood_wait_seconds
+
+
+def _flood_error(seconds):
+    return FloodWaitError(request=None, capture=seconds)
+
+
+def test_flood_wait_seconds_parsing():
+    """FloodWait süresinin hata nesnesi ve mesajından çıkarıldığını doğrular."""
+    assert flood_wait_seconds(_flood_error(42)) == 42
+    assert flood_wait_seconds("FloodWaitError: A wait of 17 seconds is required") == 17
+    assert flood_wait_seconds(ValueError("başka hata")) is None
+
+
+def test_aimd_increase_and_decrease():
+    """Başarıda toplamsal artış, FloodWait'te çarpımsal azalma yapıldığını doğrular."""
+    limiter = AdaptiveFloodLimiter(increase_step=0.1, decrease_factor=0.5, method_rates={"test": 1.0})
+
+    limiter.on_success("test")
+    assert limiter.get_stats()["methods"]["test"]["rate"] == pytest.approx(1.1)
+
+    limiter.on_flood_wait("test", 5)
+    stats = limiter.get_stats()["methods"]["test"]
+    assert stats["rate"] == pytest.approx(0.55)
+    assert stats["ceiling"] == pytest.approx(1.1)
+    assert limiter.time_to_wait("test") >= 4
+    # Kısa FloodWait diğer metotları etkilemez
+    assert limiter.time_to_wait("other") == 0
+
+
+def test_long_flood_wait_pauses_all_methods():
+    """Uzun FloodWait'in tüm metotları durdurduğunu doğrular."""
+    limiter = AdaptiveFloodLimiter(global_pause_threshold=30)
+    limiter.on_flood_wait("group_message", 120)
+
+    assert limiter.time_to_wait("direct_message") >= 119
+    assert limiter.get_stats()["global_pauses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_records_flood_wait_and_reraises():
+    """run() çağrısının FloodWait'i kaydedip yeniden fırlattığını doğrular."""
+    limiter = AdaptiveFloodLimiter()
+    send = AsyncMock(side_effect=_flood_error(3))
+
+    with pytest.raises(FloodWaitError):
+        await limiter.run("group_message", send, 1, "merhaba")
+
+    send.assert_awaited_once_with(1, "merhaba")
+    assert limiter.get_stats()["methods"]["group_message"]["flood_waits"] == 1
+
+    ok = AsyncMock(return_value="mesaj")
+    assert await limiter.run("direct_message", ok) == "mesaj"
+    assert limiter.get_stats()["successes"] == 1
@@ -0,0 +1,129 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.messages import GetChatsRequest
+from telethon.tl.types import Channel, Chat, InputPeerChannel, InputPeerChat, InputPeerUser
+from telethon.tl.types.messages import Chats
+
+from app.db.mining_snapshots import RECORD_BATCH_QUERY
+from app.services.analytics.group_mining import GroupMiningPipeline, UPSERT_GROUPS_QUERY, dedupe_groups
+from app.utils.flood_limiter import AdaptiveFloodLimiter
+
+
+def make_channel(channel_id, username=None):
+    return Channel(id=channel_id, title=f"Kanal {channel_id}", photo=None, date=None,
+                   username=username, access_hash=channel_id * 7, megagroup=True)
+
+
+class FakeClient:
+    """Oturum önbelleğini ve toplu çözümleme isteklerini taklit eden istemci"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def get_input_entity(self, peer):
+        if peer == 999:
+            return InputPeerUser(user_id=999, access_hash=1)
+        if peer == 404:
+            raise ValueError("önbellekte yok")
+        if 0 < peer < 50:
+            return InputPeerChat(chat_id=peer)
+        return InputPeerChannel(channel_id=peer, access_hash=peer * 7)
+
+    async def get_entity(self, peer):
+        raise ValueError("bulunamadı")
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        if isinstance(request, GetChannelsRequest):
+            return Chats(chats=[make_channel(c.channel_id) for c in request.id])
+        if isinstance(request, GetChatsRequest):
+            return Chats(chats=[
+                Chat(id=i, title=f"Sohbet {i}", photo=None, participants_count=3, date=None, version=1)
+                for i in request.id
+            ])
+        raise AssertionError(request)
+
+
+class _Context:
+    """acquire()/transaction() yerine geçen, çıkış istisnasını kaydeden bağlam"""
+
+    def __init__(self, value=None):
+        self.value = value
+        self.exits = []
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.exits.append(exc_type)
+        return False
+
+
+@pytest.fixture
+def pipeline():
+    pool = AsyncMock()
+    pool.execute = AsyncMock(return_value="INSERT 0 1")
+    pool.fetch = AsyncMock(return_value=[{"entity_id": 1002}])
+    # Bağlantı olarak havuzun kendisi döner; sorgular aynı mock'a kaydedilir
+    pool.acquire = MagicMock(return_value=_Context(pool))
+    pool.transaction = MagicMock(return_value=_Context())
+    limiter = AdaptiveFloodLimiter(default_rate=1000, max_rate=1000, burst=1000)
+    return GroupMiningPipeline(FakeClient(), pool=pool, limiter=limiter)
+
+
+def test_groups_are_deduplicated_across_sources():
+    """Hedef gruplar ve iş grupları tek bir tekrarsız kümeye indirilir."""
+    groups = dedupe_groups(
+        [{"group_id": 100, "name": None}, {"group_id": "200", "name": "B"}],
+        ["100", 200, None, 300],
+        [{"group_id": 100, "name": "A"}],
+    )
+    assert list(groups) == ["100", "200", "300"]
+    assert groups["100"]["name"] == "A"
+
+
+@pytest.mark.asyncio
+async def test_entities_resolved_in_batches(pipeline):
+    """Kanallar 100'lük GetChannels, basit gruplar tek GetChats isteğiyle çözülür."""
+    ids = [str(i) for i in range(1000, 1150)] + ["5", "6", "999", "404"]
+    resolved = await pipeline.resolve(ids)
+
+    kinds = [(type(r).__name__, len(r.id)) for r in pipeline.client.requests]
+    assert kinds == [("GetChannelsRequest", 100), ("GetChannelsRequest", 50), ("GetChatsRequest", 2)]
+    assert len(resolved) == 152
+    assert pipeline.stats["unresolved"] == 2
+
+
+@pytest.mark.asyncio
+async def test_only_changed_groups_are_upserted(pipeline):
+    """Anlık görüntüsü değişmeyen grupların groups satırına dokunulmaz."""
+    result = await pipeline.run([{"group_id": 1001, "name": "Eski ad"}], ["1001", "1002"])
+    assert result == {"groups": 2, "resolved": 2, "changed": 1}
+
+    snapshot_call = pipeline.pool.fetch.call_args
+    assert snapshot_call[0][0] == RECORD_BATCH_QUERY
+    assert snapshot_call[0][1] == "group"
+    assert snapshot_call[0][2] == [1001, 1002]
+
+    calls = [c for c in pipeline.pool.execute.call_args_list if c[0][0] == UPSERT_GROUPS_QUERY]
+    assert len(calls) == 1
+    assert calls[0][0][1:3] == ([1002], ["Kanal 1002"])
+
+
+@pytest.mark.asyncio
+async def test_snapshot_and_upsert_share_one_transaction(pipeline):
+    """groups upsert başarısız olursa anlık görüntü hash'i de aynı transaction'da geri alınır."""
+    async def execute(query, *args):
+        if query == UPSERT_GROUPS_QUERY:
+            raise RuntimeError("bağlantı koptu")
+        return "OK"
+
+    pipeline.pool.execute.side_effect = execute
+    with pytest.raises(RuntimeError):
+        await pipeline.run(["1002"])
+
+    transaction = pipeline.pool.transaction.return_value
+    assert transaction.exits == [RuntimeError]
+    assert pipeline.pool.fetch.call_args[0][0] == RECORD_BATCH_QUERY
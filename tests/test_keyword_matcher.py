@@ -0,0 +1,66 @@
+import pytest
+
+from app.utils.keyword_matcher import KeywordMatcher, normalize_text
+
+
+def test_turkish_normalization():
+    """İ/I Türkçe kurallarıyla küçültülür; noktasız i isteğe bağlı eşlenir."""
+    assert normalize_text("İSTANBUL") == "istanbul"
+    assert normalize_text("IĞDIR", fold_dotless_i=False) == "ığdır"
+    assert normalize_text("Istanbul") == normalize_text("İstanbul")
+    assert len(normalize_text("İİİ")) == 3
+
+
+def test_all_overlapping_matches_in_one_pass():
+    """Çakışan ve iç içe desenler tek taramada bulunur."""
+    matcher = KeywordMatcher()
+    matcher.extend(["he", "she", "his", "hers"])
+
+    found = [(m.keyword, m.start, m.end) for m in matcher.find_all("ushers")]
+    assert found == [("she", 1, 4), ("hers", 2, 6), ("he", 2, 4)]
+    assert matcher.find_all("xyz") == []
+    assert KeywordMatcher().find_all("boş eşleştirici") == []
+
+
+def test_priority_and_insertion_order():
+    """Yüksek öncelik kazanır; eşitlikte önce eklenen desen seçilir."""
+    matcher = KeywordMatcher.from_mapping({
+        "fiyat": "Fiyatlar DM'de",
+        "merhaba": "Selam!",
+        "vip": {"text": "VIP bilgisi", "priority": 5}
+    })
+
+    assert matcher.best("Merhaba, FİYAT nedir?").value == "Fiyatlar DM'de"
+    assert matcher.best("merhaba vip fiyat").value == {"text": "VIP bilgisi", "priority": 5}
+    assert matcher.best("alakasız") is None
+
+    # Desen eklenince otomat yeniden derlenir
+    matcher.add("alakasız", "yeni", priority=1)
+    assert matcher.best("alakasız").value == "yeni"
+
+
+def test_whole_word_matching():
+    """Tam kelime desenleri kelime içinde eşleşmez; @mention sonuna bakılır."""
+    matcher = KeywordMatcher(whole_word=True)
+    matcher.add("@SiyahBot")
+    matcher.add("kedi")
+    matcher.add("kedi", whole_word=False, value="alt dize")
+
+    assert matcher.search("selam @siyahbot!")
+    assert not matcher.search("selam @siyahbot_yedek")
+    assert [m.value for m in matcher.find_all("kediler")] == ["alt dize"]
+    assert [m.value for m in matcher.find_all("Kedi.")] == ["kedi", "alt dize"]
+
+
+@pytest.mark.asyncio
+async def test_reply_service_rebuilds_matcher_on_keyword_change():
+    """ReplyService.get_reply anahtar kelime değişince güncel eşleştiriciyi kullanır."""
+    from app.services.messaging.reply_service import ReplyService
+
+    service = ReplyService.__new__(ReplyService)
+    service.keywords = {"fiyat": "Fiyatlar DM'de"}
+    assert await service.get_reply("FİYAT ne kadar?") == "Fiyatlar DM'de"
+
+    service.keywords = {"ısmarla": "Ismarlıyorum"}
+    assert await service.get_reply("Çay ISMARLA") == "Ismarlıyorum"
+    assert await service.get_reply("fiyat") is None
@@ -0,0 +1,203 @@
+import pytest
+from types import SimpleNamespace
+
+from app.db.member_ingest import (
+    MemberIngestor, MERGE_GROUP_MEMBERS, MERGE_TELEGRAM_USERS, STAGE_TABLE, build_users_merge, iter_member_rows
+)
+
+
+class FakeTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        self.connection.events.append("begin")
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.connection.events.append("rollback" if exc_type else "commit")
+
+
+class FakeConnection:
+    """COPY ve birleştirme çağrılarını kaydeden sahte asyncpg bağlantısı"""
+
+    def __init__(self):
+        self.events = []
+        self.copies = []
+        self.executed = []
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies.append((table, list(records)))
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+        return f"INSERT 0 {sum(len(c[1]) for c in self.copies)}"
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.acquired = 0
+        self.in_use = 0
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                pool.acquired += 1
+                pool.in_use += 1
+                return pool.connection
+
+            async def __aexit__(self, *exc):
+                pool.in_use -= 1
+                return False
+
+        return _Acquire()
+
+    async def fetch(self, query, *args):
+        return []
+
+
+class FakeCatalog:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def has_column(self, table, column):
+        return column in self.columns
+
+
+def make_user(user_id, bot=False, deleted=False):
+    return SimpleNamespace(id=user_id, username=f"u{user_id}", first_name="Ad", last_name=None,
+                           bot=bot, deleted=deleted, premium=False, lang_code="tr", phone=None)
+
+
+class FakeClient:
+    def __init__(self, users):
+        self.users = users
+
+    async def iter_participants(self, entity, limit=None):
+        for user in self.users[:limit]:
+            yield user
+
+
+@pytest.fixture
+def ingestor(monkeypatch):
+    from app.db import member_ingest
+    monkeypatch.setattr(member_ingest.schema_catalog, "_loaded", False, raising=False)
+
+    async def no_load(pool):
+        return None
+
+    monkeypatch.setattr(member_ingest.schema_catalog, "ensure_loaded_async", no_load)
+    monkeypatch.setattr(member_ingest.schema_catalog, "statement",
+                        lambda key, builder: builder(FakeCatalog({"source_group", "updated_at"})))
+    return MemberIngestor(pool=FakePool(), chunk_rows=2)
+
+
+@pytest.mark.asyncio
+async def test_each_chunk_is_copied_and_merged_in_its_own_transaction(ingestor):
+    """Her parça kendi kısa işleminde COPY ile yazılır ve birleştirilir."""
+    rows = [(i, None, None, None, False, False, None, None, False) for i in range(5)]
+    seen = []
+
+    async def sink(chunk, connection):
+        seen.append(len(chunk))
+        assert connection is ingestor.pool.connection
+
+    result = await ingestor.ingest(42, iter(rows), source_group="Grup", chunk_sink=sink)
+
+    connection = ingestor.pool.connection
+    assert [len(c[1]) for c in connection.copies] == [2, 2, 1]
+    assert all(c[0] == STAGE_TABLE for c in connection.copies)
+    assert seen == [2, 2, 1]
+    assert connection.events == ["begin", "commit"] * 3
+    assert ingestor.pool.acquired == 3
+    # Sahte bağlantı o ana kadarki toplam COPY satırını döndürür: 2 + 4 + 5
+    assert result == {"staged": 5, "users": 11, "telegram_users": 11, "group_members": 11}
+
+
+@pytest.mark.asyncio
+async def test_no_connection_is_held_while_the_stream_waits(ingestor):
+    """Akış beklerken (ör. FloodWait) havuzdan bağlantı alınmaz."""
+    held_while_waiting = []
+
+    async def rows():
+        for i in range(3):
+            held_while_waiting.append(ingestor.pool.in_use)
+            yield (i, None, None, None, False, False, None, None, False)
+
+    await ingestor.ingest(42, rows())
+    assert held_while_waiting == [0, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_merges_are_set_based_with_group_parameters(ingestor):
+    """Her hedef tablo için tek birleştirme ifadesi ve doğru parametreler gönderilir."""
+    await ingestor.ingest(42, [(1, "a", None, None, False, False, None, None, True)], source_group="Grup")
+
+    merges = ingestor.pool.connection.executed[1:]
+    assert len(merges) == 3
+    assert "INSERT INTO users" in merges[0][0] and merges[0][1] == ("Grup",)
+    assert merges[1] == (MERGE_TELEGRAM_USERS, ())
+    assert merges[2] == (MERGE_GROUP_MEMBERS, (42,))
+
+
+@pytest.mark.asyncio
+async def test_empty_stream_skips_merges(ingestor):
+    """Akış boşsa bağlantı alınmaz, birleştirme ifadesi çalıştırılmaz."""
+    result = await ingestor.ingest(42, [])
+    assert result == {"staged": 0}
+    assert ingestor.pool.connection.executed == []
+    assert ingestor.pool.acquired == 0
+
+
+def test_users_merge_adapts_to_columns():
+    """users birleştirmesi yalnızca mevcut sütunları yazar."""
+    query, has_source = build_users_merge(FakeCatalog(set()))
+    assert not has_source and "$1" not in query and "is_bot" not in query
+
+    query, has_source = build_users_merge(FakeCatalog({"is_bot", "source_group", "updated_at"}))
+    assert has_source and "$1::text" in query and "updated_at = NOW()" in query
+
+
+@pytest.mark.asyncio
+async def test_member_rows_filter_bots_and_admins():
+    """Botlar, silinmiş hesaplar ve istenirse adminler satır akışından çıkarılır."""
+    client = FakeClient([make_user(1), make_user(2, bot=True), make_user(3, deleted=True), make_user(4)])
+
+    rows = [row async for row in iter_member_rows(client, "grup", admin_ids={4}, skip_bots=True)]
+    assert [(row[0], row[-1]) for row in rows] == [(1, False), (4, True)]
+
+    rows = [row async for row in iter_member_rows(client, "grup", admin_ids={4}, skip_bots=True, skip_admins=True)]
+    assert [row[0] for row in rows] == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_rolls_back_alone(ingestor):
+    """Bir parçanın birleştirmesi başarısız olursa yalnızca o parça (sink yazımları dahil) geri alınır."""
+    connection = ingestor.pool.connection
+    original_execute = connection.execute
+    merges = []
+
+    async def execute(query, *args):
+        if query == MERGE_GROUP_MEMBERS:
+            merges.append(args)
+            if len(merges) == 2:
+                raise RuntimeError("kilit zaman aşımı")
+        return await original_execute(query, *args)
+
+    connection.execute = execute
+    sunk = []
+
+    async def sink(chunk, conn):
+        sunk.append(len(chunk))
+
+    rows = [(i, "a", None, None, False, False, None, None, False) for i in range(4)]
+    with pytest.raises(RuntimeError):
+        await ingestor.ingest(42, rows, chunk_sink=sink)
+
+    assert connection.events == ["begin", "commit", "begin", "rollback"]
+    assert sunk == [2]
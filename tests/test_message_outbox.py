@@ -0,0 +1,236 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+from app.core.scheduler import wakeups
+from app.db.message_outbox import (
+    MessageOutbox, OutboxItem, OutboxTerminalError, ACK_QUERY, RETRY_QUERY, FAIL_QUERY,
+    message_idempotency_key
+)
+
+
+def make_row(row_id, message_id, priority=0, attempts=1, max_attempts=3, due_at=None):
+    return {
+        "id": row_id,
+        "message_id": message_id,
+        "idempotency_key": message_idempotency_key(message_id),
+        "priority": priority,
+        "attempts": attempts,
+        "max_attempts": max_attempts,
+        "due_at": due_at or datetime.utcnow()
+    }
+
+
+@pytest.fixture
+def pool():
+    """asyncpg havuzu yerine geçen mock nesne."""
+    pool = AsyncMock()
+    pool.execute = AsyncMock(return_value="UPDATE 1")
+    pool.fetch = AsyncMock(return_value=[])
+    pool.fetchval = AsyncMock(return_value=1)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent(pool):
+    """Aynı anahtarla ikinci ekleme yeni kayıt oluşturmaz."""
+    outbox = MessageOutbox(pool=pool)
+    assert await outbox.enqueue(42, priority=5) is True
+
+    query, message_id, key, priority = pool.fetchval.call_args[0][:4]
+    assert "ON CONFLICT (idempotency_key) DO NOTHING" in query
+    assert (message_id, key, priority) == (42, "message:42", 5)
+
+    pool.fetchval.return_value = None
+    assert await outbox.enqueue(42) is False
+    assert outbox.stats["enqueued"] == 1
+    assert outbox.stats["duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_claim_uses_skip_locked_and_orders_by_priority(pool):
+    """Talep SKIP LOCKED kullanır ve sonuçlar öncelik/vade sırasına dizilir."""
+    now = datetime.utcnow()
+    pool.fetch.return_value = [
+        make_row(1, 10, priority=0, due_at=now - timedelta(seconds=5)),
+        make_row(2, 20, priority=9, due_at=now),
+        make_row(3, 30, priority=0, due_at=now - timedelta(seconds=60), attempts=2),
+    ]
+    outbox = MessageOutbox(pool=pool, visibility_timeout=120)
+
+    items = await outbox.claim("consumer-0", limit=3)
+
+    query = pool.fetch.call_args[0][0]
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert "ORDER BY priority DESC, available_at" in query
+    assert pool.fetch.call_args[0][2:] == ("consumer-0", 3, 120.0)
+    assert [item.message_id for item in items] == [20, 30, 10]
+    assert outbox.stats["reclaimed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_nack_retries_then_fails(pool):
+    """Deneme hakkı kalan kayıt geciktirilir, son denemede başarısız işaretlenir."""
+    outbox = MessageOutbox(pool=pool, retry_backoff=10)
+
+    retry_item = OutboxItem(1, 10, "message:10", 0, attempts=2, max_attempts=3)
+    await outbox.nack(retry_item, "hata")
+    query, row_id, attempts, available_at = pool.execute.call_args[0][:4]
+    assert query == RETRY_QUERY
+    assert (row_id, attempts) == (1, 2)
+    assert available_at > datetime.utcnow() + timedelta(seconds=15)
+
+    last_item = OutboxItem(1, 10, "message:10", 0, attempts=3, max_attempts=3)
+    await outbox.nack(last_item, "hata")
+    assert pool.execute.call_args[0][0] == FAIL_QUERY
+    assert outbox.stats["retried"] == 1
+    assert outbox.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_ack_is_ignored(pool):
+    """Talep süresi dolup başka tüketiciye geçen kaydın onayı etkisizdir."""
+    pool.execute.return_value = "UPDATE 0"
+    outbox = MessageOutbox(pool=pool)
+    item = OutboxItem(1, 10, "message:10", 0, attempts=1, max_attempts=3)
+
+    assert await outbox.ack(item) is False
+    assert pool.execute.call_args[0][0] == ACK_QUERY
+    assert outbox.stats["acked"] == 0
+
+
+@pytest.mark.asyncio
+async def test_consumers_deliver_and_ack(pool):
+    """Tüketiciler talep edilen kayıtları handler'a verir ve sonucu onaylar."""
+    batches = [[make_row(1, 10)], [make_row(2, 20)]]
+
+    async def fetch(query, *args):
+        if "FOR UPDATE SKIP LOCKED" in query and batches:
+            return batches.pop(0)
+        return []
+
+    pool.fetch.side_effect = fetch
+    delivered = []
+
+    async def handler(item):
+        delivered.append(item.message_id)
+        return item.message_id == 10
+
+    outbox = MessageOutbox(pool=pool, consumers=2, poll_interval=0.01)
+    assert await outbox.start(handler) is True
+    for _ in range(50):
+        if len(delivered) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await outbox.stop()
+
+    assert sorted(delivered) == [10, 20]
+    assert outbox.stats["acked"] == 1
+    assert outbox.stats["retried"] == 1
+    assert not outbox.is_running
+
+
+@pytest.mark.asyncio
+async def test_outbox_wakeups_do_not_steal_service_wakeups(pool):
+    """Aynı adı taşıyan servis ve tüketiciler birbirinin uyandırmasını/vadesini tüketmez."""
+    async def handler(item):
+        return True
+
+    outbox = MessageOutbox(pool=pool, consumers=2, poll_interval=0.01, name="message_service")
+    assert await outbox.start(handler) is True
+    try:
+        # Servisin zamanlanmış mesaj vadesi, tüketiciler sık sık uyanırken korunur
+        wakeups.schedule("message_service", 0.1)
+        service_wait = asyncio.ensure_future(wakeups.wait("message_service"))
+        outbox.notify()
+        await asyncio.sleep(0.05)
+        assert not service_wait.done()
+        assert await asyncio.wait_for(service_wait, timeout=1) is True
+        assert pool.fetch.await_count > 2
+    finally:
+        await outbox.stop()
+
+
+@pytest.mark.asyncio
+async def test_terminal_errors_are_dead_lettered(pool):
+    """Kalıcı hatalar deneme hakkı kalsa da yeniden kuyruğa girmez."""
+    class ChatWriteForbiddenError(Exception):
+        pass
+
+    errors = [OutboxTerminalError("Mesaj bulunamadı"), ChatWriteForbiddenError("yazma yasak")]
+
+    async def handler(item):
+        raise errors.pop(0)
+
+    outbox = MessageOutbox(pool=pool)
+    outbox._handler = handler
+    for row_id in (1, 2):
+        item = OutboxItem(id=row_id, message_id=row_id, idempotency_key="k", priority=0,
+                          attempts=1, max_attempts=3)
+        assert await outbox.process(item) is False
+
+    queries = [call.args[0] for call in pool.execute.await_args_list]
+    assert queries == [FAIL_QUERY, FAIL_QUERY]
+    assert outbox.stats["dead_lettered"] == 2
+    assert outbox.stats["retried"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_in_flight_send(pool):
+    """stop() süren gönderimi kesmez; kayıt onaylanır ve yeniden teslim edilmez."""
+    batches = [[make_row(1, 10)]]
+
+    async def fetch(query, *args):
+        if "FOR UPDATE SKIP LOCKED" in query and batches:
+            return batches.pop(0)
+        return []
+
+    pool.fetch.side_effect = fetch
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def handler(item):
+        started.set()
+        await release.wait()
+        return True
+
+    outbox = MessageOutbox(pool=pool, consumers=2, poll_interval=0.01)
+    assert await outbox.start(handler) is True
+    await asyncio.wait_for(started.wait(), timeout=1)
+
+    stopping = asyncio.ensure_future(outbox.stop())
+    await asyncio.sleep(0.02)
+    assert not stopping.done()
+    release.set()
+    await asyncio.wait_for(stopping, timeout=1)
+
+    assert outbox.stats["acked"] == 1
+    assert pool.execute.await_args_list[-1].args[0] == ACK_QUERY
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_after_drain_timeout(pool):
+    """drain_timeout içinde bitmeyen gönderim iptal edilir ve onaylanmaz."""
+    batches = [[make_row(1, 10)]]
+
+    async def fetch(query, *args):
+        if "FOR UPDATE SKIP LOCKED" in query and batches:
+            return batches.pop(0)
+        return []
+
+    pool.fetch.side_effect = fetch
+    started = asyncio.Event()
+
+    async def handler(item):
+        started.set()
+        await asyncio.sleep(10)
+        return True
+
+    outbox = MessageOutbox(pool=pool, consumers=1, poll_interval=0.01, drain_timeout=0.05)
+    assert await outbox.start(handler) is True
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await asyncio.wait_for(outbox.stop(), timeout=1)
+
+    assert outbox.stats["acked"] == 0
+    assert outbox._tasks == []
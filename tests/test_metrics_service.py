@@ -16,7 +16,8 @@ from app.core.metrics import (
     track_message_processing,
     update_user_counts,
     update_group_counts,
-    push_metrics_to_gateway
+    push_metrics_to_gateway,
+    track_send_rate
 )
 
 
@@ -168,4 +169,15 @@ def test_push_metrics_to_gateway(mock_settings, mock_push_to_gateway, reset_metr
         "http://localhost:9091", 
         job="test_job", 
         registry=REGISTRY
-    ) 
\ No newline at end of file
+    ) 
+
+def test_track_send_rate_does_not_count_flood_wait(reset_metrics):
+    """Hız sınırlayıcı FloodWait süresini kaydeder ama olayı ikinci kez saymaz"""
+    track_send_rate("group_message", 0.25, flood_seconds=30)
+    
+    assert REGISTRY.get_sample_value(
+        'telegram_bot_send_rate_limit', {'method': 'group_message'}
+    ) == 0.25
+    assert REGISTRY.get_sample_value(
+        'telegram_bot_flood_wait_events_total', {'method': 'group_message'}
+    ) is None
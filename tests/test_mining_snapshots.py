@@ -0,0 +1,72 @@
+import json
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock
+
+from app.db.mining_snapshots import (
+    MiningSnapshotStore, RECORD_BATCH_QUERY, month_start, partition_month, partition_name, snapshot_hash
+)
+
+
+@pytest.fixture
+def pool():
+    pool = AsyncMock()
+    pool.execute = AsyncMock(return_value="CREATE TABLE")
+    pool.fetch = AsyncMock(return_value=[])
+    return pool
+
+
+def test_hash_ignores_volatile_fields_and_key_order():
+    """Özet anahtar sırasından ve her taramada değişen alanlardan bağımsızdır."""
+    a = {"id": 1, "name": "Grup", "member_count": 10, "last_update": "2025-05-01T10:00"}
+    b = {"member_count": 10, "name": "Grup", "id": 1, "last_update": "2025-05-02T11:00"}
+    assert snapshot_hash(a) == snapshot_hash(b)
+    assert snapshot_hash(a) != snapshot_hash({**a, "member_count": 11})
+
+
+def test_month_partitions():
+    """Aylık bölüm adları ve ay kaydırma yıl sınırını doğru geçer."""
+    assert month_start(date(2025, 12, 17), 1) == date(2026, 1, 1)
+    assert month_start(date(2025, 1, 5), -6) == date(2024, 7, 1)
+    assert partition_name(date(2025, 5, 1)) == "mining_snapshot_history_p202505"
+    assert partition_month("mining_snapshot_history_p202505") == date(2025, 5, 1)
+    assert partition_month("mining_snapshot_history_default") is None
+
+
+@pytest.mark.asyncio
+async def test_record_many_batches_and_returns_changed(pool):
+    """Varlıklar partiler halinde tek ifadeyle yazılır, değişen ID'ler döner."""
+    pool.fetch.side_effect = [[{"entity_id": 2}], [{"entity_id": 3}]]
+    store = MiningSnapshotStore(pool=pool, batch_size=2)
+
+    changed = await store.record_many("user", [
+        (1, {"username": "a"}, -100),
+        (2, {"username": "b"}, -100),
+        (3, {"username": "c"}, None),
+    ])
+    assert changed == [2, 3]
+    assert pool.fetch.await_count == 2
+
+    args = pool.fetch.call_args_list[0][0]
+    assert args[0] == RECORD_BATCH_QUERY
+    assert args[1:4] == ("user", [1, 2], [-100, -100])
+    assert json.loads(args[5][1]) == {"username": "b"}
+    # Tablolar ve bu ile gelecek ayın bölümleri bir kez oluşturulur
+    created = [c[0][0] for c in pool.execute.call_args_list if "PARTITION OF" in c[0][0]]
+    assert len(created) == 2
+
+
+@pytest.mark.asyncio
+async def test_prune_drops_expired_month_partitions(pool):
+    """Saklama süresini aşan aylık bölümler düşürülür, güncel aylar korunur."""
+    pool.fetch.return_value = [
+        {"name": "mining_snapshot_history_p202410"},
+        {"name": "mining_snapshot_history_p202411"},
+        {"name": "mining_snapshot_history_p202505"},
+    ]
+    store = MiningSnapshotStore(pool=pool, retention_months=6)
+
+    dropped = await store.prune(today=date(2025, 5, 20))
+    assert dropped == ["mining_snapshot_history_p202410"]
+    assert any(c[0][0] == "DROP TABLE IF EXISTS mining_snapshot_history_p202410"
+               for c in pool.execute.call_args_list)
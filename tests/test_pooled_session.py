@@ -0,0 +1,188 @@
+import pytest
+
+from telethon.crypto import AuthKey
+from telethon.tl.types import InputPeerUser, User
+
+from app.core.tdlib.pooled_session import PooledPostgresSession, PooledSessionClient, UPSERT_ENTITIES
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def transaction(self):
+        pool = self.pool
+
+        class _Transaction:
+            async def __aenter__(self):
+                pool.transactions += 1
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Transaction()
+
+    async def execute(self, query, *args):
+        if self.pool.fail:
+            raise RuntimeError("bağlantı koptu")
+        self.pool.executed.append((query, args))
+        return "INSERT 0 1"
+
+
+class FakePool:
+    """Oturum tablolarını sözlükte tutan sahte havuz"""
+
+    def __init__(self, entities=()):
+        self.entities = {row[0]: row for row in entities}
+        self.executed = []
+        self.lookups = []
+        self.transactions = 0
+        self.fail = False
+
+    def acquire(self):
+        connection = FakeConnection(self)
+
+        class _Acquire:
+            async def __aenter__(self):
+                return connection
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+    async def execute(self, query, *args):
+        return "OK"
+
+    async def fetchrow(self, query, *args):
+        if "_entities WHERE" not in query:
+            return None
+        self.lookups.append(args)
+        if "username = $1" in query:
+            return next((r for r in self.entities.values() if r[2] == args[0]), None)
+        return next((self.entities[i] for i in args[0] if i in self.entities), None)
+
+    async def fetch(self, query, *args):
+        if "_entities ORDER BY" in query:
+            return list(self.entities.values())[:args[0]]
+        return []
+
+
+def _user(user_id, username):
+    return User(id=user_id, access_hash=user_id * 10, username=username, first_name="Ali")
+
+
+@pytest.mark.asyncio
+async def test_lookups_are_served_from_hot_map():
+    """Yüklenen varlıklar veritabanına gitmeden çözülür; sıcak harita sınırlıdır."""
+    pool = FakePool(entities=[(i, i * 10, f"user{i}", None, f"Ali {i}") for i in range(1, 6)])
+    session = await PooledPostgresSession("hesap1", pool=pool, hot_limit=3).load()
+
+    assert len(session._entities) == 3
+    assert session.get_input_entity("user1") == InputPeerUser(1, 10)
+    assert pool.lookups == []
+    assert session.get_stats()["hot_entities"] == 3
+
+
+@pytest.mark.asyncio
+async def test_miss_falls_back_to_database_lazily():
+    """Bellekte olmayan varlık arka planda veritabanından yüklenir."""
+    pool = FakePool(entities=[(i, i * 10, f"user{i}", None, None) for i in range(1, 6)])
+    session = await PooledPostgresSession("hesap1", pool=pool, hot_limit=2).load()
+
+    with pytest.raises(ValueError):
+        session.get_input_entity("user5")
+    assert await session.ensure("user5")
+    assert session.get_input_entity("user5") == InputPeerUser(5, 50)
+    assert len(pool.lookups) == 1
+
+    # Veritabanında da olmayan anahtar bir kez sorgulanır
+    assert not await session.ensure(999)
+    assert not await session.ensure(999)
+    assert len(pool.lookups) == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_upserts_only_changed_rows_in_one_transaction():
+    """Kirli varlıklar ve oturum anahtarı tek transaction içinde yazılır."""
+    pool = FakePool()
+    session = await PooledPostgresSession("hesap1", pool=pool).load()
+    session.process_entities([_user(1, "user1"), _user(2, "user2")])
+    session.auth_key = AuthKey(data=b"\x01" * 256)
+
+    assert await session.flush() == 3
+    assert pool.transactions == 1
+    upserts = [args for query, args in pool.executed if query == UPSERT_ENTITIES.format(p=session.table_prefix)]
+    assert sorted(upserts[0][0]) == [1, 2]
+
+    # Aynı varlık tekrar işlenince kirli sayılmaz
+    pool.executed.clear()
+    session.process_entities([_user(1, "user1"), _user(2, "user2_new")])
+    assert await session.flush() == 1
+    assert pool.executed[0][1][2] == ["user2_new"]
+
+
+@pytest.mark.asyncio
+async def test_flush_error_keeps_dirty_rows():
+    """Yazım hatasında kirli kayıtlar bir sonraki yazma için korunur."""
+    pool = FakePool()
+    session = await PooledPostgresSession("hesap1", pool=pool).load()
+    session.process_entities([_user(3, "user3")])
+
+    pool.fail = True
+    assert await session.flush() == 0
+    assert list(session._dirty_entities) == [3]
+    assert session.stats["errors"] == 1
+
+    pool.fail = False
+    assert await session.flush() == 1
+    assert session._dirty_entities == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_and_close_keep_changes():
+    """İptal edilen yazma kirli kayıtları geri koyar; close_async() son yazmayı bekler."""
+    import asyncio
+
+    pool = FakePool()
+    session = await PooledPostgresSession("hesap1", pool=pool).load()
+    session.process_entities([_user(4, "user4")])
+    session._session_dirty = True
+
+    original_execute = FakeConnection.execute
+
+    async def slow_execute(self, query, *args):
+        await asyncio.sleep(0.05)
+        return await original_execute(self, query, *args)
+
+    FakeConnection.execute = slow_execute
+    try:
+        task = asyncio.ensure_future(session.flush())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert list(session._dirty_entities) == [4]
+        assert session._session_dirty
+
+        await session.start()
+        session.close()
+        await session.close_async()
+    finally:
+        FakeConnection.execute = original_execute
+
+    assert not session.is_running
+    assert session._dirty_entities == {} and not session._session_dirty
+    assert session._background == set()
+
+
+@pytest.mark.asyncio
+async def test_client_awaits_database_for_cold_entities():
+    """İstemci, sıcak haritada olmayan varlığı ValueError yerine veritabanından çözer."""
+    pool = FakePool(entities=[(i, i * 10, f"user{i}", None, None) for i in range(1, 6)])
+    session = await PooledPostgresSession("hesap1", pool=pool, hot_limit=1).load()
+    client = PooledSessionClient(session, 1, "hash")
+
+    assert await client.get_input_entity(2) == InputPeerUser(2, 20)
+    assert await client.get_input_entity("user3") == InputPeerUser(3, 30)
+    assert len(pool.lookups) == 2
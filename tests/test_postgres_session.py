@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from telethon.tl.types import User
+
+from app.core.tdlib import session as postgres_session
+from app.core.tdlib.session import PostgresSession
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """Sahte psycopg2 bağlantısıyla PostgresSession oluşturur."""
+    monkeypatch.chdir(tmp_path)
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = None
+    conn.cursor.return_value.fetchall.return_value = []
+    with patch.object(postgres_session.psycopg2, "connect", return_value=conn):
+        sess = PostgresSession("test_session")
+    yield sess
+    sess.close()
+
+
+def _user(user_id, username):
+    return User(id=user_id, access_hash=user_id * 10, username=username, first_name="Ali")
+
+
+def test_save_writes_only_changed_entities(session):
+    """save() çağrısının yalnızca değişen varlıkları yazdığını doğrular."""
+    session.process_entities([_user(1, "user1")])
+    session.process_entities([_user(2, "user2")])
+    session.db_conn.reset_mock()
+
+    with patch.object(postgres_session, "execute_values") as mock_values:
+        session.save()
+    rows = mock_values.call_args.args[2]
+    assert sorted(r[0] for r in rows) == [1, 2]
+    session.db_conn.commit.assert_called_once()
+
+    # Aynı varlık tekrar işlenince kirli sayılmaz
+    session.process_entities([_user(1, "user1")])
+    session.process_entities([_user(2, "user2_new")])
+    with patch.object(postgres_session, "execute_values") as mock_values:
+        session.save()
+    rows = mock_values.call_args.args[2]
+    assert [(r[0], r[2]) for r in rows] == [(2, "user2_new")]
+
+
+def test_save_error_keeps_dirty_rows(session):
+    """Yazım hatasında kirli kayıtların korunduğunu doğrular."""
+    session.process_entities([_user(3, "user3")])
+
+    with patch.object(postgres_session, "execute_values", side_effect=RuntimeError("bağlantı koptu")):
+        with pytest.raises(RuntimeError):
+            session.save()
+
+    session.db_conn.rollback.assert_called()
+    assert session._dirty_entities == {3}
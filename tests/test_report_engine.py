@@ -0,0 +1,151 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from unittest.mock import AsyncMock
+
+import pandas as pd
+
+from app.services.analytics.analytics_export import (
+    AnalyticsExporter, EXPORT_TABLES, partition_path, read_frame, write_frame
+)
+from app.services.analytics.report_engine import AnalyticsReportEngine
+
+DAY = date(2025, 5, 1)
+
+
+def message_row(row_id, category, views=0, reactions=0, replies=0, forwards=0, day=DAY):
+    return {
+        "id": row_id, "message_id": row_id * 10, "group_id": -100, "category": category,
+        "content": f"mesaj {row_id}", "sent_at": datetime.combine(day, datetime.min.time()),
+        "views": views, "reactions": reactions, "replies": replies, "forwards": forwards,
+        "updated_at": datetime.now()
+    }
+
+
+def conversion_row(row_id, source_message_id, successful, conversion_type="group_reply"):
+    return {
+        "id": row_id, "user_id": row_id, "source_message_id": source_message_id, "group_id": -100,
+        "conversion_type": conversion_type, "converted_at": datetime.combine(DAY, datetime.min.time()),
+        "message_count": 4, "response_time": 1.0, "session_duration": 60.0,
+        "is_successful": successful, "updated_at": datetime.now()
+    }
+
+
+@pytest.fixture
+def engine(tmp_path):
+    write_frame(pd.DataFrame([
+        message_row(1, "promo", views=100, reactions=1),
+        message_row(2, "promo", views=10),
+        message_row(3, "regular", views=5, forwards=30),
+        message_row(4, "regular"),
+    ]), partition_path(str(tmp_path), "message_effectiveness", DAY))
+    write_frame(pd.DataFrame([
+        conversion_row(1, 1, True),
+        conversion_row(2, 1, False),
+        conversion_row(3, 3, True, conversion_type="direct"),
+    ]), partition_path(str(tmp_path), "dm_conversions", DAY))
+    return AnalyticsReportEngine(str(tmp_path))
+
+
+def test_top_messages_scored_vectorized(engine):
+    """En iyi mesajlar views + reactions*2 + replies*3 + forwards*5 puanına göre sıralanır."""
+    top = engine.top_messages(DAY, DAY, limit=2)
+    assert [(m["id"], m["total_score"]) for m in top] == [(3, 155), (1, 102)]
+    assert [m["id"] for m in engine.top_messages(DAY, DAY, category="promo")] == [1, 2]
+    assert engine.top_messages(date(2025, 6, 1), None) == []
+
+
+def test_top_messages_tolerate_missing_metrics(tmp_path):
+    """Ölçülmemiş (NaN) metrikler sıfır sayılır, int dönüşümü hata vermez."""
+    write_frame(pd.DataFrame([
+        message_row(1, "promo", views=None, reactions=2),
+        message_row(2, "promo", views=7, reactions=None),
+    ]), partition_path(str(tmp_path), "message_effectiveness", DAY))
+    top = AnalyticsReportEngine(str(tmp_path)).top_messages(DAY, DAY)
+
+    assert [(m["id"], m["views"], m["reactions"], m["total_score"]) for m in top] == [(2, 7, 0, 7), (1, 0, 2, 4)]
+
+
+def test_category_performance_and_funnel(engine):
+    """Kategori performansı ve dönüşüm hunisi dosyalardan hesaplanır."""
+    performance = engine.category_performance(DAY, DAY)
+    assert performance["promo"]["count"] == 2
+    assert performance["promo"]["avg_views"] == 55.0
+
+    funnel = engine.conversion_funnel(DAY, DAY)
+    assert funnel["promo"] == {
+        "sent": 2, "viewed": 2, "engaged": 1, "converted": 2, "successful": 1, "conversion_rate": 1.0
+    }
+    assert funnel["regular"]["viewed"] == 1
+    assert funnel["regular"]["converted"] == 1
+
+
+def test_daily_report_matches_service_layout(engine):
+    """Günlük rapor servis rapor yapısını korur ve bölümler önbellekten okunur."""
+    report = engine.daily_report(DAY)
+    assert report["date"] == "2025-05-01"
+    assert report["summary"]["total_messages"] == 4
+    assert report["summary"]["total_conversions"] == 3
+    assert report["summary"]["successful_conversions"] == 2
+    assert report["conversion_stats"]["group_reply"]["unique_users"] == 2
+    assert len(report["top_messages"]) == 4
+    assert engine.stats["partition_reads"] == 2
+    assert engine.stats["cache_hits"] > 0
+
+
+@pytest.mark.asyncio
+async def test_exporter_rewrites_changed_days_only(tmp_path):
+    """Aktarıcı yalnızca değişen günleri imleçle okuyup yazar."""
+    columns = EXPORT_TABLES["message_effectiveness"]["columns"]
+    rows = [tuple(message_row(i, "promo").values()) for i in range(1, 6)]
+
+    class Cursor:
+        def __init__(self):
+            self.remaining = list(rows)
+
+        async def fetch(self, n):
+            chunk, self.remaining = self.remaining[:n], self.remaining[n:]
+            return chunk
+
+    class Connection:
+        @asynccontextmanager
+        async def transaction(self):
+            yield
+
+        async def cursor(self, query, *args):
+            return Cursor()
+
+    @asynccontextmanager
+    async def acquire():
+        yield Connection()
+
+    pool = AsyncMock()
+    pool.fetch = AsyncMock(return_value=[{"day": DAY}])
+    pool.acquire = acquire
+    exporter = AnalyticsExporter(export_dir=str(tmp_path), pool=pool, chunk_size=2)
+
+    assert await exporter.export(["message_effectiveness"]) == {"message_effectiveness": 1}
+    frame = read_frame(partition_path(str(tmp_path), "message_effectiveness", DAY))
+    assert list(frame.columns) == columns
+    assert frame["id"].tolist() == [1, 2, 3, 4, 5]
+
+    # İkinci aktarım son aktarım zamanını filigran olarak kullanır
+    pool.fetch.return_value = []
+    assert await exporter.export(["message_effectiveness"]) == {"message_effectiveness": 0}
+    assert pool.fetch.call_args[0][1] > datetime(2000, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_service_exports_before_reporting_started(tmp_path):
+    """Servis hazır bildirilmeden önce bir aktarım yapılır, metrikler güncel dosyalardan yüklenir."""
+    from app.services.analytics.message_analytics_service import MessageAnalyticsService
+
+    service = MessageAnalyticsService(export_dir=str(tmp_path))
+    calls = []
+    service.engagement.start = AsyncMock()
+    service.exporter.export = AsyncMock(side_effect=lambda: calls.append("export") or {})
+    service._load_metrics = AsyncMock(side_effect=lambda: calls.append("load"))
+
+    assert await service._start() is True
+    assert calls == ["export", "load"]
+    assert service.initialized
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+
+from app.core.scheduler import WakeupScheduler, PgNotifyListener, NOTIFY_CHANNELS
+
+
+@pytest.mark.asyncio
+async def test_wait_wakes_at_due_time():
+    """Anahtar verilen vadede uyanır."""
+    wakeups = WakeupScheduler()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    assert await wakeups.wait("job", timeout=0.05) is True
+
+    elapsed = loop.time() - started
+    assert 0.04 <= elapsed < 0.5
+    assert wakeups.stats["timer_wakeups"] == 1
+    await wakeups.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_earliest_deadline_wins():
+    """Birden çok vade verildiğinde en erken olan geçerlidir."""
+    wakeups = WakeupScheduler()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    wakeups.schedule("job", 0.05)
+    assert await wakeups.wait("job", timeout=10) is True
+    assert loop.time() - started < 1
+    # Eski (geç) vade bir sonraki beklemeyi erken uyandırmaz
+    assert wakeups.next_due("job") is None
+    await wakeups.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_wake_interrupts_wait():
+    """wake() beklemeyi vade dolmadan sonlandırır."""
+    wakeups = WakeupScheduler()
+    waiter = asyncio.create_task(wakeups.wait("job", timeout=60))
+    await asyncio.sleep(0)
+
+    wakeups.wake("job")
+    assert await asyncio.wait_for(waiter, timeout=1) is True
+    assert wakeups.stats["notify_wakeups"] == 1
+    await wakeups.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stop_event_ends_wait():
+    """Durdurma olayı beklemeyi False ile sonlandırır."""
+    wakeups = WakeupScheduler()
+    stop_event = asyncio.Event()
+    waiter = asyncio.create_task(wakeups.wait("job", timeout=60, stop_event=stop_event))
+    await asyncio.sleep(0)
+
+    stop_event.set()
+    assert await asyncio.wait_for(waiter, timeout=1) is False
+    assert await wakeups.wait("job", timeout=60, stop_event=stop_event) is False
+    await wakeups.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_notification_wakes_subscribed_keys():
+    """NOTIFY geri çağrısı kanala abone anahtarları uyandırır."""
+    wakeups = WakeupScheduler()
+    listener = PgNotifyListener(wakeups)
+    listener._channels[NOTIFY_CHANNELS["messages"]] = {"message_service"}
+
+    waiter = asyncio.create_task(wakeups.wait("message_service", timeout=60))
+    other = asyncio.create_task(wakeups.wait("gpt_service", timeout=60))
+    await asyncio.sleep(0)
+
+    listener._on_notify(None, 1, NOTIFY_CHANNELS["messages"], "42")
+
+    assert await asyncio.wait_for(waiter, timeout=1) is True
+    assert not other.done()
+    assert listener.stats["notifications"] == 1
+    await wakeups.shutdown()
+    assert await asyncio.wait_for(other, timeout=1) is True
+
+
+@pytest.mark.asyncio
+async def test_ensure_triggers_skips_existing_triggers():
+    """Kurulu tetikleyiciler her başlangıçta yeniden oluşturulmaz."""
+    from unittest.mock import AsyncMock
+
+    pool = AsyncMock()
+    states = {
+        "messages": {"table_exists": True, "trigger_exists": True},
+        "gpt_requests": {"table_exists": True, "trigger_exists": False},
+        "campaigns": {"table_exists": False, "trigger_exists": False},
+    }
+    pool.fetchrow = AsyncMock(side_effect=lambda query, table, trigger: states[table])
+    listener = PgNotifyListener(WakeupScheduler(), pool=pool)
+
+    await listener.ensure_triggers()
+
+    statements = [call.args[0] for call in pool.execute.await_args_list]
+    assert not any("DROP TRIGGER" in statement for statement in statements)
+    created = [statement for statement in statements if "CREATE TRIGGER" in statement]
+    assert len(created) == 1 and "ON gpt_requests" in created[0]
+    assert listener._triggers_ready
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.db.schema_catalog import SchemaCatalog, CATALOG_QUERY
+
+ROWS = [
+    ("groups", "id", "integer"),
+    ("groups", "group_id", "bigint"),
+    ("groups", "name", "text"),
+    ("users", "user_id", "bigint"),
+]
+
+
+def make_session(rows=ROWS):
+    session = MagicMock()
+    session.execute.return_value.fetchall.return_value = rows
+    return session
+
+
+def test_ensure_loaded_queries_schema_once():
+    """Katalog tek sorguyla yüklenir ve sonraki kontroller bellekten yanıtlanır."""
+    catalog = SchemaCatalog()
+    session = make_session()
+
+    for _ in range(3):
+        assert catalog.ensure_loaded(session) is True
+    assert session.execute.call_count == 1
+
+    assert catalog.has_table("groups")
+    assert not catalog.has_table("campaigns")
+    assert catalog.has_column("users", "user_id")
+    assert catalog.columns("groups") == ["id", "group_id", "name"]
+    assert catalog.first_column("groups", ["chat_id", "group_id", "id"]) == "group_id"
+
+
+def test_statements_are_cached_until_invalidated():
+    """Şemaya bağlı ifadeler bir kez kurulur; invalidate sonrası yeniden kurulur."""
+    catalog = SchemaCatalog()
+    catalog.ensure_loaded(make_session())
+    builder = MagicMock(side_effect=lambda c: f"SELECT {c.first_column('groups', ['title', 'name'])}")
+
+    assert catalog.statement("q", builder) == "SELECT name"
+    assert catalog.statement("q", builder) == "SELECT name"
+    assert builder.call_count == 1
+
+    catalog.invalidate()
+    assert not catalog.has_table("groups")
+    catalog.ensure_loaded(make_session([("groups", "title", "text")]))
+    assert catalog.statement("q", builder) == "SELECT title"
+    assert builder.call_count == 2
+
+
+def test_failed_load_leaves_catalog_unloaded():
+    """Yükleme hatası servisleri durdurmaz; katalog boş kalır."""
+    catalog = SchemaCatalog()
+    session = MagicMock()
+    session.execute.side_effect = RuntimeError("bağlantı yok")
+
+    assert catalog.ensure_loaded(session) is False
+    assert not catalog.has_table("groups")
+    # İptal edilmiş işlem çağıranın sonraki sorgularını bozmasın
+    session.rollback.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_async_load_uses_pool():
+    """Asenkron yükleme havuz üzerinden aynı sorguyu çalıştırır."""
+    pool = AsyncMock()
+    pool.fetch = AsyncMock(return_value=ROWS)
+    catalog = SchemaCatalog()
+
+    assert await catalog.ensure_loaded_async(pool) is True
+    assert await catalog.ensure_loaded_async(pool) is True
+    pool.fetch.assert_awaited_once_with(CATALOG_QUERY)
+    assert catalog.version == 1
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.rate_limiter import TokenBucket
+from app.utils.send_pipeline import SendPipeline
+
+
+def test_token_bucket_burst_and_pause():
+    """Token bucket'ın patlama kapasitesini ve duraklatmayı doğrular."""
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert 0 < bucket.time_to_wait() <= 1.0
+
+    bucket.pause(30)
+    assert bucket.time_to_wait() >= 29
+
+
+@pytest.mark.asyncio
+async def test_round_runs_concurrently_and_skips_recent_chats():
+    """Gönderimlerin paralel yapıldığını ve yeni gönderilen sohbetlerin atlandığını doğrular."""
+    active = 0
+    max_active = 0
+
+    async def send(group):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return group.id != 3
+
+    pipeline = SendPipeline(send, workers=4, global_rate=1000, global_burst=10, chat_interval=60)
+    groups = [SimpleNamespace(id=i) for i in range(6)]
+
+    results = {}
+    summary = await pipeline.run_round(groups, on_result=lambda g, r: results.__setitem__(g.id, r))
+    assert summary == {"sent": 5, "failed": 1, "skipped": 0}
+    assert max_active == 4
+    assert results[3] is False
+
+    # min_message_interval dolmadan ikinci tur: tüm gruplar atlanır
+    summary = await pipeline.run_round(groups)
+    assert summary["skipped"] == 6
+
+
+@pytest.mark.asyncio
+async def test_pause_stops_sends_until_stop_event():
+    """Duraklatılan hattın durdurma sinyaliyle sonlandığını doğrular."""
+    stop_event = asyncio.Event()
+    sent = []
+
+    async def send(group):
+        sent.append(group.id)
+        return True
+
+    pipeline = SendPipeline(send, workers=2, global_rate=1000, global_burst=10, stop_event=stop_event)
+    pipeline.pause(60)
+
+    task = asyncio.create_task(pipeline.run_round([SimpleNamespace(id=1), SimpleNamespace(id=2)]))
+    await asyncio.sleep(0.1)
+    stop_event.set()
+    await asyncio.wait_for(task, timeout=3)
+    assert sent == []
+    # Duraklatılmış turda bekleyen sohbetlerin token'ı harcanmaz
+    assert pipeline.chat_ready(1) and pipeline.chat_ready(2)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_round_keeps_chat_tokens():
+    """Hesap geneli token beklenirken iptal edilen tur sohbet token'ını boşa harcamaz."""
+    async def send(group):
+        return True
+
+    pipeline = SendPipeline(send, workers=1, global_rate=1000, global_burst=10, chat_interval=60)
+    pipeline.pause(60)
+
+    task = asyncio.create_task(pipeline.run_round([SimpleNamespace(id=7)]))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert pipeline.chat_ready(7)
+
+
+def test_token_bucket_release_is_capped():
+    """Geri verilen token'lar kapasiteyi aşmaz."""
+    bucket = TokenBucket(rate=0.001, capacity=2)
+    assert bucket.try_acquire()
+    bucket.release()
+    bucket.release()
+    assert bucket.tokens == 2
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+
+from app.db.async_pg_db import AsyncPgDatabase
+from app.utils.single_flight import SingleFlight, db_flight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Aynı anahtarla eşzamanlı çağrılar tek çalıştırmayı paylaşır."""
+    flight = SingleFlight("test")
+    calls = []
+
+    async def load(user_id):
+        calls.append(user_id)
+        await asyncio.sleep(0.01)
+        return {"id": user_id}
+
+    results = await asyncio.gather(*(flight.do(("user", 7), load, 7) for _ in range(10)))
+
+    assert calls == [7]
+    assert all(r == {"id": 7} for r in results)
+    stats = flight.get_stats()
+    assert stats["executed"] == 1 and stats["saved"] == 9
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_all_waiters_and_frees_key():
+    """Hata tüm bekleyenlere iletilir; sonraki çağrı yeniden çalışır."""
+    flight = SingleFlight("test")
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("geçici hata")
+        return "ok"
+
+    results = await asyncio.gather(*(flight.do("k", flaky) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not flight.in_flight("k")
+
+    assert await flight.do("k", flaky) == "ok"
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_independently():
+    """Farklı anahtarlar birbirini beklemez."""
+    flight = SingleFlight("test")
+
+    async def echo(value):
+        await asyncio.sleep(0)
+        return value
+
+    assert await asyncio.gather(flight.do(1, echo, "a"), flight.do(2, echo, "b")) == ["a", "b"]
+    assert flight.stats["saved"] == 0
+
+
+class SlowPool:
+    """Sorguları sayan, yanıtı geciktiren sahte havuz"""
+
+    def __init__(self):
+        self.fetch_calls = 0
+        self.executed = []
+
+    async def fetch(self, query, *args):
+        self.fetch_calls += 1
+        await asyncio.sleep(0.01)
+        return [(1,)]
+
+    async def fetchrow(self, query, *args):
+        self.fetch_calls += 1
+        await asyncio.sleep(0.01)
+        return (args[0],)
+
+    async def execute(self, query, *args):
+        self.executed.append(query)
+        return "UPDATE 1"
+
+
+@pytest.mark.asyncio
+async def test_db_reads_coalesce_within_write_generation():
+    """Özdeş SELECT'ler birleştirilir; yazmadan sonra başlayan okuma yeni sorgu yapar."""
+    pool = SlowPool()
+    db = AsyncPgDatabase(pool=pool)
+    query = "SELECT user_id FROM users WHERE is_active = %s"
+
+    first = asyncio.ensure_future(db.fetchall(query, (True,)))
+    await asyncio.sleep(0)
+    await db.execute("UPDATE users SET is_active = FALSE WHERE user_id = %s", (1,))
+    await asyncio.gather(first, db.fetchall(query, (True,)), db.fetchall(query, (True,)))
+
+    # Yazmadan önceki okuma + yazmadan sonraki iki özdeş okumanın tek sorgusu
+    assert pool.fetch_calls == 2
+    assert db_flight.get_stats()["in_flight"] == 0
+
+    # Farklı parametreler ayrı sorgulanır
+    rows = await asyncio.gather(db.fetchone("SELECT %s", (1,)), db.fetchone("SELECT %s", (2,)))
+    assert [r[0] for r in rows] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_starter_does_not_cancel_other_waiters():
+    """Çağrıyı başlatan iptal edilse de diğerleri sonucu alır; son bekleyen ayrılınca çağrı iptal olur."""
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+    cancelled = []
+
+    async def load():
+        started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "ok"
+
+    first = asyncio.ensure_future(flight.do("k", load))
+    await started.wait()
+    second = asyncio.ensure_future(flight.do("k", load))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "ok"
+    assert first.cancelled()
+    assert cancelled == []
+
+    # Tüm bekleyenler ayrılırsa paylaşılan çağrı da iptal edilir ve anahtar boşalır
+    started.clear()
+    only = asyncio.ensure_future(flight.do("k", load))
+    await started.wait()
+    only.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled == [True]
+    assert not flight.in_flight("k")
@@ -0,0 +1,106 @@
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.tdlib.client import TDLibClient
+
+
+@pytest.fixture
+def tdlib_client(tmp_path):
+    """Sahte tdjson kütüphanesiyle TDLibClient oluşturur."""
+    tdjson = MagicMock()
+    with patch("ctypes.util.find_library", return_value="tdjson"), \
+         patch("ctypes.CDLL", return_value=tdjson):
+        client = TDLibClient(
+            api_id=1,
+            api_hash="hash",
+            session_name="test",
+            files_directory=str(tmp_path / "files"),
+            database_directory=str(tmp_path / "db"),
+            poll_timeout=0.01,
+            max_pending_updates=2,
+        )
+    return client
+
+
+def _feed(client, results):
+    """td_json_client_receive çağrılarına sırayla verilecek sonuçları ayarlar."""
+    pending = [json.dumps(r).encode("utf-8") for r in results]
+    lock = threading.Lock()
+
+    def receive(_client, timeout):
+        with lock:
+            if pending:
+                return pending.pop(0)
+        time.sleep(timeout)
+        return None
+
+    client._td_json_client_receive = receive
+
+
+@pytest.mark.asyncio
+async def test_responses_resolve_pending_requests(tdlib_client):
+    """İstek yanıtlarının bekleyen future'lara iletildiğini doğrular."""
+    _feed(tdlib_client, [{"@type": "user", "id": 7, "@extra": {"request_id": 0}}])
+    request = asyncio.create_task(tdlib_client.get_me())
+    await asyncio.sleep(0)
+    tdlib_client._start_receiver()
+    try:
+        result = await asyncio.wait_for(request, timeout=2.0)
+    finally:
+        await tdlib_client._stop_receiver()
+
+    assert result["id"] == 7
+    assert tdlib_client._pending_requests == {}
+
+
+@pytest.mark.asyncio
+async def test_updates_are_dispatched_with_backpressure(tdlib_client):
+    """Güncellemelerin sınırlı kuyruk üzerinden işleyicilere ulaştığını doğrular."""
+    updates = [{"@type": "updateNewMessage", "n": i} for i in range(5)]
+    _feed(tdlib_client, updates)
+
+    received = []
+    release = asyncio.Event()
+
+    async def handler(update):
+        await release.wait()
+        received.append(update["n"])
+
+    await tdlib_client.add_update_handler(handler)
+    tdlib_client._start_receiver()
+    try:
+        await asyncio.sleep(0.2)
+        # İşleyici bloklu iken kuyruk kapasitenin üstüne çıkmaz
+        assert tdlib_client._updates_queue.qsize() <= 2
+        release.set()
+        for _ in range(100):
+            if len(received) == 5:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await tdlib_client._stop_receiver()
+
+    assert received == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_type_uses_authorization_state(tdlib_client):
+    """Yetkilendirme durumunun beklenen türle eşleştiğini doğrular."""
+    _feed(tdlib_client, [{
+        "@type": "updateAuthorizationState",
+        "authorization_state": {"@type": "authorizationStateReady"}
+    }])
+    tdlib_client._start_receiver()
+    try:
+        result = await tdlib_client._wait_for_type("authorizationStateReady", timeout=2.0)
+        again = await tdlib_client._wait_for_type("authorizationStateReady", timeout=0.1)
+    finally:
+        await tdlib_client._stop_receiver()
+
+    assert result["authorization_state"]["@type"] == "authorizationStateReady"
+    assert again is result
@@ -0,0 +1,149 @@
+import json
+import os
+import pytest
+
+from app.utils.template_registry import TemplateRegistry
+
+
+def _write(path, data, mtime=None):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    _write(tmp_path / "messages.json", {"sohbet_acici": ["Naber? ", "Kim uyanık?"], "general": ["Selam"]})
+    _write(tmp_path / "responses.json", {"sohbet_acici_reply": ["DM'den yaz 😊"]})
+    (tmp_path / "notes.txt").write_text("şablon değil")
+    return tmp_path
+
+
+class FakePool:
+    def __init__(self, rows=None, fail=False):
+        self.rows = rows or []
+        self.fail = fail
+
+    async def fetch(self, query, *args):
+        if self.fail:
+            raise RuntimeError("bağlantı koptu")
+        return self.rows
+
+
+def test_snapshot_is_indexed_and_immutable(data_dir):
+    """Kategoriler demet, açıcı kontrolü küme üzerinden yapılır; veri değiştirilemez."""
+    registry = TemplateRegistry(data_dir=str(data_dir))
+    snapshot = registry.snapshot
+
+    assert snapshot.get("messages", "general") == ("Selam",)
+    assert snapshot.contains("messages", "sohbet_acici", "  Naber?")
+    assert not snapshot.contains("messages", "sohbet_acici", "Selam")
+    assert snapshot.choice("responses", "sohbet_acici_reply") == "DM'den yaz 😊"
+    assert snapshot.choice("responses", "yok") is None
+    assert set(snapshot.sources) == {"messages", "responses"}
+
+    with pytest.raises(TypeError):
+        snapshot.source("messages")["general"] = ["değişti"]
+    # Tekrar erişim dosyayı yeniden okumaz
+    assert registry.snapshot is snapshot
+
+
+def test_reload_swaps_only_when_files_change(data_dir):
+    """Değişiklik mtime/boyut ile algılanır; bozuk dosya eski içeriğini korur."""
+    registry = TemplateRegistry(data_dir=str(data_dir))
+    first = registry.snapshot
+    view = registry.live(messages="messages")
+    assert not registry.changed()
+
+    _write(data_dir / "messages.json", {"general": ["Yeni selam"]}, mtime=first.mtimes["messages.json"][0] + 10**9)
+    assert registry.changed()
+    second = registry.reload()
+    assert second.version == first.version + 1
+    assert view["messages"]["general"] == ("Yeni selam",)
+    # Eski görüntü okuyucular için olduğu gibi kalır
+    assert first.get("messages", "general") == ("Selam",)
+
+    (data_dir / "responses.json").write_text("{bozuk", encoding="utf-8")
+    third = registry.reload()
+    assert third.get("responses", "sohbet_acici_reply") == ("DM'den yaz 😊",)
+    assert registry.stats["file_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reload_async_indexes_db_templates_by_type(data_dir):
+    """message_templates satırları "db" kaynağında type'a göre gruplanır ve dosya yenilemesinde korunur."""
+    pool = FakePool(rows=[(1, "Günaydın", "morning"), (2, "İyi geceler", "evening"), (3, "Günün ipucu", "morning")])
+    registry = TemplateRegistry(data_dir=str(data_dir), pool=pool)
+
+    snapshot = await registry.reload_async()
+    assert snapshot.get("db", "morning") == ("Günaydın", "Günün ipucu")
+
+    # Dosya yenilemesi veritabanı şablonlarını korur; DB hatası da eskisini bırakır
+    assert registry.reload().get("db", "evening") == ("İyi geceler",)
+    pool.fail = True
+    assert (await registry.reload_async()).get("db", "evening") == ("İyi geceler",)
+    assert registry.get_stats()["db_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_watcher_start_stop(data_dir):
+    """start() şablonları yükler, stop() izleyiciyi kapatır."""
+    registry = TemplateRegistry(data_dir=str(data_dir), watch_interval=0.01, pool=FakePool())
+    assert await registry.start()
+    assert registry.get_stats()["watching"]
+    assert registry.snapshot.version == 1
+
+    await registry.stop()
+    assert not registry.get_stats()["watching"]
+
+
+@pytest.mark.asyncio
+async def test_watcher_is_reference_counted(data_dir):
+    """İzleyici, başlatan her kullanıcı stop() çağırana kadar çalışmaya devam eder."""
+    registry = TemplateRegistry(data_dir=str(data_dir), watch_interval=0.01, pool=FakePool())
+    assert await registry.start()
+    assert await registry.start()
+
+    await registry.stop()
+    assert registry.get_stats()["watching"]
+    await registry.stop()
+    assert not registry.get_stats()["watching"]
+
+
+@pytest.mark.asyncio
+async def test_services_read_db_templates_from_registry(data_dir, monkeypatch):
+    """DM/tanıtım servisleri şablonları kaydın "db" kaynağından türe göre alır."""
+    from app.services.messaging import dm_service, promo_service
+
+    pool = FakePool(rows=[(1, "Hoş geldin!", "dm_welcome"), (2, "Kampanya", "promo_general"), (3, "Davet", "dm_invite")])
+    registry = TemplateRegistry(data_dir=str(data_dir), pool=pool)
+    monkeypatch.setattr(dm_service, "template_registry", registry)
+    monkeypatch.setattr(promo_service, "template_registry", registry)
+
+    dm = dm_service.DirectMessageService.__new__(dm_service.DirectMessageService)
+    await dm._load_templates()
+    assert dm.welcome_templates == ("Hoş geldin!",)
+    assert dm.service_templates == (dm_service.DEFAULT_SERVICE_TEMPLATE,)
+    assert dm.templates["invite"] == ("Davet",)
+
+    promo = promo_service.PromoService.__new__(promo_service.PromoService)
+    await promo._load_templates()
+    assert promo.promo_templates == {"promo_general": ("Kampanya",)}
+
+    # Yenilemeden sonra servisler yeni şablonları yeniden yüklemeden görür
+    pool.rows = [(4, "Yeni hoş geldin", "dm_welcome"), (5, "Yeni kampanya", "promo_general")]
+    await registry.reload_async()
+    assert dm.welcome_templates == ("Yeni hoş geldin",)
+    assert dm.templates["invite"] == (dm_service.DEFAULT_INVITE_TEMPLATE,)
+    assert promo._templates_for("promo_general") == ("Yeni kampanya",)
+
+    # Tablo okunamazsa varsayılanlar kullanılır
+    pool.fail = True
+    fallback = TemplateRegistry(data_dir=str(data_dir), pool=pool)
+    monkeypatch.setattr(promo_service, "template_registry", fallback)
+    await promo._load_templates()
+    assert promo.promo_templates == {
+        template_type: tuple(templates)
+        for template_type, templates in promo_service.DEFAULT_PROMO_TEMPLATES.items()
+    }
+    assert registry.get_stats()["db_errors"] == 0
@@ -0,0 +1,44 @@
+from app.utils.time_wheel import ExpiringIdSet
+
+
+def test_touch_and_last_seen():
+    """Eklenen ve yenilenen kayıtların son görülme zamanını doğrular."""
+    wheel = ExpiringIdSet(horizon=3600, slot_seconds=60)
+    wheel.touch(1, now=0)
+    wheel.touch(1, now=120)
+    wheel.touch(2, now=30)
+
+    assert len(wheel) == 2
+    assert wheel.last_seen(1, now=130) == 120
+    assert wheel.last_seen(3, now=130) is None
+
+
+def test_expire_drops_only_old_entries():
+    """Süre sonunda yalnızca horizon'u aşan kayıtların silindiğini doğrular."""
+    wheel = ExpiringIdSet(horizon=100, slot_seconds=60)
+    wheel.touch(1, now=0)
+    wheel.touch(2, now=50)
+    wheel.touch(1, now=90)
+
+    # Süresi dolan kayıt, dilimi süpürülene kadar görünmez olur
+    assert wheel.last_seen(2, now=170) is None
+
+    assert wheel.expire(now=185) == 1
+    assert wheel.last_seen(1, now=185) == 90
+
+    assert wheel.expire(now=400) == 1
+    assert len(wheel) == 0
+
+
+def test_memory_bounded_under_churn():
+    """Çok sayıda tekrar eden görülmede dilimlerin büyümediğini doğrular."""
+    wheel = ExpiringIdSet(horizon=600, slot_seconds=60)
+    now = 0.0
+    for i in range(20000):
+        now += 0.5
+        wheel.touch(i % 500, now=now)
+
+    assert len(wheel) == 500
+    assert sum(len(slot) for slot in wheel._slots) <= 500 * wheel.slot_count
+    wheel.expire(now=now + 700)
+    assert len(wheel) == 0
@@ -0,0 +1,70 @@
+import time
+import pytest
+
+from app.utils.ttl_cache import MISSING, TTLCache
+
+
+def test_lru_eviction():
+    """Kapasite aşıldığında en eski kaydın çıkarıldığını doğrular."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" artık en son kullanılan
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Süresi dolan kayıtların düşürüldüğünü doğrular."""
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", False, ttl=60)
+    time.sleep(0.1)
+
+    assert cache.get("a") is MISSING
+    assert cache.get("b") is False
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_invalidate_group():
+    """Bir kullanıcıya ait tüm kayıtların tek seferde silindiğini doğrular."""
+    cache = TTLCache(maxsize=10, ttl=60, group_fn=lambda key: key[0])
+    cache.set((1, "exists"), True)
+    cache.set((1, "is_invited"), False)
+    cache.set((2, "exists"), True)
+
+    assert cache.invalidate_group(1) == 2
+    assert cache.get((1, "exists")) is MISSING
+    assert cache.get((2, "exists")) is True
+
+
+@pytest.mark.asyncio
+async def test_handler_cache_keys_and_invalidation_order():
+    """Anahtar argümanlar önbellek anahtarına girer; yazma sonrası önbellek silinir."""
+    from app.handlers.handlers import MessageHandlers
+    from app.utils.ttl_cache import user_cache
+
+    calls = []
+
+    class FakeHandlers:
+        async def _call_db_method(self, method_name, *args, **kwargs):
+            calls.append((method_name, args, kwargs))
+            if method_name == 'was_recently_invited':
+                return kwargs.get('hours') == 4
+            # Yazma sürerken eski değer önbelleğe girer
+            user_cache.set((5, 'is_invited'), False)
+            return True
+
+    handlers = FakeHandlers()
+    run = MessageHandlers._run_db_method
+    assert await run(handlers, 'was_recently_invited', 5, hours=4) is True
+    assert await run(handlers, 'was_recently_invited', 5, hours=24) is False
+    assert await run(handlers, 'was_recently_invited', 5, hours=4) is True
+    assert len(calls) == 2
+
+    assert await run(handlers, 'mark_user_invited', 5) is True
+    assert user_cache.get((5, 'is_invited')) is MISSING
+    assert user_cache.get((5, 'was_recently_invited', ('hours', 4))) is MISSING
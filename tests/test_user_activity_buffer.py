@@ -0,0 +1,113 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.db.user_activity_buffer import UserActivityBuffer
+
+
+@pytest.fixture
+def mock_pool():
+    """AsyncDbConnectionPool mock nesnesi oluşturur."""
+    pool = AsyncMock()
+    pool.execute_many = AsyncMock()
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_record_merges_per_user(mock_pool):
+    """Aynı kullanıcının görülmelerinin tek satırda birleştiğini doğrular."""
+    buffer = UserActivityBuffer(pool=mock_pool)
+    buffer.record(1, username="user1", source_group="Grup A")
+    buffer.record(1, first_name="Ali", source_group="Grup B")
+    buffer.record(2, username="user2")
+
+    assert buffer.pending_count == 2
+    assert buffer.is_pending(1)
+
+    written = await buffer.flush()
+    assert written == 2
+    assert buffer.pending_count == 0
+
+    query, rows = mock_pool.execute_many.call_args.args
+    assert "ON CONFLICT (user_id)" in query
+    row = next(r for r in rows if r[0] == 1)
+    assert row[1] == "user1"
+    assert row[2] == "Ali"
+    assert row[4] == "Grup A"
+
+
+@pytest.mark.asyncio
+async def test_flush_error_keeps_rows(mock_pool):
+    """Yazım hatasında kayıtların tamponda kaldığını doğrular."""
+    mock_pool.execute_many.side_effect = RuntimeError("bağlantı koptu")
+    buffer = UserActivityBuffer(pool=mock_pool)
+    buffer.record(1, username="user1")
+
+    assert await buffer.flush() == 0
+    assert buffer.is_pending(1)
+    assert buffer.get_stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending(mock_pool):
+    """Durdurma sırasında bekleyen kayıtların yazıldığını doğrular."""
+    buffer = UserActivityBuffer(pool=mock_pool, flush_interval_ms=60000)
+    assert await buffer.start() is True
+    buffer.record(5, username="user5")
+    await buffer.stop()
+
+    mock_pool.execute_many.assert_awaited_once()
+    assert buffer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_during_flush_loses_nothing(mock_pool):
+    """Boşaltma sürerken stop() kayıtları düşürmez; iptal edilen boşaltma geri koyar."""
+    import asyncio
+
+    started = asyncio.Event()
+
+    async def slow_execute_many(query, rows):
+        started.set()
+        await asyncio.sleep(0.05)
+
+    mock_pool.execute_many = AsyncMock(side_effect=slow_execute_many)
+    buffer = UserActivityBuffer(pool=mock_pool, max_batch_rows=1)
+    assert await buffer.start()
+    buffer.record(1, username="a")
+    await started.wait()
+    buffer.record(2, username="b")
+    await buffer.stop()
+
+    assert mock_pool.execute_many.await_count == 2
+    assert buffer.pending_count == 0
+
+    buffer.record(3, username="c")
+    task = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert buffer.is_pending(3)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_merges_with_newer_sighting(mock_pool):
+    """Yazılamayan kayıt, boşaltma sırasında gelen yeni kayıtla birleşir."""
+    buffer = UserActivityBuffer(pool=mock_pool)
+    buffer.record(1, username="eski", source_group="Grup A")
+    buffer.record(1)
+    first_seen = buffer._pending[1].first_seen
+
+    async def execute_many(query, rows):
+        buffer.record(1, first_name="Ali", source_group="Grup B")
+        raise RuntimeError("bağlantı koptu")
+
+    mock_pool.execute_many.side_effect = execute_many
+    assert await buffer.flush() == 0
+
+    sighting = buffer._pending[1]
+    assert sighting.count == 3
+    assert sighting.first_seen == first_seen
+    assert sighting.username == "eski"
+    assert sighting.first_name == "Ali"
+    assert sighting.source_group == "Grup A"